@@ -0,0 +1,45 @@
+"""add materialized user credit balances
+
+Revision ID: 010
+Revises: 009
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '010'
+down_revision = '009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create user_credit_balances table
+    op.create_table(
+        'user_credit_balances',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('balance', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=True, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.PrimaryKeyConstraint('user_id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    )
+
+    # Backfill snapshots from the existing ledger; credit_ledger was created on
+    # first request before migration 020, so older databases may not have it
+    if sa.inspect(op.get_bind()).has_table('credit_ledger'):
+        op.execute(
+            """
+            INSERT INTO user_credit_balances (user_id, balance, updated_at)
+            SELECT user_id, SUM(delta), CURRENT_TIMESTAMP
+            FROM credit_ledger
+            GROUP BY user_id
+            """
+        )
+
+
+def downgrade():
+    # Drop table
+    op.drop_table('user_credit_balances')
@@ -0,0 +1,40 @@
+"""add composite indexes for keyset pagination
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '011'
+down_revision = '010'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - each listing's sort key followed by id
+KEYSET_INDEXES = [
+    ('ix_community_posts_feed_newest', 'community_posts', ['visibility', 'is_hidden', 'created_at', 'id']),
+    ('ix_community_posts_feed_popular', 'community_posts', ['likes_count', 'id']),
+    ('ix_community_posts_feed_most_remixed', 'community_posts', ['reuse_count', 'id']),
+    ('ix_comments_post_thread', 'comments', ['post_id', 'is_deleted', 'created_at', 'id']),
+    ('ix_wallet_transactions_wallet_created', 'wallet_transactions', ['wallet_id', 'created_at', 'id']),
+    ('ix_users_created_id', 'users', ['created_at', 'id']),
+    ('ix_payouts_created_id', 'payouts', ['created_at', 'id']),
+    ('ix_payouts_status_created_id', 'payouts', ['status', 'created_at', 'id']),
+]
+
+
+def upgrade():
+    # Create indexes
+    for name, table, columns in KEYSET_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    # Drop indexes
+    for name, table, _ in reversed(KEYSET_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,35 @@
+"""add trending score to community posts
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-18
+
+Run `python -m scripts.recompute_trending_scores` after upgrading to
+backfill scores for existing posts.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '012'
+down_revision = '011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Add trending score column
+    op.add_column('community_posts', sa.Column('trending_score', sa.Float(), nullable=False, server_default='0'))
+
+    # Create index
+    op.create_index('ix_community_posts_feed_trending', 'community_posts', ['trending_score', 'id'], unique=False)
+
+
+def downgrade():
+    # Drop index
+    op.drop_index('ix_community_posts_feed_trending', table_name='community_posts')
+
+    # Remove column
+    op.drop_column('community_posts', 'trending_score')
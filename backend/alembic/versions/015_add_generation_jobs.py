@@ -0,0 +1,63 @@
+"""add generation jobs
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '015'
+down_revision = '014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create generation_jobs table
+    op.create_table(
+        'generation_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('template_id', sa.Integer(), nullable=True),
+        sa.Column('prompt_text', sa.Text(), nullable=False),
+        sa.Column('enhance_prompt', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('tier', sa.String(length=20), nullable=False, server_default='standard'),
+        sa.Column('requested_provider', sa.String(length=50), nullable=True),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('credits_reserved', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('image_id', sa.Integer(), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('locked_by', sa.String(length=100), nullable=True),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['template_id'], ['image_templates.id'], ),
+        sa.ForeignKeyConstraint(['image_id'], ['generated_images.id'], ),
+    )
+
+    # Create indexes
+    op.create_index(op.f('ix_generation_jobs_id'), 'generation_jobs', ['id'], unique=False)
+    op.create_index(
+        'ix_generation_jobs_status_provider_created',
+        'generation_jobs',
+        ['status', 'provider', 'created_at', 'id'],
+        unique=False,
+    )
+
+
+def downgrade():
+    # Drop indexes
+    op.drop_index('ix_generation_jobs_status_provider_created', table_name='generation_jobs')
+    op.drop_index(op.f('ix_generation_jobs_id'), table_name='generation_jobs')
+
+    # Drop table
+    op.drop_table('generation_jobs')
@@ -0,0 +1,70 @@
+"""add referral paths closure table
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '016'
+down_revision = '015'
+branch_labels = None
+depends_on = None
+
+# Referral chains deeper than this are assumed to be cycles in bad data
+MAX_DEPTH = 100
+
+
+def upgrade():
+    # Create referral_paths table
+    op.create_table(
+        'referral_paths',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id'),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['users.id'], ),
+        sa.ForeignKeyConstraint(['descendant_id'], ['users.id'], ),
+    )
+
+    # Children lookup used by the backfill and by direct-referral listings
+    op.create_index(op.f('ix_users_referred_by_id'), 'users', ['referred_by_id'], unique=False)
+
+    # Backfill from users.referred_by_id one level at a time
+    conn = op.get_bind()
+    conn.execute(sa.text(
+        """
+        INSERT INTO referral_paths (ancestor_id, descendant_id, depth)
+        SELECT referred_by_id, id, 1 FROM users WHERE referred_by_id IS NOT NULL
+        """
+    ))
+    for depth in range(1, MAX_DEPTH):
+        inserted = conn.execute(sa.text(
+            """
+            INSERT INTO referral_paths (ancestor_id, descendant_id, depth)
+            SELECT p.ancestor_id, u.id, p.depth + 1
+            FROM referral_paths p
+            JOIN users u ON u.referred_by_id = p.descendant_id
+            WHERE p.depth = :depth
+            """
+        ), {"depth": depth}).rowcount
+        if not inserted:
+            break
+
+    # Create indexes
+    op.create_index('ix_referral_paths_ancestor_depth', 'referral_paths', ['ancestor_id', 'depth', 'descendant_id'], unique=False)
+    op.create_index('ix_referral_paths_descendant_depth', 'referral_paths', ['descendant_id', 'depth', 'ancestor_id'], unique=False)
+
+
+def downgrade():
+    # Drop indexes
+    op.drop_index('ix_referral_paths_descendant_depth', table_name='referral_paths')
+    op.drop_index('ix_referral_paths_ancestor_depth', table_name='referral_paths')
+    op.drop_index(op.f('ix_users_referred_by_id'), table_name='users')
+
+    # Drop table
+    op.drop_table('referral_paths')
@@ -0,0 +1,88 @@
+"""add commission rates
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '017'
+down_revision = '016'
+branch_labels = None
+depends_on = None
+
+# Seed for the default plan: a copy of COMMISSION_MATRIX in app/services/commission_calculator.py
+# [referrer_package][referee_package][level]
+DEFAULT_MATRIX = {
+    "Silver": {
+        "Silver": {1: 1875.0, 2: 150.0},
+        "Gold": {1: 2375.0, 2: 350.0},
+        "Platinum": {1: 2875.0, 2: 400.0}
+    },
+    "Gold": {
+        "Silver": {1: 1875.0, 2: 200.0},
+        "Gold": {1: 3375.0, 2: 400.0},
+        "Platinum": {1: 3875.0, 2: 600.0}
+    },
+    "Platinum": {
+        "Silver": {1: 1875.0, 2: 200.0},
+        "Gold": {1: 3375.0, 2: 500.0},
+        "Platinum": {1: 5625.0, 2: 1000.0}
+    }
+}
+
+
+def upgrade():
+    # Create commission_rates table
+    commission_rates = op.create_table(
+        'commission_rates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('plan', sa.String(length=50), nullable=False, server_default='default'),
+        sa.Column('referrer_package_id', sa.Integer(), nullable=False),
+        sa.Column('referee_package_id', sa.Integer(), nullable=False),
+        sa.Column('level', sa.Integer(), nullable=False),
+        sa.Column('amount', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.ForeignKeyConstraint(['referrer_package_id'], ['packages.id'], ),
+        sa.ForeignKeyConstraint(['referee_package_id'], ['packages.id'], ),
+        sa.UniqueConstraint('plan', 'referrer_package_id', 'referee_package_id', 'level', name='uq_commission_rate_cell'),
+    )
+    op.create_index(op.f('ix_commission_rates_id'), 'commission_rates', ['id'], unique=False)
+    op.create_index('ix_user_packages_user_status_purchase', 'user_packages', ['user_id', 'status', 'purchase_date'], unique=False)
+
+    # Seed the default plan for the packages that exist
+    package_ids = dict(op.get_bind().execute(sa.text("SELECT name, id FROM packages")).fetchall())
+    now = datetime.utcnow()
+    rows = [
+        {
+            'plan': 'default',
+            'referrer_package_id': package_ids[referrer],
+            'referee_package_id': package_ids[referee],
+            'level': level,
+            'amount': amount,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for referrer, referees in DEFAULT_MATRIX.items() if referrer in package_ids
+        for referee, levels in referees.items() if referee in package_ids
+        for level, amount in levels.items()
+    ]
+    if rows:
+        op.bulk_insert(commission_rates, rows)
+
+
+def downgrade():
+    # Drop indexes
+    op.drop_index('ix_user_packages_user_status_purchase', table_name='user_packages')
+    op.drop_index(op.f('ix_commission_rates_id'), table_name='commission_rates')
+
+    # Drop table
+    op.drop_table('commission_rates')
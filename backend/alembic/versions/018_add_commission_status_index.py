@@ -0,0 +1,26 @@
+"""add commissions (status, user_id) index
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '018'
+down_revision = '017'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Pending commissions per user, scanned by the set-based payout batch
+    op.create_index('ix_commissions_status_user', 'commissions', ['status', 'user_id'], unique=False)
+
+
+def downgrade():
+    # Drop index
+    op.drop_index('ix_commissions_status_user', table_name='commissions')
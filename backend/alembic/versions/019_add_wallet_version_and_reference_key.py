@@ -0,0 +1,50 @@
+"""add wallet version and unique wallet transaction references
+
+Revision ID: 019
+Revises: 018
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '019'
+down_revision = '018'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Optimistic-lock version, bumped by every balance change
+    op.add_column('wallets', sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+    # reference_id becomes an idempotency key per wallet; duplicates (lost-update
+    # races of the old read-modify-write path) must be reviewed before upgrading
+    conn = op.get_bind()
+    duplicates = conn.execute(sa.text(
+        """
+        SELECT COUNT(*) FROM (
+            SELECT wallet_id, reference_id FROM wallet_transactions
+            WHERE reference_id IS NOT NULL
+            GROUP BY wallet_id, reference_id HAVING COUNT(*) > 1
+        ) AS duplicated
+        """
+    )).scalar()
+    if duplicates:
+        raise RuntimeError(
+            f"{duplicates} (wallet_id, reference_id) pairs have more than one wallet transaction; "
+            "resolve them before applying this migration"
+        )
+
+    # Create index
+    op.create_index('uq_wallet_transactions_wallet_reference', 'wallet_transactions', ['wallet_id', 'reference_id'], unique=True)
+
+
+def downgrade():
+    # Drop index
+    op.drop_index('uq_wallet_transactions_wallet_reference', table_name='wallet_transactions')
+
+    # Drop column
+    op.drop_column('wallets', 'version')
@@ -0,0 +1,122 @@
+"""add tables that used to be created on first request
+
+Revision ID: 020
+Revises: 019
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '020'
+down_revision = '019'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # modules, topics, profiles, certificates and credit_ledger were created by
+    # the request handlers (Table.create(checkfirst=True)) rather than a migration,
+    # so older databases may or may not have them already
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'modules' not in existing:
+        # Create modules table
+        op.create_table(
+            'modules',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('display_order', sa.Integer(), nullable=True),
+            sa.Column('is_published', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_modules_id'), 'modules', ['id'], unique=False)
+
+    if 'topics' not in existing:
+        # Create topics table
+        op.create_table(
+            'topics',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('module_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=200), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('video_source_type', sa.Enum('CLOUDINARY', 'YOUTUBE', 'VIMEO', 'EXTERNAL', name='videosourcetype'), nullable=True),
+            sa.Column('cloudinary_public_id', sa.String(length=200), nullable=True),
+            sa.Column('cloudinary_url', sa.String(length=500), nullable=True),
+            sa.Column('external_video_url', sa.String(length=500), nullable=True),
+            sa.Column('thumbnail_url', sa.String(length=500), nullable=True),
+            sa.Column('duration', sa.Integer(), nullable=True),
+            sa.Column('display_order', sa.Integer(), nullable=True),
+            sa.Column('is_published', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_topics_id'), 'topics', ['id'], unique=False)
+
+    if 'profiles' not in existing:
+        # Create profiles table
+        op.create_table(
+            'profiles',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('avatar_public_id', sa.String(), nullable=True),
+            sa.Column('avatar_url', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', name='uq_profile_user')
+        )
+        op.create_index(op.f('ix_profiles_id'), 'profiles', ['id'], unique=False)
+        op.create_index(op.f('ix_profiles_user_id'), 'profiles', ['user_id'], unique=False)
+
+    if 'certificates' not in existing:
+        # Create certificates table
+        op.create_table(
+            'certificates',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('certificate_number', sa.String(), nullable=False),
+            sa.Column('issued_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'course_id', name='uq_user_course_certificate')
+        )
+        op.create_index(op.f('ix_certificates_id'), 'certificates', ['id'], unique=False)
+        op.create_index(op.f('ix_certificates_user_id'), 'certificates', ['user_id'], unique=False)
+        op.create_index(op.f('ix_certificates_course_id'), 'certificates', ['course_id'], unique=False)
+        op.create_index(op.f('ix_certificates_certificate_number'), 'certificates', ['certificate_number'], unique=True)
+
+    if 'credit_ledger' not in existing:
+        # Create credit_ledger table
+        op.create_table(
+            'credit_ledger',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('delta', sa.Float(), nullable=False),
+            sa.Column('reason', sa.String(length=50), nullable=False),
+            sa.Column('ref_id', sa.String(length=255), nullable=True),
+            sa.Column('idempotency_key', sa.String(length=255), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('idempotency_key')
+        )
+        op.create_index(op.f('ix_credit_ledger_id'), 'credit_ledger', ['id'], unique=False)
+
+
+def downgrade():
+    # These tables predate the migration on most databases; leave them in place
+    pass
@@ -0,0 +1,55 @@
+"""add composite indexes for per-user hot queries
+
+Revision ID: 021
+Revises: 020
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '021'
+down_revision = '020'
+branch_labels = None
+depends_on = None
+
+
+# (index name, table, columns) - equality filters first, then the sort key
+HOT_QUERY_INDEXES = [
+    ('ix_notifications_user_created', 'notifications', ['user_id', 'created_at']),
+    ('ix_notifications_user_read', 'notifications', ['user_id', 'is_read']),
+    ('ix_credit_ledger_user_created', 'credit_ledger', ['user_id', 'created_at']),
+    ('ix_generated_images_user_created', 'generated_images', ['user_id', 'created_at']),
+    ('ix_community_posts_user_visibility', 'community_posts', ['user_id', 'visibility', 'is_hidden']),
+    ('ix_commissions_user_created', 'commissions', ['user_id', 'created_at']),
+    ('ix_payments_user_created', 'payments', ['user_id', 'created_at']),
+    ('ix_user_course_purchases_user_active_course', 'user_course_purchases', ['user_id', 'is_active', 'course_id']),
+]
+
+# Created by the old add_indexes.py script; each duplicates a model index or is
+# covered by a composite one above (or in 011/017/018)
+LEGACY_INDEXES = [
+    'idx_users_email', 'idx_users_referral_code', 'idx_users_referred_by_id',
+    'idx_commissions_user_id', 'idx_commissions_status', 'idx_commissions_user_status',
+    'idx_payouts_user_id', 'idx_payouts_status', 'idx_payouts_user_status',
+    'idx_payments_user_id', 'idx_payments_status',
+    'idx_user_packages_user_id', 'idx_user_packages_status',
+    'idx_referrals_referrer_id', 'idx_referrals_referee_id',
+]
+
+
+def upgrade():
+    # Drop legacy indexes
+    for name in LEGACY_INDEXES:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    # Create indexes
+    for name, table, columns in HOT_QUERY_INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    # Drop indexes (the legacy ones are not recreated)
+    for name, table, _ in reversed(HOT_QUERY_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,45 @@
+"""add generation cache
+
+Revision ID: 022
+Revises: 021
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '022'
+down_revision = '021'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Create generation_cache table
+    op.create_table(
+        'generation_cache',
+        sa.Column('cache_key', sa.String(length=64), nullable=False),
+        sa.Column('image_url', sa.String(length=500), nullable=False),
+        sa.Column('width', sa.Integer(), nullable=True),
+        sa.Column('height', sa.Integer(), nullable=True),
+        sa.Column('provider', sa.String(length=50), nullable=True),
+        sa.Column('hit_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.Column('last_used_at', sa.DateTime(), nullable=False, server_default=sa.text('CURRENT_TIMESTAMP')),
+        sa.PrimaryKeyConstraint('cache_key'),
+    )
+    op.create_index('ix_generation_cache_last_used', 'generation_cache', ['last_used_at'], unique=False)
+
+    # Add cache_key to generation_jobs
+    op.add_column('generation_jobs', sa.Column('cache_key', sa.String(length=64), nullable=True))
+
+
+def downgrade():
+    # Drop cache_key from generation_jobs
+    op.drop_column('generation_jobs', 'cache_key')
+
+    # Drop generation_cache table
+    op.drop_index('ix_generation_cache_last_used', table_name='generation_cache')
+    op.drop_table('generation_cache')
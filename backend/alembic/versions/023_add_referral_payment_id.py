@@ -0,0 +1,32 @@
+"""add referral payment id
+
+Revision ID: 023
+Revises: 022
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '023'
+down_revision = '022'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Payment that triggered each referral commission; existing rows stay null
+    op.add_column('referrals', sa.Column('payment_id', sa.Integer(), sa.ForeignKey('payments.id'), nullable=True))
+
+    # Create index
+    op.create_index('uq_referrals_payment_referrer_level', 'referrals', ['payment_id', 'referrer_id', 'level'], unique=True)
+
+
+def downgrade():
+    # Drop index
+    op.drop_index('uq_referrals_payment_referrer_level', table_name='referrals')
+
+    # Drop column
+    op.drop_column('referrals', 'payment_id')
@@ -1,24 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List
+from typing import List, Optional
 from datetime import datetime
-import os
-import uuid
-from pathlib import Path
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, SessionLocal
 from app.core.dependencies import get_current_admin_user
+from app.core.pagination import NEXT_CURSOR_HEADER
+from app.services.admin_dashboard_service import get_dashboard_stats
+from app.services.admin_user_service import USER_SORTS, paginate_users, serialize_user_row, iter_users_csv
+from app.services.job_queue import queue_metrics, retry_dead_job
+from app.services.commission_calculator import get_commission_plan, recompute_commission_amounts
+from app.services.email_outbox import outbox_depth
+from app.services.generation_jobs import queue_depth as generation_queue_depth
+from app.services import course_catalog
+from app.services.blob_store import IMAGE_EXTENSIONS, IMAGES, get_blob_store
 from app.models.user import User
 from app.models.package import Package
-from app.models.user_package import UserPackage
 from app.models.payment import Payment
-from app.models.referral import Referral
 from app.models.commission import Commission
+from app.models.commission_rate import CommissionRate
 from app.models.payout import Payout
 from app.models.course import Course
-from app.models.video import Video
+from app.models.background_job import BackgroundJob
 from app.models.studio import ImageCategory, ImageTemplate, GeneratedImage, CommunityPost, PostReport
+from app.schemas.commission import CommissionPlanUpdate
 from app.schemas.studio import (
     AdminImageCategoryCreate, ImageCategoryUpdate, AdminImageCategoryResponse,
     AdminImageTemplateCreate, ImageTemplateUpdate, AdminImageTemplateResponse,
@@ -29,188 +36,88 @@ router = APIRouter()
 
 @router.get("/dashboard")
 def get_admin_dashboard(
+    refresh: bool = False,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Get admin dashboard statistics
+    Served from a snapshot refreshed every ADMIN_DASHBOARD_CACHE_TTL_SECONDS;
+    pass refresh=true to recompute immediately. See computed_at for snapshot age.
     """
-    # User statistics
-    total_users = db.query(User).count()
-    active_users = db.query(User).filter(User.is_active == True).count()
-    
-    # Package statistics
-    total_packages_sold = db.query(UserPackage).filter(
-        UserPackage.status == 'active'
-    ).count()
-    
-    silver_count = db.query(UserPackage).join(Package).filter(
-        Package.name == 'Silver',
-        UserPackage.status == 'active'
-    ).count()
-    
-    gold_count = db.query(UserPackage).join(Package).filter(
-        Package.name == 'Gold',
-        UserPackage.status == 'active'
-    ).count()
-    
-    platinum_count = db.query(UserPackage).join(Package).filter(
-        Package.name == 'Platinum',
-        UserPackage.status == 'active'
-    ).count()
-    
-    # Revenue statistics
-    total_revenue = db.query(func.sum(Payment.amount)).filter(
-        Payment.status == 'success'
-    ).scalar() or 0.0
-    
-    # Commission statistics
-    total_commissions = db.query(func.sum(Commission.amount)).scalar() or 0.0
-    pending_commissions = db.query(func.sum(Commission.amount)).filter(
-        Commission.status == 'pending'
-    ).scalar() or 0.0
-    paid_commissions = db.query(func.sum(Commission.amount)).filter(
-        Commission.status == 'paid'
-    ).scalar() or 0.0
-    
-    # Referral statistics
-    total_referrals = db.query(Referral).count()
-    level1_referrals = db.query(Referral).filter(Referral.level == 1).count()
-    level2_referrals = db.query(Referral).filter(Referral.level == 2).count()
-    
-    # Payout statistics
-    total_payouts = db.query(func.sum(Payout.amount)).filter(
-        Payout.status == 'completed'
-    ).scalar() or 0.0
-    pending_payouts = db.query(func.sum(Payout.amount)).filter(
-        Payout.status == 'pending'
-    ).scalar() or 0.0
-    
-    # Content statistics
-    total_courses = db.query(Course).count()
-    published_courses = db.query(Course).filter(Course.is_published == True).count()
-    total_videos = db.query(Video).count()
-    published_videos = db.query(Video).filter(Video.is_published == True).count()
+    return get_dashboard_stats(db, refresh=refresh)
 
-    # Studio statistics
-    total_images = db.query(GeneratedImage).count()
-    successful_images = db.query(GeneratedImage).filter(GeneratedImage.status == 'succeeded').count()
-    total_posts = db.query(CommunityPost).count()
-    public_posts = db.query(CommunityPost).filter(CommunityPost.visibility == 'public').count()
-    total_likes = db.query(func.sum(CommunityPost.likes_count)).scalar() or 0
-    total_reports = db.query(PostReport).count()
-    pending_reports = db.query(PostReport).filter(PostReport.status == 'pending').count()
-
-    # Studio revenue (credits purchased)
-    from app.models.studio import CreditLedger
-    credits_purchased = db.query(func.sum(CreditLedger.delta)).filter(
-        CreditLedger.reason == 'purchase'
-    ).scalar() or 0
-    credits_spent = db.query(func.sum(CreditLedger.delta)).filter(
-        CreditLedger.reason == 'generation'
-    ).scalar() or 0
 
-    return {
-        'users': {
-            'total': total_users,
-            'active': active_users
-        },
-        'packages': {
-            'total_sold': total_packages_sold,
-            'silver': silver_count,
-            'gold': gold_count,
-            'platinum': platinum_count
-        },
-        'revenue': {
-            'total': float(total_revenue),
-            'net_profit': float(total_revenue - total_commissions)
-        },
-        'commissions': {
-            'total': float(total_commissions),
-            'pending': float(pending_commissions),
-            'paid': float(paid_commissions)
-        },
-        'referrals': {
-            'total': total_referrals,
-            'level1': level1_referrals,
-            'level2': level2_referrals
-        },
-        'payouts': {
-            'total': float(total_payouts),
-            'pending': float(pending_payouts)
-        },
-        'content': {
-            'courses': total_courses,
-            'published_courses': published_courses,
-            'videos': total_videos,
-            'published_videos': published_videos
-        },
-        'studio': {
-            'total_images': total_images,
-            'successful_images': successful_images,
-            'total_posts': total_posts,
-            'public_posts': public_posts,
-            'total_likes': total_likes,
-            'total_reports': total_reports,
-            'pending_reports': pending_reports,
-            'credits_purchased': credits_purchased,
-            'credits_spent': abs(credits_spent),
-        }
-    }
+def _validate_user_sort(sort_by: str) -> None:
+    if sort_by not in USER_SORTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sort_by must be one of: {', '.join(USER_SORTS)}"
+        )
 
 
 @router.get("/users")
 def get_all_users(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user),
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    package: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    sort_by: str = "signup_date"
 ):
     """
     Get all users with their package information
+
+    Query Parameters:
+    - package: Filter by current package name ("none" for users without a package)
+    - search: Search in email and full name
+    - is_active: Filter by account status
+    - sort_by: signup_date (default), earnings or package, descending
+    - cursor: Keyset cursor; the next page's cursor is returned in the X-Next-Cursor header
     """
-    users = db.query(User).offset(skip).limit(limit).all()
-    
-    result = []
-    for user in users:
-        # Get user's current package
-        user_package = db.query(UserPackage).filter(
-            UserPackage.user_id == user.id,
-            UserPackage.status == 'active'
-        ).order_by(UserPackage.purchase_date.desc()).first()
-        
-        package_name = None
-        if user_package:
-            package = db.query(Package).filter(Package.id == user_package.package_id).first()
-            if package:
-                package_name = package.name
-        
-        # Get referral stats
-        direct_referrals = db.query(Referral).filter(
-            Referral.referrer_id == user.id,
-            Referral.level == 1
-        ).count()
-        
-        # Get commission stats
-        total_earnings = db.query(func.sum(Commission.amount)).filter(
-            Commission.user_id == user.id
-        ).scalar() or 0.0
-        
-        result.append({
-            'id': user.id,
-            'email': user.email,
-            'full_name': user.full_name,
-            'phone': user.phone,
-            'referral_code': user.referral_code,
-            'is_active': user.is_active,
-            'is_admin': user.is_admin,
-            'created_at': user.created_at,
-            'current_package': package_name,
-            'direct_referrals': direct_referrals,
-            'total_earnings': float(total_earnings)
-        })
-    
-    return result
+    _validate_user_sort(sort_by)
+
+    rows, next_cursor = paginate_users(
+        db, cursor, limit,
+        sort_by=sort_by, package=package, search=search, is_active=is_active, offset=skip
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    return [serialize_user_row(row) for row in rows]
+
+
+@router.get("/users/export")
+def export_users(
+    current_user: User = Depends(get_current_admin_user),
+    package: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    sort_by: str = "signup_date"
+):
+    """
+    Export the entire user base (with the same filters as /users) as a streamed CSV
+    """
+    _validate_user_sort(sort_by)
+
+    def stream():
+        # The request-scoped session is closed before the body streams, so use our own
+        db = SessionLocal()
+        try:
+            yield from iter_users_csv(db, sort_by=sort_by, package=package, search=search, is_active=is_active)
+        finally:
+            db.close()
+
+    filename = f"users_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.csv"
+    return StreamingResponse(
+        stream(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 
 @router.put("/users/{user_id}/toggle-active")
@@ -384,6 +291,7 @@ def create_course(
     )
     db.add(course)
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(course)
     return course
 
@@ -418,6 +326,7 @@ def update_course(
         course.is_published = is_published
 
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(course)
     return course
 
@@ -440,6 +349,7 @@ def delete_course(
 
     db.delete(course)
     db.commit()
+    course_catalog.invalidate_catalog()
     return {"message": "Course deleted successfully"}
 
 
@@ -978,30 +888,29 @@ async def upload_thumbnail(
             detail="File must be an image"
         )
 
-    # Validate file size (max 5MB)
-    contents = await file.read()
-    if len(contents) > 5 * 1024 * 1024:
+    # Stream into the blob store, enforcing the 5MB limit chunk by chunk
+    max_size = 5 * 1024 * 1024
+
+    async def chunks():
+        received = 0
+        while chunk := await file.read(settings.STORAGE_CHUNK_BYTES):
+            received += len(chunk)
+            if received > max_size:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="File size must be less than 5MB"
+                )
+            yield chunk
+
+    file_extension = file.filename.split('.')[-1].lower() if file.filename and '.' in file.filename else 'jpg'
+    if file_extension not in IMAGE_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File size must be less than 5MB"
+            detail=f"File must be one of: {', '.join(sorted(IMAGE_EXTENSIONS))}"
         )
+    blob = await get_blob_store(IMAGES).save_async(chunks(), file_extension)
 
-    # Create thumbnails directory if it doesn't exist
-    thumbnails_dir = Path("app/static/thumbnails")
-    thumbnails_dir.mkdir(parents=True, exist_ok=True)
-
-    # Generate unique filename
-    file_extension = file.filename.split('.')[-1] if '.' in file.filename else 'jpg'
-    unique_filename = f"{uuid.uuid4()}.{file_extension}"
-    file_path = thumbnails_dir / unique_filename
-
-    # Save file
-    with open(file_path, 'wb') as f:
-        f.write(contents)
-
-    # Return URL
-    url = f"/static/thumbnails/{unique_filename}"
-    return {"url": url}
+    return {"url": blob.url}
 
 
 # ============================================================================
@@ -1175,3 +1084,143 @@ def close_report(
 
     return {"message": "Report closed successfully", "report_id": report_id}
 
+
+
+# ==================== BACKGROUND JOBS ====================
+
+@router.get("/jobs/metrics")
+def get_job_queue_metrics(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Background job queue depth per status and wait/run latency, plus email outbox and generation queue depth"""
+    metrics = queue_metrics(db)
+    metrics['email_outbox'] = outbox_depth(db)
+    metrics['generation_jobs'] = generation_queue_depth(db)
+    return metrics
+
+
+@router.get("/jobs/dead")
+def get_dead_jobs(
+    limit: int = 50,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Dead-lettered jobs (exhausted their retries), newest first"""
+    jobs = db.query(BackgroundJob).filter(
+        BackgroundJob.status == 'dead'
+    ).order_by(BackgroundJob.finished_at.desc()).limit(limit).all()
+
+    return [
+        {
+            'id': job.id,
+            'kind': job.kind,
+            'payload': job.payload,
+            'idempotency_key': job.idempotency_key,
+            'attempts': job.attempts,
+            'last_error': job.last_error,
+            'created_at': job.created_at,
+            'finished_at': job.finished_at
+        }
+        for job in jobs
+    ]
+
+
+@router.post("/jobs/{job_id}/retry")
+def retry_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Requeue a dead-lettered job"""
+    job = retry_dead_job(db, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Dead job not found")
+
+    return {"message": "Job requeued", "job_id": job.id}
+
+
+# ==================== COMMISSION PLAN ====================
+
+@router.get("/commission-plan")
+def get_commission_plan_rates(
+    plan: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Active (or named) commission plan as a list of non-zero rates"""
+    commission_plan = get_commission_plan(db, plan)
+    packages = dict(db.query(Package.id, Package.name).all())
+
+    rates = []
+    for level in range(1, commission_plan.levels + 1):
+        for referrer_package_id in commission_plan.package_ids:
+            for referee_package_id in commission_plan.package_ids:
+                amount = commission_plan.amount(referrer_package_id, referee_package_id, level)
+                if amount:
+                    rates.append({
+                        'level': level,
+                        'referrer_package_id': referrer_package_id,
+                        'referrer_package': packages.get(referrer_package_id),
+                        'referee_package_id': referee_package_id,
+                        'referee_package': packages.get(referee_package_id),
+                        'amount': amount
+                    })
+
+    return {'plan': commission_plan.name, 'levels': commission_plan.levels, 'rates': rates}
+
+
+@router.put("/commission-plan")
+def update_commission_plan(
+    update: CommissionPlanUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Create or overwrite commission rates (any number of levels)
+    Takes effect for new purchases immediately; run /commission-plan/recompute
+    to reprice existing pending commissions.
+    """
+    plan_name = update.plan or get_commission_plan(db).name
+    package_ids = {package_id for (package_id,) in db.query(Package.id)}
+    for item in update.rates:
+        if item.referrer_package_id not in package_ids or item.referee_package_id not in package_ids:
+            raise HTTPException(status_code=400, detail=f"Unknown package in rate: {item}")
+
+    existing = {
+        (rate.referrer_package_id, rate.referee_package_id, rate.level): rate
+        for rate in db.query(CommissionRate).filter(CommissionRate.plan == plan_name)
+    }
+    now = datetime.utcnow()
+    for item in update.rates:
+        rate = existing.get((item.referrer_package_id, item.referee_package_id, item.level))
+        if rate:
+            rate.amount = item.amount
+            rate.updated_at = now
+        else:
+            db.add(CommissionRate(
+                plan=plan_name,
+                referrer_package_id=item.referrer_package_id,
+                referee_package_id=item.referee_package_id,
+                level=item.level,
+                amount=item.amount,
+                created_at=now,
+                updated_at=now
+            ))
+    db.commit()
+
+    return {'message': 'Commission plan updated', 'plan': plan_name, 'levels': get_commission_plan(db, plan_name).levels}
+
+
+@router.post("/commission-plan/recompute")
+def recompute_commissions(
+    apply: bool = False,
+    plan: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Reprice stored commissions with the plan (dry run unless apply=true)
+    Only pending commissions are changed; paid ones are reported as locked.
+    """
+    return recompute_commission_amounts(db, plan=get_commission_plan(db, plan), apply=apply)
@@ -8,6 +8,7 @@ from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.studio import GeneratedImage, CommunityPost, PostLike, CreditLedger
+from app.services.credit_ledger_service import CreditLedgerService
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -50,14 +51,14 @@ async def get_user_analytics(
     ).scalar() or 0
     
     # Credit stats
-    credits_earned = db.query(func.sum(CreditLedger.amount)).filter(
+    credits_earned = db.query(func.sum(CreditLedger.delta)).filter(
         CreditLedger.user_id == current_user.id,
-        CreditLedger.transaction_type == 'reward'
+        CreditLedger.delta > 0
     ).scalar() or 0
     
-    credits_spent = db.query(func.sum(CreditLedger.amount)).filter(
+    credits_spent = db.query(func.sum(CreditLedger.delta)).filter(
         CreditLedger.user_id == current_user.id,
-        CreditLedger.transaction_type == 'generation'
+        CreditLedger.reason == 'generation'
     ).scalar() or 0
     
     # Most popular post
@@ -97,7 +98,7 @@ async def get_user_analytics(
         'credits': {
             'earned': credits_earned,
             'spent': abs(credits_spent),
-            'current_balance': current_user.credits_balance or 0,
+            'current_balance': CreditLedgerService.get_balance(db, current_user.id),
         },
         'most_popular_post': {
             'id': most_popular_post.id if most_popular_post else None,
@@ -59,11 +59,6 @@ def register(request: Request, user_data: UserCreate, db: Session = Depends(get_
     - Hashes password
     - Returns access token
     """
-    # Ensure notification table exists
-    from app.models.notification import Notification
-    from app.core.database import engine
-    Notification.__table__.create(bind=engine, checkfirst=True)
-
     # Check if email already exists
     existing_user = db.query(User).filter(User.email == user_data.email).first()
     if existing_user:
@@ -104,17 +99,18 @@ def register(request: Request, user_data: UserCreate, db: Session = Depends(get_
     )
 
     db.add(new_user)
+    db.flush()
+
+    # Index the new user under every ancestor in the referral graph (same transaction)
+    from app.services import referral_graph
+    referral_graph.add_user(db, new_user.id, referred_by_id)
+
     db.commit()
     db.refresh(new_user)
 
     # Create wallet with sign-up bonus
     try:
         from app.models.wallet import Wallet, WalletTransaction, TransactionType, TransactionSource
-        from app.core.database import engine
-
-        # Ensure tables exist
-        Wallet.__table__.create(bind=engine, checkfirst=True)
-        WalletTransaction.__table__.create(bind=engine, checkfirst=True)
 
         # Create wallet with sign-up bonus (₹10 = 10 credits)
         signup_bonus = 10.0
@@ -171,50 +167,27 @@ def register(request: Request, user_data: UserCreate, db: Session = Depends(get_
     new_user.verification_token = verification_token
     new_user.verification_token_expires = verification_expires
     new_user.email_verified = False
-    db.commit()
-    db.refresh(new_user)
 
-    # Send welcome email (non-blocking - don't fail registration if email fails)
-    try:
-        send_welcome_email(
-            to_email=new_user.email,
-            user_name=new_user.full_name,
-            referral_code=new_user.referral_code
-        )
-        logger.info(f"Welcome email sent to {new_user.email}")
-    except Exception as e:
-        logger.error(f"Failed to send welcome email to {new_user.email}: {str(e)}")
-        # Continue with registration even if email fails
+    # Queue verification email in the same transaction as the token
+    # (delivered by the email dispatcher, never blocks the request)
+    from app.services.email_outbox import queue_email
+    from app.services.email_service import verification_email_content
+    subject, html_content = verification_email_content(new_user.full_name, verification_token)
+    queue_email(db, new_user.email, subject, html_content, from_email=settings.SMTP_FROM_EMAIL)
 
-    # Send verification email (non-blocking)
-    try:
-        from app.services.email_service import send_verification_email
-        import threading
-
-        def send_email_thread():
-            import asyncio
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(send_verification_email(
-                    email=new_user.email,
-                    name=new_user.full_name,
-                    token=verification_token
-                ))
-                logger.info(f"Verification email sent to {new_user.email}")
-            except Exception as e:
-                logger.error(f"Failed to send verification email: {str(e)}")
-            finally:
-                loop.close()
-
-        # Start email sending in background thread
-        email_thread = threading.Thread(target=send_email_thread)
-        email_thread.daemon = True
-        email_thread.start()
-        logger.info(f"Verification email queued for {new_user.email}")
-    except Exception as e:
-        logger.error(f"Failed to queue verification email to {new_user.email}: {str(e)}")
-        # Continue with registration even if email fails
+    db.commit()
+    db.refresh(new_user)
+    logger.info(f"Verification email queued for {new_user.email}")
+
+    # Queue welcome email (don't fail registration if email fails)
+    if send_welcome_email(
+        to_email=new_user.email,
+        user_name=new_user.full_name,
+        referral_code=new_user.referral_code
+    ):
+        logger.info(f"Welcome email queued for {new_user.email}")
+    else:
+        logger.error(f"Failed to queue welcome email to {new_user.email}")
 
     # Generate JWT token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -468,7 +441,7 @@ def forgot_password(request: Request, email: str, db: Session = Depends(get_db))
                 to_email=user.email,
                 reset_token=reset_token
             )
-            logger.info(f"Password reset email sent to {user.email}")
+            logger.info(f"Password reset email queued for {user.email}")
         except Exception as e:
             logger.error(f"Failed to send password reset email to {user.email}: {str(e)}")
 
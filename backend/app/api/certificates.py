@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.certificate import Certificate
@@ -22,8 +22,6 @@ def get_my_certificates(
     
     Returns certificates ordered by issue date (newest first)
     """
-    # Ensure table exists
-    Certificate.__table__.create(bind=engine, checkfirst=True)
     
     certificates = db.query(Certificate).filter(
         Certificate.user_id == current_user.id
@@ -57,8 +55,6 @@ def verify_certificate(
     
     Returns certificate details if valid, 404 if not found
     """
-    # Ensure table exists
-    Certificate.__table__.create(bind=engine, checkfirst=True)
     
     certificate = db.query(Certificate).filter(
         Certificate.certificate_number == certificate_number
@@ -98,7 +94,6 @@ def get_certificate(
     
     User can only access their own certificates
     """
-    Certificate.__table__.create(bind=engine, checkfirst=True)
     
     certificate = db.query(Certificate).filter(
         Certificate.id == certificate_id
@@ -1,16 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import desc
-from typing import List
+from typing import List, Optional
 import logging
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.pagination import paginate_keyset
 from app.models.user import User
 from app.models.studio import CommunityPost
 from app.models.comment import Comment
 from app.schemas.comment import CommentCreate, CommentUpdate, CommentResponse, CommentListResponse
 from app.services.notification_service import notify_post_commented
+from app.services import trending_service
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +44,7 @@ def create_comment(
         user_id=current_user.id,
         text=comment_data.text
     )
+    trending_service.record_event(post, "comment")
     
     db.add(comment)
     db.commit()
@@ -83,10 +85,14 @@ def get_comments(
     post_id: int,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all comments for a post"""
+    """
+    Get all comments for a post, newest first
+    Pass the previous response's next_cursor as `cursor` to get the next page
+    """
     # Verify post exists
     post = db.query(CommunityPost).filter(CommunityPost.id == post_id).first()
     if not post:
@@ -99,10 +105,17 @@ def get_comments(
     query = db.query(Comment).options(joinedload(Comment.user)).filter(
         Comment.post_id == post_id,
         Comment.is_deleted == False
-    ).order_by(desc(Comment.created_at))
+    )
 
     total = query.count()
-    comments = query.offset(skip).limit(limit).all()
+    comments, next_cursor = paginate_keyset(
+        query,
+        columns=[Comment.created_at, Comment.id],
+        cursor=cursor,
+        limit=limit,
+        key=lambda c: (c.created_at, c.id),
+        offset=skip,
+    )
 
     # Build responses using the eagerly loaded user relationship
     items = []
@@ -122,7 +135,8 @@ def get_comments(
         items=items,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 
@@ -199,6 +213,8 @@ def delete_comment(
     
     # Soft delete
     comment.is_deleted = True
+    if comment.post:
+        trending_service.record_event(comment.post, "comment", at=comment.created_at, removed=True)
     db.commit()
     
     return None
@@ -5,10 +5,11 @@ Endpoints for community posts, likes, reports, and remixes
 
 import logging
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload, contains_eager
 from sqlalchemy import desc, func
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
+from app.core.pagination import paginate_keyset
 from app.models import User, GeneratedImage, CommunityPost, PostLike, PostReport, PromptReuseEvent, ImageCategory, Profile, Comment
 from app.schemas.studio import (
     PublishPostRequest, PublishPostResponse,
@@ -18,6 +19,7 @@ from app.schemas.studio import (
     RemixOpenResponse, RemixRecordRequest, RemixRecordResponse,
 )
 from app.services.notification_service import notify_post_liked
+from app.services import trending_service
 from app.services.reward_service import (
     check_first_post_reward,
     check_post_milestone_rewards,
@@ -89,6 +91,7 @@ async def publish_post(
             tags=request.tags or [],
             visibility=request.visibility,
         )
+        trending_service.record_event(post, "publish")
         
         db.add(post)
         db.commit()
@@ -125,9 +128,59 @@ async def publish_post(
 # COMMUNITY FEED
 # ============================================================================
 
+# Feed sort modes and their keyset columns (each paired with CommunityPost.id)
+FEED_SORT_COLUMNS = {
+    "newest": CommunityPost.created_at,
+    "popular": CommunityPost.likes_count,
+    "trending": CommunityPost.trending_score,  # Maintained incrementally by trending_service
+    "most_remixed": CommunityPost.reuse_count,
+}
+
+
+def _build_feed_cards(db: Session, rows, viewer_id: int) -> list:
+    """
+    Turn (post, avatar_url) rows into feed cards.
+    Viewer likes and comment counts are fetched with one query each for the whole page.
+    """
+    post_ids = [post.id for post, _ in rows]
+    if not post_ids:
+        return []
+
+    liked_ids = {
+        post_id for (post_id,) in db.query(PostLike.post_id).filter(
+            PostLike.user_id == viewer_id,
+            PostLike.post_id.in_(post_ids),
+        )
+    }
+
+    comment_counts = dict(
+        db.query(Comment.post_id, func.count(Comment.id)).filter(
+            Comment.post_id.in_(post_ids),
+            Comment.is_deleted == False,
+        ).group_by(Comment.post_id).all()
+    )
+
+    return [
+        CommunityPostCard(
+            id=post.id,
+            image_url=post.image.image_url if post.image else "",
+            title=post.title,
+            author_name=post.user.full_name if post.user else "Unknown",
+            author_avatar_url=avatar_url,
+            category_name=post.category.name if post.category else "Uncategorized",
+            likes_count=post.likes_count,
+            reuse_count=post.reuse_count,
+            comments_count=comment_counts.get(post.id, 0),
+            user_liked=post.id in liked_ids,
+            created_at=post.created_at,
+        )
+        for post, avatar_url in rows
+    ]
+
+
 @router.get("/feed", response_model=CommunityFeedResponse)
 async def get_community_feed(
-    cursor: int = 0,
+    cursor: str | None = None,
     limit: int = 20,
     category_id: int | None = None,
     search: str | None = None,
@@ -142,7 +195,7 @@ async def get_community_feed(
     GET /api/studio/community/feed
 
     Query Parameters:
-    - cursor: Pagination cursor (default: 0)
+    - cursor: Opaque pagination cursor from the previous page's next_cursor
     - limit: Number of items per page (default: 20, max: 50)
     - category_id: Filter by category ID
     - search: Search in title and description
@@ -154,9 +207,15 @@ async def get_community_feed(
         # Limit max items per page
         limit = min(limit, 50)
 
-        # Build base query with joins
-        query = db.query(CommunityPost).join(
+        # Build base query with joins; author, category and image are loaded in the same statement
+        query = db.query(CommunityPost, Profile.avatar_url).join(
             GeneratedImage, CommunityPost.image_id == GeneratedImage.id
+        ).outerjoin(
+            Profile, Profile.user_id == CommunityPost.user_id
+        ).options(
+            contains_eager(CommunityPost.image),
+            joinedload(CommunityPost.user),
+            joinedload(CommunityPost.category),
         ).filter(
             CommunityPost.visibility == "public",
             CommunityPost.is_hidden == False,
@@ -182,68 +241,30 @@ async def get_community_feed(
         if provider:
             query = query.filter(GeneratedImage.provider == provider)
 
-        # Apply sorting
-        if sort_by == "popular":
-            # Sort by likes count
-            query = query.order_by(desc(CommunityPost.likes_count))
-        elif sort_by == "trending":
-            # Sort by likes in last 7 days (simplified: just by likes for now)
-            query = query.order_by(desc(CommunityPost.likes_count))
-        elif sort_by == "most_remixed":
-            # Sort by reuse count
-            query = query.order_by(desc(CommunityPost.reuse_count))
-        else:  # newest (default)
-            query = query.order_by(desc(CommunityPost.created_at))
-
-        # Paginate
-        posts = query.offset(cursor).limit(limit + 1).all()
-        
-        has_next = len(posts) > limit
-        items = posts[:limit]
+        # Apply keyset pagination on the sort key plus id
+        if sort_by not in FEED_SORT_COLUMNS:
+            sort_by = "newest"
+        sort_column = FEED_SORT_COLUMNS[sort_by]
+
+        rows, next_cursor = paginate_keyset(
+            query,
+            columns=[sort_column, CommunityPost.id],
+            cursor=None if cursor in (None, "", "0") else cursor,  # "0" is the legacy first page
+            limit=limit,
+            key=lambda row: (getattr(row[0], sort_column.key), row[0].id),
+            scope=sort_by,
+        )
         
-        # Build response with enriched data
-        result_items = []
-        for post in items:
-            # Get user info
-            user = db.query(User).filter(User.id == post.user_id).first()
-
-            # Get user profile for avatar
-            profile = db.query(Profile).filter(Profile.user_id == post.user_id).first()
-
-            # Get category info
-            category = db.query(ImageCategory).filter(ImageCategory.id == post.category_id).first()
-
-            # Check if current user liked this post
-            user_liked = db.query(PostLike).filter(
-                PostLike.post_id == post.id,
-                PostLike.user_id == current_user.id
-            ).first() is not None
-
-            # Count comments for this post
-            comments_count = db.query(Comment).filter(
-                Comment.post_id == post.id,
-                Comment.is_deleted == False
-            ).count()
-
-            result_items.append(CommunityPostCard(
-                id=post.id,
-                image_url=post.image.image_url if post.image else "",
-                title=post.title,
-                author_name=user.full_name if user else "Unknown",
-                author_avatar_url=profile.avatar_url if profile else None,
-                category_name=category.name if category else "Uncategorized",
-                likes_count=post.likes_count,
-                reuse_count=post.reuse_count,
-                comments_count=comments_count,
-                user_liked=user_liked,
-                created_at=post.created_at,
-            ))
+        # Build response with enriched data (constant number of queries per page)
+        result_items = _build_feed_cards(db, rows, current_user.id)
         
         return CommunityFeedResponse(
             items=result_items,
-            next_cursor=str(cursor + limit) if has_next else None,
+            next_cursor=next_cursor,
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting community feed: {e}")
         raise HTTPException(
@@ -367,6 +388,7 @@ async def toggle_like(
             # Unlike
             db.delete(existing_like)
             post.likes_count = max(0, post.likes_count - 1)
+            trending_service.record_event(post, "like", at=existing_like.created_at, removed=True)
             liked = False
         else:
             # Like
@@ -376,6 +398,7 @@ async def toggle_like(
             )
             db.add(new_like)
             post.likes_count += 1
+            trending_service.record_event(post, "like")
             liked = True
 
             # Send notification to post owner (if not liking own post)
@@ -601,6 +624,7 @@ async def record_remix(
 
         # Increment reuse count on source post
         source_post.reuse_count += 1
+        trending_service.record_event(source_post, "remix")
 
         db.commit()
         db.refresh(source_post)
@@ -691,20 +715,21 @@ def get_user_posts(
 
         # Pagination
         total = query.count()
-        posts = query.order_by(desc(CommunityPost.created_at)).offset(cursor).limit(limit).all()
+        posts = query.options(
+            joinedload(CommunityPost.user),
+            joinedload(CommunityPost.category),
+            joinedload(CommunityPost.image),
+        ).order_by(desc(CommunityPost.created_at)).offset(cursor).limit(limit).all()
 
         # Enrich posts
         items = []
         for post in posts:
-            user = db.query(User).filter(User.id == post.user_id).first()
-            category = db.query(ImageCategory).filter(ImageCategory.id == post.category_id).first()
-
             items.append({
                 'id': post.id,
                 'image_url': post.image.image_url if post.image else None,
                 'title': post.title,
-                'author_name': user.full_name if user else 'Unknown',
-                'category_name': category.name if category else None,
+                'author_name': post.user.full_name if post.user else 'Unknown',
+                'category_name': post.category.name if post.category else None,
                 'likes_count': post.likes_count,
                 'reuse_count': post.reuse_count,
                 'user_liked': False,  # Not checking for specific user
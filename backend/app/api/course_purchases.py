@@ -4,9 +4,10 @@ from typing import List
 import razorpay
 from datetime import datetime
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.core.config import settings
+from app.core.metrics import count_payment
 from app.models.user import User
 from app.models.course import Course
 from app.models.user_course_purchase import UserCoursePurchase
@@ -18,6 +19,7 @@ from app.schemas.user_course_purchase import (
     UserCoursePurchaseResponse
 )
 from app.services.razorpay_service import razorpay_service
+from app.services import course_catalog
 
 router = APIRouter()
 
@@ -35,8 +37,6 @@ def initiate_course_purchase(
     Initiate individual course purchase
     Creates Razorpay order for course payment
     """
-    # Ensure table exists
-    UserCoursePurchase.__table__.create(bind=engine, checkfirst=True)
     
     # Get course
     course = db.query(Course).filter(Course.id == request.course_id).first()
@@ -118,6 +118,7 @@ def verify_course_purchase(
 
     if not is_valid:
         print(f"[COURSE PURCHASE VERIFY] Payment signature verification failed")
+        count_payment("course", "failed")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid payment signature"
@@ -167,6 +168,8 @@ def verify_course_purchase(
     db.add(course_purchase)
     db.commit()
     db.refresh(course_purchase)
+    course_catalog.invalidate_user_access(current_user.id)
+    count_payment("course", "success")
     
     # Send purchase confirmation email
     try:
@@ -183,7 +186,7 @@ def verify_course_purchase(
             <p>You now have lifetime access to this course!</p>
             <p><a href="{settings.FRONTEND_URL}/courses/{course.id}">Start Learning</a></p>
             """,
-            body=f"Course Purchase Successful! You purchased {course.title} for ₹{amount_paid:,.2f}"
+            text_content=f"Course Purchase Successful! You purchased {course.title} for ₹{amount_paid:,.2f}"
         )
     except Exception as e:
         print(f"Error sending email: {e}")
@@ -205,7 +208,6 @@ def get_my_course_purchases(
     """
     Get all courses purchased by the current user
     """
-    UserCoursePurchase.__table__.create(bind=engine, checkfirst=True)
     
     purchases = db.query(UserCoursePurchase).filter(
         UserCoursePurchase.user_id == current_user.id,
@@ -236,7 +238,6 @@ def check_course_access(
     has_package_access = check_user_access(current_user, course, db)
     
     # Check individual purchase
-    UserCoursePurchase.__table__.create(bind=engine, checkfirst=True)
     individual_purchase = db.query(UserCoursePurchase).filter(
         UserCoursePurchase.user_id == current_user.id,
         UserCoursePurchase.course_id == course_id,
@@ -1,24 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import os
-import tempfile
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
 from app.models.user import User
 from app.models.course import Course
 from app.models.video import Video
 from app.models.package import Package
-from app.models.user_package import UserPackage
 from app.schemas.course import (
     CourseResponse, CourseCreate, CourseUpdate, CourseWithVideos, CourseWithModules,
     VideoResponse, VideoCreate, VideoUpdate, CourseWithAccess
 )
-from app.models.user_course_purchase import UserCoursePurchase
-from app.models.module import Module
-from app.models.topic import Topic
 from app.services.cloudinary_service import cloudinary_service
+from app.services import course_catalog, video_ingest
 from app.models.video_progress import VideoProgress
 from app.schemas.progress import VideoProgressCreate, VideoProgressResponse
 
@@ -33,37 +28,19 @@ def check_user_access(user: User, course: Course, db: Session) -> bool:
     if user.is_admin:
         return True
 
-    # Check individual course purchase first
-    from app.models.user_course_purchase import UserCoursePurchase
-    individual_purchase = db.query(UserCoursePurchase).filter(
-        UserCoursePurchase.user_id == user.id,
-        UserCoursePurchase.course_id == course.id,
-        UserCoursePurchase.is_active == True
-    ).first()
-
-    if individual_purchase:
-        return True
-
-    # Check package-based access
-    user_package = db.query(UserPackage).filter(
-        UserPackage.user_id == user.id,
-        UserPackage.status == "active"
-    ).order_by(UserPackage.purchase_date.desc()).first()
-
-    if not user_package:
+    access = course_catalog.get_user_access(db, user)
+    entry = course_catalog.get_course(db, course.id)
+    if entry is None:
         return False
 
-    # Get package hierarchy
-    package_hierarchy = {"Silver": 1, "Gold": 2, "Platinum": 3}
+    if not course_catalog.has_course_access(access, entry):
+        access = course_catalog.confirm_denial(db, user, access)
+    return course_catalog.has_course_access(access, entry)
 
-    user_pkg = db.query(Package).filter(Package.id == user_package.package_id).first()
-    course_pkg = db.query(Package).filter(Package.id == course.package_id).first()
 
-    if not user_pkg or not course_pkg:
-        return False
-
-    # User can access courses of their package level or lower
-    return package_hierarchy.get(user_pkg.name, 0) >= package_hierarchy.get(course_pkg.name, 0)
+def _published_count(course: dict) -> int:
+    """Published topics (new structure) - fallback to published videos for backward compatibility"""
+    return course["published_topics"] or len(course["published_videos"])
 
 
 @router.get("/", response_model=List[CourseWithVideos])
@@ -74,106 +51,53 @@ def get_courses(
     """
     Get all courses accessible to the current user
     """
-    # Get user's package
-    user_package = db.query(UserPackage).filter(
-        UserPackage.user_id == current_user.id,
-        UserPackage.status == "active"
-    ).order_by(UserPackage.purchase_date.desc()).first()
-
-    if not user_package and not current_user.is_admin:
+    access = course_catalog.get_user_access(db, current_user)
+    catalog = course_catalog.get_catalog(db)
+    if any(course["is_published"] and not course_catalog.has_package_access(access, course) for course in catalog.courses):
+        access = course_catalog.confirm_denial(db, current_user, access)
+    if access.package_level is None and not access.is_admin:
         return []
 
     # Get accessible courses
-    if current_user.is_admin:
-        courses = db.query(Course).order_by(Course.display_order).all()
+    if access.is_admin:
+        courses = catalog.courses
     else:
-        # Get package hierarchy
-        package_hierarchy = {"Silver": 1, "Gold": 2, "Platinum": 3}
-        user_pkg = db.query(Package).filter(Package.id == user_package.package_id).first()
-        user_level = package_hierarchy.get(user_pkg.name, 0)
-
-        # Get all packages at or below user's level
-        accessible_packages = db.query(Package).filter(
-            Package.name.in_([k for k, v in package_hierarchy.items() if v <= user_level])
-        ).all()
-
-        package_ids = [pkg.id for pkg in accessible_packages]
-
-        courses = db.query(Course).filter(
-            Course.package_id.in_(package_ids),
-            Course.is_published == True
-        ).order_by(Course.display_order).all()
+        # Published courses of packages at or below user's level
+        courses = [
+            course for course in catalog.courses
+            if course["is_published"]
+            and course["package_level"]
+            and course["package_level"] <= access.package_level
+        ]
 
     # Build response with topics/videos
     result = []
     for course in courses:
-        # Count topics (new structure) - fallback to videos for backward compatibility
-        topic_count = 0
-        for module in course.modules:
-            topic_count += db.query(Topic).filter(
-                Topic.module_id == module.id,
-                Topic.is_published == True
-            ).count()
-
-        # Fallback to video count if no topics
-        videos = []
-        if topic_count == 0:
-            videos = db.query(Video).filter(
-                Video.course_id == course.id,
-                Video.is_published == True
-            ).order_by(Video.display_order).all()
-            topic_count = len(videos)
-
-        package = db.query(Package).filter(Package.id == course.package_id).first()
-
         course_data = {
-            **course.__dict__,
-            "videos": videos,  # For backward compatibility
-            "package_name": package.name if package else None,
-            "video_count": topic_count
+            **course_catalog.course_summary(course),
+            # Videos only when the course has no topics, for backward compatibility
+            "videos": [] if course["published_topics"] else course["published_videos"],
+            "video_count": _published_count(course)
         }
         result.append(course_data)
 
     return result
 
 
-@router.get("/my-courses", response_model=List[CourseWithAccess])
-def get_my_courses(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """
-    Get ONLY courses that the user has access to (enrolled/purchased)
-    This is the "My Courses" endpoint - shows only accessible courses
-    """
-    from app.core.database import engine
-    UserCoursePurchase.__table__.create(bind=engine, checkfirst=True)
-
-    # Get all published courses
-    all_courses = db.query(Course).filter(
-        Course.is_published == True
-    ).order_by(Course.display_order).all()
-
-    # Get user's individual course purchases
-    user_purchases = db.query(UserCoursePurchase).filter(
-        UserCoursePurchase.user_id == current_user.id,
-        UserCoursePurchase.is_active == True
-    ).all()
-    purchased_course_ids = {p.course_id for p in user_purchases}
+def _courses_with_access(db: Session, user: User, accessible_only: bool) -> list:
+    """Published courses with the user's access flags"""
+    access = course_catalog.get_user_access(db, user)
+    courses = [course for course in course_catalog.get_catalog(db).courses if course["is_published"]]
+    if not all(course_catalog.has_course_access(access, course) for course in courses):
+        access = course_catalog.confirm_denial(db, user, access)
 
     result = []
-    for course in all_courses:
-        # Check package access
-        has_package_access = check_user_access(current_user, course, db)
-
-        # Check individual purchase
-        has_individual_access = course.id in purchased_course_ids
-
-        # Determine access type
+    for course in courses:
+        has_package_access = course_catalog.has_package_access(access, course)
+        has_individual_access = course["id"] in access.purchased_course_ids
         has_access = has_package_access or has_individual_access
 
-        # ONLY include courses the user has access to
-        if not has_access:
+        if accessible_only and not has_access:
             continue
 
         access_type = None
@@ -182,37 +106,30 @@ def get_my_courses(
         elif has_individual_access:
             access_type = "individual"
 
-        # Count topics (new structure) - fallback to videos for backward compatibility
-        topic_count = 0
-        for module in course.modules:
-            topic_count += db.query(Topic).filter(
-                Topic.module_id == module.id,
-                Topic.is_published == True
-            ).count()
-
-        # Fallback to video count if no topics
-        if topic_count == 0:
-            topic_count = db.query(Video).filter(
-                Video.course_id == course.id,
-                Video.is_published == True
-            ).count()
-
-        # Get package name
-        package = db.query(Package).filter(Package.id == course.package_id).first()
-
         course_data = {
-            **course.__dict__,
-            "package_name": package.name if package else None,
-            "video_count": topic_count,  # Using topic_count for consistency
-            "has_access": True,  # Always true for my-courses
+            **course_catalog.course_summary(course),
+            "video_count": _published_count(course),  # Using topic_count for consistency
+            "has_access": has_access,
             "access_type": access_type,
-            "is_locked": False  # Always false for my-courses
+            "is_locked": not has_access
         }
         result.append(course_data)
 
     return result
 
 
+@router.get("/my-courses", response_model=List[CourseWithAccess])
+def get_my_courses(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get ONLY courses that the user has access to (enrolled/purchased)
+    This is the "My Courses" endpoint - shows only accessible courses
+    """
+    return _courses_with_access(db, current_user, accessible_only=True)
+
+
 @router.get("/all-with-access", response_model=List[CourseWithAccess])
 def get_all_courses_with_access(
     current_user: User = Depends(get_current_user),
@@ -222,66 +139,7 @@ def get_all_courses_with_access(
     Get ALL courses with access status for current user
     Shows locked and unlocked courses - for browsing/discovery
     """
-    from app.core.database import engine
-    UserCoursePurchase.__table__.create(bind=engine, checkfirst=True)
-
-    # Get all published courses
-    courses = db.query(Course).filter(
-        Course.is_published == True
-    ).order_by(Course.display_order).all()
-
-    # Get user's individual course purchases
-    user_purchases = db.query(UserCoursePurchase).filter(
-        UserCoursePurchase.user_id == current_user.id,
-        UserCoursePurchase.is_active == True
-    ).all()
-    purchased_course_ids = {p.course_id for p in user_purchases}
-
-    result = []
-    for course in courses:
-        # Check package access
-        has_package_access = check_user_access(current_user, course, db)
-
-        # Check individual purchase
-        has_individual_access = course.id in purchased_course_ids
-
-        # Determine access type
-        has_access = has_package_access or has_individual_access
-        access_type = None
-        if has_package_access:
-            access_type = "package"
-        elif has_individual_access:
-            access_type = "individual"
-
-        # Count topics (new structure) - fallback to videos for backward compatibility
-        topic_count = 0
-        for module in course.modules:
-            topic_count += db.query(Topic).filter(
-                Topic.module_id == module.id,
-                Topic.is_published == True
-            ).count()
-
-        # Fallback to video count if no topics
-        if topic_count == 0:
-            topic_count = db.query(Video).filter(
-                Video.course_id == course.id,
-                Video.is_published == True
-            ).count()
-
-        # Get package name
-        package = db.query(Package).filter(Package.id == course.package_id).first()
-
-        course_data = {
-            **course.__dict__,
-            "package_name": package.name if package else None,
-            "video_count": topic_count,  # Using topic_count for consistency
-            "has_access": has_access,
-            "access_type": access_type,
-            "is_locked": not has_access
-        }
-        result.append(course_data)
-
-    return result
+    return _courses_with_access(db, current_user, accessible_only=False)
 
 
 @router.get("/{course_id}", response_model=CourseWithVideos)
@@ -331,36 +189,28 @@ def get_course_with_modules(
     Get a course with its modules and topics (new hierarchical structure)
     Admins can access all courses, regular users need package access
     """
-    Module.__table__.create(bind=engine, checkfirst=True)
-    Topic.__table__.create(bind=engine, checkfirst=True)
 
-    course = db.query(Course).filter(Course.id == course_id).first()
-    if not course:
+    course = course_catalog.get_course(db, course_id)
+    if course is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
 
     # Check access - skip for admins
-    if not current_user.is_admin and not check_user_access(current_user, course, db):
+    access = course_catalog.get_user_access(db, current_user)
+    if not course_catalog.has_course_access(access, course):
+        access = course_catalog.confirm_denial(db, current_user, access)
+    if not access.is_admin and not course_catalog.has_course_access(access, course):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this course"
         )
 
-    # Get package name
-    package = db.query(Package).filter(Package.id == course.package_id).first()
-
-    # Count total topics
-    total_topics = 0
-    for module in course.modules:
-        total_topics += len(module.topics)
-
     return {
-        **course.__dict__,
-        "modules": course.modules,
-        "package_name": package.name if package else None,
-        "total_topics": total_topics
+        **course_catalog.course_summary(course),
+        "modules": course["modules"],
+        "total_topics": course["total_topics"]
     }
 
 
@@ -393,6 +243,7 @@ def create_course(
     db.add(new_course)
     db.commit()
     db.refresh(new_course)
+    course_catalog.invalidate_catalog()
 
     return new_course
 
@@ -420,6 +271,7 @@ def update_course(
 
     db.commit()
     db.refresh(course)
+    course_catalog.invalidate_catalog()
 
     return course
 
@@ -450,6 +302,7 @@ def delete_course(
 
     db.delete(course)
     db.commit()
+    course_catalog.invalidate_catalog()
 
     return None
 
@@ -462,12 +315,16 @@ async def upload_video(
     title: str = Form(...),
     description: Optional[str] = Form(None),
     display_order: int = Form(0),
-    video_file: UploadFile = File(...),
+    video_file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
     """
     Upload a video to a course (Admin only)
+
+    Send the file as `video_file`, or for large videos the `upload_id` of a
+    completed resumable upload session (/api/uploads/videos).
     """
     # Verify course exists
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -477,19 +334,13 @@ async def upload_video(
             detail="Course not found"
         )
 
-    # Save uploaded file temporarily
-    with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(video_file.filename)[1]) as tmp_file:
-        content = await video_file.read()
-        tmp_file.write(content)
-        tmp_file_path = tmp_file.name
+    # Stream the upload to disk in chunks (never the whole file in memory)
+    video = await video_ingest.take_video(video_file, upload_id)
+    stored = False
 
     try:
-        # Upload to Cloudinary
-        upload_result = cloudinary_service.upload_video(
-            file_path=tmp_file_path,
-            folder=f"courses/{course_id}",
-            public_id=None
-        )
+        # Chunked upload to Cloudinary from the upload thread pool
+        upload_result = await video_ingest.upload_to_storage(video, folder=f"courses/{course_id}")
 
         # Create video record
         new_video = Video(
@@ -506,7 +357,9 @@ async def upload_video(
 
         db.add(new_video)
         db.commit()
+        stored = True
         db.refresh(new_video)
+        course_catalog.invalidate_catalog()
 
         return new_video
 
@@ -516,9 +369,8 @@ async def upload_video(
             detail=f"Failed to upload video: {str(e)}"
         )
     finally:
-        # Clean up temporary file
-        if os.path.exists(tmp_file_path):
-            os.remove(tmp_file_path)
+        # Remove the spooled file; an upload session only once stored, so it can be retried
+        video.release(stored)
 
 
 @router.get("/{course_id}/videos/{video_id}", response_model=VideoResponse)
@@ -561,9 +413,6 @@ def get_video_progress(
     db: Session = Depends(get_db)
 ):
     """Get current user's progress for a video"""
-    # Ensure table exists (safe if already created)
-    from app.core.database import engine
-    VideoProgress.__table__.create(bind=engine, checkfirst=True)
 
     # Access control
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -591,9 +440,6 @@ def upsert_video_progress(
     db: Session = Depends(get_db)
 ):
     """Create or update the user's progress for a video"""
-    # Ensure table exists (safe if already created)
-    from app.core.database import engine
-    VideoProgress.__table__.create(bind=engine, checkfirst=True)
 
     # Access control
     course = db.query(Course).filter(Course.id == course_id).first()
@@ -630,9 +476,6 @@ def issue_certificate(
     db: Session = Depends(get_db)
 ):
     """Issue a completion certificate when all course topics are completed"""
-    # Lazy-create table
-    from app.core.database import engine
-    Certificate.__table__.create(bind=engine, checkfirst=True)
 
     course = db.query(Course).filter(Course.id == course_id).first()
     if not course:
@@ -734,6 +577,7 @@ def update_video(
 
     db.commit()
     db.refresh(video)
+    course_catalog.invalidate_catalog()
 
     return video
 
@@ -767,6 +611,7 @@ def delete_video(
 
     db.delete(video)
     db.commit()
+    course_catalog.invalidate_catalog()
 
     return None
 
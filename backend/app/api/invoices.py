@@ -1,6 +1,6 @@
 """Invoice API endpoints"""
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 import os
@@ -10,6 +10,7 @@ from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.invoice import Invoice
 from app.schemas.invoice import InvoiceResponse
+from app.services.blob_store import INVOICES, get_blob_store, is_key
 from app.services.invoice_service import InvoiceService
 
 
@@ -110,16 +111,29 @@ def download_invoice(
             detail="Not authorized to access this invoice"
         )
     
-    # Check if PDF exists
-    if not invoice.pdf_url or not os.path.exists(invoice.pdf_url):
+    filename = f"{invoice.invoice_number}.pdf"
+    store = get_blob_store(INVOICES)
+
+    # PDFs live in the invoice blob store; rows from before it hold a file path
+    if is_key(invoice.pdf_url) and store.exists(invoice.pdf_url):
+        path = store.local_path(invoice.pdf_url)
+        if path is None:
+            return StreamingResponse(
+                store.iter_chunks_async(invoice.pdf_url),
+                media_type="application/pdf",
+                headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+            )
+    elif invoice.pdf_url and os.path.exists(invoice.pdf_url):
+        path = invoice.pdf_url
+    else:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Invoice PDF not found"
         )
     
     return FileResponse(
-        path=invoice.pdf_url,
-        filename=f"{invoice.invoice_number}.pdf",
+        path=path,
+        filename=filename,
         media_type="application/pdf"
     )
 
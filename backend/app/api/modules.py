@@ -2,7 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File,
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
 from app.models.user import User
 from app.models.course import Course
@@ -13,6 +13,7 @@ from app.schemas.module import (
     TopicResponse, TopicCreate, TopicUpdate
 )
 from app.services.cloudinary_service import cloudinary_service
+from app.services import course_catalog, video_ingest
 
 router = APIRouter()
 
@@ -26,7 +27,6 @@ def create_module(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new module (Admin only)"""
-    Module.__table__.create(bind=engine, checkfirst=True)
     
     # Verify course exists
     course = db.query(Course).filter(Course.id == module_data.course_id).first()
@@ -36,6 +36,7 @@ def create_module(
     module = Module(**module_data.dict())
     db.add(module)
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(module)
     return module
 
@@ -47,8 +48,6 @@ def get_module(
     current_user: User = Depends(get_current_user)
 ):
     """Get a module with its topics"""
-    Module.__table__.create(bind=engine, checkfirst=True)
-    Topic.__table__.create(bind=engine, checkfirst=True)
 
     module = db.query(Module).filter(Module.id == module_id).first()
     if not module:
@@ -86,6 +85,7 @@ def update_module(
         setattr(module, key, value)
     
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(module)
     return module
 
@@ -103,6 +103,7 @@ def delete_module(
     
     db.delete(module)
     db.commit()
+    course_catalog.invalidate_catalog()
     return {"message": "Module deleted successfully"}
 
 
@@ -116,7 +117,6 @@ def create_topic(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Create a new topic in a module (Admin only)"""
-    Topic.__table__.create(bind=engine, checkfirst=True)
     
     # Verify module exists
     module = db.query(Module).filter(Module.id == module_id).first()
@@ -130,6 +130,7 @@ def create_topic(
     topic = Topic(**topic_dict)
     db.add(topic)
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(topic)
     return topic
 
@@ -140,28 +141,25 @@ async def upload_topic_video(
     title: str = Form(...),
     description: Optional[str] = Form(None),
     display_order: int = Form(0),
-    file: UploadFile = File(...),
+    file: Optional[UploadFile] = File(None),
+    upload_id: Optional[str] = Form(None),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user)
 ):
-    """Upload a video for a topic (Admin only)"""
-    Topic.__table__.create(bind=engine, checkfirst=True)
+    """Upload a video for a topic (Admin only); `file` or a completed resumable `upload_id`"""
     
     # Verify module exists
     module = db.query(Module).filter(Module.id == module_id).first()
     if not module:
         raise HTTPException(status_code=404, detail="Module not found")
     
-    # Save file temporarily
-    import os, tempfile
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp:
-        content = await file.read()
-        tmp.write(content)
-        tmp_path = tmp.name
+    # Stream the upload to disk in chunks
+    video = await video_ingest.take_video(file, upload_id)
+    stored = False
     
     try:
-        # Upload to Cloudinary
-        result = cloudinary_service.upload_video(tmp_path, folder=f"courses/module_{module_id}")
+        # Chunked upload to Cloudinary from the upload thread pool
+        result = await video_ingest.upload_to_storage(video, folder=f"courses/module_{module_id}")
         
         # Create topic
         topic = Topic(
@@ -178,15 +176,14 @@ async def upload_topic_video(
         )
         db.add(topic)
         db.commit()
+        stored = True
+        course_catalog.invalidate_catalog()
         db.refresh(topic)
         return topic
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     finally:
-        try:
-            os.remove(tmp_path)
-        except:
-            pass
+        video.release(stored)
 
 
 @router.get("/{module_id}/topics/{topic_id}", response_model=TopicResponse)
@@ -197,7 +194,6 @@ def get_topic(
     current_user: User = Depends(get_current_user)
 ):
     """Get a specific topic"""
-    Topic.__table__.create(bind=engine, checkfirst=True)
 
     topic = db.query(Topic).filter(
         Topic.id == topic_id,
@@ -248,6 +244,7 @@ def update_topic(
         setattr(topic, key, value)
     
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(topic)
     return topic
 
@@ -277,5 +274,6 @@ def delete_topic(
     
     db.delete(topic)
     db.commit()
+    course_catalog.invalidate_catalog()
     return {"message": "Topic deleted successfully"}
 
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.notification import Notification
@@ -25,8 +25,6 @@ def get_notifications(
     db: Session = Depends(get_db)
 ):
     """Get user's notifications"""
-    # Ensure table exists
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     query = db.query(Notification).filter(Notification.user_id == current_user.id)
     
@@ -42,7 +40,6 @@ def get_notification_stats(
     db: Session = Depends(get_db)
 ):
     """Get notification statistics"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     total = db.query(Notification).filter(Notification.user_id == current_user.id).count()
     unread = db.query(Notification).filter(
@@ -64,7 +61,6 @@ def get_notification(
     db: Session = Depends(get_db)
 ):
     """Get a specific notification"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
@@ -86,7 +82,6 @@ def mark_notification_read(
     db: Session = Depends(get_db)
 ):
     """Mark a notification as read"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
@@ -113,7 +108,6 @@ def mark_notification_unread(
     db: Session = Depends(get_db)
 ):
     """Mark a notification as unread"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
@@ -139,7 +133,6 @@ def mark_all_read(
     db: Session = Depends(get_db)
 ):
     """Mark all notifications as read"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     db.query(Notification).filter(
         Notification.user_id == current_user.id,
@@ -159,7 +152,6 @@ def delete_notification(
     db: Session = Depends(get_db)
 ):
     """Delete a notification"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     notification = db.query(Notification).filter(
         Notification.id == notification_id,
@@ -184,7 +176,6 @@ def create_notification(
     db: Session = Depends(get_db)
 ):
     """Create a notification (admin only or system use)"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     # Only admins can create notifications for other users
     if notification.user_id != current_user.id and not current_user.is_admin:
@@ -210,7 +201,6 @@ def create_notification_internal(
     link: str = None
 ):
     """Internal helper to create notifications"""
-    Notification.__table__.create(bind=engine, checkfirst=True)
     
     notification = Notification(
         user_id=user_id,
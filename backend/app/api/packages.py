@@ -7,6 +7,7 @@ from app.core.dependencies import get_current_admin_user, optional_current_user
 from app.models.package import Package
 from app.models.user import User
 from app.schemas.package import PackageResponse, PackageCreate, PackageUpdate
+from app.services import course_catalog
 
 router = APIRouter()
 
@@ -85,6 +86,7 @@ def create_package(
     new_package = Package(**package_data.dict())
     db.add(new_package)
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(new_package)
     
     return new_package
@@ -113,6 +115,7 @@ def update_package(
         setattr(package, field, value)
     
     db.commit()
+    course_catalog.invalidate_catalog()
     db.refresh(package)
     
     return package
@@ -138,6 +141,7 @@ def delete_package(
     
     package.is_active = False
     db.commit()
+    course_catalog.invalidate_catalog()
     
     return None
 
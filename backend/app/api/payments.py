@@ -6,6 +6,7 @@ from typing import List
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.core.config import settings
+from app.core.metrics import count_payment
 from app.core.rate_limit import limiter
 from app.models.user import User
 from app.models.package import Package
@@ -15,6 +16,7 @@ from app.schemas.payment import (
     PaymentCreate, PaymentOrderResponse, PaymentVerification, PaymentResponse
 )
 from app.services.razorpay_service import razorpay_service
+from app.services import course_catalog
 
 router = APIRouter()
 
@@ -111,7 +113,7 @@ def verify_payment(
     - Verifies Razorpay signature
     - Updates payment status
     - Creates user_package record
-    - Triggers referral commission calculation
+    - Queues referral commissions, invoice and confirmation email as background jobs
     """
     try:
         print(f"[PAYMENT VERIFY] Received data: {verification_data}")
@@ -158,6 +160,7 @@ def verify_payment(
         payment.status = "failed"
         payment.error_message = "Invalid payment signature"
         db.commit()
+        count_payment("package", "failed")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid payment signature"
@@ -201,58 +204,30 @@ def verify_payment(
     )
 
     db.add(user_package)
-    db.commit()
-    db.refresh(payment)
 
     # Log the conflict for admin review (don't deactivate individual purchases)
+    additional_note = ""
     if existing_individual_purchases:
         print(f"[PAYMENT VERIFY] User {current_user.email} purchased package {package.name} but already owns individual courses:")
         for purchase in existing_individual_purchases:
             print(f"  - {purchase['course_title']} (₹{purchase['amount_paid']})")
         # Note: We keep individual purchases active for audit trail
-    
-    # Trigger referral commission calculation (async task in production)
-    from app.services.referral_service import process_referral_commissions
-    try:
-        process_referral_commissions(current_user.id, payment.package_id, db)
-    except Exception as e:
-        print(f"Error processing referral commissions: {e}")
-        # Don't fail the payment if commission calculation fails
 
-    # Auto-generate invoice for the payment
-    try:
-        from app.services.invoice_service import InvoiceService
-        invoice_service = InvoiceService(db)
-        invoice = invoice_service.create_invoice(payment.id)
-        print(f"[PAYMENT VERIFY] Invoice generated: {invoice.invoice_number}")
-    except Exception as e:
-        print(f"Error generating invoice: {e}")
-        # Don't fail the payment if invoice generation fails
+        # Add note about existing individual purchases to the confirmation email
+        additional_note = "\n\nNote: You previously purchased the following courses individually:\n"
+        for purchase in existing_individual_purchases:
+            additional_note += f"- {purchase['course_title']} (₹{purchase['amount_paid']})\n"
+        additional_note += "\nYou now have full package access to all courses. Your individual purchases remain in your transaction history."
 
-    # Send purchase confirmation email
-    try:
-        from app.utils.email import send_purchase_confirmation_email
-        if package:
-            # Add note about existing individual purchases if any
-            additional_note = ""
-            if existing_individual_purchases:
-                additional_note = "\n\nNote: You previously purchased the following courses individually:\n"
-                for purchase in existing_individual_purchases:
-                    additional_note += f"- {purchase['course_title']} (₹{purchase['amount_paid']})\n"
-                additional_note += "\nYou now have full package access to all courses. Your individual purchases remain in your transaction history."
+    # Referral commissions, invoice and confirmation email run on the job queue
+    # (python -m scripts.run_job_worker); they commit atomically with the payment
+    from app.services.post_payment_jobs import enqueue_post_payment_jobs
+    enqueue_post_payment_jobs(db, payment, additional_note=additional_note)
 
-            send_purchase_confirmation_email(
-                to_email=current_user.email,
-                user_name=current_user.full_name,
-                package_name=package.name,
-                package_price=package.final_price,
-                transaction_id=payment.razorpay_payment_id,
-                purchase_date=payment.completed_at,
-                additional_note=additional_note
-            )
-    except Exception as e:
-        print(f"Error sending purchase confirmation email: {e}")
-        # Don't fail the payment if email fails
+    db.commit()
+    db.refresh(payment)
+    course_catalog.invalidate_user_access(current_user.id)
+    count_payment("package", "success")
 
     return payment
 
@@ -343,6 +318,7 @@ async def razorpay_webhook(request: Request, db: Session = Depends(get_db)):
                 payment.razorpay_payment_id = payment_entity.get("id")
                 payment.completed_at = datetime.utcnow()
                 db.commit()
+                count_payment("package" if payment.package_id else "course", "success")
     
     elif event == "payment.failed":
         # Handle failed payment
@@ -358,6 +334,7 @@ async def razorpay_webhook(request: Request, db: Session = Depends(get_db)):
                 payment.status = "failed"
                 payment.error_message = payment_entity.get("error_description", "Payment failed")
                 db.commit()
+                count_payment("package" if payment.package_id else "course", "failed")
     
     return {"status": "ok"}
 
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
 
 from app.core.database import get_db
 from app.core.dependencies import get_current_user, get_current_admin_user
+from app.core.pagination import paginate_keyset, NEXT_CURSOR_HEADER
 from app.models.user import User
 from app.models.payout import Payout
 from app.models.commission import Commission
@@ -189,29 +191,45 @@ def request_payout(
 
 @router.get("/all", response_model=List[PayoutWithUser])
 def get_all_payouts(
+    response: Response,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_admin_user),
     status_filter: str = None,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None
 ):
     """
-    Get all payouts (Admin only)
+    Get all payouts (Admin only), newest first
+    The cursor for the next page is returned in the X-Next-Cursor header
     """
-    query = db.query(Payout)
+    query = db.query(Payout).options(joinedload(Payout.user))
     
     if status_filter:
         query = query.filter(Payout.status == status_filter)
     
-    payouts = query.order_by(Payout.created_at.desc()).limit(limit).all()
+    payouts, next_cursor = paginate_keyset(
+        query,
+        columns=[Payout.created_at, Payout.id],
+        cursor=cursor,
+        limit=limit,
+        key=lambda p: (p.created_at, p.id),
+        scope=status_filter or "",
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+    # Count commissions for the whole page in one grouped query
+    payout_ids = [payout.id for payout in payouts]
+    commission_counts = dict(
+        db.query(Commission.payout_id, func.count(Commission.id)).filter(
+            Commission.payout_id.in_(payout_ids)
+        ).group_by(Commission.payout_id).all()
+    ) if payout_ids else {}
     
     result = []
     for payout in payouts:
-        user = db.query(User).filter(User.id == payout.user_id).first()
-        
-        # Count commissions in this payout
-        commission_count = db.query(Commission).filter(
-            Commission.payout_id == payout.id
-        ).count()
+        user = payout.user
+        commission_count = commission_counts.get(payout.id, 0)
         
         payout_data = {
             **payout.__dict__,
@@ -235,12 +253,14 @@ def create_batch_payouts(
     
     This should be run weekly
     """
-    payouts = create_payout_batch(db)
+    batch = create_payout_batch(db)
     
     return {
-        'message': f'Created {len(payouts)} payout records',
-        'count': len(payouts),
-        'payouts': [{'id': p.id, 'user_id': p.user_id, 'amount': p.amount} for p in payouts]
+        'message': f"Created {batch['payouts']} payout records",
+        'count': batch['payouts'],
+        'commission_count': batch['commissions'],
+        'total_amount': batch['amount'],
+        'timings': batch['timings']
     }
 
 
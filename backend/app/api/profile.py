@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from sqlalchemy.orm import Session
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.profile import Profile
@@ -12,8 +12,6 @@ router = APIRouter()
 
 @router.get("/me", response_model=ProfileResponse)
 def get_my_profile(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Ensure table exists
-    Profile.__table__.create(bind=engine, checkfirst=True)
 
     profile = db.query(Profile).filter(Profile.user_id == current_user.id).first()
     if not profile:
@@ -30,8 +28,6 @@ def upload_avatar(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Ensure table exists
-    Profile.__table__.create(bind=engine, checkfirst=True)
 
     # Save file temporarily
     import os, tempfile
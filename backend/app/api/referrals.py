@@ -7,7 +7,9 @@ from app.core.dependencies import get_current_user
 from app.models.user import User
 from app.models.referral import Referral
 from app.models.package import Package
+from app.models.user_package import UserPackage
 from app.schemas.referral import ReferralResponse, ReferralWithDetails
+from app.services import referral_graph
 from app.services.referral_service import get_referral_tree
 
 router = APIRouter()
@@ -30,7 +32,6 @@ def get_my_referrals(
     result = []
     for referee in referred_users:
         # Check if they have purchased a package
-        from app.models.user_package import UserPackage
         user_package = db.query(UserPackage).filter(
             UserPackage.user_id == referee.id,
             UserPackage.status == "active"
@@ -95,47 +96,18 @@ def get_referral_stats(
     Get detailed referral statistics
     Shows ALL referred users, not just those who purchased
     """
-    # Count all users directly referred by current user (Level 1)
-    level1_count = db.query(User).filter(
-        User.referred_by_id == current_user.id
-    ).count()
-
-    # Count indirect referrals (Level 2)
-    # Get all direct referrals first
-    direct_referrals = db.query(User).filter(
-        User.referred_by_id == current_user.id
-    ).all()
-
-    level2_count = 0
-    for direct_ref in direct_referrals:
-        # Count users referred by each direct referral
-        indirect_count = db.query(User).filter(
-            User.referred_by_id == direct_ref.id
-        ).count()
-        level2_count += indirect_count
+    # Level 1 / level 2 counts in one grouped query on the referral graph index
+    counts = referral_graph.level_counts(db, current_user.id, max_depth=2)
+    level1_count = counts.get(1, 0)
+    level2_count = counts.get(2, 0)
 
-    # Get package breakdown (only for users who purchased)
-    from sqlalchemy import func
-    from app.models.user_package import UserPackage
-
-    # Get all referred users with their packages
-    referred_users = db.query(User).filter(
-        User.referred_by_id == current_user.id
-    ).all()
+    # Package breakdown per level (only for users who purchased), using each
+    # referee's latest active package
+    rows = referral_graph.package_counts(db, current_user.id, max_depth=2).all()
 
     breakdown = {}
-    for referee in referred_users:
-        user_package = db.query(UserPackage).filter(
-            UserPackage.user_id == referee.id,
-            UserPackage.status == "active"
-        ).order_by(UserPackage.purchase_date.desc()).first()
-
-        if user_package:
-            package = db.query(Package).filter(Package.id == user_package.package_id).first()
-            if package:
-                if package.name not in breakdown:
-                    breakdown[package.name] = {"level1": 0, "level2": 0}
-                breakdown[package.name]["level1"] += 1
+    for package_name, depth, count in rows:
+        breakdown.setdefault(package_name, {"level1": 0, "level2": 0})[f"level{depth}"] = count
 
     return {
         "total_referrals": level1_count + level2_count,
@@ -143,4 +115,3 @@ def get_referral_stats(
         "level2_referrals": level2_count,
         "package_breakdown": breakdown
     }
-
@@ -9,11 +9,12 @@ import time
 import os
 import tempfile
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, Request, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, UploadFile, File
 from sqlalchemy.orm import Session
+from app.core.config import settings
 from app.core.database import get_db
 from app.core.dependencies import get_current_user
-from app.models import User, GeneratedImage, CommunityPost, ImageCategory, ImageTemplate
+from app.models import User, GeneratedImage, GenerationJob, CommunityPost, ImageCategory, ImageTemplate
 from app.schemas.studio import (
     EnhancePromptRequest, EnhancePromptResponse,
     GenerateImageRequest, GenerateImageResponse, GenerationStatusResponse,
@@ -23,7 +24,7 @@ from app.schemas.studio import (
     ImageTemplateCreate, ImageTemplateUpdate, ImageTemplateResponse, TemplatesListResponse,
 )
 from app.services.prompt_enhancement_service import get_prompt_enhancement_service
-from app.services.image_generation_service import get_image_generation_service
+from app.services.generation_jobs import submit_job
 from app.services.credit_ledger_service import CreditLedgerService
 from app.services.cloudinary_service import CloudinaryService
 
@@ -163,18 +164,24 @@ async def enhance_prompt(
 # IMAGE GENERATION
 # ============================================================================
 
-@router.post("/generate", response_model=GenerateImageResponse)
+@router.post("/generate", response_model=GenerateImageResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate_image(
     request: GenerateImageRequest,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
 ):
     """
-    Generate an image from a prompt
+    Queue an image generation and return its job id at once
     POST /api/studio/generate
+
+    The credits are debited now and refunded if the generation fails.
+    Poll GET /api/studio/generate/{job_id} for the result. With
+    cache="reuse" an identical earlier request's image is returned at once
+    (200, status succeeded, cached=true) when the generation cache has it.
     """
     try:
-        # Step 1: Check credit balance (don't debit yet!)
+        # Fail fast before queueing (submit_job re-checks atomically when debiting)
         balance = CreditLedgerService.get_balance(db, current_user.id)
         tier_cost = CreditLedgerService.get_tier_cost(request.tier)
 
@@ -184,78 +191,47 @@ async def generate_image(
                 detail=f"Insufficient credits. Need {tier_cost}, have {balance}",
             )
 
-        # Step 2: Enhance prompt only if requested
-        if getattr(request, "enhance_prompt", False):
-            enhancer = get_prompt_enhancement_service()
-            enhanced_prompt = await enhancer.enhance_prompt(request.prompt)
-        else:
-            enhanced_prompt = request.prompt
-
-        # Step 3: Generate image FIRST (with optional provider override)
-        image_gen = get_image_generation_service()
-        gen_result = await image_gen.generate_image(
-            enhanced_prompt,
+        submitted = submit_job(
+            db,
+            current_user.id,
+            request.prompt,
             request.tier,
-            provider=request.provider,  # Allow UI to select provider
-            user_id=current_user.id  # Pass user_id for local storage
+            provider=request.provider,
+            enhance_prompt=getattr(request, "enhance_prompt", False),
+            template_id=request.template_id,
+            seed=request.seed,
+            cache=request.cache,
         )
-
-        # Step 4: Check if generation succeeded
-        if gen_result["status"] == "failed":
-            # Generation failed - NO credits debited!
+        if not submitted["success"]:
+            if submitted.get("error") == "Insufficient credits":
+                raise HTTPException(
+                    status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                    detail=f"Insufficient credits. Need {tier_cost}, have {submitted.get('balance')}",
+                )
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Image generation failed: {gen_result.get('error')}",
+                detail=f"Payment processing failed: {submitted.get('error')}",
             )
 
-        # Step 5: Generation succeeded - NOW debit credits
-        debit_result = CreditLedgerService.debit_credits(
-            db,
-            current_user.id,
-            tier_cost,
-            reason="generation",
-            ref_id=f"gen-{current_user.id}-{gen_result.get('job_id')}",
-        )
-
-        if not debit_result["success"]:
-            # Critical: debit failed after generation - abort save and return error
-            logger.error(
-                f"CRITICAL: Failed to debit credits after successful generation! "
-                f"user={current_user.id}, cost={tier_cost}, reason={debit_result.get('error')}"
+        job = submitted["job"]
+        if submitted["cached"]:
+            response.status_code = status.HTTP_200_OK
+            return GenerateImageResponse(
+                job_id=str(job.id),
+                status=job.status,
+                credits_debited=job.credits_reserved,
+                estimated_time_seconds=0,
+                image_url=job.image.image_url,
+                cached=True,
             )
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Payment processing failed: {debit_result.get('error')}. Please contact support.",
-            )
-        
-        # Save to database
-        generated_image = GeneratedImage(
-            user_id=current_user.id,
-            prompt_text=request.prompt,
-            enhanced_prompt=enhanced_prompt,
-            tier=request.tier,
-            image_url=gen_result.get("image_url"),
-            width=gen_result.get("width", 1024),
-            height=gen_result.get("height", 1024),
-            provider=gen_result.get("provider", "replicate"),
-            job_id=gen_result.get("job_id"),
-            status=gen_result.get("status", "succeeded"),
-            credits_spent=tier_cost,
-        )
-        db.add(generated_image)
-        db.commit()
-        db.refresh(generated_image)
-        
-        logger.info(f"Image generated: user={current_user.id}, image_id={generated_image.id}")
 
         return GenerateImageResponse(
-            job_id=str(generated_image.id),  # Convert to string
-            status=generated_image.status,
-            credits_debited=tier_cost,
-            estimated_time_seconds=0,  # Synchronous providers
-            image_url=generated_image.image_url,  # Include image_url for immediate display
+            job_id=str(job.id),
+            status=job.status,
+            credits_debited=job.credits_reserved,
+            estimated_time_seconds=settings.GENERATION_ESTIMATED_SECONDS,
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -277,25 +253,26 @@ async def get_generation_status(
     GET /api/studio/generate/{job_id}
     """
     try:
-        image = db.query(GeneratedImage).filter(
-            GeneratedImage.id == job_id,
-            GeneratedImage.user_id == current_user.id,
+        job = db.query(GenerationJob).filter(
+            GenerationJob.id == job_id,
+            GenerationJob.user_id == current_user.id,
         ).first()
-        
-        if not image:
+
+        if not job:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Generation not found",
             )
-        
+
         return GenerationStatusResponse(
-            job_id=str(image.id),
-            status=image.status,
-            image_url=image.image_url,
-            error=image.error_message,
-            credits_used=image.credits_spent,
+            job_id=str(job.id),
+            status=job.status,
+            image_id=job.image_id,
+            image_url=job.image.image_url if job.image else None,
+            error=job.error_message,
+            credits_used=job.credits_reserved if job.status != "failed" else 0,
         )
-        
+
     except HTTPException:
         raise
     except Exception as e:
@@ -528,7 +505,7 @@ async def purchase_credits(
     """
     try:
         from app.models.wallet import Wallet, WalletTransaction, TransactionType, TransactionSource
-        from app.core.database import engine
+        from app.api.wallet import create_transaction
 
         if amount <= 0 or amount > 10000:
             raise HTTPException(
@@ -536,10 +513,6 @@ async def purchase_credits(
                 detail="Amount must be between 1 and 10000 credits",
             )
 
-        # Ensure tables exist
-        Wallet.__table__.create(bind=engine, checkfirst=True)
-        WalletTransaction.__table__.create(bind=engine, checkfirst=True)
-
         # Idempotency: if idempotency_key provided and we already credited, short-circuit
         ref_id = f"wallet-purchase-{current_user.id}-{idempotency_key}" if idempotency_key else f"wallet-purchase-{current_user.id}"
 
@@ -581,27 +554,23 @@ async def purchase_credits(
                     detail=f"Insufficient wallet balance. Need ₹{cost_in_rupees}, have ₹{wallet.balance}",
                 )
 
-            # Create wallet transaction (DEBIT -> PURCHASE)
-            balance_before = wallet.balance
-            wallet.balance -= cost_in_rupees
-            wallet.total_spent += cost_in_rupees
-
             # Generate unique reference_id with timestamp to avoid collisions
             if not idempotency_key:
                 unique_suffix = str(uuid.uuid4())[:8]
                 ref_id = f"wallet-purchase-{current_user.id}-{int(cost_in_rupees)}-{unique_suffix}"
 
-            txn = WalletTransaction(
-                wallet_id=wallet.id,
-                type=TransactionType.DEBIT,
-                source=TransactionSource.PURCHASE,
-                amount=cost_in_rupees,
-                balance_before=balance_before,
-                balance_after=wallet.balance,
-                description=f"Studio credits purchase ({amount} credits)",
-                reference_id=ref_id,
-            )
-            db.add(txn)
+            # Debit the wallet atomically (DEBIT -> PURCHASE); committed with the credits below
+            try:
+                create_transaction(
+                    db, wallet, TransactionType.DEBIT, TransactionSource.PURCHASE,
+                    cost_in_rupees, f"Studio credits purchase ({amount} credits)", ref_id,
+                    commit=False,
+                )
+            except HTTPException:
+                raise HTTPException(
+                    status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                    detail=f"Insufficient wallet balance. Need ₹{cost_in_rupees}, have ₹{wallet.balance}",
+                )
 
             # Credit studio credits (idempotent internally)
             credit_result = CreditLedgerService.credit_credits(
@@ -0,0 +1,65 @@
+"""
+Resumable video upload endpoints (Admin only)
+
+1. POST /api/uploads/videos            {filename, size, sha256?} -> upload_id
+2. PUT  /api/uploads/videos/{id}       raw bytes, Upload-Offset: <start byte>
+   repeat until offset == size; after a dropped connection
+   GET  /api/uploads/videos/{id}       returns the committed offset to resume from
+3. POST /api/courses/{id}/videos or /api/modules/{id}/topics/upload-video
+   with the upload_id form field instead of a file
+"""
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, Request
+from pydantic import BaseModel, Field
+
+from app.core.dependencies import get_current_admin_user
+from app.models.user import User
+from app.services import video_ingest
+
+router = APIRouter()
+
+
+# Schemas
+class VideoUploadCreate(BaseModel):
+    filename: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0)
+    sha256: Optional[str] = Field(None, pattern=r"^[0-9a-fA-F]{64}$")
+
+
+class VideoUploadStatus(BaseModel):
+    upload_id: str
+    filename: str
+    size: int
+    offset: int
+    complete: bool
+    chunk_size: int
+
+
+@router.post("", response_model=VideoUploadStatus, status_code=201)
+def create_video_upload(
+    payload: VideoUploadCreate,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Open a resumable upload session"""
+    return video_ingest.create_session(payload.filename, payload.size, payload.sha256, user_id=current_user.id)
+
+
+@router.get("/{upload_id}", response_model=VideoUploadStatus)
+def get_video_upload(
+    upload_id: str,
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Committed offset of an upload session"""
+    return video_ingest.session_status(upload_id)
+
+
+@router.put("/{upload_id}", response_model=VideoUploadStatus)
+async def append_video_upload(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(..., alias="Upload-Offset", ge=0),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Append the request body at Upload-Offset; the body is streamed to disk, not buffered"""
+    return await video_ingest.append_chunk(upload_id, upload_offset, request.stream())
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 
-from app.core.database import get_db, engine
+from app.core.database import get_db
 from app.core.dependencies import get_current_user
+from app.core.pagination import paginate_keyset, NEXT_CURSOR_HEADER
 from app.models.user import User
 from app.models.wallet import Wallet, WalletTransaction, TransactionType, TransactionSource
 from app.schemas.wallet import (
@@ -18,17 +20,24 @@ router = APIRouter()
 
 def get_or_create_wallet(db: Session, user_id: int) -> Wallet:
     """Get user's wallet or create if doesn't exist"""
-    Wallet.__table__.create(bind=engine, checkfirst=True)
-    WalletTransaction.__table__.create(bind=engine, checkfirst=True)
     
     wallet = db.query(Wallet).filter(Wallet.user_id == user_id).first()
     if not wallet:
         wallet = Wallet(user_id=user_id, balance=0.0, total_earned=0.0, total_withdrawn=0.0, total_spent=0.0)
         db.add(wallet)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # Created concurrently by another request
+            db.rollback()
+            return db.query(Wallet).filter(Wallet.user_id == user_id).one()
         db.refresh(wallet)
     return wallet
 
+# Running totals updated alongside the balance, per transaction source
+CREDIT_TOTALS = {TransactionSource.COMMISSION: "total_earned"}
+DEBIT_TOTALS = {TransactionSource.PAYOUT: "total_withdrawn", TransactionSource.PURCHASE: "total_spent"}
+
 def create_transaction(
     db: Session,
     wallet: Wallet,
@@ -36,27 +45,58 @@ def create_transaction(
     source: TransactionSource,
     amount: float,
     description: str,
-    reference_id: str = None
+    reference_id: str = None,
+    commit: bool = True
 ) -> WalletTransaction:
-    """Create a wallet transaction"""
-    balance_before = wallet.balance
+    """
+    Create a wallet transaction
+    
+    The balance is changed by one conditional UPDATE (debits only match while
+    balance >= amount), which row-locks the wallet until commit, so concurrent
+    credits and debits never lose updates or overdraw. balance_before/after are
+    read back inside that lock.
+    
+    reference_id is an idempotency key per wallet: repeating a transaction with
+    the same reference_id returns the original transaction and changes nothing.
+    
+    With commit=False the transaction is flushed into the caller's transaction
+    instead (the wallet stays locked until the caller commits).
+    """
+    if reference_id:
+        existing = db.query(WalletTransaction).filter(
+            WalletTransaction.wallet_id == wallet.id,
+            WalletTransaction.reference_id == reference_id
+        ).first()
+        if existing:
+            return existing
     
     if transaction_type == TransactionType.CREDIT:
-        wallet.balance += amount
-        if source == TransactionSource.COMMISSION:
-            wallet.total_earned += amount
+        delta, conditions, total = amount, [], CREDIT_TOTALS.get(source)
     else:  # DEBIT
-        if wallet.balance < amount:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Insufficient wallet balance"
-            )
-        wallet.balance -= amount
-        if source == TransactionSource.PAYOUT:
-            wallet.total_withdrawn += amount
-        elif source == TransactionSource.PURCHASE:
-            wallet.total_spent += amount
+        delta, conditions, total = -amount, [Wallet.balance >= amount], DEBIT_TOTALS.get(source)
+    
+    values = {
+        Wallet.balance: Wallet.balance + delta,
+        Wallet.version: Wallet.version + 1,
+        Wallet.updated_at: datetime.utcnow()
+    }
+    if total:
+        column = getattr(Wallet, total)
+        values[column] = column + amount
+    
+    updated = db.query(Wallet).filter(Wallet.id == wallet.id, *conditions).update(
+        values, synchronize_session=False
+    )
+    if not updated:
+        if commit:
+            db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Insufficient wallet balance"
+        )
     
+    # Read back under the row lock taken by the UPDATE
+    db.refresh(wallet)
     balance_after = wallet.balance
     
     transaction = WalletTransaction(
@@ -64,15 +104,27 @@ def create_transaction(
         type=transaction_type,
         source=source,
         amount=amount,
-        balance_before=balance_before,
+        balance_before=balance_after - delta,
         balance_after=balance_after,
         description=description,
         reference_id=reference_id
     )
     
     db.add(transaction)
-    wallet.updated_at = datetime.utcnow()
-    db.commit()
+    if not commit:
+        db.flush()
+        return transaction
+    
+    try:
+        db.commit()
+    except IntegrityError:
+        # Same reference_id committed concurrently: keep the original
+        db.rollback()
+        db.refresh(wallet)
+        return db.query(WalletTransaction).filter(
+            WalletTransaction.wallet_id == wallet.id,
+            WalletTransaction.reference_id == reference_id
+        ).one()
     db.refresh(wallet)
     db.refresh(transaction)
     
@@ -114,17 +166,29 @@ def get_wallet_stats(
 
 @router.get("/transactions", response_model=List[WalletTransactionResponse])
 def get_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Get wallet transactions"""
+    """
+    Get wallet transactions, newest first
+    The cursor for the next page is returned in the X-Next-Cursor header
+    """
     wallet = get_or_create_wallet(db, current_user.id)
     
-    transactions = db.query(WalletTransaction).filter(
-        WalletTransaction.wallet_id == wallet.id
-    ).order_by(WalletTransaction.created_at.desc()).offset(skip).limit(limit).all()
+    transactions, next_cursor = paginate_keyset(
+        db.query(WalletTransaction).filter(WalletTransaction.wallet_id == wallet.id),
+        columns=[WalletTransaction.created_at, WalletTransaction.id],
+        cursor=cursor,
+        limit=limit,
+        key=lambda t: (t.created_at, t.id),
+        offset=skip,
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return transactions
 
@@ -241,7 +305,8 @@ def withdraw_from_wallet(
             detail=f"Insufficient balance. Available: ₹{wallet.balance}"
         )
     
-    # Create payout request
+    # Create payout request and debit the wallet in one transaction, so a
+    # payout never exists without its debit
     from app.models.payout import Payout
     payout = Payout(
         user_id=current_user.id,
@@ -249,15 +314,19 @@ def withdraw_from_wallet(
         status="pending"
     )
     db.add(payout)
-    db.commit()
-    db.refresh(payout)
+    db.flush()
     
     # Debit wallet
-    transaction = create_transaction(
-        db, wallet, TransactionType.DEBIT, TransactionSource.PAYOUT,
-        amount, f"Withdrawal to bank account (Payout #{payout.id})",
-        f"payout_{payout.id}"
-    )
+    try:
+        transaction = create_transaction(
+            db, wallet, TransactionType.DEBIT, TransactionSource.PAYOUT,
+            amount, f"Withdrawal to bank account (Payout #{payout.id})",
+            f"payout_{payout.id}"
+        )
+    except HTTPException:
+        db.rollback()
+        raise
+    db.refresh(payout)
     
     return {
         "message": "Withdrawal request created successfully",
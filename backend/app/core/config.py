@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     DATABASE_URL: str
     TURSO_DATABASE_URL: Optional[str] = None  # Turso database URL
     TURSO_AUTH_TOKEN: Optional[str] = None  # Turso auth token
+    SCHEMA_CHECK_ON_STARTUP: bool = True  # Refuse to start when tables/columns are missing (see app/core/schema_check.py)
     
     # JWT
     SECRET_KEY: str
@@ -24,6 +25,16 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: str = "roprly@bilvanaturals.online"  # Must match SMTP account
     SMTP_USERNAME: str = ""  # Will use SMTP_USER if not set
     SMTP_USE_TLS: bool = True
+
+    # Email Outbox (emails are queued in the database and sent by the dispatcher)
+    EMAIL_DISPATCHER_EMBEDDED: bool = True  # Run the dispatcher inside the API process; disable when running scripts.run_email_dispatcher
+    EMAIL_SMTP_POOL_SIZE: int = 4  # Persistent SMTP connections per dispatcher
+    EMAIL_SMTP_TIMEOUT_SECONDS: float = 30.0
+    EMAIL_BATCH_SIZE: int = 100  # Emails claimed per dispatch round
+    EMAIL_RATE_LIMIT_PER_MINUTE: int = 3000  # Per dispatcher; keep under the SMTP provider's limit
+    EMAIL_MAX_ATTEMPTS: int = 5
+    EMAIL_RETRY_BASE_SECONDS: float = 30.0  # Doubled per failed attempt
+    EMAIL_POLL_INTERVAL_SECONDS: float = 2.0
     
     # Razorpay
     RAZORPAY_KEY_ID: str
@@ -33,6 +44,18 @@ class Settings(BaseSettings):
     CLOUDINARY_CLOUD_NAME: str
     CLOUDINARY_API_KEY: str
     CLOUDINARY_API_SECRET: str
+
+    # Blob Storage (see app/services/blob_store.py; move blobs with scripts.migrate_storage)
+    STORAGE_BACKEND: str = "local"  # local (content-addressed files) or cloudinary
+    STORAGE_LOCAL_ROOT: str = "storage"  # local backend root; relative paths are under backend/
+    STORAGE_CHUNK_BYTES: int = 1024 * 1024  # Read/write unit for streaming blobs
+
+    # Video Uploads (see app/services/video_ingest.py)
+    VIDEO_UPLOAD_CHUNK_BYTES: int = 8 * 1024 * 1024  # Read/write/hash unit; bounds memory per upload
+    VIDEO_UPLOAD_MAX_BYTES: int = 5 * 1024 * 1024 * 1024  # Larger videos are rejected with 413
+    VIDEO_UPLOAD_DIR: Optional[str] = None  # Spool and resumable session files; default <tmp>/video_uploads
+    VIDEO_UPLOAD_SESSION_TTL_SECONDS: int = 24 * 60 * 60  # Sessions idle this long are removed
+    VIDEO_UPLOAD_THREADS: int = 2  # Concurrent Cloudinary uploads per process
     
     # Application
     APP_NAME: str = "Affiliate Learning Platform"
@@ -44,6 +67,23 @@ class Settings(BaseSettings):
     PAYOUT_DAY: str = "MONDAY"
     MINIMUM_PAYOUT_AMOUNT: float = 500.0
 
+    # Commissions
+    COMMISSION_PLAN: str = "default"  # Active plan in commission_rates (falls back to the built-in matrix if it has no rows)
+
+    # Admin
+    ADMIN_DASHBOARD_CACHE_TTL_SECONDS: int = 60  # How long a dashboard snapshot is served before recomputing
+
+    # Course Catalogue (see app/services/course_catalog.py)
+    COURSE_CATALOG_CACHE_TTL_SECONDS: int = 300  # Bounds staleness in other workers; admin edits invalidate the local copy
+    COURSE_ACCESS_CACHE_TTL_SECONDS: int = 60  # Per-user package level and purchased courses
+
+    # Background Jobs
+    JOB_MAX_ATTEMPTS: int = 5  # Attempts before a job is dead-lettered
+    JOB_RETRY_BASE_SECONDS: float = 10.0  # Backoff after the first failure, doubled per attempt
+    JOB_RETRY_MAX_SECONDS: float = 3600.0
+    JOB_POLL_INTERVAL_SECONDS: float = 1.0  # Worker sleep when the queue is empty
+    JOB_LOCK_TIMEOUT_SECONDS: int = 600  # Running jobs older than this are assumed crashed and requeued
+
     # Sentry (Error Tracking)
     SENTRY_DSN: Optional[str] = None
     ENVIRONMENT: str = "development"
@@ -61,6 +101,14 @@ class Settings(BaseSettings):
     IMAGEGEN_GEMINI_MODEL_ID: str = "gemini-2.5-flash-image"  # Nano Banana
     IMAGEGEN_DEFAULT_TIER: str = "standard"
 
+    # Image provider routing for IMAGEGEN_PROVIDER=auto (see app/services/provider_router.py)
+    PROVIDER_ROUTER_WINDOW: int = 50  # Latest calls per provider used for p50/p95 and error rate
+    PROVIDER_ROUTER_MIN_SAMPLES: int = 5  # Calls before a provider is ranked (and hedged) by its own latency
+    PROVIDER_BREAKER_FAILURES: int = 3  # Consecutive failures that open a provider's circuit
+    PROVIDER_BREAKER_RESET_SECONDS: float = 60.0  # How long an open circuit skips the provider before a trial call
+    PROVIDER_HEDGE_ENABLED: bool = True  # Call a second provider when the first is slower than the budget
+    PROVIDER_HEDGE_AFTER_SECONDS: float = 0.0  # Hedge budget; 0 = the first provider's own p95
+
     # Image Generation API Keys
     OPENAI_API_KEY: Optional[str] = None  # OpenAI DALL-E 3
     HUGGINGFACE_API_KEY: Optional[str] = None  # Hugging Face (Free tier: 1000 calls/day)
@@ -70,11 +118,31 @@ class Settings(BaseSettings):
     PROMPT_ENHANCER_PROVIDER: str = "gemini"
     PROMPT_ENHANCER_API_BASE: str = "https://generativelanguage.googleapis.com"
     PROMPT_ENHANCER_MODEL_ID: str = "gemini-1.5-flash-latest"
-    PROMPT_ENHANCER_TIMEOUT_SECONDS: float = 3.0
+    PROMPT_ENHANCER_TIMEOUT_SECONDS: float = 3.0  # Budget per upstream call, including the wait for an SDK thread
+    PROMPT_ENHANCER_THREADS: int = 4  # Thread pool for the blocking Gemini SDK
+    PROMPT_ENHANCER_CACHE_BACKEND: str = "memory"  # memory (per process) or sqlite (shared by the workers on a host), see app/services/prompt_cache.py
+    PROMPT_ENHANCER_CACHE_PATH: str = "prompt_enhancement_cache.sqlite3"  # sqlite backend file
+    PROMPT_ENHANCER_CACHE_MAX_ENTRIES: int = 1000  # Least recently used entries beyond this are evicted
+    PROMPT_ENHANCER_CACHE_TTL_SECONDS: int = 15 * 60
+
+    # Community AI Studio - Generation Jobs (see app/services/generation_jobs.py)
+    GENERATION_WORKERS_EMBEDDED: bool = True  # Run the worker pool inside the API process; disable when running scripts.run_generation_worker
+    GENERATION_MAX_CONCURRENCY: int = 8  # Provider calls in flight per worker pool
+    GENERATION_PROVIDER_CONCURRENCY: Optional[str] = None  # JSON overrides of per-provider caps, e.g. '{"openai": 8}'
+    GENERATION_TIMEOUT_SECONDS: float = 180.0  # A provider call taking longer fails the job
+    GENERATION_MAX_ATTEMPTS: int = 2  # Runs interrupted by a crashed worker are retried this many times in total
+    GENERATION_POLL_INTERVAL_SECONDS: float = 0.5  # Worker pool sleep when nothing is claimable
+    GENERATION_ESTIMATED_SECONDS: int = 20  # Returned to clients as the initial polling hint
+    GENERATION_CACHE_ENABLED: bool = True  # Store results so requests with cache="reuse" can skip the provider (see app/services/generation_cache.py)
+    GENERATION_CACHE_MAX_ENTRIES: int = 10000  # Least recently used entries beyond this are evicted
+    GENERATION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600  # Entries older than this are not reused
 
     # Community AI Studio - Storage
     STORAGE_PROVIDER: str = "cloudinary"
 
+    # Community AI Studio - Community Feed
+    TRENDING_HALF_LIFE_HOURS: float = 24.0  # Engagement loses half its trending weight per half-life
+
     # Community AI Studio - Credit Economy
     CREDIT_PRICE_INR: float = 5.0
     CREDIT_STANDARD_TIER_COST: int = 1
@@ -84,6 +152,24 @@ class Settings(BaseSettings):
     CREDIT_REUSE_CAP_PER_ASSET: int = 20
     CREDIT_REUSE_CAP_PER_DAY: int = 10
 
+    # Outbound HTTP (shared pooled clients for AI providers, see app/core/http_clients.py)
+    HTTP_HTTP2_ENABLED: bool = True  # Used when the h2 package is installed
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    HTTP_POOL_TIMEOUT_SECONDS: float = 10.0  # Max wait for a free pooled connection
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    HTTP_PROVIDER_LIMITS: Optional[str] = None  # JSON overrides, e.g. '{"openai": {"max_connections": 50, "read_timeout": 90}}'
+
+    # Metrics (Prometheus /metrics, see app/core/metrics.py; set PROMETHEUS_MULTIPROC_DIR for several workers)
+    METRICS_ENABLED: bool = True  # Request latency/in-flight middleware and DB pool instrumentation
+    METRICS_TOKEN: Optional[str] = None  # Scrapers must send "Authorization: Bearer <token>" when set
+
+    # Query instrumentation (per-request SQL stats, see app/core/query_stats.py)
+    QUERY_STATS_ENABLED: bool = True  # Off = no cursor hooks or middleware at all
+    QUERY_STATS_HEADERS: Optional[bool] = None  # X-DB-* response headers (None = only in development)
+    QUERY_STATS_TOP_N: int = 3  # Slowest statements kept per request
+    SLOW_QUERY_THRESHOLD_MS: float = 200.0
+    SLOW_QUERY_LOG_SAMPLE_RATE: float = 1.0  # Fraction of requests with slow statements that are logged
+
     # Feature Flags
     FEATURE_FLAGS: Optional[str] = '{"premium_tiers":true,"ab_test_pricing":true,"community_feed":true}'
 
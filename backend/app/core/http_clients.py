@@ -0,0 +1,124 @@
+"""
+Shared outbound HTTP clients
+
+One pooled httpx.AsyncClient per upstream provider for the lifetime of the
+application, so image generation and prompt enhancement calls reuse warm
+keep-alive (and HTTP/2, when `h2` is installed) connections instead of paying
+a TCP + TLS handshake on every request.
+
+Clients are opened and closed by the FastAPI lifespan. Code running outside
+the API (workers, scripts) gets clients lazily on first use. httpx
+connections belong to an event loop, so the registry keeps one set of
+clients per loop; aclose() closes them all (sets of loops that have since
+been closed are dropped, as nothing can be awaited on them any more).
+"""
+
+import asyncio
+import importlib.util
+import json
+import logging
+import threading
+from typing import Any, Dict
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# httpx only speaks HTTP/2 when the optional h2 package is installed
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Connection limits and read timeout per provider; override any field with
+# HTTP_PROVIDER_LIMITS, e.g. '{"openai": {"max_connections": 50}}'
+PROVIDER_LIMITS: Dict[str, Dict[str, Any]] = {
+    "gemini": {"max_connections": 20, "read_timeout": 60.0},
+    "openai": {"max_connections": 20, "read_timeout": 120.0},
+    "huggingface": {"max_connections": 10, "read_timeout": 120.0},
+    "default": {"max_connections": 10, "read_timeout": 30.0},
+}
+
+
+def _provider_config(provider: str) -> Dict[str, Any]:
+    config = dict(PROVIDER_LIMITS.get(provider, PROVIDER_LIMITS["default"]))
+    if settings.HTTP_PROVIDER_LIMITS:
+        try:
+            config.update(json.loads(settings.HTTP_PROVIDER_LIMITS).get(provider, {}))
+        except (ValueError, AttributeError):
+            logger.warning("Ignoring invalid HTTP_PROVIDER_LIMITS")
+    return config
+
+
+def build_client(provider: str, **client_kwargs) -> httpx.AsyncClient:
+    """Create a pooled client configured for `provider` (extra kwargs go to httpx.AsyncClient)"""
+    config = _provider_config(provider)
+    max_connections = int(config["max_connections"])
+    return httpx.AsyncClient(
+        http2=settings.HTTP_HTTP2_ENABLED and HTTP2_AVAILABLE,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        timeout=httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            read=float(config["read_timeout"]),
+            write=float(config["read_timeout"]),
+            pool=settings.HTTP_POOL_TIMEOUT_SECONDS,
+        ),
+        headers={"User-Agent": f"{settings.APP_NAME}/1.0"},
+        **client_kwargs,
+    )
+
+
+async def _close_all(clients: Dict[str, httpx.AsyncClient]) -> None:
+    for client in clients.values():
+        await client.aclose()
+
+
+class HTTPClientRegistry:
+    """Event loop -> provider name -> shared AsyncClient"""
+
+    def __init__(self):
+        self._clients: Dict[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._clients.get(loop)
+            if clients is None:
+                # Connections cannot move between event loops; this loop gets its own set
+                for other in [other for other in self._clients if other.is_closed()]:
+                    del self._clients[other]
+                clients = self._clients[loop] = {}
+
+            client = clients.get(provider)
+            if client is None or client.is_closed:
+                client = clients[provider] = build_client(provider)
+        return client
+
+    async def start(self) -> None:
+        """Open clients for all known providers (called from the FastAPI lifespan)"""
+        for provider in PROVIDER_LIMITS:
+            self.get(provider)
+        logger.info(f"HTTP clients ready for {', '.join(PROVIDER_LIMITS)} (HTTP/2: {HTTP2_AVAILABLE and settings.HTTP_HTTP2_ENABLED})")
+
+    async def aclose(self) -> None:
+        """Close every loop's clients: this loop's here, other running loops' on their own loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sets, self._clients = self._clients, {}
+        for other, clients in sets.items():
+            if other is loop:
+                await _close_all(clients)
+            elif not other.is_closed():
+                asyncio.run_coroutine_threadsafe(_close_all(clients), other)
+
+
+http_clients = HTTPClientRegistry()
+
+
+def get_http_client(provider: str) -> httpx.AsyncClient:
+    """Shared client for an upstream provider (gemini, openai, huggingface, ...)"""
+    return http_clients.get(provider)
@@ -0,0 +1,285 @@
+"""
+Prometheus metrics
+
+Collectors served at /metrics:
+
+  - HTTP: request latency by route template and status, requests in flight
+    (MetricsMiddleware), SQL statements and DB time per request
+    (QueryStatsMiddleware in app/core/query_stats.py)
+  - Database: connection pool checkout wait and connections in use
+    (instrument_engine)
+  - Image providers: latency of each ImageGenerationAdapter call, hedged
+    requests (app/services/provider_router.py)
+  - Queues: email outbox and generation job depth, read from the database
+    at scrape time
+  - Generation cache: lookups by result (hit rate) and evictions
+  - Business: generations, payments and commissions
+
+Multiple uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty, writable
+directory (wiped on every deploy) before the workers start. prometheus_client
+then keeps each process's samples in memory-mapped files there, and /metrics
+(served by any worker) aggregates them across processes. Gauges declare how
+they combine; workers that exit are dropped by mark_process_dead in the
+lifespan shutdown. Without the variable metrics are per process.
+"""
+
+import logging
+import os
+import time
+from typing import Tuple
+
+from fastapi import Request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PROVIDER_BUCKETS = (0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+DB_SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+
+# HTTP
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+REQUEST_DB_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements issued per HTTP request",
+    ["method", "route"],
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per HTTP request",
+    ["method", "route"],
+    buckets=DB_SECONDS_BUCKETS,
+)
+SLOW_QUERIES = Counter(
+    "db_slow_queries_total",
+    "SQL statements slower than SLOW_QUERY_THRESHOLD_MS",
+    ["method", "route"],
+)
+
+# Database pool
+DB_POOL_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time to get a connection from the pool (including opening a new one)",
+    buckets=POOL_WAIT_BUCKETS,
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Pooled connections checked out",
+    multiprocess_mode="livesum",
+)
+
+# Image providers
+PROVIDER_LATENCY = Histogram(
+    "image_provider_request_duration_seconds",
+    "Image generation provider call latency",
+    ["provider", "outcome"],
+    buckets=PROVIDER_BUCKETS,
+)
+PROVIDER_HEDGES = Counter(
+    "image_provider_hedges_total",
+    "Generations where a second provider was called after the latency budget, by which call won",
+    ["winner"],
+)
+
+# Generation cache (app/services/generation_cache.py); hit rate = hit / (hit + miss)
+GENERATION_CACHE_LOOKUPS = Counter(
+    "generation_cache_lookups_total",
+    "Generation cache lookups by requests asking to reuse a cached image",
+    ["result"],
+)
+GENERATION_CACHE_EVICTIONS = Counter(
+    "generation_cache_evictions_total",
+    "Generation cache entries evicted beyond GENERATION_CACHE_MAX_ENTRIES",
+)
+
+# Business
+GENERATIONS = Counter(
+    "image_generations_total",
+    "Settled image generation jobs",
+    ["provider", "status"],
+)
+PAYMENTS = Counter(
+    "payments_total",
+    "Verified or failed payments",
+    ["kind", "status"],
+)
+COMMISSIONS = Counter(
+    "commissions_total",
+    "Referral commissions created",
+    ["level"],
+)
+COMMISSION_AMOUNT = Counter(
+    "commissions_amount_rupees_total",
+    "Referral commission amount created",
+    ["level"],
+)
+
+
+def observe_request_queries(method: str, route: str, count: int, seconds: float, slow: int) -> None:
+    REQUEST_DB_QUERIES.labels(method, route).observe(count)
+    REQUEST_DB_SECONDS.labels(method, route).observe(seconds)
+    if slow:
+        SLOW_QUERIES.labels(method, route).inc(slow)
+
+
+def observe_provider_call(provider: str, seconds: float, outcome: str) -> None:
+    """outcome: success, error or timeout"""
+    PROVIDER_LATENCY.labels(provider, outcome).observe(seconds)
+
+
+def count_hedge(winner: str) -> None:
+    """winner: primary or hedge"""
+    PROVIDER_HEDGES.labels(winner).inc()
+
+
+def count_generation_cache(result: str) -> None:
+    """result: hit or miss"""
+    GENERATION_CACHE_LOOKUPS.labels(result).inc()
+
+
+def count_generation_cache_evictions(count: int) -> None:
+    GENERATION_CACHE_EVICTIONS.inc(count)
+
+
+def count_generation(provider: str, status: str) -> None:
+    GENERATIONS.labels(provider or "unknown", status).inc()
+
+
+def count_payment(kind: str, status: str) -> None:
+    """kind: package or course; status: success or failed"""
+    PAYMENTS.labels(kind, status).inc()
+
+
+def count_commission(level: int, amount: float) -> None:
+    COMMISSIONS.labels(str(level)).inc()
+    COMMISSION_AMOUNT.labels(str(level)).inc(amount)
+
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route (bounded label cardinality)"""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """Request latency by route template and status, and requests in flight"""
+
+    async def dispatch(self, request: Request, call_next):
+        in_flight = REQUESTS_IN_FLIGHT.labels(request.method)
+        in_flight.inc()
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            in_flight.dec()
+            REQUEST_LATENCY.labels(request.method, route_template(request), str(status)).observe(
+                time.perf_counter() - start
+            )
+
+
+def _time_checkouts(pool) -> None:
+    do_get = pool._do_get
+
+    def timed_do_get():
+        start = time.perf_counter()
+        try:
+            return do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+    pool._do_get = timed_do_get
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Time connection pool checkouts and track connections in use (idempotent)"""
+    if getattr(engine, "_metrics_instrumented", False):
+        return
+    _time_checkouts(engine.pool)
+    # Pool event listeners survive dispose(), which replaces the pool; the timing wrapper must be redone
+    event.listen(engine.pool, "checkout", lambda *args: DB_POOL_IN_USE.inc())
+    event.listen(engine.pool, "checkin", lambda *args: DB_POOL_IN_USE.dec())
+    event.listen(engine, "engine_disposed", lambda disposed: _time_checkouts(disposed.pool))
+    engine._metrics_instrumented = True
+
+
+class QueueDepthCollector:
+    """Email outbox and generation queue depth, queried when /metrics is scraped"""
+
+    def __init__(self, session_factory=None):
+        self.session_factory = session_factory
+
+    def collect(self):
+        from app.services.email_outbox import PENDING, SENDING, FAILED, outbox_depth
+        from app.services.generation_jobs import queue_depth
+
+        if self.session_factory is None:
+            from app.core.database import SessionLocal
+            self.session_factory = SessionLocal
+
+        db = self.session_factory()
+        try:
+            emails = outbox_depth(db, statuses=(PENDING, SENDING, FAILED))
+            generations = queue_depth(db)
+        except Exception as e:
+            logger.warning(f"Could not read queue depth for metrics: {e}")
+            return
+        finally:
+            db.close()
+
+        email_family = GaugeMetricFamily("email_outbox_depth", "Email outbox rows by status", labels=["status"])
+        for email_status, count in sorted(emails.items()):
+            email_family.add_metric([email_status], count)
+        yield email_family
+
+        generation_family = GaugeMetricFamily(
+            "generation_queue_depth", "Generation jobs by provider and status", labels=["provider", "status"]
+        )
+        for provider, counts in sorted(generations.items()):
+            for job_status, count in sorted(counts.items()):
+                generation_family.add_metric([provider, job_status], count)
+        yield generation_family
+
+
+_queue_registry = CollectorRegistry(auto_describe=False)
+_queue_registry.register(QueueDepthCollector())
+
+
+def render() -> Tuple[bytes, str]:
+    """Exposition body and content type for /metrics"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry) + generate_latest(_queue_registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int) -> None:
+    """Drop an exiting worker's live gauges (multiprocess mode only)"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(pid)
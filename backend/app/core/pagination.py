@@ -0,0 +1,102 @@
+"""
+Keyset (cursor) pagination helpers
+
+Cursors are opaque url-safe tokens that encode the sort key and id of the
+last row on a page. The next page seeks straight past that row on an index,
+so page N costs the same as page 1 and rows inserted while a client scrolls
+do not cause duplicates or skips.
+"""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any], scope: str = "") -> str:
+    """Encode sort key values (last one is the row id) into an opaque cursor"""
+    payload = {
+        "s": scope,
+        "v": [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values],
+    }
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int, scope: str = "") -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor
+    Raises 400 if the cursor is malformed or belongs to another sort mode
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+        if payload.get("s") != scope or not isinstance(values, list) or len(values) != size:
+            raise ValueError("cursor does not match this listing")
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in values]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor",
+        )
+
+
+def keyset_filter(columns: Sequence, values: Sequence[Any]):
+    """
+    Rows strictly after `values` for a descending order on `columns`.
+    Expands the row-value comparison (c1, c2) < (v1, v2) so it works on SQLite and PostgreSQL.
+    """
+    clauses = []
+    for i, (column, value) in enumerate(zip(columns, values)):
+        if i == 0:
+            clauses.append(column < value)
+        else:
+            prefix = [c == v for c, v in zip(columns[:i], values[:i])]
+            clauses.append(and_(*prefix, column < value))
+    return or_(*clauses)
+
+
+def paginate_keyset(
+    query: Query,
+    columns: Sequence,
+    cursor: Optional[str],
+    limit: int,
+    key: Callable[[Any], Sequence[Any]],
+    scope: str = "",
+    offset: int = 0,
+) -> Tuple[list, Optional[str]]:
+    """
+    Order `query` by `columns` descending and return one page after `cursor`.
+
+    Args:
+        query: Unordered query
+        columns: Sort columns, ending with a unique column (usually the id)
+        cursor: Cursor from the previous page, or None for the first page
+        limit: Page size
+        key: Extracts the sort values of a result row, in `columns` order
+        scope: Sort mode name, so cursors cannot be replayed against another ordering
+        offset: Legacy skip-based paging for old clients; ignored when a cursor is given
+
+    Returns:
+        (rows, next_cursor) where next_cursor is None on the last page
+    """
+    if cursor:
+        query = query.filter(keyset_filter(columns, decode_cursor(cursor, len(columns), scope)))
+
+    query = query.order_by(*[column.desc() for column in columns])
+    if offset and not cursor:
+        query = query.offset(offset)
+    rows = query.limit(limit + 1).all()
+
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(key(rows[-1]), scope) if has_next else None
+    return rows, next_cursor
@@ -0,0 +1,141 @@
+"""
+Per-request SQL instrumentation
+
+QueryStatsMiddleware opens a RequestQueryStats for every HTTP request and
+SQLAlchemy cursor hooks (registered on the Engine class, so every engine the
+process creates is covered) add each statement's count and duration to it.
+At the end of the request the middleware:
+
+  - records query count, DB time and slow statements per route template in
+    the Prometheus metrics (app/core/metrics.py, served at /metrics)
+  - logs statements slower than SLOW_QUERY_THRESHOLD_MS, for a sampled
+    fraction (SLOW_QUERY_LOG_SAMPLE_RATE) of the requests that had one
+  - in development, adds X-DB-Query-Count / X-DB-Time-Ms / X-DB-Slowest-Ms
+    response headers
+
+When QUERY_STATS_ENABLED is off neither the hooks nor the middleware are
+installed, so nothing runs per statement or per request. Statements issued
+outside a request (workers, scripts) only pay a context variable lookup.
+"""
+
+import heapq
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.core.config import settings
+from app.core.metrics import observe_request_queries, route_template
+
+logger = logging.getLogger(__name__)
+
+# Statements longer than this are cut in logs
+STATEMENT_LOG_CHARS = 500
+
+_current: ContextVar[Optional["RequestQueryStats"]] = ContextVar("request_query_stats", default=None)
+_installed = False
+
+
+class RequestQueryStats:
+    """SQL statements issued while handling one request"""
+
+    __slots__ = ("count", "seconds", "slowest", "keep")
+
+    def __init__(self, keep: int = 3):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # min-heap of (seconds, statement)
+        self.keep = keep
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        if len(self.slowest) < self.keep:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, statement))
+
+    def top(self) -> List[Tuple[float, str]]:
+        """Slowest statements, slowest first"""
+        return sorted(self.slowest, reverse=True)
+
+
+def current_stats() -> Optional[RequestQueryStats]:
+    """Stats of the request being handled, if any"""
+    return _current.get()
+
+
+# The start time lives on the execution context, which is discarded with the
+# statement, so nothing is left behind when a statement raises
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None and context is not None:
+        context._query_stats_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_stats_start", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def install_query_hooks() -> None:
+    """Time every statement of every engine (idempotent)"""
+    global _installed
+    if _installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = True
+
+
+def uninstall_query_hooks() -> None:
+    global _installed
+    if not _installed:
+        return
+    event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+    _installed = False
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """Collect per-request SQL statistics (see module docstring)"""
+
+    def __init__(self, app, headers: Optional[bool] = None):
+        super().__init__(app)
+        self.headers = settings.ENVIRONMENT == "development" if headers is None else headers
+
+    async def dispatch(self, request: Request, call_next):
+        stats = RequestQueryStats(keep=settings.QUERY_STATS_TOP_N)
+        token = _current.set(stats)
+        try:
+            response = await call_next(request)
+        finally:
+            _current.reset(token)
+
+        route = route_template(request)
+        threshold = settings.SLOW_QUERY_THRESHOLD_MS / 1000
+        slow = [(seconds, statement) for seconds, statement in stats.top() if seconds >= threshold]
+
+        observe_request_queries(request.method, route, stats.count, stats.seconds, len(slow))
+
+        if slow and random.random() < settings.SLOW_QUERY_LOG_SAMPLE_RATE:
+            for seconds, statement in slow:
+                logger.warning(
+                    f"Slow query ({seconds * 1000:.1f} ms) in {request.method} {route} "
+                    f"[{stats.count} queries, {stats.seconds * 1000:.0f} ms total]: "
+                    f"{' '.join(statement.split())[:STATEMENT_LOG_CHARS]}"
+                )
+
+        if self.headers:
+            response.headers["X-DB-Query-Count"] = str(stats.count)
+            response.headers["X-DB-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+            if stats.slowest:
+                response.headers["X-DB-Slowest-Ms"] = f"{stats.top()[0][0] * 1000:.1f}"
+        return response
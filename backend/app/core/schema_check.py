@@ -0,0 +1,91 @@
+"""
+Startup schema verification
+
+Tables are created by create_tables.py and the Alembic migrations
+(alembic/versions), never by request handlers. verify_schema runs once in
+the FastAPI lifespan and refuses to start the application when a table or
+column the models need is missing, instead of failing on the first request
+that touches it.
+"""
+
+import logging
+import os
+from typing import Dict, List, Optional
+
+from sqlalchemy import MetaData, inspect, text
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "alembic")
+
+
+class SchemaError(RuntimeError):
+    """The database schema does not match the models"""
+
+
+def missing_schema(engine: Engine, metadata: MetaData) -> Dict[str, List[str]]:
+    """
+    Compare the database with the models
+
+    Returns: {table: []} for each missing table, {table: [column, ...]} for
+    each table missing columns; empty when the schema is complete
+    """
+    inspector = inspect(engine)
+    existing = set(inspector.get_table_names())
+
+    missing = {}
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            missing[table.name] = []
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        absent = [column.name for column in table.columns if column.name not in columns]
+        if absent:
+            missing[table.name] = absent
+    return missing
+
+
+def alembic_revisions(engine: Engine) -> tuple:
+    """(database revision, head revision); either is None when unknown"""
+    current = None
+    if inspect(engine).has_table("alembic_version"):
+        with engine.connect() as conn:
+            current = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+
+    head = None
+    try:
+        from alembic.script import ScriptDirectory
+        head = ScriptDirectory(os.path.abspath(ALEMBIC_DIR)).get_current_head()
+    except Exception as e:
+        logger.debug(f"Could not read Alembic head revision: {e}")
+    return current, head
+
+
+def verify_schema(engine: Engine, metadata: Optional[MetaData] = None) -> None:
+    """
+    Fail fast when the database is missing tables or columns
+
+    Raises:
+        SchemaError: Listing every missing table and column
+    """
+    if metadata is None:
+        from app.core.database import Base
+        import app.models  # noqa: F401  (register all models on Base.metadata)
+        metadata = Base.metadata
+
+    missing = missing_schema(engine, metadata)
+    if missing:
+        problems = [
+            f"{table} (columns: {', '.join(columns)})" if columns else f"{table} (table)"
+            for table, columns in sorted(missing.items())
+        ]
+        raise SchemaError(
+            "Database schema is out of date, missing: " + "; ".join(problems)
+            + ". Run `python create_tables.py` on a new database, then `alembic upgrade head`."
+        )
+
+    current, head = alembic_revisions(engine)
+    if current and head and current != head:
+        logger.warning(f"⚠️  Database is at Alembic revision {current}, head is {head}; run `alembic upgrade head`")
+    logger.info("✅ Database schema verified")
@@ -10,6 +10,7 @@ import sentry_sdk
 from sentry_sdk.integrations.fastapi import FastApiIntegration
 from sentry_sdk.integrations.starlette import StarletteIntegration
 from contextlib import asynccontextmanager
+import asyncio
 import logging
 import os
 
@@ -34,6 +35,13 @@ if settings.SENTRY_DSN:
 async def lifespan(app: FastAPI):
     # Startup: Create admin user if it doesn't exist
     logger.info("🚀 Starting up application...")
+
+    # Schema is managed by Alembic; fail fast instead of on the first request
+    if settings.SCHEMA_CHECK_ON_STARTUP:
+        from app.core.database import engine
+        from app.core.schema_check import verify_schema
+        verify_schema(engine)
+
     try:
         from app.core.database import SessionLocal
         from app.models.user import User
@@ -74,10 +82,40 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"❌ Error creating admin user: {e}")
 
+    # Shared pooled HTTP clients for AI providers
+    from app.core.http_clients import http_clients
+    await http_clients.start()
+
+    # Deliver queued emails from this process unless dedicated dispatchers run
+    email_dispatcher_task = None
+    email_dispatcher_stop = asyncio.Event()
+    if settings.EMAIL_DISPATCHER_EMBEDDED:
+        from app.services.email_outbox import EmailDispatcher
+        email_dispatcher_task = asyncio.create_task(EmailDispatcher().run(email_dispatcher_stop))
+        logger.info("✅ Email dispatcher started")
+
+    # Run queued image generations from this process unless dedicated workers run
+    generation_pool_task = None
+    generation_pool_stop = asyncio.Event()
+    if settings.GENERATION_WORKERS_EMBEDDED:
+        from app.services.generation_jobs import GenerationWorkerPool
+        generation_pool_task = asyncio.create_task(GenerationWorkerPool().run(generation_pool_stop))
+        logger.info("✅ Generation worker pool started")
+
     yield
 
     # Shutdown
     logger.info("👋 Shutting down application...")
+    if generation_pool_task:
+        generation_pool_stop.set()
+        await generation_pool_task
+    if email_dispatcher_task:
+        email_dispatcher_stop.set()
+        await email_dispatcher_task
+    await http_clients.aclose()
+
+    from app.core.metrics import mark_process_dead
+    mark_process_dead(os.getpid())
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -128,6 +166,19 @@ class NoCacheMiddleware(BaseHTTPMiddleware):
 # Add no-cache middleware
 app.add_middleware(NoCacheMiddleware)
 
+# Request latency, requests in flight and DB pool metrics
+if settings.METRICS_ENABLED:
+    from app.core.database import engine
+    from app.core.metrics import MetricsMiddleware, instrument_engine
+    instrument_engine(engine)
+    app.add_middleware(MetricsMiddleware)
+
+# Per-request SQL statistics (query count, DB time, slow statements)
+if settings.QUERY_STATS_ENABLED:
+    from app.core.query_stats import QueryStatsMiddleware, install_query_hooks
+    install_query_hooks()
+    app.add_middleware(QueryStatsMiddleware, headers=settings.QUERY_STATS_HEADERS)
+
 
 @app.get("/")
 async def root():
@@ -150,10 +201,18 @@ async def health_check():
     }
 
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    return {"status": "healthy"}
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Prometheus metrics (a plain def: collectors query the database, so this runs in the threadpool)"""
+    if settings.METRICS_TOKEN:
+        import hmac
+        authorization = request.headers.get("authorization", "")
+        if not hmac.compare_digest(authorization.encode(), f"Bearer {settings.METRICS_TOKEN}".encode()):
+            return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+
+    from app.core.metrics import render
+    body, content_type = render()
+    return Response(content=body, media_type=content_type)
 
 
 @app.get("/sentry-test")
@@ -165,7 +224,7 @@ async def sentry_test():
 
 
 # Import and include routers
-from app.api import auth, packages, payments, referrals, commissions, courses, payouts, admin, bank_details, profile, modules, certificates, notifications, wallet, course_purchases, video_progress, email_verification, studio, community, comments, analytics, invoices, purchases
+from app.api import auth, packages, payments, referrals, commissions, courses, payouts, admin, bank_details, profile, modules, certificates, notifications, wallet, course_purchases, video_progress, email_verification, studio, community, comments, analytics, invoices, purchases, video_uploads
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(email_verification.router, prefix="/api/email-verification", tags=["Email Verification"])
@@ -178,6 +237,7 @@ app.include_router(commissions.router, prefix="/api/commissions", tags=["Commiss
 app.include_router(courses.router, prefix="/api/courses", tags=["Courses"])
 app.include_router(course_purchases.router, prefix="/api/course-purchases", tags=["Course Purchases"])
 app.include_router(modules.router, prefix="/api/modules", tags=["Modules & Topics"])
+app.include_router(video_uploads.router, prefix="/api/uploads/videos", tags=["Video Uploads"])
 app.include_router(certificates.router, prefix="/api/certificates", tags=["Certificates"])
 app.include_router(notifications.router, prefix="/api/notifications", tags=["Notifications"])
 app.include_router(wallet.router, prefix="/api/wallet", tags=["Wallet"])
@@ -191,6 +251,11 @@ app.include_router(community.router, prefix="/api/studio", tags=["Community Feat
 app.include_router(comments.router, prefix="/api/studio", tags=["Comments"])
 app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
 
+# Serve public blobs (generated images, template thumbnails) from the local blob store
+if settings.STORAGE_BACKEND == "local":
+    from app.services.blob_store import IMAGES, get_blob_store
+    app.mount(f"/blobs/{IMAGES}", StaticFiles(directory=get_blob_store(IMAGES).root), name="blobs")
+
 # Mount static files directory for serving generated images
 static_dir = os.path.join(os.path.dirname(__file__), "..", "static")
 if os.path.exists(static_dir):
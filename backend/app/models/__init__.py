@@ -3,13 +3,16 @@ from app.models.user import User
 from app.models.package import Package
 from app.models.user_package import UserPackage
 from app.models.referral import Referral
+from app.models.referral_path import ReferralPath
 from app.models.commission import Commission
+from app.models.commission_rate import CommissionRate
 from app.models.payout import Payout
 from app.models.course import Course
 from app.models.video import Video
 from app.models.payment import Payment
 from app.models.bank_details import BankDetails
 from app.models.video_progress import VideoProgress
+from app.models.user_course_purchase import UserCoursePurchase
 from app.models.profile import Profile
 from app.models.certificate import Certificate
 from app.models.module import Module
@@ -18,15 +21,20 @@ from app.models.notification import Notification
 from app.models.wallet import Wallet
 from app.models.comment import Comment
 from app.models.invoice import Invoice
+from app.models.background_job import BackgroundJob
+from app.models.email_outbox import EmailOutbox
 from app.models.studio import (
     ImageTemplate,
     ImageCategory,
     GeneratedImage,
+    GenerationJob,
+    GenerationCacheEntry,
     CommunityPost,
     PostLike,
     PostReport,
     PromptReuseEvent,
     CreditLedger,
+    UserCreditBalance,
     ReferralEvent,
 )
 
@@ -35,13 +43,16 @@ __all__ = [
     "Package",
     "UserPackage",
     "Referral",
+    "ReferralPath",
     "Commission",
+    "CommissionRate",
     "Payout",
     "Course",
     "Video",
     "Payment",
     "BankDetails",
     "VideoProgress",
+    "UserCoursePurchase",
     "Profile",
     "Certificate",
     "Module",
@@ -50,15 +61,20 @@ __all__ = [
     "Wallet",
     "Comment",
     "Invoice",
+    "BackgroundJob",
+    "EmailOutbox",
     # Community AI Studio models
     "ImageTemplate",
     "ImageCategory",
     "GeneratedImage",
+    "GenerationJob",
+    "GenerationCacheEntry",
     "CommunityPost",
     "PostLike",
     "PostReport",
     "PromptReuseEvent",
     "CreditLedger",
+    "UserCreditBalance",
     "ReferralEvent",
 ]
 
@@ -0,0 +1,37 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Text, Index
+from datetime import datetime
+from app.core.database import Base
+
+
+class BackgroundJob(Base):
+    """Durable job queue entry, processed by `python -m scripts.run_job_worker`"""
+
+    __tablename__ = "background_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    # Handler name registered in app.services.job_queue (e.g. 'referral_commissions')
+    kind = Column(String(50), nullable=False, index=True)
+    payload = Column(JSON, nullable=False, default=dict)
+
+    # Enqueueing the same key twice returns the existing job (e.g. 'payment:42:invoice')
+    idempotency_key = Column(String(200), unique=True, nullable=False)
+
+    status = Column(String(20), nullable=False, default="queued")  # queued, running, succeeded, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    last_error = Column(Text, nullable=True)
+
+    # Not picked up before this time (used for retry backoff)
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers poll "oldest due queued job"
+        Index("ix_background_jobs_status_run_at", "status", "run_at", "id"),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -20,6 +20,11 @@ class Comment(Base):
     post = relationship("CommunityPost", back_populates="comments")
     user = relationship("User")
 
+    # Keyset pagination index for a post's comment thread
+    __table_args__ = (
+        Index("ix_comments_post_thread", "post_id", "is_deleted", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<Comment(id={self.id}, post_id={self.post_id}, user_id={self.user_id})>"
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -35,6 +35,12 @@ class Commission(Base):
     user = relationship("User", back_populates="commissions")
     referral = relationship("Referral", back_populates="commissions")
     payout = relationship("Payout", back_populates="commissions")
+
+    # Pending commissions per user (payout batches, balances) and commission history
+    __table_args__ = (
+        Index("ix_commissions_status_user", "status", "user_id"),
+        Index("ix_commissions_user_created", "user_id", "created_at"),
+    )
     
     def __repr__(self):
         return f"<Commission user_id={self.user_id} amount=₹{self.amount} status={self.status}>"
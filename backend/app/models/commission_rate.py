@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, UniqueConstraint
+from datetime import datetime
+from app.core.database import Base
+
+
+class CommissionRate(Base):
+    """
+    One cell of a commission plan: what a referrer holding `referrer_package`
+    earns at `level` when someone in their downline buys `referee_package`
+
+    Loaded into a CommissionPlan (app.services.commission_calculator).
+    """
+
+    __tablename__ = "commission_rates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    plan = Column(String(50), nullable=False, default="default")
+    referrer_package_id = Column(Integer, ForeignKey("packages.id"), nullable=False)
+    referee_package_id = Column(Integer, ForeignKey("packages.id"), nullable=False)
+    level = Column(Integer, nullable=False)  # 1 = direct, 2 = indirect, ...
+    amount = Column(Float, nullable=False)
+
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("plan", "referrer_package_id", "referee_package_id", "level", name="uq_commission_rate_cell"),
+    )
+
+    def __repr__(self):
+        return f"<CommissionRate {self.plan} L{self.level} {self.referrer_package_id}->{self.referee_package_id}: {self.amount}>"
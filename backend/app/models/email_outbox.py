@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
+from datetime import datetime
+from app.core.database import Base
+
+
+class EmailOutbox(Base):
+    """Outgoing email waiting for (or recording) delivery by the email dispatcher"""
+
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+
+    from_email = Column(String(255), nullable=False)
+    to_email = Column(String(255), nullable=False, index=True)
+    subject = Column(String(500), nullable=False)
+    html_content = Column(Text, nullable=False)
+    text_content = Column(Text, nullable=True)
+
+    # Optional key so the same logical email is only queued once (e.g. 'welcome:42')
+    dedupe_key = Column(String(200), unique=True, nullable=True)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, sending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+
+    # Not sent before this time (used for retry backoff)
+    send_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = Column(DateTime, nullable=True)
+
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Dispatcher polls "oldest due pending emails"
+        Index("ix_email_outbox_status_send_after", "status", "send_after", "id"),
+    )
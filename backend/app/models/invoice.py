@@ -37,7 +37,7 @@ class Invoice(Base):
     invoice_date = Column(DateTime, default=datetime.utcnow, nullable=False)
     
     # PDF storage
-    pdf_url = Column(String(500), nullable=True)  # URL or path to PDF file
+    pdf_url = Column(String(500), nullable=True)  # Blob key in the invoices store (older rows: file path)
     
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
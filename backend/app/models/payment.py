@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -41,6 +41,11 @@ class Payment(Base):
     user = relationship("User", back_populates="payments")
     package = relationship("Package")
     user_package = relationship("UserPackage", back_populates="payment", uselist=False)
+
+    # Payment history (newest first)
+    __table_args__ = (
+        Index("ix_payments_user_created", "user_id", "created_at"),
+    )
     
     def __repr__(self):
         return f"<Payment order_id={self.razorpay_order_id} status={self.status}>"
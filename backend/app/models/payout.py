@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, Float, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -40,6 +40,12 @@ class Payout(Base):
     # Relationships
     user = relationship("User", back_populates="payouts")
     commissions = relationship("Commission", back_populates="payout")
+
+    # Keyset pagination indexes for the admin payout listing
+    __table_args__ = (
+        Index("ix_payouts_created_id", "created_at", "id"),
+        Index("ix_payouts_status_created_id", "status", "created_at", "id"),
+    )
     
     def __repr__(self):
         return f"<Payout user_id={self.user_id} amount=₹{self.amount} status={self.status}>"
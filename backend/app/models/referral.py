@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -23,6 +23,9 @@ class Referral(Base):
     # Package purchased by referee
     package_id = Column(Integer, ForeignKey("packages.id"), nullable=False)
     
+    # Payment that triggered the commission (null for referrals recorded before payments were tracked)
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True)
+    
     # Timestamps
     created_at = Column(DateTime, default=datetime.utcnow)
     
@@ -31,6 +34,11 @@ class Referral(Base):
     referee = relationship("User", foreign_keys=[referee_id], back_populates="referrals_received")
     package = relationship("Package")
     commissions = relationship("Commission", back_populates="referral")
+
+    # One referral per payment and level, so retried commission jobs don't pay twice
+    __table_args__ = (
+        Index("uq_referrals_payment_referrer_level", "payment_id", "referrer_id", "level", unique=True),
+    )
     
     def __repr__(self):
         return f"<Referral referrer={self.referrer_id} referee={self.referee_id} level={self.level}>"
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from app.core.database import Base
+
+
+class ReferralPath(Base):
+    """
+    Closure table over users.referred_by_id: one row per (ancestor, descendant)
+    pair in the referral graph, depth 1 = direct referral, 2 = their referrals, ...
+
+    Maintained by app.services.referral_graph (on registration, and by the
+    `python -m scripts.rebuild_referral_paths` backfill).
+    """
+
+    __tablename__ = "referral_paths"
+
+    ancestor_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    depth = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # Downline per level: WHERE ancestor_id = ? AND depth <= ?
+        Index("ix_referral_paths_ancestor_depth", "ancestor_id", "depth", "descendant_id"),
+        # Upline: WHERE descendant_id = ? ORDER BY depth
+        Index("ix_referral_paths_descendant_depth", "descendant_id", "depth", "ancestor_id"),
+    )
+
+    def __repr__(self):
+        return f"<ReferralPath ancestor={self.ancestor_id} descendant={self.descendant_id} depth={self.depth}>"
@@ -3,15 +3,18 @@ Community AI Studio Models
 - ImageTemplate: Predefined templates for image generation
 - ImageCategory: Categories for organizing templates and posts
 - GeneratedImage: User-generated images from the studio
+- GenerationJob: Queued image generation request, processed by the generation worker pool
+- GenerationCacheEntry: Image produced for a normalized prompt/tier/provider/seed, reused on request
 - CommunityPost: Published images shared in the community feed
 - PostLike: Likes on community posts
 - PostReport: Moderation reports on community posts
 - PromptReuseEvent: Tracking when users remix/reuse prompts
 - CreditLedger: Transaction log for credit economy
+- UserCreditBalance: Materialized per-user credit balance (kept in sync with CreditLedger)
 - ReferralEvent: Tracking referral bonuses and milestones
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, JSON, Text, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Float, JSON, Text, Enum, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -79,6 +82,63 @@ class GeneratedImage(Base):
     user = relationship("User", foreign_keys=[user_id])
     template = relationship("ImageTemplate")
 
+    # My creations (newest first)
+    __table_args__ = (
+        Index("ix_generated_images_user_created", "user_id", "created_at"),
+    )
+
+
+class GenerationJob(Base):
+    """Image generation request queued by /api/studio/generate and run by the worker pool"""
+    __tablename__ = "generation_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    template_id = Column(Integer, ForeignKey("image_templates.id"), nullable=True)
+    prompt_text = Column(Text, nullable=False)
+    enhance_prompt = Column(Boolean, default=False, nullable=False)
+    tier = Column(String(20), default="standard", nullable=False)
+    requested_provider = Column(String(50), nullable=True)  # As sent by the client (None = configured default)
+    provider = Column(String(50), nullable=False)  # Resolved adapter name, used for per-provider concurrency caps
+    status = Column(String(20), default="queued", nullable=False)  # queued, running, succeeded, failed
+    credits_reserved = Column(Integer, default=0, nullable=False)  # Debited at submit, refunded if the job fails
+    image_id = Column(Integer, ForeignKey("generated_images.id"), nullable=True)  # Set on success
+    cache_key = Column(String(64), nullable=True)  # generation_cache entry the result is stored under (None = not cached)
+    error_message = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    locked_by = Column(String(100), nullable=True)
+    locked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    # Relationships
+    user = relationship("User")
+    image = relationship("GeneratedImage")
+
+    __table_args__ = (
+        # Workers poll "oldest queued job for a provider with free capacity"
+        Index("ix_generation_jobs_status_provider_created", "status", "provider", "created_at", "id"),
+    )
+
+
+class GenerationCacheEntry(Base):
+    """Image produced for a normalized prompt, tier, provider and seed (see app/services/generation_cache.py)"""
+    __tablename__ = "generation_cache"
+
+    cache_key = Column(String(64), primary_key=True)  # SHA-256 hex of the normalized request
+    image_url = Column(String(500), nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    provider = Column(String(50), nullable=True)  # Adapter that produced the image
+    hit_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # TTL is measured from here
+    last_used_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # LRU eviction order
+
+    __table_args__ = (
+        Index("ix_generation_cache_last_used", "last_used_at"),
+    )
+
 
 class CommunityPost(Base):
     """Published images shared in the community feed"""
@@ -93,6 +153,7 @@ class CommunityPost(Base):
     tags = Column(JSON, default=list)  # List of tags
     likes_count = Column(Integer, default=0)
     reuse_count = Column(Integer, default=0)
+    trending_score = Column(Float, default=0.0, nullable=False)  # Log of time-decayed engagement (see trending_service)
     visibility = Column(String(20), default="public")  # public, private
     is_hidden = Column(Boolean, default=False)  # Moderation flag
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -107,6 +168,16 @@ class CommunityPost(Base):
     reuse_events = relationship("PromptReuseEvent", back_populates="source_post")
     comments = relationship("Comment", back_populates="post", cascade="all, delete-orphan")
 
+    # Keyset pagination indexes, one per feed sort mode (sort key + id)
+    __table_args__ = (
+        Index("ix_community_posts_feed_newest", "visibility", "is_hidden", "created_at", "id"),
+        Index("ix_community_posts_feed_popular", "likes_count", "id"),
+        Index("ix_community_posts_feed_most_remixed", "reuse_count", "id"),
+        Index("ix_community_posts_feed_trending", "trending_score", "id"),
+        # Profile and analytics counts of one user's posts
+        Index("ix_community_posts_user_visibility", "user_id", "visibility", "is_hidden"),
+    )
+
 
 class PostLike(Base):
     """Likes on community posts"""
@@ -190,6 +261,23 @@ class CreditLedger(Base):
     # Relationships
     user = relationship("User")
 
+    # Ledger history (newest first)
+    __table_args__ = (
+        Index("ix_credit_ledger_user_created", "user_id", "created_at"),
+    )
+
+
+class UserCreditBalance(Base):
+    """Materialized credit balance per user, updated in the same transaction as each ledger insert"""
+    __tablename__ = "user_credit_balances"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    balance = Column(Float, nullable=False, default=0.0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Relationships
+    user = relationship("User")
+
 
 class ReferralEvent(Base):
     """Tracking referral bonuses and milestones"""
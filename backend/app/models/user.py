@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -32,7 +32,7 @@ class User(Base):
     
     # Referral system
     referral_code = Column(String(12), unique=True, index=True, nullable=False)
-    referred_by_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    referred_by_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
     
     # Account status
     is_active = Column(Boolean, default=True)
@@ -67,6 +67,11 @@ class User(Base):
     notifications = relationship("Notification", foreign_keys="Notification.user_id", back_populates="user")
     wallet = relationship("Wallet", back_populates="user", uselist=False)
     invoices = relationship("Invoice", back_populates="user")
+
+    # Keyset pagination index for the admin user listing
+    __table_args__ = (
+        Index("ix_users_created_id", "created_at", "id"),
+    )
     
     def __repr__(self):
         return f"<User {self.email}>"
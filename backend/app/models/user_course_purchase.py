@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -30,6 +30,11 @@ class UserCoursePurchase(Base):
     user = relationship("User", backref="course_purchases")
     course = relationship("Course", backref="individual_purchases")
     payment = relationship("Payment", backref="course_purchase")
+
+    # Course access checks: a user's active purchases, optionally of one course
+    __table_args__ = (
+        Index("ix_user_course_purchases_user_active_course", "user_id", "is_active", "course_id"),
+    )
     
     def __repr__(self):
         return f"<UserCoursePurchase user_id={self.user_id} course_id={self.course_id}>"
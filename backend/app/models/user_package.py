@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -28,6 +28,11 @@ class UserPackage(Base):
     user = relationship("User", back_populates="packages")
     package = relationship("Package", back_populates="user_packages")
     payment = relationship("Payment", back_populates="user_package")
+
+    # A user's package as of a given time (commission lookups and recomputation)
+    __table_args__ = (
+        Index("ix_user_packages_user_status_purchase", "user_id", "status", "purchase_date"),
+    )
     
     def __repr__(self):
         return f"<UserPackage user_id={self.user_id} package_id={self.package_id}>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -26,11 +26,16 @@ class Wallet(Base):
     total_spent = Column(Float, default=0.0, nullable=False)  # Total money spent on purchases
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    version = Column(Integer, default=1, nullable=False)  # Bumped on every balance change
 
     # Relationships
     user = relationship("User", back_populates="wallet")
     transactions = relationship("WalletTransaction", back_populates="wallet", order_by="WalletTransaction.created_at.desc()")
 
+    # Balances are changed with atomic UPDATEs (app.api.wallet.create_transaction);
+    # an ORM flush of a stale Wallet fails instead of overwriting them
+    __mapper_args__ = {"version_id_col": version}
+
 class WalletTransaction(Base):
     __tablename__ = "wallet_transactions"
 
@@ -42,9 +47,16 @@ class WalletTransaction(Base):
     balance_before = Column(Float, nullable=False)
     balance_after = Column(Float, nullable=False)
     description = Column(Text, nullable=False)
-    reference_id = Column(String(100), nullable=True)  # Reference to commission_id, payout_id, etc.
+    reference_id = Column(String(100), nullable=True)  # Reference to commission_id, payout_id, etc. (unique per wallet)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
 
     # Relationship
     wallet = relationship("Wallet", back_populates="transactions")
 
+    # Keyset pagination index for a wallet's transaction history
+    __table_args__ = (
+        Index("ix_wallet_transactions_wallet_created", "wallet_id", "created_at", "id"),
+        # Idempotency: one transaction per reference per wallet
+        Index("uq_wallet_transactions_wallet_reference", "wallet_id", "reference_id", unique=True),
+    )
+
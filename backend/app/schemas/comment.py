@@ -34,4 +34,5 @@ class CommentListResponse(BaseModel):
     total: int
     skip: int
     limit: int
+    next_cursor: Optional[str] = None  # Opaque keyset cursor for the next page
 
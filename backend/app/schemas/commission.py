@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class CommissionBase(BaseModel):
@@ -41,3 +41,16 @@ class CommissionSummary(BaseModel):
     pending_count: int
     paid_count: int
 
+
+class CommissionRateItem(BaseModel):
+    """One cell of a commission plan"""
+    referrer_package_id: int
+    referee_package_id: int
+    level: int = Field(..., ge=1)
+    amount: float = Field(..., ge=0)
+
+
+class CommissionPlanUpdate(BaseModel):
+    """Rates to create or overwrite in a plan (cells not listed are kept)"""
+    plan: Optional[str] = None  # Defaults to the active plan
+    rates: List[CommissionRateItem]
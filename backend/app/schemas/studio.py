@@ -97,6 +97,8 @@ class GenerateImageRequest(BaseModel):
     provider: Optional[str] = Field(default=None, pattern="^(auto|openai_dalle|huggingface|gemini_nano_banana|mock)?$")
     source_image_url: Optional[str] = None  # For remix/style transfer
     source_post_id: Optional[int] = None  # Track which post is being remixed
+    seed: Optional[int] = None  # Part of the generation cache key: a new seed asks for a different image
+    cache: str = Field(default="fresh", pattern="^(reuse|fresh)$")  # reuse = return a cached image for the same request if any
 
 
 class GenerateImageResponse(BaseModel):
@@ -104,12 +106,14 @@ class GenerateImageResponse(BaseModel):
     status: str
     credits_debited: int
     estimated_time_seconds: int = 30
-    image_url: Optional[str] = None  # Include image_url for synchronous providers
+    image_url: Optional[str] = None  # Set only when the result is already known
+    cached: bool = False  # Served from the generation cache
 
 
 class GenerationStatusResponse(BaseModel):
     job_id: str
     status: str  # queued, running, succeeded, failed
+    image_id: Optional[int] = None  # GeneratedImage id once succeeded
     image_url: Optional[str] = None
     error: Optional[str] = None
     progress_percent: Optional[int] = None
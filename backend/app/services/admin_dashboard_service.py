@@ -0,0 +1,195 @@
+"""
+Admin Dashboard Service
+Computes platform-wide dashboard statistics with one aggregate statement
+and serves them from a short-lived in-process snapshot
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, func, select, true
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import (
+    User, Package, UserPackage, Payment, Commission, Referral, Payout, Course, Video,
+    GeneratedImage, CommunityPost, PostReport, CreditLedger,
+)
+
+logger = logging.getLogger(__name__)
+
+_snapshot: Optional[Dict[str, Any]] = None
+_snapshot_expires_at = 0.0
+_snapshot_lock = threading.Lock()
+
+
+def _count_if(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def _sum_if(column, condition):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def _aggregate_subqueries():
+    """One single-row aggregate per table; CASE WHEN replaces a filtered count per metric"""
+    users = select(
+        func.count(User.id).label("total_users"),
+        _count_if(User.is_active == True).label("active_users"),
+    ).subquery("users_agg")
+
+    packages = select(
+        _count_if(UserPackage.status == "active").label("total_packages_sold"),
+        _count_if((UserPackage.status == "active") & (Package.name == "Silver")).label("silver_count"),
+        _count_if((UserPackage.status == "active") & (Package.name == "Gold")).label("gold_count"),
+        _count_if((UserPackage.status == "active") & (Package.name == "Platinum")).label("platinum_count"),
+    ).select_from(UserPackage).join(Package, Package.id == UserPackage.package_id).subquery("packages_agg")
+
+    payments = select(
+        _sum_if(Payment.amount, Payment.status == "success").label("total_revenue"),
+    ).subquery("payments_agg")
+
+    commissions = select(
+        func.coalesce(func.sum(Commission.amount), 0).label("total_commissions"),
+        _sum_if(Commission.amount, Commission.status == "pending").label("pending_commissions"),
+        _sum_if(Commission.amount, Commission.status == "paid").label("paid_commissions"),
+    ).subquery("commissions_agg")
+
+    referrals = select(
+        func.count(Referral.id).label("total_referrals"),
+        _count_if(Referral.level == 1).label("level1_referrals"),
+        _count_if(Referral.level == 2).label("level2_referrals"),
+    ).subquery("referrals_agg")
+
+    payouts = select(
+        _sum_if(Payout.amount, Payout.status == "completed").label("total_payouts"),
+        _sum_if(Payout.amount, Payout.status == "pending").label("pending_payouts"),
+    ).subquery("payouts_agg")
+
+    courses = select(
+        func.count(Course.id).label("total_courses"),
+        _count_if(Course.is_published == True).label("published_courses"),
+    ).subquery("courses_agg")
+
+    videos = select(
+        func.count(Video.id).label("total_videos"),
+        _count_if(Video.is_published == True).label("published_videos"),
+    ).subquery("videos_agg")
+
+    images = select(
+        func.count(GeneratedImage.id).label("total_images"),
+        _count_if(GeneratedImage.status == "succeeded").label("successful_images"),
+    ).subquery("images_agg")
+
+    posts = select(
+        func.count(CommunityPost.id).label("total_posts"),
+        _count_if(CommunityPost.visibility == "public").label("public_posts"),
+        func.coalesce(func.sum(CommunityPost.likes_count), 0).label("total_likes"),
+    ).subquery("posts_agg")
+
+    reports = select(
+        func.count(PostReport.id).label("total_reports"),
+        _count_if(PostReport.status == "pending").label("pending_reports"),
+    ).subquery("reports_agg")
+
+    credits = select(
+        _sum_if(CreditLedger.delta, CreditLedger.reason == "purchase").label("credits_purchased"),
+        _sum_if(CreditLedger.delta, CreditLedger.reason == "generation").label("credits_spent"),
+    ).subquery("credits_agg")
+
+    return [users, packages, payments, commissions, referrals, payouts, courses, videos, images, posts, reports, credits]
+
+
+def compute_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """Compute all dashboard metrics in a single round trip (cross join of one-row aggregates)"""
+    subqueries = _aggregate_subqueries()
+    columns = [column for subquery in subqueries for column in subquery.c]
+    # Explicit ON TRUE joins: every subquery has exactly one row
+    joined = subqueries[0]
+    for subquery in subqueries[1:]:
+        joined = joined.join(subquery, true())
+    row = db.execute(select(*columns).select_from(joined)).mappings().one()
+
+    total_revenue = float(row["total_revenue"])
+    total_commissions = float(row["total_commissions"])
+
+    return {
+        'users': {
+            'total': row["total_users"],
+            'active': row["active_users"]
+        },
+        'packages': {
+            'total_sold': row["total_packages_sold"],
+            'silver': row["silver_count"],
+            'gold': row["gold_count"],
+            'platinum': row["platinum_count"]
+        },
+        'revenue': {
+            'total': total_revenue,
+            'net_profit': total_revenue - total_commissions
+        },
+        'commissions': {
+            'total': total_commissions,
+            'pending': float(row["pending_commissions"]),
+            'paid': float(row["paid_commissions"])
+        },
+        'referrals': {
+            'total': row["total_referrals"],
+            'level1': row["level1_referrals"],
+            'level2': row["level2_referrals"]
+        },
+        'payouts': {
+            'total': float(row["total_payouts"]),
+            'pending': float(row["pending_payouts"])
+        },
+        'content': {
+            'courses': row["total_courses"],
+            'published_courses': row["published_courses"],
+            'videos': row["total_videos"],
+            'published_videos': row["published_videos"]
+        },
+        'studio': {
+            'total_images': row["total_images"],
+            'successful_images': row["successful_images"],
+            'total_posts': row["total_posts"],
+            'public_posts': row["public_posts"],
+            'total_likes': row["total_likes"],
+            'total_reports': row["total_reports"],
+            'pending_reports': row["pending_reports"],
+            'credits_purchased': row["credits_purchased"],
+            'credits_spent': abs(row["credits_spent"]),
+        },
+        'computed_at': datetime.utcnow().isoformat(),
+    }
+
+
+def get_dashboard_stats(db: Session, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Get dashboard statistics from the snapshot, recomputing it when it is older
+    than ADMIN_DASHBOARD_CACHE_TTL_SECONDS (or when refresh=True)
+    """
+    global _snapshot, _snapshot_expires_at
+
+    if not refresh and _snapshot is not None and time.monotonic() < _snapshot_expires_at:
+        return _snapshot
+
+    with _snapshot_lock:
+        # Another request may have refreshed the snapshot while we waited
+        if not refresh and _snapshot is not None and time.monotonic() < _snapshot_expires_at:
+            return _snapshot
+
+        _snapshot = compute_dashboard_stats(db)
+        _snapshot_expires_at = time.monotonic() + settings.ADMIN_DASHBOARD_CACHE_TTL_SECONDS
+        logger.info("Admin dashboard snapshot refreshed")
+        return _snapshot
+
+
+def invalidate_dashboard_stats() -> None:
+    """Drop the snapshot so the next request recomputes it"""
+    global _snapshot, _snapshot_expires_at
+    with _snapshot_lock:
+        _snapshot = None
+        _snapshot_expires_at = 0.0
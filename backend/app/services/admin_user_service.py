@@ -0,0 +1,183 @@
+"""
+Admin User Listing Service
+Builds the enriched admin user listing (current package, direct referrals,
+total earnings) as one statement and streams it as CSV for exports
+"""
+
+import csv
+import io
+import logging
+from typing import Any, Dict, Iterator, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.pagination import paginate_keyset
+from app.models import User, Package, UserPackage, Referral, Commission
+
+logger = logging.getLogger(__name__)
+
+# Sort modes exposed to the admin panel, always descending
+USER_SORTS = ("signup_date", "earnings", "package")
+
+EXPORT_CHUNK_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    "id", "email", "full_name", "phone", "referral_code", "is_active", "is_admin",
+    "created_at", "current_package", "direct_referrals", "total_earnings",
+]
+
+
+def build_users_query(
+    db: Session,
+    sort_by: str = "signup_date",
+    package: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+):
+    """
+    Users outer-joined once with their latest active package (window function),
+    level-1 referral count and total commissions (grouped subqueries)
+
+    Returns:
+        (query, sort_column) where each row is (User, package_name,
+        direct_referrals, total_earnings, sort_value)
+    """
+    package_rank = func.row_number().over(
+        partition_by=UserPackage.user_id,
+        order_by=(UserPackage.purchase_date.desc(), UserPackage.id.desc()),
+    ).label("package_rank")
+    latest_package = db.query(
+        UserPackage.user_id, UserPackage.package_id, package_rank
+    ).filter(UserPackage.status == "active").subquery("latest_package")
+
+    referral_counts = db.query(
+        Referral.referrer_id.label("user_id"),
+        func.count(Referral.id).label("direct_referrals"),
+    ).filter(Referral.level == 1).group_by(Referral.referrer_id).subquery("referral_counts")
+
+    earnings = db.query(
+        Commission.user_id.label("user_id"),
+        func.sum(Commission.amount).label("total_earnings"),
+    ).group_by(Commission.user_id).subquery("earnings")
+
+    total_earnings = func.coalesce(earnings.c.total_earnings, 0.0)
+    sort_column = {
+        "signup_date": User.created_at,
+        "earnings": total_earnings,
+        "package": func.coalesce(Package.base_price, 0.0),
+    }[sort_by]
+
+    query = db.query(
+        User,
+        Package.name.label("package_name"),
+        func.coalesce(referral_counts.c.direct_referrals, 0).label("direct_referrals"),
+        total_earnings.label("total_earnings"),
+        sort_column.label("sort_value"),
+    ).outerjoin(
+        latest_package, (latest_package.c.user_id == User.id) & (latest_package.c.package_rank == 1)
+    ).outerjoin(
+        Package, Package.id == latest_package.c.package_id
+    ).outerjoin(
+        referral_counts, referral_counts.c.user_id == User.id
+    ).outerjoin(
+        earnings, earnings.c.user_id == User.id
+    )
+
+    if package:
+        if package.lower() == "none":
+            query = query.filter(Package.id.is_(None))
+        else:
+            query = query.filter(func.lower(Package.name) == package.lower())
+    if search:
+        search_term = f"%{search}%"
+        query = query.filter(User.email.ilike(search_term) | User.full_name.ilike(search_term))
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+
+    return query, sort_column
+
+
+def listing_scope(sort_by: str, package: Optional[str], search: Optional[str], is_active: Optional[bool]) -> str:
+    """Cursor scope, so a cursor cannot be replayed against another sort or filter"""
+    return f"users:{sort_by}:{package or ''}:{search or ''}:{'' if is_active is None else is_active}"
+
+
+def paginate_users(
+    db: Session,
+    cursor: Optional[str],
+    limit: int,
+    sort_by: str = "signup_date",
+    package: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    offset: int = 0,
+):
+    """One keyset page of the enriched listing: (rows, next_cursor)"""
+    query, sort_column = build_users_query(db, sort_by, package, search, is_active)
+    return paginate_keyset(
+        query,
+        columns=[sort_column, User.id],
+        cursor=cursor,
+        limit=limit,
+        key=lambda row: (row.sort_value, row.User.id),
+        scope=listing_scope(sort_by, package, search, is_active),
+        offset=offset,
+    )
+
+
+def serialize_user_row(row) -> Dict[str, Any]:
+    user = row.User
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "phone": user.phone,
+        "referral_code": user.referral_code,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+        "created_at": user.created_at,
+        "current_package": row.package_name,
+        "direct_referrals": int(row.direct_referrals),
+        "total_earnings": float(row.total_earnings),
+    }
+
+
+def iter_users_csv(
+    db: Session,
+    sort_by: str = "signup_date",
+    package: Optional[str] = None,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    chunk_size: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield the whole (filtered) user base as CSV, one keyset chunk at a time
+    Memory stays flat regardless of table size; each chunk is a single query.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    cursor = None
+    exported = 0
+    while True:
+        rows, cursor = paginate_users(db, cursor, chunk_size, sort_by, package, search, is_active)
+        for row in rows:
+            record = serialize_user_row(row)
+            if record["created_at"] is not None:
+                record["created_at"] = record["created_at"].isoformat()
+            writer.writerow([record[column] for column in EXPORT_COLUMNS])
+        exported += len(rows)
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        # Release the chunk's identities so the session does not grow with the export
+        db.expunge_all()
+
+        if cursor is None:
+            break
+
+    logger.info(f"Exported {exported} user(s) to CSV")
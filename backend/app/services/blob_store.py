@@ -0,0 +1,475 @@
+"""
+Blob Store
+Pluggable, content-addressed storage for generated images, template
+thumbnails and invoice PDFs
+
+Every blob is keyed by the SHA-256 of its bytes plus an extension
+("<sha256>.png"), so identical assets are stored once however many records
+point at them, and a key means the same bytes on every backend (the
+migration tool only has to copy blobs and rewrite public URLs).
+
+Backends (STORAGE_BACKEND):
+  - local: files under STORAGE_LOCAL_ROOT/<namespace>/ab/cd/<key>; each
+    write streams to a temp file in the same directory tree while hashing,
+    then is renamed into place atomically, so readers never see a partial
+    blob and concurrent writers of the same content are harmless
+  - cloudinary: blobs/<namespace>/<sha256> in Cloudinary; non-public
+    namespaces use private delivery
+
+Namespaces:
+  - images: generated images and template thumbnails, served publicly
+    (mounted at /blobs/images for the local backend)
+  - invoices: invoice PDFs, private; served by GET /api/invoices/{id}/download
+
+Writes and reads go through fixed-size chunks (STORAGE_CHUNK_BYTES). The
+async helpers (save_async, iter_chunks_async) run the file I/O in a worker
+thread so callers on the event loop never block on the disk. Blobs can be
+shared by several records: delete() is for tooling that knows a blob is
+unreferenced.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, Optional, Union
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+IMAGES = "images"
+INVOICES = "invoices"
+PUBLIC_NAMESPACES = {IMAGES}
+
+_KEY = re.compile(r"^[0-9a-f]{64}\.[0-9a-z]{1,8}$")
+# Stored as Cloudinary images; the only extensions accepted for uploaded images
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+
+# backend/
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
+
+
+class BlobNotFound(Exception):
+    """No blob stored under the key"""
+
+
+@dataclass
+class Blob:
+    key: str
+    size: int
+    url: Optional[str]  # None for private namespaces
+    created: bool  # False when identical content was already stored
+
+
+def is_key(value: Optional[str]) -> bool:
+    return bool(value) and bool(_KEY.match(value))
+
+
+def _extension(extension: str) -> str:
+    extension = extension.lower().lstrip(".")
+    if not re.match(r"^[0-9a-z]{1,8}$", extension):
+        raise ValueError(f"Invalid blob extension: {extension!r}")
+    return extension
+
+
+def _chunks_of(data: Union[bytes, BinaryIO, Iterable[bytes]]) -> Iterator[bytes]:
+    if isinstance(data, (bytes, bytearray)):
+        yield bytes(data)
+    elif hasattr(data, "read"):
+        yield from iter(lambda: data.read(settings.STORAGE_CHUNK_BYTES), b"")
+    else:
+        yield from data
+
+
+class BlobWriter:
+    """
+    Streaming write of one blob: write() chunks, then commit() or abort()
+    The key is only known at commit, from the hash of everything written.
+    """
+
+    def __init__(self):
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def commit(self, extension: str) -> Blob:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        raise NotImplementedError
+
+
+class BlobStore:
+    """Storage backend for one namespace"""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self.public = namespace in PUBLIC_NAMESPACES
+
+    # Backend API
+
+    def open_writer(self) -> BlobWriter:
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def keys(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def url(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        """Key of a URL produced by url(), None for any other URL"""
+        raise NotImplementedError
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """File holding the blob when the backend has one (for FileResponse)"""
+        return None
+
+    # Shared helpers
+
+    def save(self, data: Union[bytes, BinaryIO, Iterable[bytes]], extension: str) -> Blob:
+        """Store bytes, a file object or an iterable of chunks (blocking)"""
+        writer = self.open_writer()
+        try:
+            for chunk in _chunks_of(data):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.commit(_extension(extension))
+
+    def save_file(self, path: Union[str, Path], extension: Optional[str] = None) -> Blob:
+        """Store a file from disk, streamed in chunks (blocking)"""
+        extension = extension or Path(path).suffix or "bin"
+        with open(path, "rb") as f:
+            return self.save(f, extension)
+
+    async def save_async(self, data: Union[bytes, AsyncIterator[bytes]], extension: str) -> Blob:
+        """Store bytes or an async stream of chunks without blocking the event loop"""
+        if isinstance(data, (bytes, bytearray)):
+            return await asyncio.to_thread(self.save, data, extension)
+
+        writer = await asyncio.to_thread(self.open_writer)
+        try:
+            async for chunk in data:
+                await asyncio.to_thread(writer.write, chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return await asyncio.to_thread(writer.commit, _extension(extension))
+
+    async def iter_chunks_async(self, key: str) -> AsyncIterator[bytes]:
+        """Read a blob chunk by chunk from a worker thread"""
+        chunks = self.iter_chunks(key)
+        sentinel = object()
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, sentinel)
+                if chunk is sentinel:
+                    return
+                yield chunk
+        finally:
+            chunks.close()
+
+    def read(self, key: str) -> bytes:
+        return b"".join(self.iter_chunks(key))
+
+
+# ============ LOCAL ============
+
+class _LocalWriter(BlobWriter):
+    def __init__(self, store: "LocalBlobStore"):
+        super().__init__()
+        self.store = store
+        fd, self.tmp_path = tempfile.mkstemp(prefix=".incoming-", dir=store.tmp_dir)
+        self.file = os.fdopen(fd, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.file.write(chunk)
+
+    def commit(self, extension: str) -> Blob:
+        key = f"{self.digest.hexdigest()}.{extension}"
+        target = self.store._path(key)
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+            if target.exists():
+                os.remove(self.tmp_path)
+                created = False
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # Same filesystem as the target: the rename is atomic
+                os.replace(self.tmp_path, target)
+                created = True
+        except BaseException:
+            self.abort()
+            raise
+        return Blob(key=key, size=self.size, url=self.store.url(key), created=created)
+
+    def abort(self) -> None:
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class LocalBlobStore(BlobStore):
+    """Content-addressed files in sharded directories"""
+
+    def __init__(self, namespace: str, root: Union[str, Path], base_url: Optional[str] = None):
+        super().__init__(namespace)
+        self.root = Path(root)
+        self.tmp_dir = self.root / ".tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.base_url = base_url.rstrip("/") if base_url and self.public else None
+
+    def _relative(self, key: str) -> str:
+        if not is_key(key):
+            raise BlobNotFound(key)
+        return f"{key[:2]}/{key[2:4]}/{key}"
+
+    def _path(self, key: str) -> Path:
+        return self.root / self._relative(key)
+
+    def open_writer(self) -> BlobWriter:
+        return _LocalWriter(self)
+
+    def exists(self, key: str) -> bool:
+        return is_key(key) and self._path(key).exists()
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]:
+        try:
+            f = open(self._path(key), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(key)
+        return self._read_chunks(f)
+
+    @staticmethod
+    def _read_chunks(f: BinaryIO) -> Iterator[bytes]:
+        with f:
+            yield from iter(lambda: f.read(settings.STORAGE_CHUNK_BYTES), b"")
+
+    def delete(self, key: str) -> bool:
+        try:
+            self._path(key).unlink()
+            return True
+        except (FileNotFoundError, BlobNotFound):
+            return False
+
+    def keys(self) -> Iterator[str]:
+        for path in self.root.glob("??/??/*"):
+            if is_key(path.name):
+                yield path.name
+
+    def url(self, key: str) -> Optional[str]:
+        if self.base_url is None:
+            return None
+        return f"{self.base_url}/{self._relative(key)}"
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        if self.base_url is None or not url or not url.startswith(f"{self.base_url}/"):
+            return None
+        key = url.rsplit("/", 1)[-1]
+        return key if is_key(key) else None
+
+    def local_path(self, key: str) -> Optional[Path]:
+        return self._path(key)
+
+
+# ============ CLOUDINARY ============
+
+class _SpooledWriter(BlobWriter):
+    """Spools to a temp file; the upload happens at commit, once the key is known"""
+
+    def __init__(self, store: "CloudinaryBlobStore"):
+        super().__init__()
+        self.store = store
+        self.spool = tempfile.NamedTemporaryFile(delete=False)
+
+    def write(self, chunk: bytes) -> None:
+        self.digest.update(chunk)
+        self.size += len(chunk)
+        self.spool.write(chunk)
+
+    def commit(self, extension: str) -> Blob:
+        key = f"{self.digest.hexdigest()}.{extension}"
+        try:
+            self.spool.close()
+            created = self.store._upload(self.spool.name, key)
+        finally:
+            self.abort()
+        return Blob(key=key, size=self.size, url=self.store.url(key), created=created)
+
+    def abort(self) -> None:
+        self.spool.close()
+        if os.path.exists(self.spool.name):
+            os.remove(self.spool.name)
+
+
+class CloudinaryBlobStore(BlobStore):
+    """Blobs as Cloudinary assets named by their hash"""
+
+    def __init__(self, namespace: str):
+        super().__init__(namespace)
+        self.folder = f"blobs/{namespace}"
+        self.delivery_type = "upload" if self.public else "private"
+
+    def _asset(self, key: str):
+        if not is_key(key):
+            raise BlobNotFound(key)
+        sha256, extension = key.split(".", 1)
+        resource_type = "image" if extension in IMAGE_EXTENSIONS else "raw"
+        # raw assets keep the extension in their public_id
+        public_id = f"{self.folder}/{sha256}" if resource_type == "image" else f"{self.folder}/{key}"
+        return public_id, resource_type, extension
+
+    def _upload(self, path: str, key: str) -> bool:
+        """Upload unless the asset exists (overwrite=False); returns whether it was created"""
+        import cloudinary.uploader
+
+        public_id, resource_type, _ = self._asset(key)
+        result = cloudinary.uploader.upload_large(
+            path,
+            public_id=public_id,
+            resource_type=resource_type,
+            type=self.delivery_type,
+            overwrite=False,
+            chunk_size=max(settings.STORAGE_CHUNK_BYTES, 5 * 1024 * 1024),
+        )
+        # Cloudinary answers an upload of an existing public_id with existing=true
+        return not (result or {}).get("existing", False)
+
+    def open_writer(self) -> BlobWriter:
+        return _SpooledWriter(self)
+
+    def exists(self, key: str) -> bool:
+        import cloudinary.api
+        from cloudinary.exceptions import NotFound
+
+        public_id, resource_type, _ = self._asset(key)
+        try:
+            cloudinary.api.resource(public_id, resource_type=resource_type, type=self.delivery_type)
+            return True
+        except NotFound:
+            return False
+
+    def _download_url(self, key: str) -> str:
+        import cloudinary.utils
+
+        public_id, resource_type, extension = self._asset(key)
+        if self.public:
+            return cloudinary.utils.cloudinary_url(
+                public_id, resource_type=resource_type, format=extension if resource_type == "image" else None,
+                secure=True,
+            )[0]
+        return cloudinary.utils.private_download_url(
+            public_id, extension if resource_type == "image" else "", resource_type=resource_type, type="private",
+        )
+
+    def iter_chunks(self, key: str) -> Iterator[bytes]:
+        import httpx
+
+        url = self._download_url(key)
+
+        def _stream():
+            with httpx.stream("GET", url, timeout=60.0) as response:
+                if response.status_code == 404:
+                    raise BlobNotFound(key)
+                response.raise_for_status()
+                yield from response.iter_bytes(settings.STORAGE_CHUNK_BYTES)
+
+        return _stream()
+
+    def delete(self, key: str) -> bool:
+        import cloudinary.uploader
+
+        public_id, resource_type, _ = self._asset(key)
+        result = cloudinary.uploader.destroy(public_id, resource_type=resource_type, type=self.delivery_type)
+        return result.get("result") == "ok"
+
+    def keys(self) -> Iterator[str]:
+        import cloudinary.api
+
+        for resource_type in ("image", "raw"):
+            cursor = None
+            while True:
+                page = cloudinary.api.resources(
+                    type=self.delivery_type, resource_type=resource_type, prefix=f"{self.folder}/",
+                    max_results=500, next_cursor=cursor,
+                )
+                for resource in page.get("resources", []):
+                    name = resource["public_id"].rsplit("/", 1)[-1]
+                    key = name if resource_type == "raw" else f"{name}.{resource.get('format')}"
+                    if is_key(key):
+                        yield key
+                cursor = page.get("next_cursor")
+                if not cursor:
+                    break
+
+    def url(self, key: str) -> Optional[str]:
+        return self._download_url(key) if self.public else None
+
+    def key_from_url(self, url: str) -> Optional[str]:
+        if not self.public or not url or f"/{self.folder}/" not in url:
+            return None
+        key = url.rsplit("/", 1)[-1]
+        return key if is_key(key) else None
+
+
+# ============ FACTORY ============
+
+def local_root() -> Path:
+    root = Path(settings.STORAGE_LOCAL_ROOT)
+    return root if root.is_absolute() else BACKEND_ROOT / root
+
+
+def create_store(namespace: str, backend: Optional[str] = None) -> BlobStore:
+    """Store for `namespace` on `backend` (default STORAGE_BACKEND)"""
+    backend = backend or settings.STORAGE_BACKEND
+    if backend == "local":
+        return LocalBlobStore(namespace, local_root() / namespace, f"{settings.API_BASE_URL}/blobs/{namespace}")
+    if backend == "cloudinary":
+        return CloudinaryBlobStore(namespace)
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+_stores: Dict[str, BlobStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_blob_store(namespace: str) -> BlobStore:
+    """Shared store for a namespace on the configured backend"""
+    store = _stores.get(namespace)
+    if store is None:
+        with _stores_lock:
+            store = _stores.get(namespace)
+            if store is None:
+                store = create_store(namespace)
+                _stores[namespace] = store
+    return store
+
+
+def reset_blob_stores() -> None:
+    """Forget the shared stores (after a settings change)"""
+    with _stores_lock:
+        _stores.clear()
@@ -51,6 +51,42 @@ class CloudinaryService:
             print(f"Error uploading video: {e}")
             raise
     
+    def upload_video_large(self, file_path: str, folder: str = "courses", public_id: str = None) -> dict:
+        """
+        Upload a video from disk with Cloudinary's chunked upload_large
+        
+        The file is sent in VIDEO_UPLOAD_CHUNK_BYTES pieces (Cloudinary's 5 MiB
+        minimum applies), so memory stays flat for any video size. Blocking;
+        call it from a worker thread.
+        
+        Returns:
+            Upload result in the same shape as upload_video
+        """
+        try:
+            upload_options = {
+                "resource_type": "video",
+                "folder": folder,
+                "overwrite": True,
+                "chunk_size": max(settings.VIDEO_UPLOAD_CHUNK_BYTES, 5 * 1024 * 1024),
+            }
+            
+            if public_id:
+                upload_options["public_id"] = public_id
+            
+            result = cloudinary.uploader.upload_large(file_path, **upload_options)
+            
+            return {
+                "public_id": result.get("public_id"),
+                "url": result.get("secure_url"),
+                "duration": result.get("duration"),
+                "format": result.get("format"),
+                "resource_type": result.get("resource_type"),
+                "thumbnail_url": self.get_video_thumbnail(result.get("public_id"))
+            }
+        except Exception as e:
+            print(f"Error uploading video: {e}")
+            raise
+    
     def upload_image(self, file_path: str, folder: str = "thumbnails", public_id: str = None) -> dict:
         """
         Upload an image to Cloudinary
@@ -4,9 +4,25 @@ Commission Calculator Service
 Implements the commission matrix logic based on:
 - Referrer's package tier
 - Referee's package tier
-- Commission level (1 or 2)
+- Commission level (1, 2, ... N)
+
+Live and bulk calculations use a CommissionPlan loaded from the
+commission_rates table (see get_commission_plan); COMMISSION_MATRIX is the
+built-in default plan, used when the table has no rows for the active plan.
 """
 
+import logging
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
 # Commission Matrix: [referrer_package][referee_package][level]
 COMMISSION_MATRIX = {
     "Silver": {
@@ -122,3 +138,219 @@ def validate_commission_matrix():
 # Validate matrix on import
 validate_commission_matrix()
 
+
+class CommissionPlan:
+    """
+    Commission rates for one plan held in a flat array
+
+    amounts[(level - 1) * P * P + referrer_rank * P + referee_rank], where P is
+    the number of packages plus one: the last rank (and one extra level block)
+    is all zeros, so unknown packages, referrers without a package and levels
+    beyond the plan resolve to 0.0 without any branching.
+    """
+
+    def __init__(self, package_ids: Sequence[int], rates: Dict[Tuple[int, int, int], float], name: str = "default"):
+        """
+        Args:
+            package_ids: Packages in rank order
+            rates: {(referrer_package_id, referee_package_id, level): amount}
+            name: Plan name
+        """
+        self.name = name
+        self.package_ids = list(package_ids)
+        self.levels = max((level for _, _, level in rates), default=0)
+
+        size = len(self.package_ids) + 1
+        self._size = size
+        self._rank = {package_id: rank for rank, package_id in enumerate(self.package_ids)}
+        self._unknown = size - 1
+
+        # Precomputed offsets so a lookup is three dict hits and two additions
+        self._level_offset = {level: (level - 1) * size * size for level in range(1, self.levels + 1)}
+        self._zero_level = self.levels * size * size
+        self._referrer_offset = {package_id: rank * size for package_id, rank in self._rank.items()}
+
+        self.amounts = array("d", bytes(8 * (self.levels + 1) * size * size))
+        for (referrer_package_id, referee_package_id, level), amount in rates.items():
+            if level < 1 or referrer_package_id not in self._rank or referee_package_id not in self._rank:
+                continue
+            self.amounts[
+                self._level_offset[level] + self._referrer_offset[referrer_package_id] + self._rank[referee_package_id]
+            ] = float(amount)
+
+    @classmethod
+    def from_matrix(cls, matrix: Dict[str, Dict[str, Dict[int, float]]], package_ids_by_name: Dict[str, int], name: str = "default"):
+        """Build a plan from a name-keyed matrix like COMMISSION_MATRIX"""
+        rates = {
+            (package_ids_by_name[referrer], package_ids_by_name[referee], level): amount
+            for referrer, referees in matrix.items() if referrer in package_ids_by_name
+            for referee, levels in referees.items() if referee in package_ids_by_name
+            for level, amount in levels.items()
+        }
+        return cls(sorted(package_ids_by_name.values()), rates, name=name)
+
+    @classmethod
+    def load(cls, db: Session, name: Optional[str] = None) -> "CommissionPlan":
+        """Load a plan from commission_rates (two queries), falling back to COMMISSION_MATRIX"""
+        from app.models import CommissionRate, Package
+
+        name = name or settings.COMMISSION_PLAN
+        packages = db.query(Package.id, Package.name).order_by(Package.display_order, Package.base_price, Package.id).all()
+        rows = db.query(
+            CommissionRate.referrer_package_id, CommissionRate.referee_package_id, CommissionRate.level, CommissionRate.amount
+        ).filter(CommissionRate.plan == name).all()
+
+        if not rows:
+            logger.warning(f"Commission plan '{name}' has no rates; using the built-in matrix")
+            return cls.from_matrix(COMMISSION_MATRIX, {package_name: package_id for package_id, package_name in packages}, name=name)
+
+        return cls(
+            [package_id for package_id, _ in packages],
+            {(referrer, referee, level): amount for referrer, referee, level, amount in rows},
+            name=name,
+        )
+
+    def amount(self, referrer_package_id: Optional[int], referee_package_id: Optional[int], level: int) -> float:
+        """Commission for one referrer at one level"""
+        return self.amounts[
+            self._level_offset.get(level, self._zero_level)
+            + self._referrer_offset.get(referrer_package_id, self._unknown * self._size)
+            + self._rank.get(referee_package_id, self._unknown)
+        ]
+
+    def fan_out(self, referee_package_id: int, upline_package_ids: Sequence[Optional[int]]) -> List[float]:
+        """
+        Commissions for every level of one purchase in a single pass
+        upline_package_ids[0] is the direct referrer's current package (None if
+        they have none), [1] the next referrer up, and so on.
+        """
+        referee_rank = self._rank.get(referee_package_id, self._unknown)
+        unknown_referrer = self._unknown * self._size
+        amounts = self.amounts
+        return [
+            amounts[
+                self._level_offset.get(level, self._zero_level)
+                + self._referrer_offset.get(referrer_package_id, unknown_referrer)
+                + referee_rank
+            ]
+            for level, referrer_package_id in enumerate(upline_package_ids, start=1)
+        ]
+
+    def bulk_amounts(
+        self,
+        referrer_package_ids: Iterable[Optional[int]],
+        referee_package_ids: Iterable[Optional[int]],
+        levels: Iterable[int],
+    ) -> array:
+        """Commission for each (referrer package, referee package, level) triple, as an array of doubles"""
+        amounts = self.amounts
+        level_offset, zero_level = self._level_offset.get, self._zero_level
+        referrer_offset, unknown_referrer = self._referrer_offset.get, self._unknown * self._size
+        referee_rank, unknown = self._rank.get, self._unknown
+        return array("d", [
+            amounts[level_offset(level, zero_level) + referrer_offset(referrer, unknown_referrer) + referee_rank(referee, unknown)]
+            for referrer, referee, level in zip(referrer_package_ids, referee_package_ids, levels)
+        ])
+
+
+# Loaded plan, reused until its rates change
+_plan_cache: Dict[str, Tuple[tuple, CommissionPlan]] = {}
+
+
+def get_commission_plan(db: Session, name: Optional[str] = None) -> CommissionPlan:
+    """
+    The active commission plan, reloaded only when its rates or the package list change
+    (checked with one aggregate query, so edits apply across all processes immediately)
+    """
+    from app.models import CommissionRate, Package
+
+    name = name or settings.COMMISSION_PLAN
+    fingerprint = (
+        db.query(func.count(CommissionRate.id), func.max(CommissionRate.updated_at)).filter(CommissionRate.plan == name).one(),
+        db.query(func.count(Package.id), func.max(Package.updated_at)).one(),
+    )
+    cached = _plan_cache.get(name)
+    if cached and cached[0] == fingerprint:
+        return cached[1]
+
+    plan = CommissionPlan.load(db, name)
+    _plan_cache[name] = (fingerprint, plan)
+    return plan
+
+
+def package_as_of(user_id, at):
+    """
+    Correlated scalar subquery: the package a user held at time `at`
+    (their latest active purchase made at or before it, NULL if none)
+    """
+    from app.models import UserPackage
+
+    held = aliased(UserPackage)
+    return select(held.package_id).where(
+        held.user_id == user_id,
+        held.status == "active",
+        held.purchase_date <= at,
+    ).order_by(held.purchase_date.desc(), held.id.desc()).limit(1).scalar_subquery()
+
+
+def recompute_commission_amounts(
+    db: Session,
+    plan: Optional[CommissionPlan] = None,
+    apply: bool = False,
+    batch_size: int = 50_000,
+) -> Dict[str, float]:
+    """
+    Recalculate every stored commission with `plan` (e.g. after a plan change)
+
+    Commissions are streamed in id order in batches with the referrer's package
+    as of the referral date, priced with one bulk_amounts call per batch and
+    compared with the stored amount. With apply=True, pending commissions are
+    updated in place; paid or cancelled ones are only counted.
+
+    Returns: {scanned, changed, updated, locked, unresolved, seconds}
+    """
+    from app.models import Commission, Referral
+
+    plan = plan or get_commission_plan(db)
+    start = time.perf_counter()
+    stats = {"scanned": 0, "changed": 0, "updated": 0, "locked": 0, "unresolved": 0}
+
+    referrer_package = package_as_of(Referral.referrer_id, Referral.created_at)
+
+    last_id = 0
+    while True:
+        rows = db.query(
+            Commission.id, Commission.amount, Commission.status,
+            Referral.level, Referral.package_id, referrer_package,
+        ).join(Referral, Referral.id == Commission.referral_id).filter(
+            Commission.id > last_id
+        ).order_by(Commission.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+
+        ids, stored, statuses, levels, referee_packages, referrer_packages = zip(*rows)
+        expected = plan.bulk_amounts(referrer_packages, referee_packages, levels)
+
+        updates = []
+        for commission_id, old, commission_status, referrer_package_id, new in zip(ids, stored, statuses, referrer_packages, expected):
+            if referrer_package_id is None:
+                stats["unresolved"] += 1
+                continue
+            if abs(old - new) < 0.005:
+                continue
+            stats["changed"] += 1
+            if commission_status != "pending":
+                stats["locked"] += 1
+            elif apply:
+                updates.append({"id": commission_id, "amount": new})
+
+        if updates:
+            db.bulk_update_mappings(Commission, updates)
+            db.commit()
+            stats["updated"] += len(updates)
+        stats["scanned"] += len(rows)
+
+    stats["seconds"] = time.perf_counter() - start
+    logger.info(f"Commission recompute with plan '{plan.name}': {stats}")
+    return stats
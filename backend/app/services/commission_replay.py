@@ -0,0 +1,271 @@
+"""
+Commission Replay
+Audits stored referral commissions by replaying every package purchase
+
+Purchases (user_packages, skipping those whose payment did not succeed) are
+replayed against the referral graph with the commission plan, rebuilding the
+Referral/Commission set the live flow (referral_service) should have written:
+one commission per purchase and (referrer, level), priced with the
+referrer's package as of the purchase and paid only when non-zero. The
+rebuilt set is diffed against the stored one:
+
+  missing        expected commission with no stored row
+  extra          stored commission that should not exist (or a duplicate)
+  wrong_amount   stored amount differs from the plan
+
+Work is split into user-id ranges of buyers (referees), so each batch holds
+the complete expected and stored sets for its referees and memory stays
+bounded by the batch size. Repeat purchases of a package pay again;
+expected and stored commissions for the same (referrer, referee, level,
+package) are paired in chronological order. Ranges are independent, so replay_parallel
+runs them in separate processes. CLI: python -m scripts.replay_commissions
+"""
+
+import csv
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session, aliased
+
+from app.models import Commission, Payment, Referral, ReferralPath, UserPackage
+from app.services.commission_calculator import CommissionPlan, get_commission_plan, package_as_of
+
+logger = logging.getLogger(__name__)
+
+DIFF_FIELDS = [
+    "kind", "referrer_id", "referee_id", "level", "package_id",
+    "expected_amount", "actual_amount", "commission_id", "commission_status",
+]
+
+# Amounts closer than this are equal (amounts are stored as floats in rupees)
+AMOUNT_TOLERANCE = 0.005
+
+
+def _empty_stats() -> Dict[str, float]:
+    return {"purchases": 0, "expected": 0, "actual": 0, "matched": 0, "missing": 0, "extra": 0, "wrong_amount": 0}
+
+
+def _expected_commissions(db: Session, plan: CommissionPlan, first_user_id: int, last_user_id: int) -> Tuple[int, Dict[tuple, float]]:
+    """Replay purchases by users in [first_user_id, last_user_id]: (purchase count, {key: amount})"""
+    purchase = aliased(UserPackage)
+    rows = db.query(
+        purchase.id, purchase.user_id, purchase.package_id,
+        ReferralPath.ancestor_id, ReferralPath.depth,
+        package_as_of(ReferralPath.ancestor_id, purchase.purchase_date),
+    ).select_from(purchase).outerjoin(
+        Payment, Payment.id == purchase.payment_id
+    ).outerjoin(
+        ReferralPath,
+        (ReferralPath.descendant_id == purchase.user_id) & (ReferralPath.depth <= plan.levels),
+    ).filter(
+        purchase.user_id.between(first_user_id, last_user_id),
+        or_(Payment.id.is_(None), Payment.status == "success"),
+    ).order_by(purchase.purchase_date, purchase.id, ReferralPath.depth).all()
+    if not rows:
+        return 0, {}
+
+    _, referees, referee_packages, referrers, levels, referrer_packages = zip(*rows)
+    amounts = plan.bulk_amounts(referrer_packages, referee_packages, (level or 0 for level in levels))
+
+    expected, seen = {}, {}
+    for referee, referee_package, referrer, level, referrer_package, amount in zip(
+        referees, referee_packages, referrers, levels, referrer_packages, amounts
+    ):
+        # No referrer at this level, referrer without a package, or nothing to pay
+        if referrer is None or referrer_package is None or amount <= 0:
+            continue
+        key = (referrer, referee, level, referee_package)
+        seen[key] = seen.get(key, 0) + 1
+        expected[key + (seen[key],)] = amount
+
+    return len({row[0] for row in rows}), expected
+
+
+def _stored_commissions(db: Session, first_user_id: int, last_user_id: int) -> List[tuple]:
+    """Stored commissions for referees in [first_user_id, last_user_id]: [(key, commission_id, amount, status)]"""
+    rows = db.query(
+        Referral.referrer_id, Referral.referee_id, Referral.level, Referral.package_id,
+        Commission.id, Commission.amount, Commission.status,
+    ).join(Commission, Commission.referral_id == Referral.id).filter(
+        Referral.referee_id.between(first_user_id, last_user_id)
+    ).order_by(Commission.id)
+
+    seen, stored = {}, []
+    for referrer, referee, level, package, commission_id, amount, status in rows:
+        key = (referrer, referee, level, package)
+        seen[key] = seen.get(key, 0) + 1
+        stored.append((key + (seen[key],), commission_id, amount, status))
+    return stored
+
+
+def _diff_row(kind: str, key: tuple, expected: Optional[float], actual: Optional[float] = None,
+              commission_id: Optional[int] = None, status: Optional[str] = None) -> dict:
+    referrer_id, referee_id, level, package_id, _ = key
+    return {
+        "kind": kind, "referrer_id": referrer_id, "referee_id": referee_id, "level": level, "package_id": package_id,
+        "expected_amount": expected, "actual_amount": actual, "commission_id": commission_id, "commission_status": status,
+    }
+
+
+def replay_range(
+    db: Session,
+    first_user_id: int,
+    last_user_id: int,
+    plan: Optional[CommissionPlan] = None,
+    batch_size: int = 5_000,
+    emit: Optional[Callable[[dict], None]] = None,
+) -> Dict[str, float]:
+    """
+    Replay purchases by users in [first_user_id, last_user_id] and diff the commissions
+
+    Args:
+        db: Database session (only read from)
+        first_user_id, last_user_id: Inclusive range of buyer user ids
+        plan: Commission plan to price with (the active plan by default)
+        batch_size: User ids per batch
+        emit: Called with each diff row (see DIFF_FIELDS)
+
+    Returns: {purchases, expected, actual, matched, missing, extra, wrong_amount}
+    """
+    plan = plan or get_commission_plan(db)
+    stats = _empty_stats()
+
+    for batch_start in range(first_user_id, last_user_id + 1, batch_size):
+        batch_end = min(batch_start + batch_size - 1, last_user_id)
+        purchases, expected = _expected_commissions(db, plan, batch_start, batch_end)
+        stored = _stored_commissions(db, batch_start, batch_end)
+        stats["purchases"] += purchases
+        stats["expected"] += len(expected)
+        stats["actual"] += len(stored)
+
+        diff = []
+        for key, commission_id, amount, status in stored:
+            expected_amount = expected.pop(key, None)
+            if expected_amount is None:
+                diff.append(_diff_row("extra", key, None, amount, commission_id, status))
+            elif abs(amount - expected_amount) >= AMOUNT_TOLERANCE:
+                diff.append(_diff_row("wrong_amount", key, expected_amount, amount, commission_id, status))
+            else:
+                stats["matched"] += 1
+        diff.extend(_diff_row("missing", key, amount) for key, amount in expected.items())
+
+        for row in diff:
+            stats[row["kind"]] += 1
+            if emit:
+                emit(row)
+
+    return stats
+
+
+def user_id_ranges(db: Session, parts: int) -> List[Tuple[int, int]]:
+    """Split the id range of users with purchases or commissions into `parts` inclusive ranges"""
+    low, high = db.query(func.min(UserPackage.user_id), func.max(UserPackage.user_id)).one()
+    referral_low, referral_high = db.query(func.min(Referral.referee_id), func.max(Referral.referee_id)).one()
+    bounds = [value for value in (low, high, referral_low, referral_high) if value is not None]
+    if not bounds:
+        return []
+
+    low, high = min(bounds), max(bounds)
+    step = -(-(high - low + 1) // max(parts, 1))
+    return [(start, min(start + step - 1, high)) for start in range(low, high + 1, step)]
+
+
+def replay(
+    db: Session,
+    plan: Optional[CommissionPlan] = None,
+    batch_size: int = 5_000,
+    emit: Optional[Callable[[dict], None]] = None,
+) -> Dict[str, float]:
+    """Replay every purchase in one process (see replay_range)"""
+    start = time.perf_counter()
+    stats = _empty_stats()
+    for first_user_id, last_user_id in user_id_ranges(db, 1):
+        stats = replay_range(db, first_user_id, last_user_id, plan=plan, batch_size=batch_size, emit=emit)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def _replay_worker(database_url: Optional[str], plan_name: Optional[str], first_user_id: int, last_user_id: int,
+                   batch_size: int, diff_path: Optional[str]) -> Dict[str, float]:
+    """Process pool entry point: replay one range with a private engine, writing diffs to diff_path"""
+    if database_url:
+        from sqlalchemy import create_engine
+        engine = create_engine(database_url)
+    else:
+        from app.core.database import engine
+        engine.dispose(close=False)  # Don't share the parent's pooled connections
+
+    db = Session(bind=engine)
+    diff_file = open(diff_path, "w", newline="") if diff_path else None
+    try:
+        writer = csv.DictWriter(diff_file, fieldnames=DIFF_FIELDS) if diff_file else None
+        plan = get_commission_plan(db, plan_name)
+        return replay_range(db, first_user_id, last_user_id, plan=plan, batch_size=batch_size,
+                            emit=writer.writerow if writer else None)
+    finally:
+        if diff_file:
+            diff_file.close()
+        db.close()
+
+
+def replay_parallel(
+    workers: int,
+    batch_size: int = 5_000,
+    diff_path: Optional[str] = None,
+    database_url: Optional[str] = None,
+    plan_name: Optional[str] = None,
+) -> Dict[str, float]:
+    """
+    Replay every purchase with one process per user-id range
+
+    Args:
+        workers: Number of processes (and ranges)
+        batch_size: User ids per batch within a range
+        diff_path: CSV file receiving the diff rows from all ranges (with a header)
+        database_url: Database to audit (the application database by default)
+        plan_name: Commission plan to price with (the active plan by default)
+
+    Returns: Stats summed over all ranges, plus seconds
+    """
+    from app.core.database import SessionLocal
+
+    start = time.perf_counter()
+    if database_url:
+        from sqlalchemy import create_engine
+        db = Session(bind=create_engine(database_url))
+    else:
+        db = SessionLocal()
+    try:
+        ranges = user_id_ranges(db, workers)
+    finally:
+        db.close()
+        if database_url:
+            db.get_bind().dispose()
+
+    parts = [f"{diff_path}.part{index}" if diff_path else None for index in range(len(ranges))]
+    stats = _empty_stats()
+    with ProcessPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [
+            pool.submit(_replay_worker, database_url, plan_name, first_user_id, last_user_id, batch_size, part)
+            for (first_user_id, last_user_id), part in zip(ranges, parts)
+        ]
+        for future in futures:
+            for key, value in future.result().items():
+                stats[key] += value
+
+    if diff_path:
+        with open(diff_path, "w", newline="") as diff_file:
+            csv.DictWriter(diff_file, fieldnames=DIFF_FIELDS).writeheader()
+            for part in parts:
+                with open(part, newline="") as part_file:
+                    for line in part_file:
+                        diff_file.write(line)
+                os.remove(part)
+
+    stats["seconds"] = time.perf_counter() - start
+    logger.info(f"Commission replay with {workers} workers: {stats}")
+    return stats
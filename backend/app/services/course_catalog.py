@@ -0,0 +1,196 @@
+"""
+Course Catalogue
+Read model of the course structure shared by the course listings
+
+The catalogue (every course with its package, modules, topics and videos)
+is loaded with one eager query (selectinload) into plain dicts and kept in
+process until an admin course/module/topic/video/package mutation calls
+invalidate_catalog(), or for at most COURSE_CATALOG_CACHE_TTL_SECONDS (which
+bounds staleness in the other worker processes). Per-user access flags
+(admin, package level, individually purchased courses) are cached separately
+for COURSE_ACCESS_CACHE_TTL_SECONDS so the shared structure never holds
+user data; purchases call invalidate_user_access(). That only reaches the
+worker process that handled the purchase, so a denial decided on cached
+flags is confirmed with a fresh lookup first (confirm_denial()); denials are
+rare, grants keep the cache.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Dict, FrozenSet, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session, selectinload
+
+from app.core.config import settings
+from app.models import Course, Module, Package, User, UserCoursePurchase, UserPackage
+
+logger = logging.getLogger(__name__)
+
+# Users can access courses of their package level or lower
+PACKAGE_HIERARCHY = {"Silver": 1, "Gold": 2, "Platinum": 3}
+
+
+class Catalog(NamedTuple):
+    courses: List[Dict[str, Any]]  # All courses, by display_order
+    by_id: Dict[int, Dict[str, Any]]
+
+
+class UserAccess(NamedTuple):
+    is_admin: bool
+    package_level: Optional[int]  # None = no active package
+    purchased_course_ids: FrozenSet[int]
+    from_cache: bool = False
+
+
+_catalog: Optional[Catalog] = None
+_catalog_expires_at = 0.0
+_catalog_lock = threading.Lock()
+
+_access: Dict[int, tuple] = {}  # user_id -> (expires_at, UserAccess)
+_access_lock = threading.Lock()
+
+
+def _columns(obj) -> Dict[str, Any]:
+    return {column.key: getattr(obj, column.key) for column in obj.__mapper__.column_attrs}
+
+
+def build_catalog(db: Session) -> Catalog:
+    """Load every course with its package, modules, topics and videos in one eager query"""
+    courses = db.query(Course).options(
+        selectinload(Course.package),
+        selectinload(Course.modules).selectinload(Module.topics),
+        selectinload(Course.videos),
+    ).order_by(Course.display_order).all()
+
+    entries = []
+    for course in courses:
+        modules = [
+            {**_columns(module), "topics": [_columns(topic) for topic in module.topics]}
+            for module in course.modules
+        ]
+        published_videos = sorted(
+            (_columns(video) for video in course.videos if video.is_published),
+            key=lambda video: video["display_order"],
+        )
+        package_name = course.package.name if course.package else None
+        entries.append({
+            **_columns(course),
+            "package_name": package_name,
+            # None = no package, 0 = a package outside the hierarchy
+            "package_level": None if package_name is None else PACKAGE_HIERARCHY.get(package_name, 0),
+            "modules": modules,
+            "total_topics": sum(len(module["topics"]) for module in modules),
+            "published_topics": sum(
+                1 for module in modules for topic in module["topics"] if topic["is_published"]
+            ),
+            "published_videos": published_videos,
+        })
+    return Catalog(courses=entries, by_id={entry["id"]: entry for entry in entries})
+
+
+def get_catalog(db: Session) -> Catalog:
+    """The cached catalogue, rebuilt after invalidation or COURSE_CATALOG_CACHE_TTL_SECONDS"""
+    global _catalog, _catalog_expires_at
+
+    catalog = _catalog
+    if catalog is not None and time.monotonic() < _catalog_expires_at:
+        return catalog
+
+    with _catalog_lock:
+        # Another request may have rebuilt it while we waited
+        if _catalog is not None and time.monotonic() < _catalog_expires_at:
+            return _catalog
+        _catalog = build_catalog(db)
+        _catalog_expires_at = time.monotonic() + settings.COURSE_CATALOG_CACHE_TTL_SECONDS
+        logger.info(f"Course catalogue rebuilt ({len(_catalog.courses)} courses)")
+        return _catalog
+
+
+def get_course(db: Session, course_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Catalogue entry of a course, None if there is no such course
+    A course created since the catalogue was built (another worker) triggers a
+    rebuild; ids that don't exist cost one primary-key lookup, not a rebuild.
+    """
+    course = get_catalog(db).by_id.get(course_id)
+    if course is None and db.query(Course.id).filter(Course.id == course_id).scalar() is not None:
+        invalidate_catalog()
+        course = get_catalog(db).by_id.get(course_id)
+    return course
+
+
+def invalidate_catalog() -> None:
+    """Drop the catalogue so the next request rebuilds it"""
+    global _catalog, _catalog_expires_at
+    with _catalog_lock:
+        _catalog = None
+        _catalog_expires_at = 0.0
+
+
+def get_user_access(db: Session, user: User, fresh: bool = False) -> UserAccess:
+    """The user's access flags (cached for COURSE_ACCESS_CACHE_TTL_SECONDS unless `fresh`)"""
+    cached = None if fresh else _access.get(user.id)
+    if cached is not None and time.monotonic() < cached[0]:
+        # is_admin comes from the (already loaded) user, never from the cache
+        return cached[1]._replace(is_admin=bool(user.is_admin), from_cache=True)
+
+    package_name = db.query(Package.name).join(
+        UserPackage, UserPackage.package_id == Package.id
+    ).filter(
+        UserPackage.user_id == user.id,
+        UserPackage.status == "active",
+    ).order_by(UserPackage.purchase_date.desc()).limit(1).scalar()
+
+    purchased = frozenset(course_id for (course_id,) in db.query(UserCoursePurchase.course_id).filter(
+        UserCoursePurchase.user_id == user.id,
+        UserCoursePurchase.is_active == True,
+    ))
+
+    access = UserAccess(
+        is_admin=bool(user.is_admin),
+        package_level=None if package_name is None else PACKAGE_HIERARCHY.get(package_name, 0),
+        purchased_course_ids=purchased,
+    )
+    with _access_lock:
+        _access[user.id] = (time.monotonic() + settings.COURSE_ACCESS_CACHE_TTL_SECONDS, access)
+    return access
+
+
+def confirm_denial(db: Session, user: User, access: UserAccess) -> UserAccess:
+    """
+    Flags to deny access with: reloaded when `access` came from the cache, which
+    a purchase handled by another worker process has not invalidated
+    """
+    return get_user_access(db, user, fresh=True) if access.from_cache else access
+
+
+def invalidate_user_access(user_id: Optional[int] = None) -> None:
+    """Drop one user's access flags (or everyone's)"""
+    with _access_lock:
+        if user_id is None:
+            _access.clear()
+        else:
+            _access.pop(user_id, None)
+
+
+def has_package_access(access: UserAccess, course: Dict[str, Any]) -> bool:
+    """Admin, or an active package at or above the course's package level"""
+    if access.is_admin:
+        return True
+    if access.package_level is None or course["package_level"] is None:
+        return False
+    return access.package_level >= course["package_level"]
+
+
+def has_course_access(access: UserAccess, course: Dict[str, Any]) -> bool:
+    """Package access or an individual purchase of the course"""
+    return course["id"] in access.purchased_course_ids or has_package_access(access, course)
+
+
+def course_summary(course: Dict[str, Any]) -> Dict[str, Any]:
+    """Course columns plus package name, for the listing responses"""
+    return {
+        key: value for key, value in course.items()
+        if key not in ("modules", "published_videos", "package_level", "total_topics", "published_topics")
+    }
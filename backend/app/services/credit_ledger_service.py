@@ -5,9 +5,13 @@ Manages credit transactions, balances, and rewards
 
 import logging
 import uuid
-from typing import Optional, Dict, Any
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from app.models import CreditLedger, User
+from app.models import CreditLedger, UserCreditBalance, User
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -49,9 +53,22 @@ class CreditLedgerService:
                     "idempotent": True,
                 }
             
-            # Check balance
-            current_balance = CreditLedgerService.get_balance(db, user_id)
-            if current_balance < amount:
+            # Make sure the balance snapshot exists, then debit it conditionally so
+            # two concurrent debits can never take the balance below zero
+            CreditLedgerService._ensure_snapshot(db, user_id)
+            debited = db.query(UserCreditBalance).filter(
+                UserCreditBalance.user_id == user_id,
+                UserCreditBalance.balance >= amount,
+            ).update(
+                {
+                    UserCreditBalance.balance: UserCreditBalance.balance - amount,
+                    UserCreditBalance.updated_at: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
+            if not debited:
+                db.rollback()
+                current_balance = CreditLedgerService.get_balance(db, user_id)
                 logger.warning(f"Insufficient credits: user={user_id}, need={amount}, have={current_balance}")
                 return {
                     "success": False,
@@ -59,7 +76,7 @@ class CreditLedgerService:
                     "error": "Insufficient credits",
                 }
             
-            # Create ledger entry
+            # Create ledger entry (same transaction as the balance update)
             ledger_entry = CreditLedger(
                 user_id=user_id,
                 delta=-amount,  # Negative for debit
@@ -121,7 +138,17 @@ class CreditLedgerService:
                     "idempotent": True,
                 }
             
-            # Create ledger entry
+            # Create ledger entry and bump the balance snapshot in one transaction
+            CreditLedgerService._ensure_snapshot(db, user_id)
+            db.query(UserCreditBalance).filter(
+                UserCreditBalance.user_id == user_id,
+            ).update(
+                {
+                    UserCreditBalance.balance: UserCreditBalance.balance + amount,
+                    UserCreditBalance.updated_at: datetime.utcnow(),
+                },
+                synchronize_session=False,
+            )
             ledger_entry = CreditLedger(
                 user_id=user_id,
                 delta=amount,  # Positive for credit
@@ -152,18 +179,104 @@ class CreditLedgerService:
     
     @staticmethod
     def get_balance(db: Session, user_id: int) -> float:
-        """Get current credit balance for user"""
+        """
+        Get current credit balance for user (single primary-key lookup)
+        Read-only: a user without a snapshot yet gets the ledger total, and the
+        snapshot is seeded by their next debit or credit.
+        """
         try:
-            result = db.query(CreditLedger).filter(
-                CreditLedger.user_id == user_id
-            ).all()
-            
-            balance = sum(entry.delta for entry in result)
+            balance = db.query(UserCreditBalance.balance).filter(
+                UserCreditBalance.user_id == user_id
+            ).scalar()
+
+            if balance is None:
+                # No snapshot yet (user predates the balance table)
+                balance = CreditLedgerService._ledger_total(db, user_id)
+
             return max(0, balance)  # Never negative
             
         except Exception as e:
             logger.error(f"Error getting balance: {e}")
+            db.rollback()
             return 0.0
+
+    @staticmethod
+    def _ledger_total(db: Session, user_id: int) -> float:
+        """Sum the ledger for a user in SQL (used only for seeding and reconciliation)"""
+        total = db.query(func.coalesce(func.sum(CreditLedger.delta), 0.0)).filter(
+            CreditLedger.user_id == user_id
+        ).scalar()
+        return float(total or 0.0)
+
+    @staticmethod
+    def _ensure_snapshot(db: Session, user_id: int) -> None:
+        """
+        Make sure a balance snapshot row exists for user, seeding it from the ledger.
+        INSERT ... ON CONFLICT DO NOTHING, so concurrent first writers for the same
+        user cannot collide on the primary key; it joins the caller's transaction.
+        """
+        exists = db.query(UserCreditBalance.user_id).filter(
+            UserCreditBalance.user_id == user_id
+        ).scalar()
+        if exists is not None:
+            return
+
+        insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        db.execute(
+            insert(UserCreditBalance)
+            .values(
+                user_id=user_id,
+                balance=CreditLedgerService._ledger_total(db, user_id),
+                updated_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(index_elements=[UserCreditBalance.user_id])
+        )
+
+    @staticmethod
+    def reconcile_balances(db: Session, fix: bool = False, tolerance: float = 1e-6) -> List[Dict[str, Any]]:
+        """
+        Recompute every user's balance from the ledger and compare it with the snapshot.
+        Returns one entry per drifted user: {user_id, snapshot, ledger, drift}.
+        With fix=True the snapshots are overwritten with the ledger totals.
+        """
+        ledger_totals = dict(
+            db.query(CreditLedger.user_id, func.sum(CreditLedger.delta))
+            .group_by(CreditLedger.user_id)
+            .all()
+        )
+        snapshots = dict(
+            db.query(UserCreditBalance.user_id, UserCreditBalance.balance).all()
+        )
+
+        drift = []
+        for user_id in sorted(set(ledger_totals) | set(snapshots)):
+            expected = float(ledger_totals.get(user_id) or 0.0)
+            actual = snapshots.get(user_id)
+            if actual is not None and abs(actual - expected) <= tolerance:
+                continue
+            drift.append({
+                "user_id": user_id,
+                "snapshot": actual,
+                "ledger": expected,
+                "drift": None if actual is None else actual - expected,
+            })
+
+        if fix and drift:
+            now = datetime.utcnow()
+            for entry in drift:
+                if entry["snapshot"] is None:
+                    db.add(UserCreditBalance(user_id=entry["user_id"], balance=entry["ledger"], updated_at=now))
+                else:
+                    db.query(UserCreditBalance).filter(
+                        UserCreditBalance.user_id == entry["user_id"]
+                    ).update(
+                        {UserCreditBalance.balance: entry["ledger"], UserCreditBalance.updated_at: now},
+                        synchronize_session=False,
+                    )
+            db.commit()
+            logger.info(f"Reconciled {len(drift)} credit balance snapshot(s)")
+
+        return drift
     
     @staticmethod
     def get_tier_cost(tier: str) -> int:
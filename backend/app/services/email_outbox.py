@@ -0,0 +1,302 @@
+"""
+Email Outbox
+Database-backed queue of outgoing email plus the async dispatcher that drains it
+
+API code only inserts rows (`queue_email` inside the caller's transaction, or
+`enqueue_email` with its own session), so no request ever waits on SMTP. The
+dispatcher claims due rows in batches, sends them concurrently over a pool of
+persistent SMTP connections under a rate limit, and records the outcome in one
+round trip per batch. Failed sends are retried with exponential backoff up to
+EMAIL_MAX_ATTEMPTS, then marked 'failed'.
+
+The dispatcher runs inside the API process (EMAIL_DISPATCHER_EMBEDDED) or as
+dedicated processes via `python -m scripts.run_email_dispatcher`.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import EmailOutbox
+from app.services.email_service import SMTPConnectionPool, build_message
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Emails stuck in 'sending' this long (dispatcher crashed mid-batch) are retried
+STALE_SENDING_SECONDS = 600
+
+
+def queue_email(
+    db: Session,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    from_email: Optional[str] = None,
+    dedupe_key: Optional[str] = None,
+) -> EmailOutbox:
+    """
+    Add an email to the caller's transaction (the caller commits)
+    Returns the existing row if one with the same dedupe key was already queued.
+    """
+    if dedupe_key:
+        existing = db.query(EmailOutbox).filter(EmailOutbox.dedupe_key == dedupe_key).first()
+        if existing:
+            return existing
+
+    email = EmailOutbox(
+        from_email=from_email or settings.EMAIL_FROM,
+        to_email=to_email,
+        subject=subject,
+        html_content=html_content,
+        text_content=text_content,
+        dedupe_key=dedupe_key,
+        status=PENDING,
+        send_after=datetime.utcnow(),
+    )
+    db.add(email)
+    return email
+
+
+def enqueue_email(
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None,
+    from_email: Optional[str] = None,
+    dedupe_key: Optional[str] = None,
+) -> bool:
+    """Queue and commit an email on a short-lived session; returns False if it could not be stored"""
+    db = SessionLocal()
+    try:
+        queue_email(db, to_email, subject, html_content, text_content, from_email, dedupe_key)
+        db.commit()
+        return True
+    except IntegrityError:
+        # Same dedupe key queued concurrently
+        db.rollback()
+        return True
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to queue email to {to_email}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def claim_batch(db: Session, limit: int) -> List[Dict[str, Any]]:
+    """
+    Mark up to `limit` due pending emails as sending and return them as plain dicts
+    The status check in the UPDATE keeps concurrent dispatchers from sending twice.
+    """
+    now = datetime.utcnow()
+    candidates = db.query(EmailOutbox.id).filter(
+        EmailOutbox.status == PENDING,
+        EmailOutbox.send_after <= now,
+    ).order_by(EmailOutbox.send_after, EmailOutbox.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+    ids = [row.id for row in candidates]
+    if not ids:
+        db.commit()
+        return []
+
+    db.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status == PENDING,
+    ).update({
+        EmailOutbox.status: SENDING,
+        EmailOutbox.locked_at: now,
+        EmailOutbox.attempts: EmailOutbox.attempts + 1,
+    }, synchronize_session=False)
+    db.commit()
+
+    # Only rows this dispatcher actually flipped (locked_at is ours)
+    rows = db.query(EmailOutbox).filter(
+        EmailOutbox.id.in_(ids),
+        EmailOutbox.status == SENDING,
+        EmailOutbox.locked_at == now,
+    ).all()
+    batch = [
+        {
+            "id": row.id,
+            "from_email": row.from_email,
+            "to_email": row.to_email,
+            "subject": row.subject,
+            "html_content": row.html_content,
+            "text_content": row.text_content,
+            "attempts": row.attempts,
+        }
+        for row in rows
+    ]
+    db.commit()
+    return batch
+
+
+def record_results(db: Session, batch: List[Dict[str, Any]], errors: List[Optional[str]]) -> None:
+    """Persist the outcome of a dispatched batch (errors[i] is None when batch[i] was sent)"""
+    now = datetime.utcnow()
+    sent_ids = [item["id"] for item, error in zip(batch, errors) if error is None]
+    if sent_ids:
+        db.query(EmailOutbox).filter(EmailOutbox.id.in_(sent_ids)).update({
+            EmailOutbox.status: SENT,
+            EmailOutbox.sent_at: now,
+            EmailOutbox.locked_at: None,
+            EmailOutbox.last_error: None,
+        }, synchronize_session=False)
+
+    for item, error in zip(batch, errors):
+        if error is None:
+            continue
+        if item["attempts"] >= settings.EMAIL_MAX_ATTEMPTS:
+            values = {EmailOutbox.status: FAILED}
+            logger.error(f"Email {item['id']} to {item['to_email']} failed permanently: {error}")
+        else:
+            delay = settings.EMAIL_RETRY_BASE_SECONDS * (2 ** (item["attempts"] - 1))
+            values = {EmailOutbox.status: PENDING, EmailOutbox.send_after: now + timedelta(seconds=delay)}
+            logger.warning(f"Email {item['id']} to {item['to_email']} failed, retrying in {delay:.0f}s: {error}")
+        values.update({EmailOutbox.locked_at: None, EmailOutbox.last_error: error[:2000]})
+        db.query(EmailOutbox).filter(EmailOutbox.id == item["id"]).update(values, synchronize_session=False)
+
+    db.commit()
+
+
+def requeue_stale(db: Session) -> int:
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SENDING_SECONDS)
+    requeued = db.query(EmailOutbox).filter(
+        EmailOutbox.status == SENDING,
+        EmailOutbox.locked_at < cutoff,
+    ).update({
+        EmailOutbox.status: PENDING,
+        EmailOutbox.locked_at: None,
+    }, synchronize_session=False)
+    db.commit()
+    return requeued
+
+
+def outbox_depth(db: Session, statuses: Optional[Iterable[str]] = None) -> Dict[str, int]:
+    """Number of outbox rows per status (all statuses, or only `statuses`)"""
+    statuses = tuple(statuses) if statuses is not None else (PENDING, SENDING, SENT, FAILED)
+    depth = dict.fromkeys(statuses, 0)
+    rows = db.query(EmailOutbox.status, func.count(EmailOutbox.id)).filter(
+        EmailOutbox.status.in_(statuses)
+    ).group_by(EmailOutbox.status)
+    for email_status, count in rows:
+        depth[email_status] = count
+    return depth
+
+
+class RateLimiter:
+    """Spaces acquisitions evenly so at most `per_minute` pass per minute"""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next_slot = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class EmailDispatcher:
+    """Drains the outbox over pooled SMTP connections"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        pool: Optional[SMTPConnectionPool] = None,
+        batch_size: Optional[int] = None,
+        rate_per_minute: Optional[int] = None,
+    ):
+        self.session_factory = session_factory or SessionLocal
+        self.pool = pool or SMTPConnectionPool()
+        self.batch_size = batch_size or settings.EMAIL_BATCH_SIZE
+        self.rate_limiter = RateLimiter(rate_per_minute if rate_per_minute is not None else settings.EMAIL_RATE_LIMIT_PER_MINUTE)
+        self.sent = 0
+        self.failed = 0
+
+    def _with_session(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    async def _send(self, item: Dict[str, Any]) -> Optional[str]:
+        await self.rate_limiter.acquire()
+        message = build_message(
+            item["from_email"], item["to_email"], item["subject"], item["html_content"], item["text_content"]
+        )
+        try:
+            await self.pool.send(message)
+            return None
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    async def dispatch_once(self) -> int:
+        """Claim, send and record one batch; returns the number of emails attempted"""
+        batch = await asyncio.to_thread(self._with_session, claim_batch, self.batch_size)
+        if not batch:
+            return 0
+
+        errors = await asyncio.gather(*(self._send(item) for item in batch))
+        await asyncio.to_thread(self._with_session, record_results, batch, list(errors))
+
+        failed = sum(1 for error in errors if error is not None)
+        self.sent += len(batch) - failed
+        self.failed += failed
+        logger.info(f"Dispatched {len(batch)} email(s), {failed} failed")
+        return len(batch)
+
+    async def drain(self) -> int:
+        """Send everything that is currently due; returns emails attempted"""
+        total = 0
+        while True:
+            attempted = await self.dispatch_once()
+            if not attempted:
+                return total
+            total += attempted
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """Dispatch until stop_event is set, sleeping EMAIL_POLL_INTERVAL_SECONDS when idle"""
+        logger.info("Email dispatcher started")
+        next_stale_check = 0.0
+        try:
+            while not stop_event.is_set():
+                attempted = 0
+                try:
+                    if time.monotonic() >= next_stale_check:
+                        await asyncio.to_thread(self._with_session, requeue_stale)
+                        next_stale_check = time.monotonic() + STALE_SENDING_SECONDS / 2
+                    attempted = await self.dispatch_once()
+                except Exception as e:
+                    logger.error(f"Email dispatcher error: {e}")
+
+                if not attempted:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), timeout=settings.EMAIL_POLL_INTERVAL_SECONDS)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            await self.pool.close()
+            logger.info(f"Email dispatcher stopped ({self.sent} sent, {self.failed} failed)")
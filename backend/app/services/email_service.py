@@ -1,64 +1,148 @@
 """
 Email Service for sending verification and notification emails
+
+Emails are written to the outbox (app.services.email_outbox) and delivered by
+the dispatcher over a small pool of persistent SMTP connections, so callers
+never wait on SMTP.
 """
-import aiosmtplib
+import asyncio
+import logging
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from typing import List, Optional
+
+import aiosmtplib
+
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
 
-async def send_email(to_email: str, subject: str, html_content: str):
-    """
-    Send email using SMTP
 
-    Args:
-        to_email: Recipient email address
-        subject: Email subject
-        html_content: HTML content of the email
-    """
-    # Create message
+def build_message(
+    from_email: str,
+    to_email: str,
+    subject: str,
+    html_content: str,
+    text_content: Optional[str] = None
+) -> MIMEMultipart:
+    """Build a multipart/alternative message (plain text part first, if any)"""
     message = MIMEMultipart("alternative")
-    message["From"] = settings.SMTP_FROM_EMAIL
+    message["From"] = from_email
     message["To"] = to_email
     message["Subject"] = subject
 
-    # Add HTML content
-    html_part = MIMEText(html_content, "html")
-    message.attach(html_part)
+    if text_content:
+        message.attach(MIMEText(text_content, "plain"))
+    message.attach(MIMEText(html_content, "html"))
+    return message
 
-    # Use SMTP_USERNAME if set, otherwise use SMTP_USER
-    smtp_username = settings.SMTP_USERNAME if settings.SMTP_USERNAME else settings.SMTP_USER
 
-    # Send email
-    try:
-        # Port 465 requires use_tls=False (it uses implicit SSL)
-        # Port 587 requires use_tls=True (it uses STARTTLS)
-        use_tls = False if settings.SMTP_PORT == 465 else True
+class SMTPConnectionPool:
+    """
+    Keeps up to `size` logged-in SMTP connections open and reuses them across messages
+    A connection that errors is discarded; a stale idle connection is replaced once transparently.
+    """
+
+    def __init__(
+        self,
+        hostname: Optional[str] = None,
+        port: Optional[int] = None,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        size: Optional[int] = None,
+        use_tls: Optional[bool] = None,
+        start_tls: Optional[bool] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.hostname = hostname or settings.SMTP_HOST
+        self.port = port or settings.SMTP_PORT
+        # Use SMTP_USERNAME if set, otherwise use SMTP_USER
+        self.username = username if username is not None else (settings.SMTP_USERNAME or settings.SMTP_USER)
+        self.password = password if password is not None else settings.SMTP_PASSWORD
+        # Port 465 uses implicit SSL; other ports upgrade with STARTTLS when the server offers it
+        self.use_tls = use_tls if use_tls is not None else self.port == 465
+        if start_tls is None and (self.use_tls or not settings.SMTP_USE_TLS):
+            start_tls = False
+        self.start_tls = start_tls
+        self.timeout = timeout or settings.EMAIL_SMTP_TIMEOUT_SECONDS
+        self.size = size or settings.EMAIL_SMTP_POOL_SIZE
 
-        await aiosmtplib.send(
-            message,
-            hostname=settings.SMTP_HOST,
-            port=settings.SMTP_PORT,
-            username=smtp_username,
-            password=settings.SMTP_PASSWORD,
-            use_tls=use_tls,
-            start_tls=False if settings.SMTP_PORT == 465 else True,
+        self._idle: List[aiosmtplib.SMTP] = []
+        self._slots = asyncio.Semaphore(self.size)
+        self.connections_opened = 0
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout,
         )
-        print(f"✅ Email sent successfully to {to_email}")
-    except Exception as e:
-        print(f"❌ Failed to send email to {to_email}: {e}")
-        print(f"   SMTP Config: {settings.SMTP_HOST}:{settings.SMTP_PORT}, TLS={use_tls}")
-        raise
+        await smtp.connect()
+        if self.username and smtp.supports_extension("auth"):
+            await smtp.login(self.username, self.password)
+        self.connections_opened += 1
+        logger.info(f"Opened SMTP connection to {self.hostname}:{self.port}")
+        return smtp
 
+    @staticmethod
+    async def _discard(smtp: aiosmtplib.SMTP) -> None:
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
 
-async def send_verification_email(email: str, name: str, token: str):
+    async def send(self, message: MIMEMultipart) -> None:
+        """Send one message on a pooled connection; raises on delivery failure"""
+        async with self._slots:
+            reused = bool(self._idle)
+            smtp = self._idle.pop() if reused else await self._connect()
+            try:
+                try:
+                    await smtp.send_message(message)
+                except aiosmtplib.SMTPServerDisconnected:
+                    if not reused:
+                        raise
+                    # Idle connection was closed by the server; reconnect once
+                    await self._discard(smtp)
+                    smtp = await self._connect()
+                    await smtp.send_message(message)
+            except Exception:
+                await self._discard(smtp)
+                raise
+            self._idle.append(smtp)
+
+    async def close(self) -> None:
+        while self._idle:
+            await self._discard(self._idle.pop())
+
+
+async def send_email(to_email: str, subject: str, html_content: str):
     """
-    Send email verification email
-    
+    Queue an email in the outbox for delivery by the email dispatcher
+
     Args:
-        email: User's email address
-        name: User's full name
-        token: Verification token
+        to_email: Recipient email address
+        subject: Email subject
+        html_content: HTML content of the email
+    """
+    from app.services.email_outbox import enqueue_email
+
+    queued = await asyncio.to_thread(
+        enqueue_email, to_email, subject, html_content, from_email=settings.SMTP_FROM_EMAIL
+    )
+    if not queued:
+        raise RuntimeError(f"Failed to queue email to {to_email}")
+
+
+def verification_email_content(name: str, token: str):
+    """
+    Build the email verification email
+
+    Returns:
+        (subject, html_content)
     """
     # Construct verification URL
     frontend_url = settings.FRONTEND_URL or "http://localhost:3000"
@@ -150,6 +234,19 @@ async def send_verification_email(email: str, name: str, token: str):
     </html>
     """
     
+    return subject, html_content
+
+
+async def send_verification_email(email: str, name: str, token: str):
+    """
+    Send email verification email
+    
+    Args:
+        email: User's email address
+        name: User's full name
+        token: Verification token
+    """
+    subject, html_content = verification_email_content(name, token)
     await send_email(email, subject, html_content)
 
 
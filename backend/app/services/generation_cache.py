@@ -0,0 +1,124 @@
+"""
+Generation Cache
+Content-addressed reuse of generated images for identical requests
+
+Remixes (community.get_remix_prompt) and template-driven generations often
+resend the same prompt and tier. Every successful generation job is stored
+in the generation_cache table under the SHA-256 of its normalized prompt,
+tier, provider, seed and enhance flag. A request sent with cache="reuse"
+that finds a live entry is settled at once by submit_job: a new
+GeneratedImage pointing at the cached image_url (no provider call, no new
+blob written), with the usual credits debited. cache="fresh" (the default)
+always calls the provider and refreshes the entry.
+
+Entries expire GENERATION_CACHE_TTL_SECONDS after they were stored and the
+least recently used ones are evicted beyond GENERATION_CACHE_MAX_ENTRIES,
+checked at most every EVICT_CHECK_SECONDS per process and deleted in
+batches. Stores are upserts, so concurrent jobs for the same key never
+collide. The table is shared by the API and generation worker processes. Lookups are
+counted in generation_cache_lookups_total{result="hit"|"miss"} for the hit
+rate.
+"""
+
+import hashlib
+import logging
+import time
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.metrics import count_generation_cache, count_generation_cache_evictions
+from app.models import GenerationCacheEntry
+
+logger = logging.getLogger(__name__)
+
+REUSE = "reuse"
+FRESH = "fresh"
+
+# Size limit checks per process, and entries deleted per statement
+EVICT_CHECK_SECONDS = 60
+EVICT_BATCH_SIZE = 500
+
+_next_evict_check = 0.0
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Unicode-normalized, case-folded prompt with collapsed whitespace"""
+    return " ".join(unicodedata.normalize("NFKC", prompt).casefold().split())
+
+
+def cache_key(prompt: str, tier: str, provider: str, seed: Optional[int] = None, enhance_prompt: bool = False) -> str:
+    """SHA-256 hex of the normalized request"""
+    parts = [normalize_prompt(prompt), tier, provider, "" if seed is None else str(seed), "1" if enhance_prompt else "0"]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def lookup(db: Session, key: str) -> Optional[GenerationCacheEntry]:
+    """
+    Live entry for `key`, marked as used (the caller commits)
+    Expired entries are deleted and count as a miss.
+    """
+    entry = db.get(GenerationCacheEntry, key)
+    now = datetime.utcnow()
+    if entry is not None and entry.created_at < now - timedelta(seconds=settings.GENERATION_CACHE_TTL_SECONDS):
+        db.delete(entry)
+        entry = None
+
+    if entry is None:
+        count_generation_cache("miss")
+        return None
+
+    entry.hit_count += 1
+    entry.last_used_at = now
+    count_generation_cache("hit")
+    return entry
+
+
+def store(db: Session, key: str, result: Dict[str, Any]) -> None:
+    """Store (or refresh) the image for `key`, evicting when a size check is due (the caller commits)"""
+    global _next_evict_check
+    now = datetime.utcnow()
+    values = {
+        "image_url": result["image_url"],
+        "width": result.get("width"),
+        "height": result.get("height"),
+        "provider": result.get("provider"),
+        "created_at": now,
+        "last_used_at": now,
+    }
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    db.execute(
+        insert(GenerationCacheEntry)
+        .values(cache_key=key, hit_count=0, **values)
+        .on_conflict_do_update(index_elements=[GenerationCacheEntry.cache_key], set_=values)
+    )
+
+    if time.monotonic() >= _next_evict_check:
+        _next_evict_check = time.monotonic() + EVICT_CHECK_SECONDS
+        evict(db)
+
+
+def evict(db: Session, max_entries: Optional[int] = None) -> int:
+    """Delete the least recently used entries beyond `max_entries`, in batches; returns how many"""
+    max_entries = settings.GENERATION_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+    excess = db.query(GenerationCacheEntry).count() - max_entries
+    evicted = 0
+    while evicted < excess:
+        stale_keys = [key for (key,) in db.query(GenerationCacheEntry.cache_key).order_by(
+            GenerationCacheEntry.last_used_at
+        ).limit(min(EVICT_BATCH_SIZE, excess - evicted))]
+        if not stale_keys:
+            break
+        db.query(GenerationCacheEntry).filter(
+            GenerationCacheEntry.cache_key.in_(stale_keys)
+        ).delete(synchronize_session=False)
+        evicted += len(stale_keys)
+
+    if evicted:
+        count_generation_cache_evictions(evicted)
+    return evicted
@@ -0,0 +1,471 @@
+"""
+Generation Jobs
+Asynchronous pipeline behind POST /api/studio/generate
+
+`submit_job` reserves the credits and queues a `generation_jobs` row in one
+transaction, so the request returns immediately with a job id. A
+`GenerationWorkerPool` claims queued jobs (conditional UPDATE, plus SKIP
+LOCKED on PostgreSQL), runs the provider call with a bounded number of calls
+in flight overall and per provider, and settles the job: on success a
+`GeneratedImage` is saved, on failure the reserved credits are refunded. The
+client polls GET /api/studio/generate/{job_id}. Requests sent with
+cache="reuse" may instead be settled at submit time from the generation
+cache (app/services/generation_cache.py).
+
+The pool runs inside the API process (GENERATION_WORKERS_EMBEDDED) or as
+dedicated processes via `python -m scripts.run_generation_worker`.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import count_generation, observe_provider_call
+from app.models import GeneratedImage, GenerationJob
+from app.services import generation_cache
+from app.services.credit_ledger_service import CreditLedgerService
+from app.services.image_generation_service import get_image_generation_service
+from app.services.prompt_enhancement_service import get_prompt_enhancement_service
+from app.services.provider_router import provider_slots
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Provider calls in flight per worker pool; override with GENERATION_PROVIDER_CONCURRENCY
+PROVIDER_CONCURRENCY: Dict[str, int] = {
+    "openai": 4,
+    "gemini": 4,
+    "huggingface": 2,
+    "replicate": 2,
+    "mock": 8,
+    "auto": 8,  # provider_router.ProviderRouter jobs; their calls also take the slots above
+    "default": 2,
+}
+
+# Running jobs not settled within the provider timeout plus this margin belong to a dead worker
+STALE_MARGIN_SECONDS = 60
+
+
+def provider_concurrency(provider: str) -> int:
+    limits = dict(PROVIDER_CONCURRENCY)
+    if settings.GENERATION_PROVIDER_CONCURRENCY:
+        try:
+            limits.update(json.loads(settings.GENERATION_PROVIDER_CONCURRENCY))
+        except (ValueError, TypeError):
+            logger.warning("Ignoring invalid GENERATION_PROVIDER_CONCURRENCY")
+    return int(limits.get(provider, limits["default"]))
+
+
+def _reservation_key(job_id: int) -> str:
+    return f"generation-job-{job_id}"
+
+
+def submit_job(
+    db: Session,
+    user_id: int,
+    prompt: str,
+    tier: str,
+    provider: Optional[str] = None,
+    enhance_prompt: bool = False,
+    template_id: Optional[int] = None,
+    seed: Optional[int] = None,
+    cache: str = generation_cache.FRESH,
+) -> Dict[str, Any]:
+    """
+    Queue a generation and debit its cost in the same transaction
+    With cache="reuse" and a live generation cache entry the job is settled
+    at once with the cached image instead (status succeeded, cached=True).
+    Returns: {success, job?, balance?, cached?, error?}
+    """
+    tier_cost = CreditLedgerService.get_tier_cost(tier)
+    adapter = get_image_generation_service().get_adapter(provider)
+
+    key = None
+    if settings.GENERATION_CACHE_ENABLED:
+        key = generation_cache.cache_key(prompt, tier, adapter.name, seed=seed, enhance_prompt=enhance_prompt)
+    cached = generation_cache.lookup(db, key) if key and cache == generation_cache.REUSE else None
+
+    job = GenerationJob(
+        user_id=user_id,
+        template_id=template_id,
+        prompt_text=prompt,
+        enhance_prompt=enhance_prompt,
+        tier=tier,
+        requested_provider=provider,
+        provider=adapter.name,
+        status=QUEUED,
+        credits_reserved=tier_cost,
+        cache_key=key,
+    )
+    db.add(job)
+    db.flush()
+
+    if cached is not None:
+        # Reuse the stored image: no provider call and no new file
+        image = GeneratedImage(
+            user_id=user_id,
+            template_id=template_id,
+            prompt_text=prompt,
+            tier=tier,
+            image_url=cached.image_url,
+            width=cached.width or 1024,
+            height=cached.height or 1024,
+            provider=cached.provider or adapter.name,
+            job_id=f"gen-job-{job.id}",
+            status=SUCCEEDED,
+            credits_spent=tier_cost,
+        )
+        db.add(image)
+        db.flush()
+        job.status = SUCCEEDED
+        job.image_id = image.id
+        job.finished_at = datetime.utcnow()
+
+    # debit_credits commits the job together with the debit, or rolls both back
+    job_id = job.id
+    debit_result = CreditLedgerService.debit_credits(
+        db,
+        user_id,
+        tier_cost,
+        reason="generation",
+        ref_id=f"gen-job-{job_id}",
+        idempotency_key=_reservation_key(job_id),
+    )
+    if not debit_result["success"]:
+        return {"success": False, "balance": debit_result.get("balance"), "error": debit_result.get("error")}
+
+    if cached is not None:
+        count_generation(adapter.name, SUCCEEDED)
+        logger.info(f"Generation job served from cache: job={job_id}, user={user_id}, tier={tier}")
+    else:
+        logger.info(f"Generation job queued: job={job_id}, user={user_id}, provider={job.provider}, tier={tier}")
+    return {
+        "success": True,
+        "job": db.get(GenerationJob, job_id),
+        "balance": debit_result["balance"],
+        "cached": cached is not None,
+    }
+
+
+def _job_snapshot(job: GenerationJob) -> Dict[str, Any]:
+    return {
+        "id": job.id,
+        "user_id": job.user_id,
+        "template_id": job.template_id,
+        "prompt_text": job.prompt_text,
+        "enhance_prompt": job.enhance_prompt,
+        "tier": job.tier,
+        "requested_provider": job.requested_provider,
+        "provider": job.provider,
+        "credits_reserved": job.credits_reserved,
+    }
+
+
+def claim_next(db: Session, worker_id: str, exclude_providers: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+    """
+    Atomically mark the oldest queued job as running for this worker
+    Jobs for providers in `exclude_providers` (already at their cap) are left
+    for later so one slow provider cannot hold up the others.
+    Returns a plain dict snapshot of the job, or None.
+    """
+    exclude_providers = list(exclude_providers)
+    for _ in range(5):
+        candidate = db.query(GenerationJob.id).filter(GenerationJob.status == QUEUED)
+        if exclude_providers:
+            candidate = candidate.filter(GenerationJob.provider.notin_(exclude_providers))
+        candidate = candidate.order_by(GenerationJob.created_at, GenerationJob.id)
+        if db.get_bind().dialect.name == "postgresql":
+            candidate = candidate.with_for_update(skip_locked=True)
+
+        row = candidate.first()
+        if row is None:
+            db.commit()
+            return None
+
+        now = datetime.utcnow()
+        claimed = db.query(GenerationJob).filter(
+            GenerationJob.id == row.id,
+            GenerationJob.status == QUEUED,
+        ).update({
+            GenerationJob.status: RUNNING,
+            GenerationJob.attempts: GenerationJob.attempts + 1,
+            GenerationJob.locked_by: worker_id,
+            GenerationJob.locked_at: now,
+            GenerationJob.started_at: now,
+        }, synchronize_session=False)
+        db.commit()
+
+        if claimed:
+            return _job_snapshot(db.get(GenerationJob, row.id))
+        # Another worker won the race; try the next candidate
+
+    return None
+
+
+def _fail_and_refund(db: Session, job: GenerationJob, error: str) -> None:
+    """Mark a job failed and give its reserved credits back (commits)"""
+    job.status = FAILED
+    job.error_message = error
+    job.finished_at = datetime.utcnow()
+    job.locked_by = None
+    job.locked_at = None
+    if job.credits_reserved:
+        # credit_credits commits the job update together with the refund
+        refund = CreditLedgerService.credit_credits(
+            db,
+            job.user_id,
+            job.credits_reserved,
+            reason="generation_refund",
+            ref_id=f"gen-job-{job.id}",
+            idempotency_key=f"{_reservation_key(job.id)}-refund",
+        )
+        if not refund["success"]:
+            logger.error(f"CRITICAL: Failed to refund credits for generation job {job.id}: {refund.get('error')}")
+    db.commit()
+    count_generation(job.provider, FAILED)
+
+
+def complete_job(
+    db: Session,
+    job_id: int,
+    worker_id: str,
+    enhanced_prompt: str,
+    result: Dict[str, Any],
+) -> str:
+    """
+    Settle a running job with the provider result
+    Success saves a GeneratedImage; failure refunds the reserved credits.
+    Returns the final status, or the current one if this worker no longer owns the job.
+    """
+    job = db.query(GenerationJob).filter(GenerationJob.id == job_id).first()
+    if job is None or job.status != RUNNING or job.locked_by != worker_id:
+        logger.warning(f"Generation job {job_id} is no longer owned by {worker_id}; dropping result")
+        return job.status if job else FAILED
+
+    if result.get("status") == FAILED or not result.get("image_url"):
+        _fail_and_refund(db, job, result.get("error") or "Image generation failed")
+        logger.warning(f"Generation job {job_id} failed: {job.error_message}")
+        return FAILED
+
+    image = GeneratedImage(
+        user_id=job.user_id,
+        template_id=job.template_id,
+        prompt_text=job.prompt_text,
+        enhanced_prompt=enhanced_prompt,
+        tier=job.tier,
+        image_url=result.get("image_url"),
+        width=result.get("width", 1024),
+        height=result.get("height", 1024),
+        provider=result.get("provider", job.provider),
+        job_id=result.get("job_id") or f"gen-job-{job_id}",
+        status=SUCCEEDED,
+        credits_spent=job.credits_reserved,
+    )
+    db.add(image)
+    db.flush()
+
+    job.status = SUCCEEDED
+    job.image_id = image.id
+    job.error_message = None
+    job.finished_at = datetime.utcnow()
+    job.locked_by = None
+    job.locked_at = None
+    if job.cache_key:
+        # A cache write must never keep the job from settling
+        try:
+            with db.begin_nested():
+                generation_cache.store(db, job.cache_key, {**result, "provider": image.provider})
+        except Exception as e:
+            logger.warning(f"Generation job {job_id}: caching the result failed: {e}")
+    db.commit()
+    count_generation(job.provider, SUCCEEDED)
+
+    logger.info(f"Generation job {job_id} succeeded: image={image.id}")
+    return SUCCEEDED
+
+
+def requeue_stale(db: Session) -> int:
+    """Requeue (or fail and refund, once out of attempts) jobs whose worker died mid-run"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.GENERATION_TIMEOUT_SECONDS + STALE_MARGIN_SECONDS)
+    stale = db.query(GenerationJob).filter(
+        GenerationJob.status == RUNNING,
+        GenerationJob.locked_at < cutoff,
+    ).all()
+
+    for job in stale:
+        if job.attempts >= settings.GENERATION_MAX_ATTEMPTS:
+            _fail_and_refund(db, job, "Generation was interrupted")
+        else:
+            job.status = QUEUED
+            job.locked_by = None
+            job.locked_at = None
+    db.commit()
+
+    if stale:
+        logger.warning(f"Recovered {len(stale)} stale generation job(s)")
+    return len(stale)
+
+
+def queue_depth(db: Session) -> Dict[str, Dict[str, int]]:
+    """Queued and running job counts per provider"""
+    depth: Dict[str, Dict[str, int]] = {}
+    rows = db.query(GenerationJob.provider, GenerationJob.status, func.count(GenerationJob.id)).filter(
+        GenerationJob.status.in_((QUEUED, RUNNING))
+    ).group_by(GenerationJob.provider, GenerationJob.status)
+    for provider, job_status, count in rows:
+        depth.setdefault(provider, {QUEUED: 0, RUNNING: 0})[job_status] = count
+    return depth
+
+
+class GenerationWorkerPool:
+    """Runs queued generation jobs with bounded total and per-provider concurrency"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        concurrency: Optional[int] = None,
+        worker_id: Optional[str] = None,
+    ):
+        self.session_factory = session_factory or SessionLocal
+        self.concurrency = concurrency or settings.GENERATION_MAX_CONCURRENCY
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.active: Dict[str, int] = {}
+        self.succeeded = 0
+        self.failed = 0
+        self._tasks: set = set()
+        self._wakeup = asyncio.Event()
+
+    def _with_session(self, func, *args):
+        db = self.session_factory()
+        try:
+            return func(db, *args)
+        finally:
+            db.close()
+
+    def _saturated_providers(self) -> List[str]:
+        return [provider for provider, count in self.active.items() if count >= provider_concurrency(provider)]
+
+    def try_acquire(self, provider: str) -> bool:
+        """Take a call slot of `provider` if it is below its cap (also used by provider_router)"""
+        if self.active.get(provider, 0) >= provider_concurrency(provider):
+            return False
+        self.active[provider] = self.active.get(provider, 0) + 1
+        return True
+
+    def release(self, provider: str) -> None:
+        self.active[provider] -= 1
+        self._wakeup.set()
+
+    async def _call_provider(self, job: Dict[str, Any]):
+        prompt = job["prompt_text"]
+        if job["enhance_prompt"]:
+            try:
+                prompt = await get_prompt_enhancement_service().enhance_prompt(prompt)
+            except Exception as e:
+                logger.warning(f"Prompt enhancement failed for generation job {job['id']}, using original: {e}")
+
+        adapter = get_image_generation_service().get_adapter(job["requested_provider"])
+        started = time.perf_counter()
+        slots = provider_slots.set(self)
+        try:
+            result = await asyncio.wait_for(
+                adapter.generate(prompt, job["tier"], user_id=job["user_id"]),
+                timeout=settings.GENERATION_TIMEOUT_SECONDS,
+            )
+            outcome = "error" if result.get("status") == FAILED else "success"
+        except asyncio.TimeoutError:
+            result = {"status": FAILED, "error": f"Provider timed out after {settings.GENERATION_TIMEOUT_SECONDS:.0f}s"}
+            outcome = "timeout"
+        except Exception as e:
+            result = {"status": FAILED, "error": str(e)}
+            outcome = "error"
+        finally:
+            provider_slots.reset(slots)
+        observe_provider_call(adapter.name, time.perf_counter() - started, outcome)
+        return prompt, result
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        provider = job["provider"]
+        try:
+            prompt, result = await self._call_provider(job)
+            final_status = await asyncio.to_thread(
+                self._with_session, complete_job, job["id"], self.worker_id, prompt, result
+            )
+            if final_status == SUCCEEDED:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        except Exception as e:
+            # Left running; requeue_stale picks it up once the lock expires
+            logger.error(f"Generation job {job['id']} could not be settled: {e}")
+        finally:
+            self.release(provider)
+
+    async def fill(self) -> int:
+        """Claim jobs until the pool or every provider with queued work is full; returns jobs started"""
+        started = 0
+        while len(self._tasks) < self.concurrency:
+            job = await asyncio.to_thread(
+                self._with_session, claim_next, self.worker_id, self._saturated_providers()
+            )
+            if job is None:
+                break
+            self.active[job["provider"]] = self.active.get(job["provider"], 0) + 1
+            task = asyncio.create_task(self._run(job))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            started += 1
+        return started
+
+    async def drain(self) -> int:
+        """Run everything currently queued and wait for it to settle; returns jobs started"""
+        total = 0
+        while True:
+            total += await self.fill()
+            if not self._tasks:
+                return total
+            await asyncio.wait(set(self._tasks), return_when=asyncio.FIRST_COMPLETED)
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """Process jobs until stop_event is set, then let in-flight generations finish"""
+        logger.info(f"Generation worker pool {self.worker_id} started (concurrency {self.concurrency})")
+        next_stale_check = 0.0
+        try:
+            while not stop_event.is_set():
+                self._wakeup.clear()
+                try:
+                    if time.monotonic() >= next_stale_check:
+                        await asyncio.to_thread(self._with_session, requeue_stale)
+                        next_stale_check = time.monotonic() + STALE_MARGIN_SECONDS
+                    await self.fill()
+                except Exception as e:
+                    logger.error(f"Generation worker pool error: {e}")
+
+                # Wake on a finished job (a slot freed up), on stop, or to poll for new work
+                waiters = [asyncio.ensure_future(self._wakeup.wait()), asyncio.ensure_future(stop_event.wait())]
+                try:
+                    await asyncio.wait(
+                        waiters, timeout=settings.GENERATION_POLL_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+                    )
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+        finally:
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            logger.info(f"Generation worker pool stopped ({self.succeeded} succeeded, {self.failed} failed)")
@@ -4,9 +4,9 @@ Uses free Hugging Face Inference API for prompt enhancement
 """
 
 import logging
-import httpx
 from typing import Optional
 from app.core.config import settings
+from app.core.http_clients import get_http_client
 
 logger = logging.getLogger(__name__)
 
@@ -67,39 +67,39 @@ Enhanced prompt: [/INST]"""
             
             logger.info(f"Enhancing prompt via Hugging Face: {prompt[:50]}...")
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.api_url,
-                    headers=headers,
-                    json=payload
-                )
-                
-                if response.status_code != 200:
-                    logger.error(f"Hugging Face API error: {response.status_code} {response.text}")
-                    # Return original prompt on error
-                    return prompt
-                
-                data = response.json()
-                
-                # Extract generated text
-                if isinstance(data, list) and len(data) > 0:
-                    enhanced = data[0].get("generated_text", "").strip()
-                else:
-                    enhanced = ""
-                
-                # Clean up the response
-                enhanced = enhanced.replace("[/INST]", "").strip()
-                enhanced = enhanced.replace("Enhanced prompt:", "").strip()
-                enhanced = enhanced.strip('"\'')
-                
-                # If enhancement failed or is empty, return original
-                if not enhanced or len(enhanced) < 10:
-                    logger.warning("Enhancement produced empty result, using original")
-                    return prompt
-                
-                logger.info(f"Prompt enhanced: {prompt[:30]}... -> {enhanced[:30]}...")
-                return enhanced
-                
+            client = get_http_client("huggingface")
+            response = await client.post(
+                self.api_url,
+                headers=headers,
+                json=payload
+            )
+
+            if response.status_code != 200:
+                logger.error(f"Hugging Face API error: {response.status_code} {response.text}")
+                # Return original prompt on error
+                return prompt
+
+            data = response.json()
+
+            # Extract generated text
+            if isinstance(data, list) and len(data) > 0:
+                enhanced = data[0].get("generated_text", "").strip()
+            else:
+                enhanced = ""
+
+            # Clean up the response
+            enhanced = enhanced.replace("[/INST]", "").strip()
+            enhanced = enhanced.replace("Enhanced prompt:", "").strip()
+            enhanced = enhanced.strip('"\'')
+
+            # If enhancement failed or is empty, return original
+            if not enhanced or len(enhanced) < 10:
+                logger.warning("Enhancement produced empty result, using original")
+                return prompt
+
+            logger.info(f"Prompt enhanced: {prompt[:30]}... -> {enhanced[:30]}...")
+            return enhanced
+
         except Exception as e:
             logger.error(f"Prompt enhancement failed: {e}")
             # Return original prompt on error
@@ -108,12 +108,13 @@ Enhanced prompt: [/INST]"""
     async def is_available(self) -> bool:
         """Check if Hugging Face API is available"""
         try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                response = await client.get(
-                    "https://api-inference.huggingface.co/",
-                    headers={"Authorization": f"Bearer {self.api_key}"}
-                )
-                return response.status_code in [200, 404]  # 404 is OK, means API is up
+            client = get_http_client("huggingface")
+            response = await client.get(
+                "https://api-inference.huggingface.co/",
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=5.0
+            )
+            return response.status_code in [200, 404]  # 404 is OK, means API is up
         except:
             return False
 
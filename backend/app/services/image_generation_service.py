@@ -7,12 +7,15 @@ import logging
 import os
 import base64
 import io
+import time
 from typing import Optional, Dict, Any
 
-import httpx
 import replicate
 from app.core.config import settings
+from app.core.http_clients import get_http_client
+from app.core.metrics import observe_provider_call
 from app.services.cloudinary_service import cloudinary_service
+from app.services.blob_store import IMAGES, get_blob_store
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +23,10 @@ logger = logging.getLogger(__name__)
 class ImageGenerationAdapter:
     """Base adapter for image generation providers"""
 
-    async def generate(self, prompt: str, tier: str = "standard") -> Dict[str, Any]:
+    # Provider name used for per-provider concurrency caps and GeneratedImage.provider
+    name = "base"
+
+    async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
         """Generate image from prompt. Returns {job_id, status}"""
         raise NotImplementedError
 
@@ -28,6 +34,8 @@ class ImageGenerationAdapter:
 class ReplicateAdapter(ImageGenerationAdapter):
     """Replicate.com adapter for SDXL and other models"""
 
+    name = "replicate"
+
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.IMAGEGEN_API_KEY
         if not self.api_key:
@@ -35,7 +43,7 @@ class ReplicateAdapter(ImageGenerationAdapter):
         # Configure Replicate via environment variable expected by the SDK
         os.environ["REPLICATE_API_TOKEN"] = self.api_key
 
-    async def generate(self, prompt: str, tier: str = "standard") -> Dict[str, Any]:
+    async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
         """
         Generate image using Replicate API
         Returns: {job_id, status, model_id}
@@ -95,6 +103,8 @@ class ReplicateAdapter(ImageGenerationAdapter):
 class GeminiNanoBananaAdapter(ImageGenerationAdapter):
     """Google Gemini 2.5 Flash Image (Nano Banana) - Latest 2025 model"""
 
+    name = "gemini"
+
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.GEMINI_API_KEY
         if not self.api_key:
@@ -134,18 +144,18 @@ class GeminiNanoBananaAdapter(ImageGenerationAdapter):
                 }
             }
 
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.post(url, headers=headers, json=payload)
-                if resp.status_code != 200:
-                    err_txt = resp.text
-                    logger.error(f"Nano Banana generate failed: {resp.status_code} {err_txt}")
-                    return {
-                        "job_id": None,
-                        "status": "failed",
-                        "error": f"Nano Banana API error: {resp.status_code}",
-                        "provider": "gemini_nano_banana",
-                    }
-                data = resp.json()
+            client = get_http_client("gemini")
+            resp = await client.post(url, headers=headers, json=payload)
+            if resp.status_code != 200:
+                err_txt = resp.text
+                logger.error(f"Nano Banana generate failed: {resp.status_code} {err_txt}")
+                return {
+                    "job_id": None,
+                    "status": "failed",
+                    "error": f"Nano Banana API error: {resp.status_code}",
+                    "provider": "gemini_nano_banana",
+                }
+            data = resp.json()
 
             # Extract base64 image from response (inline_data format)
             b64 = None
@@ -172,10 +182,8 @@ class GeminiNanoBananaAdapter(ImageGenerationAdapter):
             img_bytes = base64.b64decode(b64)
             buf = io.BytesIO(img_bytes)
 
-            # Save to local storage instead of Cloudinary
-            from app.services.local_storage_service import get_local_storage_service
-            storage = get_local_storage_service()
-            image_url = storage.save_image(img_bytes, user_id, extension="png")
+            # Content-addressed blob store (identical images are stored once)
+            image_url = (await get_blob_store(IMAGES).save_async(img_bytes, "png")).url
 
             import uuid
             return {
@@ -199,6 +207,8 @@ class GeminiNanoBananaAdapter(ImageGenerationAdapter):
 class OpenAIDALLEAdapter(ImageGenerationAdapter):
     """OpenAI DALL-E 3 adapter for image generation"""
 
+    name = "openai"
+
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.OPENAI_API_KEY
         if not self.api_key:
@@ -217,8 +227,6 @@ class OpenAIDALLEAdapter(ImageGenerationAdapter):
     async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
         """Generate image using OpenAI DALL-E 3"""
         try:
-            from app.services.local_storage_service import get_local_storage_service
-
             params = self._tier_params(tier)
             url = f"{self.api_base}/images/generations"
             headers = {
@@ -237,30 +245,27 @@ class OpenAIDALLEAdapter(ImageGenerationAdapter):
 
             logger.info(f"Generating image via DALL-E 3: {prompt[:50]}...")
 
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                resp = await client.post(url, headers=headers, json=payload)
-                if resp.status_code != 200:
-                    err_txt = resp.text
-                    logger.error(f"DALL-E 3 generate failed: {resp.status_code} {err_txt}")
-                    return {
-                        "job_id": None,
-                        "status": "failed",
-                        "error": f"DALL-E 3 API error: {resp.status_code}",
-                        "provider": "openai_dalle",
-                    }
-                data = resp.json()
+            client = get_http_client("openai")
+            resp = await client.post(url, headers=headers, json=payload)
+            if resp.status_code != 200:
+                err_txt = resp.text
+                logger.error(f"DALL-E 3 generate failed: {resp.status_code} {err_txt}")
+                return {
+                    "job_id": None,
+                    "status": "failed",
+                    "error": f"DALL-E 3 API error: {resp.status_code}",
+                    "provider": "openai_dalle",
+                }
+            data = resp.json()
 
             # Extract image URL from response
             image_url = data["data"][0]["url"]
 
-            # Download and save to local storage
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                img_resp = await client.get(image_url)
-                img_bytes = img_resp.content
-
-            # Save locally instead of Cloudinary
-            storage = get_local_storage_service()
-            local_url = storage.save_image(img_bytes, user_id, extension="png")
+            # Stream the download into the blob store (reuses the pooled client)
+            async with client.stream("GET", image_url) as img_resp:
+                img_resp.raise_for_status()
+                blob = await get_blob_store(IMAGES).save_async(img_resp.aiter_bytes(), "png")
+            local_url = blob.url
 
             import uuid
             return {
@@ -286,6 +291,8 @@ class OpenAIDALLEAdapter(ImageGenerationAdapter):
 class HuggingFaceAdapter(ImageGenerationAdapter):
     """Hugging Face Inference API adapter (Free tier: 1000 calls/day)"""
 
+    name = "huggingface"
+
     def __init__(self, api_key: Optional[str] = None):
         self.api_key = api_key or settings.HUGGINGFACE_API_KEY
         if not self.api_key:
@@ -306,8 +313,6 @@ class HuggingFaceAdapter(ImageGenerationAdapter):
     async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
         """Generate image using Hugging Face Inference API"""
         try:
-            from app.services.local_storage_service import get_local_storage_service
-
             params = self._tier_params(tier)
             headers = {
                 "Authorization": f"Bearer {self.api_key}",
@@ -325,24 +330,23 @@ class HuggingFaceAdapter(ImageGenerationAdapter):
 
             logger.info(f"Generating image via Hugging Face: {prompt[:50]}...")
 
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                resp = await client.post(self.api_url, headers=headers, json=payload)
-                if resp.status_code != 200:
-                    err_txt = resp.text
-                    logger.error(f"Hugging Face generate failed: {resp.status_code} {err_txt}")
-                    return {
-                        "job_id": None,
-                        "status": "failed",
-                        "error": f"Hugging Face API error: {resp.status_code}",
-                        "provider": "huggingface",
-                    }
+            client = get_http_client("huggingface")
+            resp = await client.post(self.api_url, headers=headers, json=payload)
+            if resp.status_code != 200:
+                err_txt = resp.text
+                logger.error(f"Hugging Face generate failed: {resp.status_code} {err_txt}")
+                return {
+                    "job_id": None,
+                    "status": "failed",
+                    "error": f"Hugging Face API error: {resp.status_code}",
+                    "provider": "huggingface",
+                }
 
-                # Response is raw image bytes
-                img_bytes = resp.content
+            # Response is raw image bytes
+            img_bytes = resp.content
 
-            # Save to local storage instead of Cloudinary
-            storage = get_local_storage_service()
-            local_url = storage.save_image(img_bytes, user_id, extension="png")
+            # Save to the blob store instead of Cloudinary
+            local_url = (await get_blob_store(IMAGES).save_async(img_bytes, "png")).url
 
             import uuid
             return {
@@ -368,6 +372,8 @@ class HuggingFaceAdapter(ImageGenerationAdapter):
 class MockImageGenerationAdapter(ImageGenerationAdapter):
     """Mock adapter for testing - generates images locally with PIL"""
 
+    name = "mock"
+
     async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
         """
         Generate mock image using PIL (local generation)
@@ -377,7 +383,6 @@ class MockImageGenerationAdapter(ImageGenerationAdapter):
             import uuid
             from datetime import datetime
             from PIL import Image, ImageDraw, ImageFont
-            from app.services.local_storage_service import get_local_storage_service
 
             # Generate unique job ID
             job_id = f"mock-{uuid.uuid4().hex[:12]}"
@@ -421,9 +426,8 @@ class MockImageGenerationAdapter(ImageGenerationAdapter):
             img.save(buf, format='PNG')
             image_bytes = buf.getvalue()
 
-            # Save to local storage
-            storage = get_local_storage_service()
-            image_url = storage.save_image(image_bytes, user_id, extension="png")
+            # Save to the blob store
+            image_url = (await get_blob_store(IMAGES).save_async(image_bytes, "png")).url
 
             logger.info(f"Mock image saved: {image_url}")
 
@@ -508,8 +512,13 @@ class ImageGenerationService:
 
     def __init__(self):
         self.provider = settings.IMAGEGEN_PROVIDER
+        self._router: Optional[ImageGenerationAdapter] = None
         self.adapter = self._get_adapter()
 
+    def get_adapter(self, provider: Optional[str] = None) -> ImageGenerationAdapter:
+        """Adapter for a provider override, or the configured default"""
+        return self._get_adapter(provider) if provider else self.adapter
+
     def _get_adapter(self, provider_override: Optional[str] = None) -> ImageGenerationAdapter:
         """Get appropriate adapter based on configuration or override"""
         provider = provider_override or self.provider
@@ -546,28 +555,35 @@ class ImageGenerationService:
         elif provider == "mock":
             return MockImageGenerationAdapter()
 
-        # Auto mode: Try providers in order until one works
+        # Auto mode: route between every configured provider by latency and health
         elif provider == "auto":
-            # Try OpenAI first (best quality, you have API key)
-            if settings.OPENAI_API_KEY:
-                logger.info("Auto mode: Using OpenAI DALL-E 3")
-                return OpenAIDALLEAdapter(settings.OPENAI_API_KEY)
-            # Try Hugging Face (free tier)
-            elif settings.HUGGINGFACE_API_KEY:
-                logger.info("Auto mode: Using Hugging Face")
-                return HuggingFaceAdapter(settings.HUGGINGFACE_API_KEY)
-            # Try Gemini
-            elif settings.GEMINI_API_KEY:
-                logger.info("Auto mode: Using Gemini Nano Banana")
-                return GeminiNanoBananaAdapter(settings.GEMINI_API_KEY)
-            # Fallback to mock
-            else:
-                logger.warning("Auto mode: No API keys configured, using mock adapter")
-                return MockImageGenerationAdapter()
+            return self._get_router()
 
         else:
             raise ValueError(f"Unknown image generation provider: {provider}")
 
+    def _get_router(self) -> ImageGenerationAdapter:
+        """The shared auto-mode router (its latency stats live as long as the service)"""
+        if self._router is None:
+            from app.services.provider_router import ProviderRouter
+
+            # Configured order is the tie-break until latencies are known
+            adapters = []
+            if settings.OPENAI_API_KEY:
+                adapters.append(OpenAIDALLEAdapter(settings.OPENAI_API_KEY))
+            if settings.HUGGINGFACE_API_KEY:
+                adapters.append(HuggingFaceAdapter(settings.HUGGINGFACE_API_KEY))
+            if settings.GEMINI_API_KEY:
+                adapters.append(GeminiNanoBananaAdapter(settings.GEMINI_API_KEY))
+
+            if not adapters:
+                logger.warning("Auto mode: No API keys configured, using mock adapter")
+                self._router = MockImageGenerationAdapter()
+            else:
+                logger.info(f"Auto mode: routing between {', '.join(adapter.name for adapter in adapters)}")
+                self._router = ProviderRouter(adapters)
+        return self._router
+
     async def generate_image(
         self,
         prompt: str,
@@ -585,11 +601,18 @@ class ImageGenerationService:
         Returns: {job_id, status, image_url?, error?}
         """
         # Use provider override if specified
-        adapter = self._get_adapter(provider) if provider else self.adapter
+        adapter = self.get_adapter(provider)
 
         logger.info(f"Generating image with tier={tier}, provider={provider or self.provider}: {prompt[:50]}...")
-        result = await adapter.generate(prompt, tier, user_id=user_id)
-        return result
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            result = await adapter.generate(prompt, tier, user_id=user_id)
+            if result.get("status") != "failed":
+                outcome = "success"
+            return result
+        finally:
+            observe_provider_call(adapter.name, time.perf_counter() - started, outcome)
 
     async def get_generation_status(self, job_id: str) -> Dict[str, Any]:
         """Get status of a generation job"""
@@ -1,5 +1,5 @@
 """Invoice generation service using ReportLab"""
-import os
+import io
 from datetime import datetime
 from typing import Optional
 from sqlalchemy.orm import Session
@@ -14,6 +14,7 @@ from app.models.invoice import Invoice
 from app.models.payment import Payment
 from app.models.user import User
 from app.models.package import Package
+from app.services.blob_store import INVOICES, get_blob_store
 
 
 class InvoiceService:
@@ -21,8 +22,7 @@ class InvoiceService:
     
     def __init__(self, db: Session):
         self.db = db
-        self.invoice_dir = "invoices"
-        os.makedirs(self.invoice_dir, exist_ok=True)
+        self.store = get_blob_store(INVOICES)
     
     def generate_invoice_number(self) -> str:
         """Generate unique invoice number"""
@@ -89,20 +89,18 @@ class InvoiceService:
         self.db.commit()
         self.db.refresh(invoice)
         
-        # Generate PDF
-        pdf_path = self.generate_pdf(invoice, user, payment)
-        invoice.pdf_url = pdf_path
+        # Generate PDF (pdf_url holds its blob key)
+        invoice.pdf_url = self.generate_pdf(invoice, user, payment)
         self.db.commit()
         
         return invoice
     
     def generate_pdf(self, invoice: Invoice, user: User, payment: Payment) -> str:
-        """Generate PDF invoice"""
-        filename = f"{invoice.invoice_number}.pdf"
-        filepath = os.path.join(self.invoice_dir, filename)
+        """Generate PDF invoice into the invoice blob store; returns the blob key"""
+        buffer = io.BytesIO()
         
         # Create PDF document
-        doc = SimpleDocTemplate(filepath, pagesize=A4)
+        doc = SimpleDocTemplate(buffer, pagesize=A4)
         story = []
         styles = getSampleStyleSheet()
         
@@ -220,7 +218,8 @@ class InvoiceService:
         # Build PDF
         doc.build(story)
         
-        return filepath
+        buffer.seek(0)
+        return self.store.save(buffer, "pdf").key
     
     def get_invoice_by_id(self, invoice_id: int) -> Optional[Invoice]:
         """Get invoice by ID"""
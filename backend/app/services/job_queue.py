@@ -0,0 +1,295 @@
+"""
+Background Job Queue
+Durable, database-backed queue for work that should not run inside a request
+
+Jobs are rows in `background_jobs`. `enqueue` adds a row to the caller's
+transaction, so a job exists if and only if the work that produced it was
+committed. Workers (`python -m scripts.run_job_worker`) claim due jobs with
+a conditional UPDATE (plus SKIP LOCKED on PostgreSQL), run the registered
+handler, and on failure requeue with exponential backoff until
+max_attempts, after which the job is dead-lettered (status 'dead') for an
+admin to inspect and retry.
+
+Handlers run at least once, so they must be idempotent.
+"""
+
+import importlib
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[Session, Dict[str, Any]], None]
+
+# kind -> handler(db, payload)
+HANDLERS: Dict[str, JobHandler] = {}
+
+# Modules whose import registers handlers; loaded by workers before they poll
+HANDLER_MODULES = [
+    "app.services.post_payment_jobs",
+]
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+DEAD = "dead"
+
+
+def job_handler(kind: str):
+    """Register a function as the handler for `kind` jobs"""
+    def decorator(func: JobHandler) -> JobHandler:
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def load_handlers() -> None:
+    for module in HANDLER_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Dict[str, Any],
+    idempotency_key: str,
+    max_attempts: Optional[int] = None,
+    delay_seconds: float = 0,
+) -> BackgroundJob:
+    """
+    Add a job to the caller's transaction (the caller commits)
+    Returns the existing job if one with the same idempotency key was already enqueued.
+    """
+    existing = db.query(BackgroundJob).filter(BackgroundJob.idempotency_key == idempotency_key).first()
+    if existing:
+        return existing
+
+    job = BackgroundJob(
+        kind=kind,
+        payload=payload,
+        idempotency_key=idempotency_key,
+        status=QUEUED,
+        max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        run_at=datetime.utcnow() + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with jitter after the given number of failed attempts"""
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * (2 ** (attempts - 1)), settings.JOB_RETRY_MAX_SECONDS)
+    return delay * random.uniform(1.0, 1.25)
+
+
+def claim_next(db: Session, worker_id: str) -> Optional[BackgroundJob]:
+    """
+    Atomically mark the oldest due job as running for this worker
+    The status check in the UPDATE makes concurrent workers safe on any database;
+    SKIP LOCKED lets PostgreSQL workers pass over each other's candidates.
+    """
+    for _ in range(5):
+        now = datetime.utcnow()
+        candidate = db.query(BackgroundJob.id).filter(
+            BackgroundJob.status == QUEUED,
+            BackgroundJob.run_at <= now,
+        ).order_by(BackgroundJob.run_at, BackgroundJob.id)
+        if db.get_bind().dialect.name == "postgresql":
+            candidate = candidate.with_for_update(skip_locked=True)
+
+        row = candidate.first()
+        if row is None:
+            db.commit()
+            return None
+
+        claimed = db.query(BackgroundJob).filter(
+            BackgroundJob.id == row.id,
+            BackgroundJob.status == QUEUED,
+        ).update({
+            BackgroundJob.status: RUNNING,
+            BackgroundJob.attempts: BackgroundJob.attempts + 1,
+            BackgroundJob.locked_by: worker_id,
+            BackgroundJob.locked_at: now,
+            BackgroundJob.started_at: now,
+        }, synchronize_session=False)
+        db.commit()
+
+        if claimed:
+            return db.get(BackgroundJob, row.id)
+        # Another worker won the race; try the next candidate
+
+    return None
+
+
+def run_job(db: Session, job: BackgroundJob) -> bool:
+    """
+    Run a claimed job and record the outcome
+    Returns True if the handler succeeded.
+    """
+    job_id = job.id
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        handler(db, dict(job.payload or {}))
+    except Exception as e:
+        db.rollback()
+        job = db.get(BackgroundJob, job_id)
+        job.last_error = f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}"
+        job.locked_by = None
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = DEAD
+            job.finished_at = datetime.utcnow()
+            logger.error(f"Job {job_id} ({job.kind}) dead-lettered after {job.attempts} attempt(s): {e}")
+        else:
+            job.status = QUEUED
+            job.run_at = datetime.utcnow() + timedelta(seconds=retry_delay(job.attempts))
+            logger.warning(f"Job {job_id} ({job.kind}) failed attempt {job.attempts}, retrying at {job.run_at}: {e}")
+        db.commit()
+        return False
+
+    job.status = SUCCEEDED
+    job.finished_at = datetime.utcnow()
+    job.last_error = None
+    job.locked_by = None
+    job.locked_at = None
+    db.commit()
+    logger.info(f"Job {job_id} ({job.kind}) succeeded")
+    return True
+
+
+def requeue_stale(db: Session) -> int:
+    """Return jobs whose worker died mid-run to the queue"""
+    cutoff = datetime.utcnow() - timedelta(seconds=settings.JOB_LOCK_TIMEOUT_SECONDS)
+    requeued = db.query(BackgroundJob).filter(
+        BackgroundJob.status == RUNNING,
+        BackgroundJob.locked_at < cutoff,
+    ).update({
+        BackgroundJob.status: QUEUED,
+        BackgroundJob.locked_by: None,
+        BackgroundJob.locked_at: None,
+        BackgroundJob.run_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    db.commit()
+    if requeued:
+        logger.warning(f"Requeued {requeued} stale job(s)")
+    return requeued
+
+
+def retry_dead_job(db: Session, job_id: int) -> Optional[BackgroundJob]:
+    """Move a dead-lettered job back to the queue with a fresh attempt budget"""
+    job = db.query(BackgroundJob).filter(BackgroundJob.id == job_id, BackgroundJob.status == DEAD).first()
+    if not job:
+        return None
+    job.status = QUEUED
+    job.attempts = 0
+    job.run_at = datetime.utcnow()
+    job.finished_at = None
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def drain(db: Session, worker_id: str = "inline", max_jobs: Optional[int] = None) -> int:
+    """Process due jobs on the given session until the queue is empty; returns jobs run"""
+    load_handlers()
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next(db, worker_id)
+        if job is None:
+            break
+        run_job(db, job)
+        processed += 1
+    return processed
+
+
+def run_worker(
+    session_factory: Optional[Callable[[], Session]] = None,
+    worker_id: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+) -> int:
+    """
+    Poll for and run jobs until stop_event is set; returns jobs run
+    Each job runs on a fresh session so a failed handler cannot poison the next one.
+    """
+    if session_factory is None:
+        from app.core.database import SessionLocal
+        session_factory = SessionLocal
+
+    load_handlers()
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    processed = 0
+    next_stale_check = 0.0
+
+    logger.info(f"Job worker {worker_id} started")
+    while not stop_event.is_set():
+        db = session_factory()
+        try:
+            if time.monotonic() >= next_stale_check:
+                requeue_stale(db)
+                next_stale_check = time.monotonic() + settings.JOB_LOCK_TIMEOUT_SECONDS / 2
+
+            job = claim_next(db, worker_id)
+            if job is not None:
+                run_job(db, job)
+                processed += 1
+        except Exception as e:
+            logger.error(f"Job worker {worker_id} error: {e}")
+            job = None
+        finally:
+            db.close()
+
+        if job is None:
+            stop_event.wait(settings.JOB_POLL_INTERVAL_SECONDS)
+
+    logger.info(f"Job worker {worker_id} stopped after {processed} job(s)")
+    return processed
+
+
+def queue_metrics(db: Session, sample_size: int = 500) -> Dict[str, Any]:
+    """
+    Queue depth per status plus latency figures:
+    - oldest_due_age_seconds: how long the oldest runnable job has been waiting
+    - avg_wait_seconds / avg_run_seconds: over the most recent finished jobs
+    """
+    now = datetime.utcnow()
+    depth = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, DEAD: 0}
+    for job_status, count in db.query(BackgroundJob.status, func.count(BackgroundJob.id)).group_by(BackgroundJob.status):
+        depth[job_status] = count
+
+    oldest_due = db.query(func.min(BackgroundJob.created_at)).filter(
+        BackgroundJob.status == QUEUED,
+        BackgroundJob.run_at <= now,
+    ).scalar()
+
+    recent = db.query(
+        BackgroundJob.created_at, BackgroundJob.started_at, BackgroundJob.finished_at
+    ).filter(
+        BackgroundJob.status == SUCCEEDED,
+    ).order_by(BackgroundJob.finished_at.desc()).limit(sample_size).all()
+
+    waits = [(started - created).total_seconds() for created, started, _ in recent if started and created]
+    runs = [(finished - started).total_seconds() for _, started, finished in recent if finished and started]
+
+    return {
+        "depth": depth,
+        "oldest_due_age_seconds": (now - oldest_due).total_seconds() if oldest_due else 0.0,
+        "avg_wait_seconds": sum(waits) / len(waits) if waits else 0.0,
+        "avg_run_seconds": sum(runs) / len(runs) if runs else 0.0,
+        "sampled_jobs": len(recent),
+    }
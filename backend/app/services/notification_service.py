@@ -1,7 +1,6 @@
 from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.notification import Notification
-from app.core.database import engine
 
 
 def create_notification(
@@ -18,9 +17,6 @@ def create_notification(
     """
     Create a notification for a user
     """
-    # Ensure table exists
-    Notification.__table__.create(bind=engine, checkfirst=True)
-    
     notification = Notification(
         user_id=user_id,
         title=title,
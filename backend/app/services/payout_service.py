@@ -3,8 +3,11 @@ Payout Service
 
 Handles weekly payout calculations and processing
 """
+import logging
+import time
+
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import DateTime, func, insert, literal, select, update
 from datetime import datetime, timedelta
 from typing import List, Dict
 
@@ -13,6 +16,8 @@ from app.models.commission import Commission
 from app.models.payout import Payout
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 
 def calculate_pending_payouts(db: Session) -> List[Dict]:
     """
@@ -43,49 +48,114 @@ def calculate_pending_payouts(db: Session) -> List[Dict]:
     return payouts
 
 
-def create_payout_batch(db: Session) -> List[Payout]:
+def create_payout_batch(db: Session, chunk_size: int = 5_000) -> Dict:
     """
     Create payout records for all eligible users
     
     This should be run weekly (e.g., every Monday)
     
+    Set-based: eligible users are processed in chunks of `chunk_size`, each
+    in one transaction of three statements (claim the chunk's pending
+    commissions, INSERT ... SELECT one payout per user, UPDATE ... FROM to link
+    the claimed commissions to it). Only commissions that existed when the run
+    started are paid. A crashed or interrupted run can simply be run again:
+    committed chunks are no longer pending and the rest are picked up.
+    
     Returns:
-        List of created payout records
+        {payouts, commissions, amount, chunks, timings: {phase: seconds}, seconds}
     """
-    pending_payouts = calculate_pending_payouts(db)
-    
-    created_payouts = []
-    for payout_data in pending_payouts:
-        user_id = payout_data['user_id']
-        amount = payout_data['amount']
-        
-        # Get pending commissions for this user
-        pending_commissions = db.query(Commission).filter(
-            Commission.user_id == user_id,
-            Commission.status == 'pending'
-        ).all()
-        
-        # Create payout record
-        payout = Payout(
-            user_id=user_id,
-            amount=amount,
-            status='pending',
-            payout_date=datetime.utcnow()
-        )
-        
-        db.add(payout)
-        db.flush()  # Get payout ID
-        
-        # Link commissions to payout
-        for commission in pending_commissions:
-            commission.payout_id = payout.id
-            commission.status = 'processing'
-        
-        created_payouts.append(payout)
-    
-    db.commit()
-    
-    return created_payouts
+    started = time.perf_counter()
+    timings = {'eligible': 0.0, 'claim': 0.0, 'insert': 0.0, 'link': 0.0, 'commit': 0.0}
+    summary = {'payouts': 0, 'commissions': 0, 'amount': 0.0, 'chunks': 0}
+    run_at = datetime.utcnow()
+
+    # Phase 1: eligible users (one grouped query), and the newest commission the run covers
+    phase = time.perf_counter()
+    cutoff_id = db.query(func.max(Commission.id)).scalar() or 0
+    user_ids = [user_id for (user_id,) in db.query(Commission.user_id).filter(
+        Commission.status == 'pending',
+        Commission.id <= cutoff_id
+    ).group_by(Commission.user_id).having(
+        func.sum(Commission.amount) >= settings.MINIMUM_PAYOUT_AMOUNT
+    ).order_by(Commission.user_id)]
+    timings['eligible'] += time.perf_counter() - phase
+
+    for offset in range(0, len(user_ids), chunk_size):
+        chunk = user_ids[offset:offset + chunk_size]
+        in_chunk = Commission.user_id.between(chunk[0], chunk[-1])
+
+        try:
+            # Claim: pending -> processing (unlinked) for users still eligible in this id range
+            phase = time.perf_counter()
+            eligible = select(Commission.user_id).where(
+                Commission.status == 'pending',
+                Commission.id <= cutoff_id,
+                in_chunk
+            ).group_by(Commission.user_id).having(
+                func.sum(Commission.amount) >= settings.MINIMUM_PAYOUT_AMOUNT
+            )
+            claimed = db.execute(
+                update(Commission).where(
+                    Commission.status == 'pending',
+                    Commission.id <= cutoff_id,
+                    in_chunk,
+                    Commission.user_id.in_(eligible)
+                ).values(status='processing').execution_options(synchronize_session=False)
+            ).rowcount
+            timings['claim'] += time.perf_counter() - phase
+
+            # One payout per user for the sum of their claimed commissions
+            phase = time.perf_counter()
+            unlinked = (Commission.status == 'processing') & Commission.payout_id.is_(None) & in_chunk
+            created = db.execute(
+                insert(Payout).from_select(
+                    ['user_id', 'amount', 'status', 'payout_date', 'created_at'],
+                    select(
+                        Commission.user_id,
+                        func.sum(Commission.amount),
+                        literal('pending'),
+                        literal(run_at, DateTime),
+                        literal(run_at, DateTime)
+                    ).where(unlinked).group_by(Commission.user_id)
+                )
+            ).rowcount
+            timings['insert'] += time.perf_counter() - phase
+
+            # Link the claimed commissions to this run's payouts
+            phase = time.perf_counter()
+            db.execute(
+                update(Commission).where(
+                    unlinked,
+                    Payout.user_id == Commission.user_id,
+                    Payout.payout_date == run_at,
+                    Payout.status == 'pending'
+                ).values(payout_id=Payout.id).execution_options(synchronize_session=False)
+            )
+            timings['link'] += time.perf_counter() - phase
+
+            phase = time.perf_counter()
+            db.commit()
+            timings['commit'] += time.perf_counter() - phase
+        except Exception:
+            db.rollback()
+            logger.exception(f"Payout batch failed in chunk of users {chunk[0]}-{chunk[-1]}; completed chunks are kept, re-run to resume")
+            raise
+
+        summary['chunks'] += 1
+        summary['payouts'] += created
+        summary['commissions'] += claimed
+
+    summary['amount'] = float(db.query(func.coalesce(func.sum(Payout.amount), 0.0)).filter(
+        Payout.payout_date == run_at
+    ).scalar())
+    summary['timings'] = timings
+    summary['seconds'] = time.perf_counter() - started
+    logger.info(
+        f"Payout batch: {summary['payouts']} payouts, {summary['commissions']} commissions in {summary['chunks']} chunks, "
+        + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+    )
+
+    return summary
 
 
 def process_payout(payout_id: int, db: Session, transaction_id: str = None, payment_method: str = None) -> Payout:
@@ -0,0 +1,76 @@
+"""
+Post-Payment Jobs
+Side effects of a verified package payment, run by the background job queue
+instead of inside the verification request
+"""
+
+import logging
+from typing import Any, Dict
+
+from sqlalchemy.orm import Session
+
+from app.models import Payment, Package, User
+from app.services.job_queue import enqueue, job_handler
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_post_payment_jobs(db: Session, payment: Payment, additional_note: str = "") -> None:
+    """
+    Queue commissions, invoice and confirmation email for a successful payment
+    Added to the caller's transaction, so they commit together with the payment.
+    """
+    enqueue(
+        db, "referral_commissions",
+        {"user_id": payment.user_id, "package_id": payment.package_id, "payment_id": payment.id},
+        idempotency_key=f"payment:{payment.id}:referral_commissions",
+    )
+    enqueue(
+        db, "payment_invoice",
+        {"payment_id": payment.id},
+        idempotency_key=f"payment:{payment.id}:invoice",
+    )
+    enqueue(
+        db, "purchase_confirmation_email",
+        {"payment_id": payment.id, "additional_note": additional_note},
+        idempotency_key=f"payment:{payment.id}:confirmation_email",
+    )
+
+
+@job_handler("referral_commissions")
+def run_referral_commissions(db: Session, payload: Dict[str, Any]) -> None:
+    from app.services.referral_service import process_referral_commissions
+    process_referral_commissions(payload["user_id"], payload["package_id"], db, payment_id=payload.get("payment_id"))
+
+
+@job_handler("payment_invoice")
+def run_payment_invoice(db: Session, payload: Dict[str, Any]) -> None:
+    from app.services.invoice_service import InvoiceService
+    invoice = InvoiceService(db).create_invoice(payload["payment_id"])
+    logger.info(f"Invoice generated: {invoice.invoice_number}")
+
+
+@job_handler("purchase_confirmation_email")
+def run_purchase_confirmation_email(db: Session, payload: Dict[str, Any]) -> None:
+    from app.utils.email import send_purchase_confirmation_email
+
+    payment = db.query(Payment).filter(Payment.id == payload["payment_id"]).first()
+    if not payment:
+        raise ValueError(f"Payment {payload['payment_id']} not found")
+    user = db.query(User).filter(User.id == payment.user_id).first()
+    package = db.query(Package).filter(Package.id == payment.package_id).first()
+    if not user or not package:
+        return
+
+    # Queued in the job's transaction: a retried job finds the keyed row instead of adding another
+    send_purchase_confirmation_email(
+        to_email=user.email,
+        user_name=user.full_name,
+        package_name=package.name,
+        package_price=package.final_price,
+        transaction_id=payment.razorpay_payment_id,
+        purchase_date=payment.completed_at,
+        additional_note=payload.get("additional_note", ""),
+        db=db,
+        dedupe_key=f"payment:{payment.id}:confirmation"
+    )
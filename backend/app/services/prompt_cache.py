@@ -0,0 +1,215 @@
+"""
+Prompt Enhancement Cache
+Bounded LRU cache in front of the prompt enhancement providers
+
+PromptEnhancementCache.get_or_compute() looks the prompt up in a backend and,
+on a miss, runs the upstream call once however many requests ask for the
+same prompt at the same time: concurrent callers await the same task.
+Results are only stored when the enhancement succeeded (a provider failure
+falls back to the original prompt, which must not be cached).
+
+Backends (PROMPT_ENHANCER_CACHE_BACKEND):
+  - memory: per process, OrderedDict with O(1) get/set/evict
+  - sqlite: a table in PROMPT_ENHANCER_CACHE_PATH shared by every uvicorn
+    worker on the host (WAL mode); LRU order is kept in an indexed
+    last_used_at column
+
+Both evict the least recently used entries beyond
+PROMPT_ENHANCER_CACHE_MAX_ENTRIES and ignore entries older than
+PROMPT_ENHANCER_CACHE_TTL_SECONDS. Coalescing is per process; with the
+sqlite backend other workers see the result as soon as it is stored.
+"""
+
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_key(prompt: str, namespace: str = "") -> str:
+    """SHA-256 hex of the provider/model namespace and whitespace-collapsed prompt"""
+    return hashlib.sha256(f"{namespace}\x1f{' '.join(prompt.split())}".encode("utf-8")).hexdigest()
+
+
+class PromptCacheBackend:
+    """Storage for enhanced prompts"""
+
+    # Backends doing I/O are called from a worker thread
+    blocking = False
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryPromptCache(PromptCacheBackend):
+    """In-process LRU: OrderedDict in recency order, oldest first"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() - entry[1] >= self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            self._entries[key] = (value, self.clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLitePromptCache(PromptCacheBackend):
+    """LRU table in a SQLite file shared by the workers on one host"""
+
+    blocking = True
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS prompt_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_prompt_cache_last_used ON prompt_cache (last_used_at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections must not be shared across threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0)
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = self.clock()
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, stored_at FROM prompt_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl_seconds:
+                conn.execute("DELETE FROM prompt_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE prompt_cache SET last_used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str) -> None:
+        now = self.clock()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO prompt_cache (key, value, stored_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            conn.execute(
+                "DELETE FROM prompt_cache WHERE key IN ("
+                " SELECT key FROM prompt_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM prompt_cache")
+
+    def __len__(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM prompt_cache").fetchone()[0]
+
+
+def create_backend() -> PromptCacheBackend:
+    """Backend selected by PROMPT_ENHANCER_CACHE_BACKEND"""
+    backend = settings.PROMPT_ENHANCER_CACHE_BACKEND
+    if backend == "memory":
+        return MemoryPromptCache(settings.PROMPT_ENHANCER_CACHE_MAX_ENTRIES, settings.PROMPT_ENHANCER_CACHE_TTL_SECONDS)
+    if backend == "sqlite":
+        return SQLitePromptCache(
+            settings.PROMPT_ENHANCER_CACHE_PATH,
+            settings.PROMPT_ENHANCER_CACHE_MAX_ENTRIES,
+            settings.PROMPT_ENHANCER_CACHE_TTL_SECONDS,
+        )
+    raise ValueError(f"Unknown prompt enhancer cache backend: {backend}")
+
+
+class PromptEnhancementCache:
+    """Cache lookups with request coalescing (see module docstring)"""
+
+    def __init__(self, backend: PromptCacheBackend, namespace: str = ""):
+        self.backend = backend
+        self.namespace = namespace
+        self._in_flight: Dict[Tuple[int, str], asyncio.Task] = {}
+
+    async def _call(self, method, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def get_or_compute(self, prompt: str, compute: Callable[[str], Awaitable[Optional[str]]]) -> str:
+        """
+        Cached enhancement of `prompt`, computing it at most once at a time
+        `compute` returns the enhanced prompt, or None when the provider failed
+        (the original prompt is returned and nothing is cached).
+        """
+        key = prompt_key(prompt, self.namespace)
+        try:
+            cached = await self._call(self.backend.get, key)
+        except Exception as e:
+            logger.warning(f"Prompt cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            return cached
+
+        # Tasks belong to one event loop (the API and the worker pool may run different ones)
+        flight_key = (id(asyncio.get_running_loop()), key)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(self._compute_and_store(key, prompt, compute))
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(flight_key, None))
+        # shield: a caller giving up must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    async def _compute_and_store(self, key: str, prompt: str, compute) -> str:
+        enhanced = await compute(prompt)
+        if not enhanced:
+            return prompt
+        try:
+            await self._call(self.backend.set, key, enhanced)
+        except Exception as e:
+            logger.warning(f"Prompt cache write failed: {e}")
+        return enhanced
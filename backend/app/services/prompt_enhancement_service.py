@@ -1,13 +1,19 @@
 """
 Prompt Enhancement Service with LLM Provider Adapters
 Supports: Hugging Face, Google Gemini, OpenAI, Claude, Local LLM
+Results are cached and concurrent requests coalesced (see app/services/prompt_cache.py)
 """
 
+import asyncio
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import google.generativeai as genai
 from typing import Optional
 from app.core.config import settings
 from app.services.huggingface_prompt_enhancer import HuggingFacePromptEnhancer
+from app.services.prompt_cache import PromptEnhancementCache, create_backend
 
 logger = logging.getLogger(__name__)
 
@@ -31,6 +37,26 @@ class HuggingFaceAdapter(PromptEnhancerAdapter):
         return await self.enhancer.enhance_prompt(prompt)
 
 
+_sdk_executor: Optional[ThreadPoolExecutor] = None
+_sdk_executor_lock = threading.Lock()
+
+
+def get_sdk_executor() -> ThreadPoolExecutor:
+    """
+    Bounded pool for blocking provider SDK calls
+    Kept apart from the default executor so that slow or hung SDK calls
+    cannot starve asyncio.to_thread users (database work in the worker pool).
+    """
+    global _sdk_executor
+    if _sdk_executor is None:
+        with _sdk_executor_lock:
+            if _sdk_executor is None:
+                _sdk_executor = ThreadPoolExecutor(
+                    max_workers=settings.PROMPT_ENHANCER_THREADS, thread_name_prefix="prompt-enhancer"
+                )
+    return _sdk_executor
+
+
 class GeminiAdapter(PromptEnhancerAdapter):
     """Google Gemini adapter for prompt enhancement"""
     
@@ -40,26 +66,15 @@ class GeminiAdapter(PromptEnhancerAdapter):
             raise ValueError("GEMINI_API_KEY not configured")
         genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel(settings.PROMPT_ENHANCER_MODEL_ID)
-        # Simple in-memory cache: {prompt: (enhanced, ts)}
-        self._cache: dict[str, tuple[str, float]] = {}
-        self._cache_max = 100
-        self._cache_ttl = 15 * 60  # 15 minutes
 
     async def enhance(self, prompt: str) -> str:
         """
-        Enhance prompt using Gemini with timeout and caching
-        Returns: enhanced prompt string
+        Enhance prompt using Gemini within PROMPT_ENHANCER_TIMEOUT_SECONDS
+        Returns: enhanced prompt string (the original one on failure or timeout)
         """
-        import asyncio, time
         try:
             logger.info(f"Enhancing prompt via Gemini: {prompt[:50]}...")
 
-            # Cache hit
-            now = time.time()
-            cached = self._cache.get(prompt)
-            if cached and (now - cached[1] < self._cache_ttl):
-                return cached[0]
-
             enhancement_prompt = f"""You are an expert AI image prompt engineer.
 Your task is to enhance and improve the following image generation prompt to make it more detailed,
 vivid, and likely to produce high-quality images.
@@ -75,22 +90,18 @@ Please provide an enhanced version that:
 
 Return ONLY the enhanced prompt, nothing else."""
 
-            # Run blocking SDK call in a thread with timeout
+            timeout = settings.PROMPT_ENHANCER_TIMEOUT_SECONDS
+
+            # Blocking SDK call in the SDK thread pool; the budget covers queueing for a
+            # thread too, and the SDK's own timeout frees the thread soon after
             def _run():
-                resp = self.model.generate_content(enhancement_prompt)
+                resp = self.model.generate_content(enhancement_prompt, request_options={"timeout": timeout})
                 return (resp.text or "").strip()
 
-            timeout = getattr(settings, "PROMPT_ENHANCER_TIMEOUT_SECONDS", 3.0) or 3.0
-            enhanced = await asyncio.wait_for(asyncio.to_thread(_run), timeout=timeout)
+            loop = asyncio.get_running_loop()
+            enhanced = await asyncio.wait_for(loop.run_in_executor(get_sdk_executor(), _run), timeout=timeout)
             enhanced = enhanced or prompt
 
-            # Cache put (evict simple LRU by size)
-            self._cache[prompt] = (enhanced, now)
-            if len(self._cache) > self._cache_max:
-                # remove oldest
-                oldest_key = min(self._cache.items(), key=lambda kv: kv[1][1])[0]
-                self._cache.pop(oldest_key, None)
-
             logger.info(f"Enhanced prompt: {enhanced[:50]}...")
             return enhanced
 
@@ -103,9 +114,11 @@ Return ONLY the enhanced prompt, nothing else."""
 class PromptEnhancementService:
     """Main service for prompt enhancement with provider abstraction"""
     
-    def __init__(self):
+    def __init__(self, cache: Optional[PromptEnhancementCache] = None):
         self.provider = settings.PROMPT_ENHANCER_PROVIDER
         self.adapter = self._get_adapter()
+        namespace = f"{self.provider}:{settings.PROMPT_ENHANCER_MODEL_ID}"
+        self.cache = cache or PromptEnhancementCache(create_backend(), namespace=namespace)
     
     def _get_adapter(self) -> PromptEnhancerAdapter:
         """Get appropriate adapter based on configuration"""
@@ -131,13 +144,21 @@ class PromptEnhancementService:
         Returns: enhanced prompt string
         """
         logger.info(f"Enhancing prompt: {prompt[:50]}...")
+        try:
+            return await self.cache.get_or_compute(prompt, self._enhance_uncached)
+        except Exception as e:
+            logger.error(f"Prompt enhancement failed: {e}")
+            return prompt
+
+    async def _enhance_uncached(self, prompt: str) -> Optional[str]:
+        """Upstream enhancement, or None when the adapter fell back to the original prompt"""
         enhanced = await self.adapter.enhance(prompt)
+        if not enhanced or enhanced.strip() == prompt.strip():
+            return None
         return enhanced
 
 
 # Singleton instance with thread-safe initialization
-import threading
-
 _prompt_enhancer_service: Optional[PromptEnhancementService] = None
 _service_lock = threading.Lock()
 
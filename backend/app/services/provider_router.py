@@ -0,0 +1,271 @@
+"""
+Image Provider Router
+Latency-aware routing across image generation adapters ("auto" provider)
+
+For every adapter the router keeps the latest PROVIDER_ROUTER_WINDOW calls
+(latency and success) and a circuit breaker:
+
+  - Ranking: adapters are tried by expected time to a successful image,
+    p50 / success rate. Adapters with fewer than PROVIDER_ROUTER_MIN_SAMPLES
+    calls rank first (in configured order) so they get measured.
+  - Circuit breaker: PROVIDER_BREAKER_FAILURES consecutive failures open the
+    circuit and the adapter is skipped for PROVIDER_BREAKER_RESET_SECONDS;
+    then a single trial call is let through (half-open) and closes the
+    circuit again on success.
+  - Hedging: if the first adapter has not answered within the hedge budget
+    (PROVIDER_HEDGE_AFTER_SECONDS, or its own p95 when that is 0) the next
+    adapter is called as well. The first successful result wins and the
+    other call is cancelled. A call that fails fast falls over to the next
+    adapter straight away.
+
+Inside a generation worker pool every call takes a slot of its adapter's
+cap (generation_jobs.PROVIDER_CONCURRENCY), shared with jobs sent to that
+provider directly. Saturated adapters are skipped when hedging and falling
+over; when every available adapter is saturated the first call waits for a
+slot.
+
+The router is itself an ImageGenerationAdapter returning a single result, so
+callers settle each generation exactly once: credits reserved by
+generation_jobs.submit_job are neither debited again nor refunded because a
+hedge ran. The losing call is cancelled on our side only; the provider may
+still bill it, which is the price of the lower tail latency.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import count_hedge, observe_provider_call
+from app.services.image_generation_service import ImageGenerationAdapter
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Per-provider call slots of the calling worker pool: try_acquire(name) -> bool
+# and release(name) (see generation_jobs.GenerationWorkerPool). Unset outside a
+# pool, where calls are not capped.
+provider_slots: ContextVar[Optional[Any]] = ContextVar("provider_slots", default=None)
+
+# Poll interval while waiting for a slot when every available adapter is saturated
+SLOT_WAIT_SECONDS = 0.05
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ProviderStats:
+    """Rolling latency and error rate of one adapter, plus its circuit breaker"""
+
+    def __init__(self, window: int, clock: Callable[[], float] = time.monotonic):
+        self.samples: Deque[Tuple[float, bool]] = deque(maxlen=window)  # (seconds, succeeded)
+        self.clock = clock
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_in_flight = False
+
+    @property
+    def p50(self) -> Optional[float]:
+        latencies = [seconds for seconds, ok in self.samples if ok]
+        return _percentile(latencies, 0.50) if latencies else None
+
+    @property
+    def p95(self) -> Optional[float]:
+        latencies = [seconds for seconds, ok in self.samples if ok]
+        return _percentile(latencies, 0.95) if latencies else None
+
+    @property
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for _, ok in self.samples if not ok) / len(self.samples)
+
+    def available(self) -> bool:
+        """Whether a call may be sent now (moves an expired open circuit to half-open)"""
+        if self.state == OPEN and self.clock() - self.opened_at >= settings.PROVIDER_BREAKER_RESET_SECONDS:
+            self.state = HALF_OPEN
+            self.trial_in_flight = False
+        if self.state == HALF_OPEN:
+            return not self.trial_in_flight
+        return self.state == CLOSED
+
+    def started(self) -> None:
+        if self.state == HALF_OPEN:
+            self.trial_in_flight = True
+
+    def record(self, seconds: float, succeeded: bool) -> None:
+        self.samples.append((seconds, succeeded))
+        if succeeded:
+            self.consecutive_failures = 0
+            self.state = CLOSED
+        else:
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= settings.PROVIDER_BREAKER_FAILURES:
+                self.state = OPEN
+                self.opened_at = self.clock()
+        self.trial_in_flight = False
+
+    def abandoned(self) -> None:
+        """A call was cancelled because another provider won; it says nothing about this one"""
+        self.trial_in_flight = False
+
+
+class ProviderRouter(ImageGenerationAdapter):
+    """Routes each generation to the best available adapter, hedging slow calls"""
+
+    name = "auto"
+
+    def __init__(self, adapters: List[ImageGenerationAdapter], clock: Callable[[], float] = time.monotonic):
+        if not adapters:
+            raise ValueError("ProviderRouter needs at least one adapter")
+        self.adapters = adapters
+        self.stats: Dict[str, ProviderStats] = {
+            adapter.name: ProviderStats(settings.PROVIDER_ROUTER_WINDOW, clock) for adapter in adapters
+        }
+        self._lock = threading.Lock()
+
+    def ranked(self) -> List[ImageGenerationAdapter]:
+        """Adapters whose circuit lets a call through, best first"""
+        def score(item):
+            index, adapter = item
+            stats = self.stats[adapter.name]
+            if len(stats.samples) < settings.PROVIDER_ROUTER_MIN_SAMPLES or stats.p50 is None:
+                return (0, 0.0, index)
+            return (1, stats.p50 / max(1.0 - stats.error_rate, 0.05), index)
+
+        with self._lock:
+            available = [(i, a) for i, a in enumerate(self.adapters) if self.stats[a.name].available()]
+        return [adapter for _, adapter in sorted(available, key=score)]
+
+    def hedge_budget(self, adapter: ImageGenerationAdapter) -> Optional[float]:
+        """Seconds to wait on `adapter` before calling the next one (None = don't hedge)"""
+        if not settings.PROVIDER_HEDGE_ENABLED:
+            return None
+        if settings.PROVIDER_HEDGE_AFTER_SECONDS > 0:
+            return settings.PROVIDER_HEDGE_AFTER_SECONDS
+        stats = self.stats[adapter.name]
+        if len(stats.samples) < settings.PROVIDER_ROUTER_MIN_SAMPLES:
+            return None
+        return stats.p95
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Per-adapter p50/p95, error rate and circuit state"""
+        return {
+            name: {
+                "p50": stats.p50,
+                "p95": stats.p95,
+                "error_rate": stats.error_rate,
+                "samples": len(stats.samples),
+                "circuit": stats.state,
+            }
+            for name, stats in self.stats.items()
+        }
+
+    async def _attempt(self, adapter: ImageGenerationAdapter, prompt: str, tier: str, user_id: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            result = await adapter.generate(prompt, tier, user_id=user_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            result = {"status": "failed", "error": str(e)}
+        succeeded = result.get("status") != "failed"
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.stats[adapter.name].record(seconds, succeeded)
+        observe_provider_call(adapter.name, seconds, "success" if succeeded else "error")
+        result.setdefault("provider", adapter.name)
+        return result
+
+    @staticmethod
+    def _claim(candidates: List[ImageGenerationAdapter], slots) -> Optional[ImageGenerationAdapter]:
+        """Remove and return the best candidate with a free slot (None if all are saturated)"""
+        for index, adapter in enumerate(candidates):
+            if slots is None or slots.try_acquire(adapter.name):
+                return candidates.pop(index)
+        return None
+
+    async def _claim_waiting(self, candidates: List[ImageGenerationAdapter], slots) -> ImageGenerationAdapter:
+        """Like _claim, but waits until one of the candidates has a free slot"""
+        while (adapter := self._claim(candidates, slots)) is None:
+            await asyncio.sleep(SLOT_WAIT_SECONDS)
+        return adapter
+
+    def _start(self, adapter, prompt, tier, user_id, running: Dict[asyncio.Task, tuple], slots) -> None:
+        """Call `adapter`, whose slot the caller holds; the slot is released when the call ends"""
+        with self._lock:
+            self.stats[adapter.name].started()
+        task = asyncio.ensure_future(self._attempt(adapter, prompt, tier, user_id))
+        if slots is not None:
+            task.add_done_callback(lambda _, name=adapter.name: slots.release(name))
+        running[task] = (adapter, time.perf_counter())
+
+    async def generate(self, prompt: str, tier: str = "standard", user_id: int = 0) -> Dict[str, Any]:
+        candidates = self.ranked()
+        if not candidates:
+            return {"status": "failed", "error": "All image providers are unavailable, please try again shortly"}
+
+        slots = provider_slots.get()
+        running: Dict[asyncio.Task, tuple] = {}
+        last_result: Dict[str, Any] = {"status": "failed", "error": "Image generation failed"}
+        primary = await self._claim_waiting(candidates, slots)
+        hedged = False
+        try:
+            self._start(primary, prompt, tier, user_id, running, slots)
+            while running:
+                budget = None
+                if candidates and not hedged and len(running) == 1:
+                    slow_adapter, started = next(iter(running.values()))
+                    budget = self.hedge_budget(slow_adapter)
+                    if budget is not None:
+                        budget = max(budget - (time.perf_counter() - started), 0.0)
+
+                done, _ = await asyncio.wait(running, timeout=budget, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    # Latency budget passed: call the next provider with a free slot as well
+                    hedged = True
+                    adapter = self._claim(candidates, slots)
+                    if adapter is not None:
+                        logger.info(f"Hedging slow {slow_adapter.name} call with {adapter.name}")
+                        self._start(adapter, prompt, tier, user_id, running, slots)
+                    continue
+
+                for task in done:
+                    adapter, _ = running.pop(task)
+                    result = task.result()
+                    if result.get("status") != "failed":
+                        if hedged:
+                            count_hedge("primary" if adapter is primary else "hedge")
+                        return result
+                    last_result = result
+                    logger.warning(f"{adapter.name} failed: {result.get('error')}")
+
+                # Fail over when nothing is left in flight
+                if not running and candidates:
+                    self._start(await self._claim_waiting(candidates, slots), prompt, tier, user_id, running, slots)
+            return last_result
+        except asyncio.CancelledError:
+            # Cancelled from outside (e.g. the job timeout): the calls in flight count as failures
+            now = time.perf_counter()
+            with self._lock:
+                for adapter, started in running.values():
+                    self.stats[adapter.name].record(now - started, False)
+            for adapter, started in running.values():
+                observe_provider_call(adapter.name, now - started, "timeout")
+            raise
+        finally:
+            for task, (adapter, _) in running.items():
+                task.cancel()
+                with self._lock:
+                    self.stats[adapter.name].abandoned()
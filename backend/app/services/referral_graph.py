@@ -0,0 +1,139 @@
+"""
+Referral Graph
+Ancestry index over users.referred_by_id, stored as a closure table (referral_paths)
+
+Every (ancestor, descendant, depth) pair is materialized, so downline counts,
+per-level breakdowns and upline lookups are single indexed queries instead of
+one query per node or per hop. Rows are added in the registration transaction
+(`add_user`) and can be rebuilt from users.referred_by_id at any time
+(`rebuild`, or `python -m scripts.rebuild_referral_paths`).
+"""
+
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from app.models import Package, ReferralPath, User, UserPackage
+
+logger = logging.getLogger(__name__)
+
+# Referral chains deeper than this are assumed to be cycles in bad data
+MAX_DEPTH = 100
+
+
+def add_user(db: Session, user_id: int, referrer_id: Optional[int]) -> None:
+    """
+    Index a newly registered user under their referrer (the caller commits)
+    The new user's ancestors are the referrer plus all of the referrer's ancestors.
+    """
+    if not referrer_id:
+        return
+
+    db.add(ReferralPath(ancestor_id=referrer_id, descendant_id=user_id, depth=1))
+    db.execute(
+        insert(ReferralPath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(ReferralPath.ancestor_id, literal(user_id), ReferralPath.depth + 1).where(
+                ReferralPath.descendant_id == referrer_id
+            ),
+        )
+    )
+
+
+def level_counts(db: Session, user_id: int, max_depth: Optional[int] = None) -> Dict[int, int]:
+    """Number of users in the downline at each depth: {1: direct, 2: indirect, ...}"""
+    query = db.query(ReferralPath.depth, func.count()).filter(ReferralPath.ancestor_id == user_id)
+    if max_depth is not None:
+        query = query.filter(ReferralPath.depth <= max_depth)
+    return dict(query.group_by(ReferralPath.depth).all())
+
+
+def package_counts(db: Session, user_id: int, max_depth: Optional[int] = None):
+    """
+    Query of (package name, depth, users) over the downline, by each member's
+    latest active package (members without one are left out)
+
+    The package is a correlated per-member lookup on
+    ix_user_packages_user_status_purchase, so only the downline's purchases are read.
+    """
+    latest_package_id = select(UserPackage.package_id).where(
+        UserPackage.user_id == ReferralPath.descendant_id,
+        UserPackage.status == "active",
+    ).order_by(UserPackage.purchase_date.desc(), UserPackage.id.desc()).limit(1).correlate(ReferralPath).scalar_subquery()
+
+    query = db.query(Package.name, ReferralPath.depth, func.count()).select_from(ReferralPath).join(
+        Package, Package.id == latest_package_id
+    ).filter(ReferralPath.ancestor_id == user_id)
+    if max_depth is not None:
+        query = query.filter(ReferralPath.depth <= max_depth)
+    return query.group_by(Package.name, ReferralPath.depth)
+
+
+def subtree_count(db: Session, user_id: int, max_depth: Optional[int] = None) -> int:
+    """Total users in the downline (optionally limited to max_depth levels)"""
+    query = db.query(func.count()).select_from(ReferralPath).filter(ReferralPath.ancestor_id == user_id)
+    if max_depth is not None:
+        query = query.filter(ReferralPath.depth <= max_depth)
+    return query.scalar() or 0
+
+
+def upline(db: Session, user_id: int, max_depth: Optional[int] = None) -> List[Tuple[User, int]]:
+    """The user's referrer chain, nearest first, as (User, depth) pairs"""
+    query = db.query(User, ReferralPath.depth).join(
+        ReferralPath, ReferralPath.ancestor_id == User.id
+    ).filter(ReferralPath.descendant_id == user_id)
+    if max_depth is not None:
+        query = query.filter(ReferralPath.depth <= max_depth)
+    return query.order_by(ReferralPath.depth).all()
+
+
+def downline(db: Session, user_id: int, max_depth: Optional[int] = None) -> List[Tuple[User, int]]:
+    """Every user below `user_id`, as (User, depth) pairs ordered by depth then signup"""
+    query = db.query(User, ReferralPath.depth).join(
+        ReferralPath, ReferralPath.descendant_id == User.id
+    ).filter(ReferralPath.ancestor_id == user_id)
+    if max_depth is not None:
+        query = query.filter(ReferralPath.depth <= max_depth)
+    return query.order_by(ReferralPath.depth, User.id).all()
+
+
+def rebuild(db: Session) -> Dict[str, float]:
+    """
+    Recompute the whole closure table from users.referred_by_id (commits)
+    Set-based: one INSERT ... SELECT per depth level.
+    Returns {rows, depth, seconds}.
+    """
+    start = time.perf_counter()
+    db.query(ReferralPath).delete(synchronize_session=False)
+
+    total = db.execute(
+        insert(ReferralPath).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(User.referred_by_id, User.id, literal(1)).where(User.referred_by_id.isnot(None)),
+        )
+    ).rowcount
+
+    depth = 1
+    while depth < MAX_DEPTH:
+        inserted = db.execute(
+            insert(ReferralPath).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(ReferralPath.ancestor_id, User.id, ReferralPath.depth + 1)
+                .join(User, User.referred_by_id == ReferralPath.descendant_id)
+                .where(ReferralPath.depth == depth),
+            )
+        ).rowcount
+        if not inserted:
+            break
+        total += inserted
+        depth += 1
+    else:
+        logger.warning(f"Referral chains reach MAX_DEPTH={MAX_DEPTH}; check users.referred_by_id for cycles")
+
+    db.commit()
+    elapsed = time.perf_counter() - start
+    logger.info(f"Rebuilt referral paths: {total} rows, max depth {depth if total else 0}, {elapsed:.2f}s")
+    return {"rows": total, "depth": depth if total else 0, "seconds": elapsed}
@@ -3,30 +3,38 @@ Referral Service
 
 Handles referral tracking and commission creation when a user purchases a package
 """
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from app.core.metrics import count_commission
 from app.models.user import User
 from app.models.package import Package
 from app.models.user_package import UserPackage
 from app.models.referral import Referral
 from app.models.commission import Commission
-from app.services.commission_calculator import calculate_commission
+from app.services.commission_calculator import get_commission_plan
+from app.services.referral_graph import downline, upline
 
 
-def process_referral_commissions(user_id: int, package_id: int, db: Session):
+def process_referral_commissions(user_id: int, package_id: int, db: Session, payment_id: Optional[int] = None):
     """
     Process referral commissions when a user purchases a package
     
     This function:
-    1. Identifies the user's referrer (level 1)
-    2. Identifies the referrer's referrer (level 2)
-    3. Gets the referrer's current package
-    4. Calculates commissions based on the matrix
-    5. Creates referral and commission records
+    1. Loads the user's referrer chain (level 1, 2, ... up to the plan's depth)
+    2. Gets every referrer's current package in one query
+    3. Calculates all levels' commissions in one pass over the commission plan
+    4. Creates referral and commission records and credits the referrers' wallets
+    
+    Every payment pays its own commissions; safe to re-run for the same payment.
     
     Args:
         user_id: ID of the user who made the purchase
         package_id: ID of the package purchased
         db: Database session
+        payment_id: Payment for the purchase (None for calls predating payment
+            tracking, which pay once per package)
     """
     # Get the user who made the purchase
     user = db.query(User).filter(User.id == user_id).first()
@@ -39,66 +47,75 @@ def process_referral_commissions(user_id: int, package_id: int, db: Session):
     if not purchased_package:
         return
     
-    # Process Level 1 (Direct) Referral
-    level_1_referrer = db.query(User).filter(User.id == user.referred_by_id).first()
-    if level_1_referrer:
-        process_level_1_commission(
-            referrer=level_1_referrer,
+    plan = get_commission_plan(db)
+
+    # Referrer chain (level 1 = direct, level 2 = indirect, ...) from the referral graph index
+    referrers = upline(db, user.id, max_depth=plan.levels)
+    if not referrers:
+        return
+
+    referrer_packages = get_current_package_ids([referrer.id for referrer, _ in referrers], db)
+    amounts = plan.fan_out(purchased_package.id, [referrer_packages.get(referrer.id) for referrer, _ in referrers])
+
+    for (referrer, level), commission_amount in zip(referrers, amounts):
+        if referrer.id not in referrer_packages:
+            # Referrer doesn't have a package yet, no commission
+            continue
+        if commission_amount <= 0:
+            continue
+        process_level_commission(
+            referrer=referrer,
             referee=user,
             purchased_package=purchased_package,
-            db=db
+            level=level,
+            commission_amount=commission_amount,
+            db=db,
+            payment_id=payment_id
         )
-        
-        # Process Level 2 (Indirect) Referral
-        if level_1_referrer.referred_by_id:
-            level_2_referrer = db.query(User).filter(User.id == level_1_referrer.referred_by_id).first()
-            if level_2_referrer:
-                process_level_2_commission(
-                    referrer=level_2_referrer,
-                    referee=user,
-                    purchased_package=purchased_package,
-                    db=db
-                )
 
 
-def process_level_1_commission(
+def process_level_commission(
     referrer: User,
     referee: User,
     purchased_package: Package,
-    db: Session
+    level: int,
+    commission_amount: float,
+    db: Session,
+    payment_id: Optional[int] = None
 ):
     """
-    Process level 1 (direct) referral commission
+    Record one level's referral commission and credit it to the referrer's wallet
+    
+    The referral, commission, wallet credit and notification email are
+    committed together, so a failed credit leaves nothing behind and the
+    retried job pays it (and notifies the referrer) once.
     
     Args:
-        referrer: User who referred the buyer
+        referrer: User earning the commission (level 1 = referred the buyer directly)
         referee: User who made the purchase
         purchased_package: Package that was purchased
+        level: Referral level
+        commission_amount: Amount from the commission plan
         db: Database session
+        payment_id: Payment for the purchase (see process_referral_commissions)
     """
-    # Get referrer's current package
-    referrer_package = get_user_current_package(referrer.id, db)
-    if not referrer_package:
-        # Referrer doesn't have a package yet, no commission
-        return
-    
-    # Calculate commission
-    try:
-        commission_amount = calculate_commission(
-            referrer_package=referrer_package.name,
-            referee_package=purchased_package.name,
-            level=1
-        )
-    except ValueError as e:
-        print(f"Error calculating level 1 commission: {e}")
+    from app.api.wallet import create_transaction, get_or_create_wallet
+    from app.models.wallet import TransactionSource, TransactionType
+
+    # Already processed (commission jobs may be retried)
+    if referral_exists(referrer.id, referee.id, level, purchased_package.id, db, payment_id=payment_id):
         return
-    
+
+    # Before the records: creating a wallet commits
+    wallet = get_or_create_wallet(db, referrer.id)
+
     # Create referral record
     referral = Referral(
         referrer_id=referrer.id,
         referee_id=referee.id,
-        level=1,
-        package_id=purchased_package.id
+        level=level,
+        package_id=purchased_package.id,
+        payment_id=payment_id
     )
     db.add(referral)
     db.flush()  # Get referral ID
@@ -108,137 +125,68 @@ def process_level_1_commission(
         user_id=referrer.id,
         referral_id=referral.id,
         amount=commission_amount,
-        commission_type="level1",
+        commission_type=f"level{level}",
         status="pending"
     )
     db.add(commission)
-    db.commit()
-    db.refresh(commission)
-
-    # Auto-credit commission to wallet
-    try:
-        from app.api.wallet import credit_wallet_internal
-        from app.models.wallet import TransactionSource
-
-        credit_wallet_internal(
-            db=db,
-            user_id=referrer.id,
-            amount=commission_amount,
-            source=TransactionSource.COMMISSION,
-            description=f"Level 1 commission from {referee.full_name}'s {purchased_package.name} package purchase",
-            reference_id=f"commission_{commission.id}"
-        )
-        print(f"Level 1 commission created and credited to wallet: ₹{commission_amount} for user {referrer.id}")
+    db.flush()  # Get commission ID
 
-        # Send commission notification email
-        try:
-            from app.utils.email import send_commission_notification_email
-            send_commission_notification_email(
-                to_email=referrer.email,
-                referrer_name=referrer.full_name,
-                commission_amount=commission_amount,
-                level=1,
-                referee_name=referee.full_name,
-                package_name=purchased_package.name
-            )
-        except Exception as e:
-            print(f"Error sending commission notification email: {e}")
-            # Don't fail if email fails
+    # Auto-credit commission to wallet, in the same transaction
+    create_transaction(
+        db, wallet, TransactionType.CREDIT, TransactionSource.COMMISSION,
+        commission_amount,
+        f"Level {level} commission from {referee.full_name}'s {purchased_package.name} package purchase",
+        reference_id=f"commission-{payment_id}-{level}" if payment_id else f"commission_{commission.id}",
+        commit=False
+    )
 
-    except Exception as e:
-        print(f"Error crediting wallet for level 1 commission: {e}")
-        # Don't fail commission creation if wallet credit fails
-        print(f"Level 1 commission created (wallet credit failed): ₹{commission_amount} for user {referrer.id}")
+    # Commission notification, committed together with the commission
+    from app.utils.email import send_commission_notification_email
+    send_commission_notification_email(
+        to_email=referrer.email,
+        referrer_name=referrer.full_name,
+        commission_amount=commission_amount,
+        level=level,
+        referee_name=referee.full_name,
+        package_name=purchased_package.name,
+        db=db,
+        dedupe_key=f"commission:{payment_id}:{level}" if payment_id else f"commission:{commission.id}"
+    )
+    db.commit()
+    count_commission(level, commission_amount)
+    print(f"Level {level} commission created and credited to wallet: ₹{commission_amount} for user {referrer.id}")
 
 
-def process_level_2_commission(
-    referrer: User,
-    referee: User,
-    purchased_package: Package,
-    db: Session
-):
+def referral_exists(referrer_id: int, referee_id: int, level: int, package_id: int, db: Session,
+                    payment_id: Optional[int] = None) -> bool:
     """
-    Process level 2 (indirect) referral commission
+    Check whether a referral (and its commission) was already recorded for this purchase
     
     Args:
-        referrer: User who referred the person who referred the buyer
-        referee: User who made the purchase
-        purchased_package: Package that was purchased
+        referrer_id: User earning the commission
+        referee_id: User who made the purchase
+        level: Referral level (1 or 2)
+        package_id: Package that was purchased
         db: Database session
+        payment_id: Payment for the purchase; without one any earlier purchase
+            of the package counts
+        
+    Returns:
+        True if the referral exists
     """
-    # Get referrer's current package
-    referrer_package = get_user_current_package(referrer.id, db)
-    if not referrer_package:
-        # Referrer doesn't have a package yet, no commission
-        return
-    
-    # Calculate commission
-    try:
-        commission_amount = calculate_commission(
-            referrer_package=referrer_package.name,
-            referee_package=purchased_package.name,
-            level=2
-        )
-    except ValueError as e:
-        print(f"Error calculating level 2 commission: {e}")
-        return
-    
-    # Create referral record
-    referral = Referral(
-        referrer_id=referrer.id,
-        referee_id=referee.id,
-        level=2,
-        package_id=purchased_package.id
-    )
-    db.add(referral)
-    db.flush()  # Get referral ID
-    
-    # Create commission record
-    commission = Commission(
-        user_id=referrer.id,
-        referral_id=referral.id,
-        amount=commission_amount,
-        commission_type="level2",
-        status="pending"
-    )
-    db.add(commission)
-    db.commit()
-    db.refresh(commission)
-
-    # Auto-credit commission to wallet
-    try:
-        from app.api.wallet import credit_wallet_internal
-        from app.models.wallet import TransactionSource
-
-        credit_wallet_internal(
-            db=db,
-            user_id=referrer.id,
-            amount=commission_amount,
-            source=TransactionSource.COMMISSION,
-            description=f"Level 2 commission from {referee.full_name}'s {purchased_package.name} package purchase",
-            reference_id=f"commission_{commission.id}"
-        )
-        print(f"Level 2 commission created and credited to wallet: ₹{commission_amount} for user {referrer.id}")
-
-        # Send commission notification email
-        try:
-            from app.utils.email import send_commission_notification_email
-            send_commission_notification_email(
-                to_email=referrer.email,
-                referrer_name=referrer.full_name,
-                commission_amount=commission_amount,
-                level=2,
-                referee_name=referee.full_name,
-                package_name=purchased_package.name
-            )
-        except Exception as e:
-            print(f"Error sending commission notification email: {e}")
-            # Don't fail if email fails
+    if payment_id is not None:
+        return db.query(Referral.id).filter(
+            Referral.payment_id == payment_id,
+            Referral.referrer_id == referrer_id,
+            Referral.level == level
+        ).first() is not None
 
-    except Exception as e:
-        print(f"Error crediting wallet for level 2 commission: {e}")
-        # Don't fail commission creation if wallet credit fails
-        print(f"Level 2 commission created (wallet credit failed): ₹{commission_amount} for user {referrer.id}")
+    return db.query(Referral.id).filter(
+        Referral.referrer_id == referrer_id,
+        Referral.referee_id == referee_id,
+        Referral.level == level,
+        Referral.package_id == package_id
+    ).first() is not None
 
 
 def get_user_current_package(user_id: int, db: Session) -> Package:
@@ -264,6 +212,34 @@ def get_user_current_package(user_id: int, db: Session) -> Package:
     return package
 
 
+def get_current_package_ids(user_ids: List[int], db: Session) -> Dict[int, int]:
+    """
+    Get several users' current active package ids in one query
+    
+    Args:
+        user_ids: User IDs
+        db: Database session
+        
+    Returns:
+        {user_id: package_id} for users that have an active package
+    """
+    if not user_ids:
+        return {}
+
+    package_rank = func.row_number().over(
+        partition_by=UserPackage.user_id,
+        order_by=(UserPackage.purchase_date.desc(), UserPackage.id.desc()),
+    ).label("package_rank")
+    latest = db.query(UserPackage.user_id, UserPackage.package_id, package_rank).filter(
+        UserPackage.user_id.in_(user_ids),
+        UserPackage.status == "active"
+    ).subquery()
+
+    return dict(
+        db.query(latest.c.user_id, latest.c.package_id).filter(latest.c.package_rank == 1).all()
+    )
+
+
 def get_referral_tree(user_id: int, db: Session, max_depth: int = 2) -> dict:
     """
     Get referral tree for a user
@@ -287,28 +263,23 @@ def get_referral_tree(user_id: int, db: Session, max_depth: int = 2) -> dict:
         "direct_referrals": []
     }
     
-    # Get direct referrals (level 1)
-    direct_referrals = db.query(User).filter(User.referred_by_id == user_id).all()
-    
-    for referral in direct_referrals:
-        referral_data = {
-            "user_id": referral.id,
-            "email": referral.email,
-            "referral_code": referral.referral_code,
-            "indirect_referrals": []
-        }
-        
-        # Get indirect referrals (level 2) if max_depth allows
-        if max_depth >= 2:
-            indirect_referrals = db.query(User).filter(User.referred_by_id == referral.id).all()
-            for indirect in indirect_referrals:
-                referral_data["indirect_referrals"].append({
-                    "user_id": indirect.id,
-                    "email": indirect.email,
-                    "referral_code": indirect.referral_code
-                })
-        
-        tree["direct_referrals"].append(referral_data)
+    # Whole downline to max_depth in one query, then nested under each direct referral
+    direct_by_id = {}
+    for member, depth in downline(db, user_id, max_depth=min(max_depth, 2)):
+        if depth == 1:
+            referral_data = {
+                "user_id": member.id,
+                "email": member.email,
+                "referral_code": member.referral_code,
+                "indirect_referrals": []
+            }
+            direct_by_id[member.id] = referral_data
+            tree["direct_referrals"].append(referral_data)
+        elif member.referred_by_id in direct_by_id:
+            direct_by_id[member.referred_by_id]["indirect_referrals"].append({
+                "user_id": member.id,
+                "email": member.email,
+                "referral_code": member.referral_code
+            })
     
     return tree
-
@@ -5,7 +5,7 @@ from sqlalchemy.exc import IntegrityError
 from app.models.studio import CommunityPost, CreditLedger
 from app.models.user import User
 from app.services.notification_service import notify_credit_reward, notify_milestone
-from app.core.database import engine
+from app.services.credit_ledger_service import CreditLedgerService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,29 +23,27 @@ def award_credits(
     Award credits to a user and create ledger entry
     """
     try:
-        # Ensure table exists
-        CreditLedger.__table__.create(bind=engine, checkfirst=True)
-        
-        # Update user balance
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
             logger.error(f"User {user_id} not found")
             return None
         
-        user.credits_balance = (user.credits_balance or 0) + amount
-        
-        # Create ledger entry
-        ledger = CreditLedger(
-            user_id=user_id,
-            amount=amount,
-            transaction_type="reward",
-            description=reason,
-            reference_type=reference_type,
-            reference_id=reference_id,
+        # Create ledger entry (also updates the materialized balance)
+        result = CreditLedgerService.credit_credits(
+            db,
+            user_id,
+            amount,
+            reason=reference_type,
+            ref_id=str(reference_id) if reference_id is not None else None,
         )
-        db.add(ledger)
-        db.commit()
-        db.refresh(user)
+        if not result.get("success"):
+            logger.error(f"Failed to award credits: {result.get('error')}")
+            return None
+
+        ledger = db.query(CreditLedger).filter(CreditLedger.id == result["transaction_id"]).first()
+        if ledger is not None:
+            ledger.notes = reason
+            db.commit()
         
         # Send notification
         try:
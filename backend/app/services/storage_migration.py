@@ -0,0 +1,182 @@
+"""
+Storage Migration
+Moves assets into and between blob store backends (see app/services/blob_store.py)
+
+import_legacy() brings files written before the blob store into the
+configured backend and points their records at the blobs:
+  - generated images under static/generated/YYYY/MM/DD (GeneratedImage,
+    GenerationCacheEntry)
+  - template thumbnails under app/static/thumbnails (ImageTemplate)
+  - invoice PDFs under invoices/ (Invoice.pdf_url becomes the blob key)
+
+migrate_backend() copies every blob of each namespace from one backend to
+another, streaming chunk by chunk, then rewrites the public URLs stored in
+the database. Keys are content hashes, so a blob already present on the
+target is skipped and invoice keys need no rewrite.
+
+Rows are processed in primary-key batches, committed per batch, so both can
+be re-run after an interruption. Run them with scripts.migrate_storage.
+"""
+
+import logging
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models import GeneratedImage, GenerationCacheEntry, ImageTemplate, Invoice
+from app.services.blob_store import BACKEND_ROOT, IMAGES, INVOICES, BlobStore, create_store, is_key
+from app.services.local_storage_service import get_local_storage_service
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# (model, column, namespace); public namespaces store URLs, private ones keys
+ASSET_COLUMNS = [
+    (GeneratedImage, "image_url", IMAGES),
+    (GenerationCacheEntry, "image_url", IMAGES),
+    (ImageTemplate, "thumbnail_url", IMAGES),
+    (Invoice, "pdf_url", INVOICES),
+]
+
+LEGACY_THUMBNAIL_DIR = BACKEND_ROOT / "app" / "static" / "thumbnails"
+
+
+@dataclass
+class MigrationReport:
+    counts: Dict[str, int] = field(default_factory=dict)
+    missing: List[str] = field(default_factory=list)
+
+    def add(self, name: str, n: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + n
+
+
+def _within(path: Path, base: Path) -> Optional[Path]:
+    path = path.resolve()
+    try:
+        path.relative_to(base.resolve())
+    except ValueError:
+        return None
+    return path
+
+
+def legacy_file(value: str) -> Optional[Path]:
+    """File behind a pre-blob-store URL or path, None if it is not one (or is gone)"""
+    if "/static/generated/" in value:
+        try:
+            path = get_local_storage_service().get_file_path(value)
+        except ValueError:
+            return None
+    elif "/static/thumbnails/" in value:
+        path = _within(LEGACY_THUMBNAIL_DIR / value.split("/static/thumbnails/", 1)[1], LEGACY_THUMBNAIL_DIR)
+    elif value.endswith(".pdf") and "://" not in value:
+        # Invoice PDFs were written relative to the working directory, normally backend/
+        path = next((p for p in (Path(value), BACKEND_ROOT / value) if p.exists()), None)
+    else:
+        return None
+    return path if path is not None and path.exists() else None
+
+
+def _batches(db: Session, model, column: str) -> Iterator[list]:
+    pk = model.__mapper__.primary_key[0]
+    last = None
+    while True:
+        query = db.query(model).filter(getattr(model, column).isnot(None))
+        if last is not None:
+            query = query.filter(pk > last)
+        rows = query.order_by(pk).limit(BATCH_SIZE).all()
+        if not rows:
+            return
+        yield rows
+        last = getattr(rows[-1], pk.key)
+
+
+def import_legacy(db: Session, stores: Dict[str, BlobStore], dry_run: bool = False,
+                  delete_files: bool = False) -> MigrationReport:
+    """Store legacy files as blobs and repoint their rows (see module docstring)"""
+    report = MigrationReport()
+    imported: Dict[Path, str] = {}  # Several rows can share a file (e.g. cache entries)
+
+    for model, column, namespace in ASSET_COLUMNS:
+        store = stores[namespace]
+        for rows in _batches(db, model, column):
+            for row in rows:
+                value = getattr(row, column)
+                if is_key(value) or store.key_from_url(value):
+                    report.add("already_migrated")
+                    continue
+                path = legacy_file(value)
+                if path is None:
+                    if "/static/" in value or value.endswith(".pdf"):
+                        report.missing.append(value)
+                    else:
+                        report.add("skipped")  # External URL, e.g. Cloudinary
+                    continue
+
+                if dry_run:
+                    report.add("imported")
+                    continue
+                if path not in imported:
+                    blob = store.save_file(path, path.suffix or "bin")
+                    imported[path] = blob.url if store.public else blob.key
+                    report.add("blobs_created" if blob.created else "blobs_deduplicated")
+                setattr(row, column, imported[path])
+                report.add("imported")
+            if not dry_run:
+                db.commit()
+
+    if delete_files and not dry_run:
+        for path in imported:
+            os.remove(path)
+        report.add("files_deleted", len(imported))
+    return report
+
+
+def copy_blobs(source: BlobStore, target: BlobStore, dry_run: bool = False) -> Tuple[int, int]:
+    """Stream every blob of `source` into `target`; returns (copied, already present)"""
+    copied = present = 0
+    for key in source.keys():
+        if target.exists(key):
+            present += 1
+            continue
+        if not dry_run:
+            blob = target.save(source.iter_chunks(key), key.split(".", 1)[1])
+            if blob.key != key:
+                raise ValueError(f"Blob {key} changed in transit (got {blob.key})")
+        copied += 1
+    return copied, present
+
+
+def rewrite_urls(db: Session, source: BlobStore, target: BlobStore, dry_run: bool = False) -> int:
+    """Point URL columns of `source`'s namespace at the same blobs on `target`"""
+    rewritten = 0
+    for model, column, namespace in ASSET_COLUMNS:
+        if namespace != source.namespace or not source.public:
+            continue
+        for rows in _batches(db, model, column):
+            for row in rows:
+                key = source.key_from_url(getattr(row, column))
+                if key:
+                    if not dry_run:
+                        setattr(row, column, target.url(key))
+                    rewritten += 1
+            if not dry_run:
+                db.commit()
+    return rewritten
+
+
+def migrate_backend(db: Session, source_backend: str, target_backend: str, dry_run: bool = False) -> MigrationReport:
+    """Copy all namespaces from one backend to another and rewrite stored URLs"""
+    report = MigrationReport()
+    for namespace in (IMAGES, INVOICES):
+        source = create_store(namespace, source_backend)
+        target = create_store(namespace, target_backend)
+        copied, present = copy_blobs(source, target, dry_run)
+        report.add(f"{namespace}_copied", copied)
+        report.add(f"{namespace}_already_present", present)
+        report.add(f"{namespace}_urls_rewritten", rewrite_urls(db, source, target, dry_run))
+        logger.info(f"Storage migration {source_backend} -> {target_backend}: {namespace} done")
+    return report
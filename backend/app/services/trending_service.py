@@ -0,0 +1,163 @@
+"""
+Trending Score Service
+Maintains an exponentially time-decayed engagement score on community posts
+
+Each event (publish, like, comment, remix) contributes weight * 2^(-age / half_life).
+Because every post decays at the same rate, the ranking only needs the
+*undecayed* sum  sum(weight * 2^((t_event - EPOCH) / half_life)),  which never
+changes once an event is recorded. We store its natural log so values stay small:
+
+    trending_score = log( sum( weight * exp((t_event - EPOCH) * ln2 / half_life) ) )
+
+New events are folded in with log-add-exp as they arrive, so the feed can
+ORDER BY trending_score on an index without recomputing anything per request.
+"""
+
+import logging
+import math
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.models import CommunityPost, PostLike, PromptReuseEvent, Comment
+
+logger = logging.getLogger(__name__)
+
+# Reference point for scores; any fixed instant works
+EPOCH = datetime(2025, 1, 1)
+
+# Relative weight of each engagement event
+EVENT_WEIGHTS = {
+    "publish": 1.0,
+    "like": 1.0,
+    "comment": 2.0,
+    "remix": 3.0,
+}
+
+# Score floor: equivalent to a single unit event at EPOCH, which is negligible
+# next to any recent event, so posts with no activity simply sink
+EMPTY_SCORE = 0.0
+
+# Compare-and-swap retries when concurrent events race on the same post
+CAS_ATTEMPTS = 10
+
+
+def _event_term(kind: str, at: datetime) -> float:
+    """log(weight * 2^((at - EPOCH) / half_life))"""
+    half_life_seconds = settings.TRENDING_HALF_LIFE_HOURS * 3600
+    age = (at.replace(tzinfo=None) - EPOCH).total_seconds()
+    return math.log(EVENT_WEIGHTS[kind]) + age * math.log(2) / half_life_seconds
+
+
+def _log_add(a: float, b: float) -> float:
+    """log(exp(a) + exp(b)) without overflow"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _log_sub(a: float, b: float) -> float:
+    """log(exp(a) - exp(b)), floored at EMPTY_SCORE when b >= a"""
+    if b >= a:
+        return EMPTY_SCORE
+    return a + math.log1p(-math.exp(b - a))
+
+
+def _apply_event(current: Optional[float], term: float, removed: bool) -> float:
+    current = current if current is not None else EMPTY_SCORE
+    return _log_sub(current, term) if removed else _log_add(current, term)
+
+
+def record_event(post: CommunityPost, kind: str, at: Optional[datetime] = None, removed: bool = False) -> None:
+    """
+    Fold one engagement event into a post's trending score
+    The caller commits, so the score changes in the same transaction as the event itself.
+
+    For a post already in the database the new score is written with a
+    compare-and-swap UPDATE (retried when another request changed the score
+    in between), so concurrent likes and comments on a hot post never
+    overwrite each other's increments.
+
+    Args:
+        post: Post the event belongs to
+        kind: One of EVENT_WEIGHTS (publish, like, comment, remix)
+        at: When the event happened (defaults to now)
+        removed: True when the event is being undone (unlike, deleted comment)
+    """
+    term = _event_term(kind, at or datetime.utcnow())
+    db = object_session(post)
+    state = inspect(post)
+
+    if db is None or not state.persistent:
+        # Not written yet: nobody else can see the row
+        post.trending_score = _apply_event(post.trending_score, term, removed)
+        return
+
+    if state.attrs.trending_score.history.has_changes():
+        db.flush([post])
+
+    for _ in range(CAS_ATTEMPTS):
+        score = CommunityPost.trending_score
+        query = db.query(score).filter(CommunityPost.id == post.id)
+        if db.get_bind().dialect.name == "postgresql":
+            query = query.with_for_update()
+        current = query.scalar()
+        new_score = _apply_event(current, term, removed)
+        updated = db.query(CommunityPost).filter(
+            CommunityPost.id == post.id,
+            score.is_(None) if current is None else score == current,
+        ).update({score: new_score}, synchronize_session=False)
+        if updated:
+            set_committed_value(post, "trending_score", new_score)
+            return
+    logger.warning(f"Trending score of post {post.id} kept changing; {kind} event left for recompute_scores")
+
+
+def recompute_scores(db: Session, post_ids: Optional[Iterable[int]] = None, batch_size: int = 500) -> int:
+    """
+    Rebuild trending scores from the event tables (scheduled refresh / drift repair)
+    Events are streamed one grouped query per table per batch of posts.
+
+    Returns:
+        Number of posts rescored
+    """
+    query = db.query(CommunityPost.id, CommunityPost.created_at).order_by(CommunityPost.id)
+    if post_ids is not None:
+        query = query.filter(CommunityPost.id.in_(list(post_ids)))
+    posts = query.all()
+
+    rescored = 0
+    for start in range(0, len(posts), batch_size):
+        batch = posts[start:start + batch_size]
+        ids = [post_id for post_id, _ in batch]
+        scores = {
+            post_id: _log_add(EMPTY_SCORE, _event_term("publish", created_at or EPOCH))
+            for post_id, created_at in batch
+        }
+
+        event_sources = [
+            ("like", db.query(PostLike.post_id, PostLike.created_at).filter(PostLike.post_id.in_(ids))),
+            ("comment", db.query(Comment.post_id, Comment.created_at).filter(
+                Comment.post_id.in_(ids), Comment.is_deleted == False
+            )),
+            ("remix", db.query(PromptReuseEvent.source_post_id, PromptReuseEvent.created_at).filter(
+                PromptReuseEvent.source_post_id.in_(ids)
+            )),
+        ]
+        for kind, events in event_sources:
+            for post_id, created_at in events.yield_per(1000):
+                if created_at is None:
+                    continue
+                scores[post_id] = _log_add(scores[post_id], _event_term(kind, created_at))
+
+        db.bulk_update_mappings(CommunityPost, [
+            {"id": post_id, "trending_score": score} for post_id, score in scores.items()
+        ])
+        db.commit()
+        rescored += len(batch)
+
+    logger.info(f"Recomputed trending scores for {rescored} post(s)")
+    return rescored
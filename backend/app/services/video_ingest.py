@@ -0,0 +1,302 @@
+"""
+Video Ingest
+Streaming path from an admin's upload to Cloudinary for course and topic videos
+
+Uploads are never read into memory whole:
+
+  - spool_upload() copies a multipart UploadFile to disk in
+    VIDEO_UPLOAD_CHUNK_BYTES chunks, hashing (SHA-256) as it goes
+  - resumable sessions (create_session / append_chunk / session_status) let
+    a client send a large file as a series of PUTs and, after a network
+    drop, ask for the committed offset and continue from there; sessions are
+    directories under VIDEO_UPLOAD_DIR, so every worker on the host sees them
+  - upload_to_storage() sends the finished file to Cloudinary with
+    upload_large (chunked) on a dedicated thread pool, off the event loop
+
+Peak memory per upload is one chunk, whatever the file size.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import HTTPException, UploadFile, status
+
+from app.core.config import settings
+from app.services.cloudinary_service import cloudinary_service
+
+logger = logging.getLogger(__name__)
+
+PART_FILE = "data.part"
+META_FILE = "session.json"
+LOCK_FILE = "append.lock"
+# An append lock not touched for this long belongs to a request that died;
+# a live writer touches it every LOCK_REFRESH_SECONDS while data arrives
+STALE_LOCK_SECONDS = 600
+LOCK_REFRESH_SECONDS = 30
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+@dataclass
+class SpooledVideo:
+    """A complete upload on local disk"""
+    path: str
+    size: int
+    sha256: str
+    cleanup_dir: Optional[str] = None  # Session directory to remove with the file
+
+    def release(self, stored: bool) -> None:
+        """
+        Done with the file: a spooled file is always removed, a claimed session
+        only once stored, so a failed store can be retried with the same upload_id
+        (the session expires after VIDEO_UPLOAD_SESSION_TTL_SECONDS otherwise)
+        """
+        if stored or not self.cleanup_dir:
+            self.cleanup()
+
+    def cleanup(self) -> None:
+        try:
+            if self.cleanup_dir:
+                shutil.rmtree(self.cleanup_dir, ignore_errors=True)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+        except OSError as e:
+            logger.warning(f"Could not remove spooled upload {self.path}: {e}")
+
+
+def upload_dir() -> Path:
+    path = Path(settings.VIDEO_UPLOAD_DIR or os.path.join(tempfile.gettempdir(), "video_uploads"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Video exceeds the {settings.VIDEO_UPLOAD_MAX_BYTES} byte limit",
+    )
+
+
+async def spool_upload(upload: UploadFile) -> SpooledVideo:
+    """Copy a multipart upload to a temp file chunk by chunk, with a running SHA-256"""
+    suffix = os.path.splitext(upload.filename or "")[1] or ".mp4"
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=upload_dir())
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await upload.read(settings.VIDEO_UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > settings.VIDEO_UPLOAD_MAX_BYTES:
+                    raise _too_large()
+                digest.update(chunk)
+                await asyncio.to_thread(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return SpooledVideo(path=path, size=size, sha256=digest.hexdigest())
+
+
+# ============ RESUMABLE SESSIONS ============
+
+def _session_dir(upload_id: str) -> Path:
+    if not _SESSION_ID.match(upload_id or ""):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+    path = upload_dir() / upload_id
+    if not (path / META_FILE).exists():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload session not found")
+    return path
+
+
+def _read_meta(path: Path) -> Dict:
+    return json.loads((path / META_FILE).read_text())
+
+
+def _offset(path: Path) -> int:
+    part = path / PART_FILE
+    return part.stat().st_size if part.exists() else 0
+
+
+def purge_expired_sessions() -> int:
+    """Remove sessions not written to for VIDEO_UPLOAD_SESSION_TTL_SECONDS"""
+    cutoff = time.time() - settings.VIDEO_UPLOAD_SESSION_TTL_SECONDS
+    removed = 0
+    for path in upload_dir().iterdir():
+        if not (path.is_dir() and _SESSION_ID.match(path.name)):
+            continue
+        last_write = max((child.stat().st_mtime for child in path.iterdir()), default=path.stat().st_mtime)
+        if last_write < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def create_session(filename: str, size: int, sha256: Optional[str] = None, user_id: Optional[int] = None) -> Dict:
+    """Open a resumable upload session for a file of `size` bytes"""
+    if size <= 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="size must be positive")
+    if size > settings.VIDEO_UPLOAD_MAX_BYTES:
+        raise _too_large()
+    purge_expired_sessions()
+
+    upload_id = uuid.uuid4().hex
+    path = upload_dir() / upload_id
+    path.mkdir()
+    (path / PART_FILE).touch()
+    (path / META_FILE).write_text(json.dumps({
+        "filename": filename,
+        "size": size,
+        "sha256": sha256.lower() if sha256 else None,
+        "user_id": user_id,
+        "created_at": time.time(),
+    }))
+    logger.info(f"Video upload session {upload_id} opened: {filename} ({size} bytes)")
+    return session_status(upload_id)
+
+
+def session_status(upload_id: str) -> Dict:
+    """Committed offset of a session; a client resumes by sending from there"""
+    path = _session_dir(upload_id)
+    meta = _read_meta(path)
+    offset = _offset(path)
+    return {
+        "upload_id": upload_id,
+        "filename": meta["filename"],
+        "size": meta["size"],
+        "offset": offset,
+        "complete": offset == meta["size"],
+        "chunk_size": settings.VIDEO_UPLOAD_CHUNK_BYTES,
+    }
+
+
+def _acquire_append_lock(path: Path) -> None:
+    lock = path / LOCK_FILE
+    try:
+        os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return
+    except FileExistsError:
+        if time.time() - lock.stat().st_mtime < STALE_LOCK_SECONDS:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Another chunk is being written")
+    # Stale lock left by a dead request
+    lock.unlink(missing_ok=True)
+    _acquire_append_lock(path)
+
+
+async def append_chunk(upload_id: str, start: int, body: AsyncIterator[bytes]) -> Dict:
+    """
+    Append a chunk that begins at byte `start` of the file
+    `start` must equal the committed offset (409 with the offset otherwise).
+    A chunk cut off by a network drop keeps the bytes that arrived.
+    """
+    path = _session_dir(upload_id)
+    meta = _read_meta(path)
+
+    _acquire_append_lock(path)
+    try:
+        offset = _offset(path)
+        if start != offset:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Chunk does not start at the committed offset", "offset": offset},
+            )
+
+        refreshed = time.monotonic()
+        with open(path / PART_FILE, "ab") as out:
+            async for data in body:
+                if time.monotonic() - refreshed >= LOCK_REFRESH_SECONDS:
+                    # Still writing: keep the lock from looking stale
+                    os.utime(path / LOCK_FILE)
+                    refreshed = time.monotonic()
+                offset += len(data)
+                if offset > meta["size"]:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail="Chunk runs past the declared file size",
+                    )
+                await asyncio.to_thread(out.write, data)
+    finally:
+        (path / LOCK_FILE).unlink(missing_ok=True)
+
+    return session_status(upload_id)
+
+
+def _hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(settings.VIDEO_UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+async def claim_session(upload_id: str) -> SpooledVideo:
+    """
+    The finished file of a complete session, checksum verified
+    The session is removed by SpooledVideo.release() once stored.
+    """
+    path = _session_dir(upload_id)
+    meta = _read_meta(path)
+    offset = _offset(path)
+    if offset != meta["size"]:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"message": "Upload is not complete", "offset": offset, "size": meta["size"]},
+        )
+
+    sha256 = await asyncio.to_thread(_hash_file, path / PART_FILE)
+    if meta.get("sha256") and meta["sha256"] != sha256:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Checksum mismatch, upload the file again")
+
+    return SpooledVideo(path=str(path / PART_FILE), size=offset, sha256=sha256, cleanup_dir=str(path))
+
+
+async def take_video(upload: Optional[UploadFile], upload_id: Optional[str]) -> SpooledVideo:
+    """The video of an upload endpoint: a multipart file or a completed upload session"""
+    if upload_id:
+        return await claim_session(upload_id)
+    if upload is not None:
+        return await spool_upload(upload)
+    raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Send a video file or an upload_id")
+
+
+# ============ STORAGE ============
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.VIDEO_UPLOAD_THREADS, thread_name_prefix="video-upload"
+                )
+    return _executor
+
+
+async def upload_to_storage(video: SpooledVideo, folder: str) -> Dict:
+    """Send a spooled video to Cloudinary in chunks from the upload thread pool"""
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    result = await loop.run_in_executor(_get_executor(), cloudinary_service.upload_video_large, video.path, folder)
+    logger.info(
+        f"Video uploaded to {folder}: {video.size} bytes, sha256={video.sha256}, "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+    return result
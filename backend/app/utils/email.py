@@ -1,11 +1,11 @@
 """
-Email utility for sending emails via SMTP
+Email utility for sending emails via the outbox (see app.services.email_outbox)
 """
-import smtplib
 import logging
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 from typing import Optional
+
+from sqlalchemy.orm import Session
+
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -15,56 +15,34 @@ def send_email(
     to_email: str,
     subject: str,
     html_content: str,
-    text_content: Optional[str] = None
+    text_content: Optional[str] = None,
+    db: Optional[Session] = None,
+    dedupe_key: Optional[str] = None
 ) -> bool:
     """
-    Send an email using SMTP configuration from settings
+    Queue an email for delivery by the email dispatcher
     
     Args:
         to_email: Recipient email address
         subject: Email subject
         html_content: HTML content of the email
         text_content: Plain text content (optional, will use html if not provided)
+        db: Add the email to this session's transaction (the caller commits) instead of committing it on its own
+        dedupe_key: Queue the email only once per key
     
     Returns:
-        bool: True if email sent successfully, False otherwise
+        bool: True if email was queued successfully, False otherwise
     """
-    try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = settings.EMAIL_FROM
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Add text and HTML parts
-        if text_content:
-            part1 = MIMEText(text_content, 'plain')
-            msg.attach(part1)
-        
-        part2 = MIMEText(html_content, 'html')
-        msg.attach(part2)
-        
-        # Connect to SMTP server and send email
-        logger.info(f"Connecting to SMTP server: {settings.SMTP_HOST}:{settings.SMTP_PORT}")
-        
-        # Use SSL connection for port 465
-        if settings.SMTP_PORT == 465:
-            with smtplib.SMTP_SSL(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.send_message(msg)
-        else:
-            # Use TLS for other ports
-            with smtplib.SMTP(settings.SMTP_HOST, settings.SMTP_PORT) as server:
-                server.starttls()
-                server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
-                server.send_message(msg)
-        
-        logger.info(f"Email sent successfully to {to_email}")
+    from app.services.email_outbox import enqueue_email, queue_email
+
+    if db is not None:
+        queue_email(db, to_email, subject, html_content, text_content, dedupe_key=dedupe_key)
         return True
-        
-    except Exception as e:
-        logger.error(f"Failed to send email to {to_email}: {str(e)}")
-        return False
+
+    queued = enqueue_email(to_email, subject, html_content, text_content, dedupe_key=dedupe_key)
+    if queued:
+        logger.info(f"Email queued for {to_email}")
+    return queued
 
 
 def send_welcome_email(to_email: str, user_name: str, referral_code: str) -> bool:
@@ -360,7 +338,9 @@ def send_purchase_confirmation_email(
     package_price: float,
     transaction_id: str,
     purchase_date,
-    additional_note: str = ""
+    additional_note: str = "",
+    db: Optional[Session] = None,
+    dedupe_key: Optional[str] = None
 ) -> bool:
     """
     Send package purchase confirmation email
@@ -373,6 +353,8 @@ def send_purchase_confirmation_email(
         transaction_id: Razorpay transaction ID
         purchase_date: Date of purchase
         additional_note: Optional additional note (e.g., about existing individual purchases)
+        db: Queue the email in this session's transaction (see send_email)
+        dedupe_key: Queue the email only once per key
 
     Returns:
         bool: True if email sent successfully, False otherwise
@@ -510,7 +492,7 @@ def send_purchase_confirmation_email(
     The {settings.APP_NAME} Team
     """
 
-    return send_email(to_email, subject, html_content, text_content)
+    return send_email(to_email, subject, html_content, text_content, db=db, dedupe_key=dedupe_key)
 
 
 def send_commission_notification_email(
@@ -519,7 +501,9 @@ def send_commission_notification_email(
     commission_amount: float,
     level: int,
     referee_name: str,
-    package_name: str
+    package_name: str,
+    db: Optional[Session] = None,
+    dedupe_key: Optional[str] = None
 ) -> bool:
     """
     Send commission notification email to referrer
@@ -531,6 +515,8 @@ def send_commission_notification_email(
         level: Commission level (1 or 2)
         referee_name: Name of person who made purchase
         package_name: Package purchased
+        db: Queue the email in this session's transaction (see send_email)
+        dedupe_key: Queue the email only once per key
 
     Returns:
         bool: True if email sent successfully, False otherwise
@@ -670,5 +656,5 @@ def send_commission_notification_email(
     The {settings.APP_NAME} Team
     """
 
-    return send_email(to_email, subject, html_content, text_content)
+    return send_email(to_email, subject, html_content, text_content, db=db, dedupe_key=dedupe_key)
 
@@ -0,0 +1,96 @@
+"""
+Shared pytest fixtures for backend tests
+
+Tests run against a throwaway in-memory SQLite database, so no .env is required.
+Live-server scripts (test_api.py, test_endpoints.py, ...) are not affected.
+"""
+import os
+from contextlib import contextmanager
+
+# Settings() requires these at import time; real values are never used by the tests
+for _key, _value in {
+    "DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "test-secret",
+    "EMAIL_FROM": "test@example.com",
+    "SMTP_HOST": "localhost",
+    "SMTP_PORT": "1025",
+    "SMTP_USER": "test",
+    "SMTP_PASSWORD": "test",
+    "RAZORPAY_KEY_ID": "rzp_test",
+    "RAZORPAY_KEY_SECRET": "rzp_test_secret",
+    "CLOUDINARY_CLOUD_NAME": "test",
+    "CLOUDINARY_API_KEY": "test",
+    "CLOUDINARY_API_SECRET": "test",
+}.items():
+    os.environ.setdefault(_key, _value)
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base, get_db
+import app.models  # noqa: F401  (register all models on Base.metadata)
+
+
+@pytest.fixture
+def engine():
+    """Fresh in-memory SQLite engine with the full schema"""
+    test_engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """Database session bound to the test engine"""
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    """FastAPI TestClient whose routes use the test session"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    app.dependency_overrides[get_db] = lambda: db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def login_as():
+    """Authenticate requests as the given user without issuing a JWT"""
+    from app.main import app
+    from app.core.dependencies import get_current_user
+
+    def _login(user):
+        app.dependency_overrides[get_current_user] = lambda: user
+
+    return _login
+
+
+@pytest.fixture
+def count_queries(engine):
+    """Context manager collecting every SQL statement issued on the test engine"""
+    @contextmanager
+    def _count():
+        statements = []
+
+        def _before(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _before)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", _before)
+
+    return _count
@@ -50,6 +50,7 @@ def create_tables():
         print("  - post_reports")
         print("  - prompt_reuse_events")
         print("  - credit_ledger")
+        print("  - user_credit_balances")
         print("  - referral_events")
         
         return True
@@ -0,0 +1,77 @@
+"""
+Benchmark the array-backed commission plan against per-call calculate_commission
+
+Prices N synthetic historic commissions (random referrer package, referee
+package and level) three ways:
+
+  legacy   calculate_commission(name, name, level) per row (dict matrix)
+  amount   CommissionPlan.amount per row
+  bulk     one CommissionPlan.bulk_amounts call for all rows
+
+Usage:
+    python -m scripts.benchmark_commission_engine
+    python -m scripts.benchmark_commission_engine --rows 2000000 --levels 5
+"""
+import argparse
+import random
+import time
+
+from app.services.commission_calculator import COMMISSION_MATRIX, CommissionPlan, calculate_commission
+
+PACKAGES = {"Silver": 1, "Gold": 2, "Platinum": 3}
+
+
+def _plan(levels: int) -> CommissionPlan:
+    # The built-in matrix for levels 1-2, halving per extra level
+    rates = {}
+    for referrer, referees in COMMISSION_MATRIX.items():
+        for referee, amounts in referees.items():
+            for level in range(1, levels + 1):
+                amount = amounts.get(level, amounts[2] / 2 ** (level - 2))
+                rates[(PACKAGES[referrer], PACKAGES[referee], level)] = amount
+    return CommissionPlan(list(PACKAGES.values()), rates)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the commission engine")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--levels", type=int, default=2, help="Plan depth (legacy only covers 2)")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    names = list(PACKAGES)
+    referrers = [rng.choice(names) for _ in range(args.rows)]
+    referees = [rng.choice(names) for _ in range(args.rows)]
+    levels = [rng.randint(1, args.levels) for _ in range(args.rows)]
+    referrer_ids = [PACKAGES[name] for name in referrers]
+    referee_ids = [PACKAGES[name] for name in referees]
+    plan = _plan(args.levels)
+
+    results = {}
+    if args.levels <= 2:
+        start = time.perf_counter()
+        legacy = [calculate_commission(a, b, level) for a, b, level in zip(referrers, referees, levels)]
+        results["legacy"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_row = [plan.amount(a, b, level) for a, b, level in zip(referrer_ids, referee_ids, levels)]
+    results["amount"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = plan.bulk_amounts(referrer_ids, referee_ids, levels)
+    results["bulk"] = time.perf_counter() - start
+
+    assert list(bulk) == per_row
+    if args.levels <= 2:
+        assert per_row == legacy
+
+    print(f"{args.rows:,} commissions, {args.levels}-level plan")
+    print(f"{'method':>8} | {'seconds':>8} | {'rows/second':>12}")
+    print("-" * 36)
+    for method, seconds in results.items():
+        print(f"{method:>8} | {seconds:>8.2f} | {args.rows / seconds:>12,.0f}")
+    print("\n✅ All methods agree")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Benchmark the commission replay on a synthetic purchase history
+
+Builds a throwaway SQLite database with N users (default 1M) in a random
+referral tree, where about 70% bought a package and some upgraded later.
+Commissions are written from a first replay (so they match the plan), then
+a sample is corrupted: amounts changed, rows deleted, duplicates added. The
+replay is then timed sequentially and with --workers processes and must find
+exactly the corruption.
+
+Usage:
+    python -m scripts.benchmark_commission_replay
+    python -m scripts.benchmark_commission_replay --users 200000 --workers 4
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import Commission, Package, Referral, ReferralPath, User, UserPackage
+from app.services import referral_graph
+from app.services.commission_calculator import get_commission_plan
+from app.services.commission_replay import replay, replay_parallel, replay_range
+
+BATCH = 50_000
+
+
+def _seed(engine, users: int, seed: int) -> None:
+    rng = random.Random(seed)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(Package.__table__.insert(), [
+            {"id": 1, "name": "Silver", "slug": "silver", "base_price": 2500, "gst_amount": 450, "final_price": 2950, "display_order": 1},
+            {"id": 2, "name": "Gold", "slug": "gold", "base_price": 4500, "gst_amount": 810, "final_price": 5310, "display_order": 2},
+            {"id": 3, "name": "Platinum", "slug": "platinum", "base_price": 7500, "gst_amount": 1350, "final_price": 8850, "display_order": 3},
+        ])
+        user_rows, package_rows = [], []
+        for user_id in range(1, users + 1):
+            referrer = rng.randint(1, user_id - 1) if user_id > 1 and rng.random() < 0.8 else None
+            user_rows.append({
+                "id": user_id, "email": f"user{user_id}@example.com", "hashed_password": "x",
+                "full_name": "Bench", "referral_code": f"R{user_id:09d}", "referred_by_id": referrer,
+            })
+            if rng.random() < 0.7:
+                bought = base + timedelta(minutes=user_id)
+                package_id = rng.randint(1, 3)
+                package_rows.append({"user_id": user_id, "package_id": package_id, "status": "active", "purchase_date": bought})
+                if package_id < 3 and rng.random() < 0.1:
+                    package_rows.append({"user_id": user_id, "package_id": package_id + 1, "status": "active",
+                                         "purchase_date": bought + timedelta(days=rng.randint(1, 90))})
+            if len(user_rows) == BATCH:
+                conn.execute(User.__table__.insert(), user_rows)
+                conn.execute(UserPackage.__table__.insert(), package_rows)
+                user_rows, package_rows = [], []
+        if user_rows:
+            conn.execute(User.__table__.insert(), user_rows)
+        if package_rows:
+            conn.execute(UserPackage.__table__.insert(), package_rows)
+
+
+def _write_commissions(db, users: int) -> None:
+    """Store exactly the commissions the replay expects"""
+    plan = get_commission_plan(db)
+    for start in range(1, users + 1, BATCH):
+        missing = []
+        replay_range(db, start, min(start + BATCH - 1, users), plan=plan, batch_size=BATCH, emit=missing.append)
+        referrals = [
+            {"referrer_id": row["referrer_id"], "referee_id": row["referee_id"], "level": row["level"], "package_id": row["package_id"]}
+            for row in missing
+        ]
+        first_id = (db.query(func.max(Referral.id)).scalar() or 0) + 1
+        db.execute(Referral.__table__.insert(), referrals)
+        db.execute(Commission.__table__.insert(), [
+            {"user_id": row["referrer_id"], "referral_id": first_id + index, "amount": row["expected_amount"],
+             "commission_type": f"level{row['level']}", "status": "pending"}
+            for index, row in enumerate(missing)
+        ])
+        db.commit()
+
+
+def _corrupt(db, rng, count: int) -> int:
+    """Change `count` amounts, delete `count` commissions and duplicate `count`: 3 * count differences"""
+    total = db.query(func.count(Commission.id)).scalar()
+    ids = rng.sample(range(1, total + 1), 3 * count)
+    for commission_id in ids[:count]:
+        db.query(Commission).filter(Commission.id == commission_id).update({"amount": Commission.amount + 1})
+    db.query(Commission).filter(Commission.id.in_(ids[count:2 * count])).delete(synchronize_session=False)
+    for commission in db.query(Commission).filter(Commission.id.in_(ids[2 * count:])):
+        db.add(Commission(user_id=commission.user_id, referral_id=commission.referral_id, amount=commission.amount,
+                          commission_type=commission.commission_type, status="pending"))
+    db.commit()
+    return 3 * count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the commission replay")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--corrupt", type=int, default=100, help="Commissions corrupted per kind of difference")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{os.path.join(tmp, 'commissions.db')}"
+        engine = create_engine(database_url)
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        _seed(engine, args.users, args.seed)
+        referral_graph.rebuild(db)
+        _write_commissions(db, args.users)
+        differences = _corrupt(db, random.Random(args.seed), args.corrupt)
+        rows = sum(db.query(func.count()).select_from(model).scalar()
+                   for model in (User, UserPackage, ReferralPath, Referral, Commission))
+        print(f"Seeded {rows:,} rows ({args.users:,} users) in {time.perf_counter() - start:.1f}s\n")
+
+        sequential = replay(db)
+        db.close()
+        engine.dispose()
+        parallel = replay_parallel(args.workers, database_url=database_url)
+
+        print(f"{'mode':>12} | {'seconds':>8} | {'purchases/s':>12} | {'differences':>11}")
+        print("-" * 54)
+        for mode, stats in (("sequential", sequential), (f"{args.workers} workers", parallel)):
+            found = stats["missing"] + stats["extra"] + stats["wrong_amount"]
+            print(f"{mode:>12} | {stats['seconds']:>8.1f} | {stats['purchases'] / stats['seconds']:>12,.0f} | {found:>11,}")
+            assert found == differences, f"expected {differences} differences, found {found}"
+        print(f"\n✅ Both modes found all {differences} injected differences")
+
+
+if __name__ == "__main__":
+    main()
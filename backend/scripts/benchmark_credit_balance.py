@@ -0,0 +1,68 @@
+"""
+Benchmark credit balance lookups as the ledger grows
+
+Compares the materialized snapshot lookup used by CreditLedgerService.get_balance
+with the old approach of loading and summing every ledger row.
+Runs against a throwaway in-memory SQLite database.
+
+Usage:
+    python -m scripts.benchmark_credit_balance
+"""
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.models import User, CreditLedger
+from app.services.credit_ledger_service import CreditLedgerService
+
+LEDGER_SIZES = [100, 1_000, 10_000, 100_000]
+LOOKUPS = 200
+
+
+def legacy_balance(db, user_id: int) -> float:
+    rows = db.query(CreditLedger).filter(CreditLedger.user_id == user_id).all()
+    return max(0, sum(row.delta for row in rows))
+
+
+def time_lookups(fn, db, user_id: int) -> float:
+    start = time.perf_counter()
+    for _ in range(LOOKUPS):
+        fn(db, user_id)
+        db.expire_all()
+    return (time.perf_counter() - start) / LOOKUPS * 1000
+
+
+def main():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    print(f"{'ledger rows':>12} | {'snapshot (ms)':>14} | {'full scan (ms)':>15}")
+    print("-" * 48)
+    for i, size in enumerate(LEDGER_SIZES):
+        user = User(email=f"bench{i}@example.com", hashed_password="x", full_name="Bench", referral_code=f"BENCH{i:04d}")
+        db.add(user)
+        db.commit()
+
+        db.bulk_insert_mappings(CreditLedger, [
+            {"user_id": user.id, "delta": 1.0, "reason": "benchmark", "idempotency_key": f"bench-{user.id}-{n}"}
+            for n in range(size)
+        ])
+        db.commit()
+
+        # Seed the snapshot once, as the migration backfill would
+        CreditLedgerService.get_balance(db, user.id)
+        db.commit()
+
+        snapshot_ms = time_lookups(CreditLedgerService.get_balance, db, user.id)
+        legacy_ms = time_lookups(legacy_balance, db, user.id) if size <= 10_000 else float("nan")
+        print(f"{size:>12,} | {snapshot_ms:>14.3f} | {legacy_ms:>15.3f}")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
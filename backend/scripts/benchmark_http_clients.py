@@ -0,0 +1,186 @@
+"""
+Benchmark per-call httpx clients against the shared pooled provider clients
+
+Starts a local HTTPS mock of the DALL-E flow (POST a generation, then GET the
+image URL it returns) and times N sequential generations two ways:
+
+  fresh   a new httpx.AsyncClient per request, as the adapters used to do
+  pooled  one long-lived client from app.core.http_clients.build_client
+
+--rtt-ms simulates network distance: each new connection waits 2 x RTT
+(TCP + TLS handshake) and each request waits 1 x RTT.
+
+Usage:
+    python -m scripts.benchmark_http_clients
+    python -m scripts.benchmark_http_clients --generations 50 --rtt-ms 40
+"""
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import ssl
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from app.core.http_clients import build_client
+
+IMAGE_BYTES = b"\x89PNG" + b"\0" * 64 * 1024
+
+
+def _self_signed_cert(directory: Path):
+    key = ec.generate_private_key(ec.SECP256R1())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "127.0.0.1")])
+    now = datetime.datetime.now(datetime.timezone.utc)
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(now - datetime.timedelta(minutes=1))
+        .not_valid_after(now + datetime.timedelta(hours=1))
+        .add_extension(x509.SubjectAlternativeName([x509.IPAddress(ipaddress.ip_address("127.0.0.1"))]), False)
+        .sign(key, hashes.SHA256())
+    )
+    cert_path, key_path = directory / "cert.pem", directory / "key.pem"
+    cert_path.write_bytes(cert.public_bytes(serialization.Encoding.PEM))
+    key_path.write_bytes(key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    return cert_path, key_path
+
+
+class MockProvider:
+    """Tiny HTTP/1.1 keep-alive server imitating the DALL-E generate + download endpoints"""
+
+    def __init__(self, ssl_context: ssl.SSLContext, rtt: float):
+        self.ssl_context = ssl_context
+        self.rtt = rtt
+        self.connections = 0
+        self.port = 0
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0, ssl=self.ssl_context)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        await asyncio.sleep(2 * self.rtt)  # TCP + TLS handshake round trips
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode().strip()
+                    if not line:
+                        break
+                    key, value = line.split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                if "content-length" in headers:
+                    await reader.readexactly(int(headers["content-length"]))
+
+                await asyncio.sleep(self.rtt)
+                if method == "POST":
+                    body = json.dumps({"data": [{"url": f"https://127.0.0.1:{self.port}/image.png"}]}).encode()
+                    content_type = "application/json"
+                else:
+                    body, content_type = IMAGE_BYTES, "image/png"
+                writer.write(
+                    f"HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ssl.SSLError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def _generate(client: httpx.AsyncClient, base_url: str):
+    resp = await client.post(f"{base_url}/v1/images/generations", json={"prompt": "a cat", "n": 1})
+    image = await client.get(resp.json()["data"][0]["url"])
+    assert image.content == IMAGE_BYTES
+
+
+async def _fresh_generation(verify, base_url: str):
+    # Old adapter behaviour: one client (and connection) per request
+    async with httpx.AsyncClient(verify=verify, timeout=60.0) as client:
+        resp = await client.post(f"{base_url}/v1/images/generations", json={"prompt": "a cat", "n": 1})
+        url = resp.json()["data"][0]["url"]
+    async with httpx.AsyncClient(verify=verify, timeout=60.0) as client:
+        image = await client.get(url)
+        assert image.content == IMAGE_BYTES
+
+
+async def _run(generations: int, rtt_ms: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        cert_path, key_path = _self_signed_cert(Path(tmp))
+        server_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        server_ctx.load_cert_chain(cert_path, key_path)
+        client_ctx = ssl.create_default_context(cafile=str(cert_path))
+
+        server = MockProvider(server_ctx, rtt_ms / 1000)
+        await server.start()
+        base_url = f"https://127.0.0.1:{server.port}"
+
+        results = {}
+        try:
+            for mode in ("fresh", "pooled"):
+                connections_before = server.connections
+                timings = []
+                pooled = build_client("openai", verify=client_ctx) if mode == "pooled" else None
+                try:
+                    for _ in range(generations):
+                        start = time.perf_counter()
+                        if pooled:
+                            await _generate(pooled, base_url)
+                        else:
+                            await _fresh_generation(client_ctx, base_url)
+                        timings.append((time.perf_counter() - start) * 1000)
+                finally:
+                    if pooled:
+                        await pooled.aclose()
+                results[mode] = (timings, server.connections - connections_before)
+        finally:
+            await server.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fresh vs pooled provider HTTP clients")
+    parser.add_argument("--generations", type=int, default=30)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Simulated network round trip")
+    args = parser.parse_args()
+
+    results = asyncio.run(_run(args.generations, args.rtt_ms))
+
+    print(f"{args.generations} DALL-E style generations (generate + download), simulated RTT {args.rtt_ms:.0f}ms")
+    print(f"{'mode':>8} | {'mean (ms)':>10} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'connections':>11}")
+    print("-" * 60)
+    for mode, (timings, connections) in results.items():
+        p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{mode:>8} | {statistics.mean(timings):>10.1f} | {statistics.median(timings):>9.1f} | {p95:>9.1f} | {connections:>11}")
+
+    saved = statistics.mean(results["fresh"][0]) - statistics.mean(results["pooled"][0])
+    print(f"\n✅ Pooled clients save {saved:.1f}ms per generation on average")
+
+
+if __name__ == "__main__":
+    main()
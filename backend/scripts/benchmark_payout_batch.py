@@ -0,0 +1,113 @@
+"""
+Benchmark the weekly payout batch on synthetic pending commissions
+
+Builds a throwaway SQLite database with N pending commissions spread over
+M users and runs payout_service.create_payout_batch, printing its per-phase
+timing summary. With --legacy the previous per-user ORM implementation runs
+first on an identical copy for comparison.
+
+Usage:
+    python -m scripts.benchmark_payout_batch
+    python -m scripts.benchmark_payout_batch --commissions 100000 --users 20000 --legacy
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import Commission, Payout, User
+from app.services.payout_service import calculate_pending_payouts, create_payout_batch
+
+BATCH = 50_000
+
+
+def _seed(engine, commissions: int, users: int, seed: int) -> None:
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for start in range(1, users + 1, BATCH):
+            conn.execute(User.__table__.insert(), [
+                {"id": user_id, "email": f"user{user_id}@example.com", "hashed_password": "x",
+                 "full_name": "Bench", "referral_code": f"R{user_id:09d}"}
+                for user_id in range(start, min(start + BATCH, users + 1))
+            ])
+        for start in range(0, commissions, BATCH):
+            conn.execute(Commission.__table__.insert(), [
+                {"user_id": rng.randint(1, users), "referral_id": 1, "amount": rng.choice([150.0, 400.0, 1875.0, 3375.0]),
+                 "commission_type": "level1", "status": "pending" if rng.random() < 0.9 else "paid"}
+                for _ in range(start, min(start + BATCH, commissions))
+            ])
+
+
+def legacy_create_payout_batch(db):
+    """The previous implementation: one query and row-by-row updates per user"""
+    created = []
+    for payout_data in calculate_pending_payouts(db):
+        pending = db.query(Commission).filter(
+            Commission.user_id == payout_data['user_id'], Commission.status == 'pending'
+        ).all()
+        payout = Payout(user_id=payout_data['user_id'], amount=payout_data['amount'], status='pending',
+                        payout_date=datetime.utcnow())
+        db.add(payout)
+        db.flush()
+        for commission in pending:
+            commission.payout_id = payout.id
+            commission.status = 'processing'
+        created.append(payout)
+    db.commit()
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the payout batch")
+    parser.add_argument("--commissions", type=int, default=500_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=5_000)
+    parser.add_argument("--legacy", action="store_true", help="Also time the previous per-user implementation")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "payouts.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        start = time.perf_counter()
+        _seed(engine, args.commissions, args.users, args.seed)
+        engine.dispose()
+        print(f"Seeded {args.commissions:,} commissions for {args.users:,} users in {time.perf_counter() - start:.1f}s\n")
+
+        if args.legacy:
+            shutil.copy(path, path + ".legacy")
+            legacy_engine = create_engine(f"sqlite:///{path}.legacy")
+            db = sessionmaker(bind=legacy_engine)()
+            start = time.perf_counter()
+            payouts = legacy_create_payout_batch(db)
+            print(f"legacy: {len(payouts):,} payouts in {time.perf_counter() - start:.2f}s")
+            db.close()
+            legacy_engine.dispose()
+
+        engine = create_engine(f"sqlite:///{path}")
+        db = sessionmaker(bind=engine)()
+        result = create_payout_batch(db, chunk_size=args.chunk_size)
+        print(f"set-based: {result['payouts']:,} payouts, {result['commissions']:,} commissions, "
+              f"{result['chunks']} chunks in {result['seconds']:.2f}s")
+        for phase, seconds in result["timings"].items():
+            print(f"  {phase:>8}: {seconds:.2f}s")
+
+        unlinked = db.query(func.count(Commission.id)).filter(
+            Commission.status == "processing", Commission.payout_id.is_(None)
+        ).scalar()
+        assert unlinked == 0
+        print("\n✅ Every claimed commission is linked to a payout")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Benchmark referral graph queries on a synthetic referral tree
+
+Builds a throwaway SQLite database with N users (default 1M) where each user
+was referred by a random earlier user (20% sign up without a referrer),
+indexes it with referral_graph.rebuild, and compares the closure-table
+queries with the per-node / per-hop queries they replace:
+
+  stats      level 1 + level 2 counts (one COUNT per direct referral before)
+  subtree    whole downline size (one query per tree level before)
+  upline     full referrer chain (one query per hop before)
+
+Usage:
+    python -m scripts.benchmark_referral_graph
+    python -m scripts.benchmark_referral_graph --users 100000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import User
+from app.services import referral_graph
+
+REPEATS = 20
+
+
+def _seed(engine, users: int, seed: int) -> None:
+    rng = random.Random(seed)
+    batch = []
+    with engine.begin() as conn:
+        for user_id in range(1, users + 1):
+            referrer = rng.randint(1, user_id - 1) if user_id > 1 and rng.random() < 0.8 else None
+            batch.append({
+                "id": user_id,
+                "email": f"user{user_id}@example.com",
+                "hashed_password": "x",
+                "full_name": "Bench",
+                "referral_code": f"R{user_id:09d}",
+                "referred_by_id": referrer,
+            })
+            if len(batch) == 50_000:
+                conn.execute(User.__table__.insert(), batch)
+                batch = []
+        if batch:
+            conn.execute(User.__table__.insert(), batch)
+
+
+def legacy_stats(db, user_id: int):
+    direct = db.query(User).filter(User.referred_by_id == user_id).all()
+    level2 = sum(db.query(User).filter(User.referred_by_id == ref.id).count() for ref in direct)
+    return len(direct), level2
+
+
+def legacy_subtree(db, user_id: int) -> int:
+    total, frontier = 0, [user_id]
+    while frontier:
+        frontier = [row.id for row in db.query(User.id).filter(User.referred_by_id.in_(frontier))]
+        total += len(frontier)
+    return total
+
+
+def legacy_upline(db, user_id: int) -> int:
+    chain = 0
+    user = db.get(User, user_id)
+    while user and user.referred_by_id:
+        user = db.query(User).filter(User.id == user.referred_by_id).first()
+        chain += 1
+    return chain
+
+
+def _time(fn, db, user_id: int) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        fn(db, user_id)
+        db.expire_all()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the referral closure table")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'referrals.db')}")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+
+        start = time.perf_counter()
+        _seed(engine, args.users, args.seed)
+        print(f"Seeded {args.users:,} users in {time.perf_counter() - start:.1f}s")
+
+        result = referral_graph.rebuild(db)
+        print(f"Closure table: {result['rows']:,} rows, max depth {result['depth']}, built in {result['seconds']:.1f}s\n")
+
+        # Largest downline (an early user), a mid-tree user, and the deepest leaf
+        deepest = db.execute(text(
+            "SELECT descendant_id FROM referral_paths ORDER BY depth DESC LIMIT 1"
+        )).scalar()
+        mid = db.query(User.id).filter(User.referred_by_id.isnot(None)).order_by(User.id).offset(args.users // 100).limit(1).scalar()
+        samples = {"top (user 1)": 1, f"mid (user {mid})": mid, f"leaf (user {deepest})": deepest}
+
+        print(f"{'user':>22} | {'downline':>9} | {'query':>8} | {'legacy (ms)':>12} | {'closure (ms)':>12}")
+        print("-" * 76)
+        for label, user_id in samples.items():
+            size = referral_graph.subtree_count(db, user_id)
+            cases = [
+                ("stats", legacy_stats, lambda db, uid: referral_graph.level_counts(db, uid, max_depth=2)),
+                ("subtree", legacy_subtree, referral_graph.subtree_count),
+                ("upline", legacy_upline, lambda db, uid: referral_graph.upline(db, uid)),
+            ]
+            for name, legacy, closure in cases:
+                print(f"{label:>22} | {size:>9,} | {name:>8} | {_time(legacy, db, user_id):>12.2f} | {_time(closure, db, user_id):>12.2f}")
+
+        total = db.query(func.count(User.id)).scalar()
+        print(f"\n✅ Benchmarked {total:,} users")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Move stored assets into or between blob store backends
+
+--import-legacy stores files written before the blob store (static/generated,
+app/static/thumbnails, invoices/) in the STORAGE_BACKEND store and points
+their records at the blobs. --from/--to copies every blob from one backend
+to another and rewrites the stored URLs; set STORAGE_BACKEND to the target
+afterwards. Both are safe to re-run.
+
+Usage:
+    python -m scripts.migrate_storage --import-legacy --dry-run
+    python -m scripts.migrate_storage --import-legacy [--delete-legacy]
+    python -m scripts.migrate_storage --from local --to cloudinary [--dry-run]
+"""
+import argparse
+import logging
+import sys
+
+from app.core.database import SessionLocal
+from app.services.blob_store import IMAGES, INVOICES, get_blob_store
+from app.services.storage_migration import import_legacy, migrate_backend
+
+BACKENDS = ("local", "cloudinary")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Migrate stored assets into or between blob store backends")
+    parser.add_argument("--import-legacy", action="store_true", help="import pre-blob-store files into STORAGE_BACKEND")
+    parser.add_argument("--delete-legacy", action="store_true", help="remove legacy files once imported")
+    parser.add_argument("--from", dest="source", choices=BACKENDS, help="backend to copy blobs from")
+    parser.add_argument("--to", dest="target", choices=BACKENDS, help="backend to copy blobs to")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    if args.import_legacy == bool(args.source or args.target):
+        parser.error("use either --import-legacy or --from/--to")
+    if not args.import_legacy and (not args.source or not args.target or args.source == args.target):
+        parser.error("--from and --to must name two different backends")
+
+    logging.basicConfig(level=logging.INFO)
+
+    db = SessionLocal()
+    try:
+        if args.import_legacy:
+            stores = {IMAGES: get_blob_store(IMAGES), INVOICES: get_blob_store(INVOICES)}
+            report = import_legacy(db, stores, dry_run=args.dry_run, delete_files=args.delete_legacy)
+        else:
+            report = migrate_backend(db, args.source, args.target, dry_run=args.dry_run)
+    finally:
+        db.close()
+
+    prefix = "[dry run] " if args.dry_run else ""
+    for name, count in sorted(report.counts.items()):
+        print(f"{prefix}{name}: {count}")
+    if report.missing:
+        print(f"⚠️  {len(report.missing)} record(s) point at files that no longer exist:")
+        for value in report.missing[:20]:
+            print(f"  - {value}")
+        return 1
+    print("✅ Storage migration complete")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
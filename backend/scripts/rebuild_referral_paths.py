@@ -0,0 +1,54 @@
+"""
+Rebuild the referral graph index (referral_paths closure table) from users.referred_by_id
+
+Registration keeps the index up to date; run this after bulk imports, manual
+edits of referred_by_id, or to verify the index.
+
+Usage:
+    python -m scripts.rebuild_referral_paths           # rebuild
+    python -m scripts.rebuild_referral_paths --check   # report drift without writing
+"""
+import argparse
+import logging
+
+from sqlalchemy import func
+
+from app.core.database import SessionLocal
+from app.models import ReferralPath, User
+from app.services import referral_graph
+
+
+def check(db) -> int:
+    """Compare stored direct links with users.referred_by_id; returns the number of mismatches"""
+    expected = set(db.query(User.referred_by_id, User.id).filter(User.referred_by_id.isnot(None)))
+    stored = set(db.query(ReferralPath.ancestor_id, ReferralPath.descendant_id).filter(ReferralPath.depth == 1))
+    missing, extra = expected - stored, stored - expected
+    total = db.query(func.count()).select_from(ReferralPath).scalar()
+    print(f"Referral paths: {total} rows, {len(expected)} direct links")
+    if missing or extra:
+        print(f"⚠️  {len(missing)} direct link(s) missing, {len(extra)} stale")
+    else:
+        print("✅ Direct links match users.referred_by_id")
+    return len(missing) + len(extra)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the referral_paths closure table")
+    parser.add_argument("--check", action="store_true", help="Report drift without rebuilding")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            check(db)
+            return
+        result = referral_graph.rebuild(db)
+        print(f"✅ Rebuilt {result['rows']} referral path(s), max depth {result['depth']}, in {result['seconds']:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
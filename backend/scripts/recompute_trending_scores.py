@@ -0,0 +1,25 @@
+"""
+Recompute community trending scores from likes, comments and remixes
+
+Scores are maintained incrementally as events arrive; run this on a schedule
+(e.g. nightly cron) to repair any drift, and once after migration 012 to
+backfill existing posts.
+
+Usage:
+    python -m scripts.recompute_trending_scores
+"""
+from app.core.database import SessionLocal
+from app.services.trending_service import recompute_scores
+
+
+def main():
+    db = SessionLocal()
+    try:
+        count = recompute_scores(db)
+        print(f"✅ Recomputed trending scores for {count} post(s)")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
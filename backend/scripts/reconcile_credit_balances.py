@@ -0,0 +1,41 @@
+"""
+Reconcile materialized credit balances against the credit ledger
+
+Usage:
+    python -m scripts.reconcile_credit_balances          # report drift only
+    python -m scripts.reconcile_credit_balances --fix    # report and repair
+"""
+import argparse
+import sys
+
+from app.core.database import SessionLocal
+from app.services.credit_ledger_service import CreditLedgerService
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Recompute credit balances from the ledger and report drift")
+    parser.add_argument("--fix", action="store_true", help="overwrite drifted snapshots with ledger totals")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        drift = CreditLedgerService.reconcile_balances(db, fix=args.fix)
+    finally:
+        db.close()
+
+    if not drift:
+        print("✅ All credit balance snapshots match the ledger")
+        return 0
+
+    print(f"⚠️  {len(drift)} user(s) with drifted credit balances:")
+    for entry in drift:
+        snapshot = "missing" if entry["snapshot"] is None else f"{entry['snapshot']:.2f}"
+        print(f"  - user {entry['user_id']}: snapshot={snapshot}, ledger={entry['ledger']:.2f}")
+    if args.fix:
+        print("✅ Snapshots repaired")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
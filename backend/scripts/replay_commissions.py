@@ -0,0 +1,73 @@
+"""
+Audit stored referral commissions by replaying every package purchase
+
+Rebuilds the commissions the commission plan says should exist and writes
+the differences (missing, extra, wrong_amount) as CSV. Read-only: nothing in
+the database is changed. See app/services/commission_replay.py.
+
+Usage:
+    python -m scripts.replay_commissions                        # summary only
+    python -m scripts.replay_commissions --output diff.csv      # plus every difference
+    python -m scripts.replay_commissions --workers 8 --output diff.csv
+    python -m scripts.replay_commissions --from-user 1 --to-user 50000
+"""
+import argparse
+import csv
+import sys
+
+from app.core.database import SessionLocal
+from app.services.commission_calculator import get_commission_plan
+from app.services.commission_replay import DIFF_FIELDS, replay, replay_parallel, replay_range
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay purchases and diff stored commissions against the commission plan")
+    parser.add_argument("--output", help="CSV file for the differences")
+    parser.add_argument("--workers", type=int, default=1, help="Processes, each replaying one user-id range")
+    parser.add_argument("--batch-size", type=int, default=5_000, help="Buyer user ids per batch")
+    parser.add_argument("--plan", help="Commission plan to check against (default: the active plan)")
+    parser.add_argument("--from-user", type=int, help="First buyer user id (with --to-user)")
+    parser.add_argument("--to-user", type=int, help="Last buyer user id (with --from-user)")
+    args = parser.parse_args()
+    if (args.from_user is None) != (args.to_user is None):
+        parser.error("--from-user and --to-user must be given together")
+    if args.workers > 1 and args.from_user is not None:
+        parser.error("--workers splits the whole user-id range itself; don't combine it with --from-user/--to-user")
+
+    if args.workers > 1:
+        stats = replay_parallel(args.workers, batch_size=args.batch_size, diff_path=args.output, plan_name=args.plan)
+    else:
+        db = SessionLocal()
+        diff_file = open(args.output, "w", newline="") if args.output else None
+        try:
+            writer = csv.DictWriter(diff_file, fieldnames=DIFF_FIELDS) if diff_file else None
+            if writer:
+                writer.writeheader()
+            emit = writer.writerow if writer else None
+            plan = get_commission_plan(db, args.plan)
+            if args.from_user is not None:
+                stats = replay_range(db, args.from_user, args.to_user, plan=plan, batch_size=args.batch_size, emit=emit)
+            else:
+                stats = replay(db, plan=plan, batch_size=args.batch_size, emit=emit)
+        finally:
+            if diff_file:
+                diff_file.close()
+            db.close()
+
+    print(f"Replayed {stats['purchases']:,} purchases: {stats['expected']:,} expected, {stats['actual']:,} stored commissions")
+    if "seconds" in stats:
+        print(f"Took {stats['seconds']:.1f}s")
+    differences = stats["missing"] + stats["extra"] + stats["wrong_amount"]
+    if not differences:
+        print(f"✅ All {stats['matched']:,} commissions match the plan")
+        return 0
+
+    print(f"⚠️  {differences:,} difference(s): {stats['missing']:,} missing, {stats['extra']:,} extra, "
+          f"{stats['wrong_amount']:,} wrong amount")
+    if args.output:
+        print(f"Details written to {args.output}")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+Run the email outbox dispatcher as a dedicated process
+
+By default the API process runs a dispatcher itself; when running this
+instead, set EMAIL_DISPATCHER_EMBEDDED=false on the API. Several dispatchers
+can run at once (each claims its own batches); EMAIL_RATE_LIMIT_PER_MINUTE
+applies per dispatcher.
+
+Usage:
+    python -m scripts.run_email_dispatcher          # run until Ctrl+C / SIGTERM
+    python -m scripts.run_email_dispatcher --drain  # send everything due and exit
+    python -m scripts.run_email_dispatcher --stats  # print outbox depth
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.core.database import SessionLocal
+from app.services.email_outbox import EmailDispatcher, outbox_depth
+
+
+async def _run(drain: bool) -> EmailDispatcher:
+    dispatcher = EmailDispatcher()
+    if drain:
+        try:
+            await dispatcher.drain()
+        finally:
+            await dispatcher.pool.close()
+        return dispatcher
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    await dispatcher.run(stop_event)
+    return dispatcher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the email outbox dispatcher")
+    parser.add_argument("--drain", action="store_true", help="Send all due emails and exit")
+    parser.add_argument("--stats", action="store_true", help="Print outbox depth and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not args.stats:
+        dispatcher = asyncio.run(_run(args.drain))
+        print(f"✅ Sent {dispatcher.sent} email(s), {dispatcher.failed} failed attempt(s)")
+
+    db = SessionLocal()
+    try:
+        print(f"Outbox depth: {outbox_depth(db)}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
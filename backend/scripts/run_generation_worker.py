@@ -0,0 +1,67 @@
+"""
+Run the image generation worker pool as a dedicated process
+
+By default the API process runs a worker pool itself; when running this
+instead, set GENERATION_WORKERS_EMBEDDED=false on the API. Several pools can
+run at once (each claims its own jobs); GENERATION_MAX_CONCURRENCY and the
+per-provider caps apply per pool.
+
+Usage:
+    python -m scripts.run_generation_worker                  # run until Ctrl+C / SIGTERM
+    python -m scripts.run_generation_worker --concurrency 16
+    python -m scripts.run_generation_worker --drain          # run everything queued and exit
+    python -m scripts.run_generation_worker --stats          # print queue depth per provider
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app.core.database import SessionLocal
+from app.core.http_clients import http_clients
+from app.services.generation_jobs import GenerationWorkerPool, queue_depth
+
+
+async def _run(drain: bool, concurrency: int) -> GenerationWorkerPool:
+    pool = GenerationWorkerPool(concurrency=concurrency or None)
+    try:
+        if drain:
+            await pool.drain()
+            return pool
+
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        await pool.run(stop_event)
+        return pool
+    finally:
+        await http_clients.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the image generation worker pool")
+    parser.add_argument("--concurrency", type=int, default=0, help="Provider calls in flight (default: GENERATION_MAX_CONCURRENCY)")
+    parser.add_argument("--drain", action="store_true", help="Run all queued jobs and exit")
+    parser.add_argument("--stats", action="store_true", help="Print queue depth and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if not args.stats:
+        pool = asyncio.run(_run(args.drain, args.concurrency))
+        print(f"✅ {pool.succeeded} generation(s) succeeded, {pool.failed} failed")
+
+    db = SessionLocal()
+    try:
+        depth = queue_depth(db)
+    finally:
+        db.close()
+    if not depth:
+        print("Generation queue is empty")
+    for provider, counts in sorted(depth.items()):
+        print(f"{provider}: {counts['queued']} queued, {counts['running']} running")
+
+
+if __name__ == "__main__":
+    main()
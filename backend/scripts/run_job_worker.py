@@ -0,0 +1,71 @@
+"""
+Run background job workers (referral commissions, invoices, emails, ...)
+
+Each worker is a separate process polling the background_jobs table; run as
+many as the database can take. Stop with Ctrl+C / SIGTERM: workers finish
+their current job before exiting.
+
+Usage:
+    python -m scripts.run_job_worker              # one worker
+    python -m scripts.run_job_worker --workers 4  # four worker processes
+    python -m scripts.run_job_worker --drain      # run due jobs once and exit
+    python -m scripts.run_job_worker --stats      # print queue depth and latency
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import threading
+
+from app.core.database import SessionLocal
+from app.services.job_queue import drain, queue_metrics, run_worker
+
+
+def _worker_process():
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+    run_worker(stop_event=stop_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run background job workers")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes")
+    parser.add_argument("--drain", action="store_true", help="Run all due jobs once and exit")
+    parser.add_argument("--stats", action="store_true", help="Print queue metrics and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    if args.stats or args.drain:
+        db = SessionLocal()
+        try:
+            if args.drain:
+                print(f"✅ Ran {drain(db)} job(s)")
+            metrics = queue_metrics(db)
+        finally:
+            db.close()
+        print(f"Queue depth: {metrics['depth']}")
+        print(f"Oldest due job waiting: {metrics['oldest_due_age_seconds']:.1f}s")
+        print(f"Avg wait / run: {metrics['avg_wait_seconds']:.2f}s / {metrics['avg_run_seconds']:.2f}s")
+        if metrics["depth"]["dead"]:
+            print(f"⚠️  {metrics['depth']['dead']} dead-lettered job(s); retry via POST /api/admin/jobs/{{id}}/retry")
+        return
+
+    if args.workers == 1:
+        _worker_process()
+        return
+
+    processes = [multiprocessing.Process(target=_worker_process, name=f"job-worker-{i}") for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
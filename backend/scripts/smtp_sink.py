@@ -0,0 +1,103 @@
+"""
+Local SMTP sink: accepts every message and keeps it in memory (nothing is delivered)
+
+Point SMTP_HOST/SMTP_PORT at it during development to watch outgoing email, or
+start it from tests to assert on what the email dispatcher sent.
+
+Usage:
+    python -m scripts.smtp_sink               # listen on 127.0.0.1:1025
+    python -m scripts.smtp_sink --port 2525
+"""
+import argparse
+import asyncio
+import email
+from email.message import Message
+from typing import List, Optional
+
+
+class SMTPSink:
+    """Minimal asyncio SMTP server (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT)"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, verbose: bool = False):
+        self.host = host
+        self.port = port
+        self.verbose = verbose
+        self.messages: List[Message] = []
+        self.connections = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> "SMTPSink":
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+
+        async def reply(line: str) -> None:
+            writer.write(f"{line}\r\n".encode())
+            await writer.drain()
+
+        await reply("220 smtp-sink ready")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                command = line.decode(errors="replace").strip()
+                verb = command.split(" ", 1)[0].upper()
+
+                if verb == "EHLO":
+                    await reply("250-smtp-sink")
+                    await reply("250 8BITMIME")
+                elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                    await reply("250 OK")
+                elif verb == "DATA":
+                    await reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        data_line = await reader.readline()
+                        if data_line in (b".\r\n", b".\n", b""):
+                            break
+                        # Undo dot-stuffing
+                        data.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                    message = email.message_from_bytes(b"".join(data))
+                    self.messages.append(message)
+                    if self.verbose:
+                        print(f"📧 {message['From']} -> {message['To']}: {message['Subject']}")
+                    await reply("250 Message accepted")
+                elif verb == "QUIT":
+                    await reply("221 Bye")
+                    break
+                else:
+                    await reply("502 Command not implemented")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def _serve(host: str, port: int) -> None:
+    sink = await SMTPSink(host, port, verbose=True).start()
+    print(f"✅ SMTP sink listening on {sink.host}:{sink.port}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1025)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Tests for the aggregated admin dashboard
+"""
+import pytest
+
+from app.models import (
+    User, Package, UserPackage, Payment, Commission, Referral, Payout, CommunityPost, GeneratedImage,
+    ImageCategory, CreditLedger,
+)
+from app.services import admin_dashboard_service
+
+
+@pytest.fixture(autouse=True)
+def fresh_snapshot():
+    admin_dashboard_service.invalidate_dashboard_stats()
+    yield
+    admin_dashboard_service.invalidate_dashboard_stats()
+
+
+def _seed(db):
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    buyer = User(email="buyer@example.com", hashed_password="x", full_name="Buyer", referral_code="BUYER001", is_active=False)
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    gold = Package(name="Gold", slug="gold", base_price=4500, gst_amount=810, final_price=5310)
+    category = ImageCategory(name="Art")
+    db.add_all([admin, buyer, silver, gold, category])
+    db.flush()
+
+    db.add_all([
+        UserPackage(user_id=admin.id, package_id=silver.id, status="active"),
+        UserPackage(user_id=buyer.id, package_id=gold.id, status="active"),
+        UserPackage(user_id=buyer.id, package_id=silver.id, status="expired"),
+        Payment(user_id=buyer.id, razorpay_order_id="o1", amount=5310, status="success"),
+        Payment(user_id=buyer.id, razorpay_order_id="o2", amount=999, status="failed"),
+    ])
+    referral = Referral(referrer_id=admin.id, referee_id=buyer.id, level=1, package_id=gold.id)
+    db.add(referral)
+    db.flush()
+    db.add_all([
+        Commission(user_id=admin.id, referral_id=referral.id, amount=1000, commission_type="level1", status="pending"),
+        Commission(user_id=admin.id, referral_id=referral.id, amount=500, commission_type="level1", status="paid"),
+        Payout(user_id=admin.id, amount=500, status="completed"),
+        CreditLedger(user_id=buyer.id, delta=10, reason="purchase"),
+        CreditLedger(user_id=buyer.id, delta=-3, reason="generation"),
+    ])
+    image = GeneratedImage(user_id=buyer.id, prompt_text="p", status="succeeded")
+    db.add(image)
+    db.flush()
+    db.add(CommunityPost(image_id=image.id, user_id=buyer.id, title="t", category_id=category.id, likes_count=4))
+    db.commit()
+    db.refresh(admin)
+    return admin
+
+
+@pytest.mark.filterwarnings("error::sqlalchemy.exc.SAWarning")
+def test_dashboard_aggregates_match_source_tables(db, client, login_as, count_queries):
+    login_as(_seed(db))
+
+    with count_queries() as statements:
+        stats = client.get("/api/admin/dashboard").json()
+
+    assert len(statements) == 1
+    assert stats["users"] == {"total": 2, "active": 1}
+    assert stats["packages"] == {"total_sold": 2, "silver": 1, "gold": 1, "platinum": 0}
+    assert stats["revenue"] == {"total": 5310.0, "net_profit": 3810.0}
+    assert stats["commissions"] == {"total": 1500.0, "pending": 1000.0, "paid": 500.0}
+    assert stats["referrals"] == {"total": 1, "level1": 1, "level2": 0}
+    assert stats["payouts"] == {"total": 500.0, "pending": 0.0}
+    assert stats["studio"]["total_likes"] == 4
+    assert stats["studio"]["credits_purchased"] == 10
+    assert stats["studio"]["credits_spent"] == 3
+    assert "computed_at" in stats
+
+
+def test_dashboard_served_from_snapshot_until_refresh(db, client, login_as, count_queries):
+    login_as(_seed(db))
+    first = client.get("/api/admin/dashboard").json()
+
+    with count_queries() as statements:
+        cached = client.get("/api/admin/dashboard").json()
+    assert statements == []
+    assert cached["computed_at"] == first["computed_at"]
+
+    db.add(User(email="new@example.com", hashed_password="x", full_name="New", referral_code="NEWUSER1"))
+    db.commit()
+    refreshed = client.get("/api/admin/dashboard", params={"refresh": True}).json()
+    assert refreshed["users"]["total"] == 3
@@ -0,0 +1,129 @@
+"""
+Tests for the enriched admin user listing and CSV export
+"""
+import csv
+import io
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import sessionmaker
+
+from app.models import User, Package, UserPackage, Referral, Commission
+
+
+def _seed(db, extra_users=0):
+    base = datetime(2025, 6, 1)
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001",
+                 is_admin=True, created_at=base)
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    gold = Package(name="Gold", slug="gold", base_price=4500, gst_amount=810, final_price=5310)
+    users = [
+        User(email=f"user{i}@example.com", hashed_password="x", full_name=f"User {i}", referral_code=f"REF{i:05d}",
+             created_at=base + timedelta(days=i + 1))
+        for i in range(3 + extra_users)
+    ]
+    db.add_all([admin, silver, gold, *users])
+    db.flush()
+
+    db.add_all([
+        # Latest active package wins: user0 upgraded from Silver to Gold
+        UserPackage(user_id=users[0].id, package_id=silver.id, status="active", purchase_date=base),
+        UserPackage(user_id=users[0].id, package_id=gold.id, status="active", purchase_date=base + timedelta(days=5)),
+        UserPackage(user_id=users[1].id, package_id=silver.id, status="active", purchase_date=base),
+        UserPackage(user_id=users[2].id, package_id=gold.id, status="expired", purchase_date=base),
+    ])
+    referrals = [
+        Referral(referrer_id=users[0].id, referee_id=users[1].id, level=1, package_id=silver.id),
+        Referral(referrer_id=users[0].id, referee_id=users[2].id, level=1, package_id=gold.id),
+        Referral(referrer_id=users[1].id, referee_id=users[2].id, level=2, package_id=gold.id),
+    ]
+    db.add_all(referrals)
+    db.flush()
+    db.add_all([
+        Commission(user_id=users[0].id, referral_id=referrals[0].id, amount=1000, commission_type="level1"),
+        Commission(user_id=users[0].id, referral_id=referrals[1].id, amount=1500, commission_type="level1"),
+        Commission(user_id=users[1].id, referral_id=referrals[2].id, amount=200, commission_type="level2"),
+    ])
+    db.commit()
+    db.refresh(admin)
+    return admin, users
+
+
+def test_listing_is_enriched_with_a_single_query(db, client, login_as, count_queries):
+    admin, users = _seed(db)
+    login_as(admin)
+
+    with count_queries() as statements:
+        rows = client.get("/api/admin/users").json()
+
+    assert len(statements) == 1
+    by_email = {row["email"]: row for row in rows}
+    assert by_email["user0@example.com"]["current_package"] == "Gold"
+    assert by_email["user0@example.com"]["direct_referrals"] == 2
+    assert by_email["user0@example.com"]["total_earnings"] == 2500.0
+    assert by_email["user1@example.com"]["direct_referrals"] == 0
+    assert by_email["user1@example.com"]["total_earnings"] == 200.0
+    assert by_email["user2@example.com"]["current_package"] is None
+
+
+def test_query_count_does_not_grow_with_page_size(db, client, login_as, count_queries):
+    admin, _ = _seed(db, extra_users=20)
+    login_as(admin)
+
+    with count_queries() as statements:
+        rows = client.get("/api/admin/users", params={"limit": 50}).json()
+
+    assert len(rows) == 24
+    assert len(statements) == 1
+
+
+def test_filters_and_sorts_run_server_side(db, client, login_as):
+    admin, _ = _seed(db)
+    login_as(admin)
+
+    gold = client.get("/api/admin/users", params={"package": "gold"}).json()
+    assert [row["email"] for row in gold] == ["user0@example.com"]
+
+    without = client.get("/api/admin/users", params={"package": "none"}).json()
+    assert {row["email"] for row in without} == {"user2@example.com", "admin@example.com"}
+
+    by_earnings = client.get("/api/admin/users", params={"sort_by": "earnings"}).json()
+    assert [row["email"] for row in by_earnings][:2] == ["user0@example.com", "user1@example.com"]
+
+    by_signup = client.get("/api/admin/users").json()
+    assert by_signup[0]["email"] == "user2@example.com"
+
+    assert client.get("/api/admin/users", params={"sort_by": "bogus"}).status_code == 400
+
+
+def test_keyset_pages_cover_every_user_once(db, client, login_as):
+    admin, _ = _seed(db, extra_users=7)
+    login_as(admin)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, "sort_by": "earnings"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/api/admin/users", params=params)
+        seen.extend(row["id"] for row in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert len(seen) == len(set(seen)) == 11
+
+
+def test_csv_export_streams_entire_user_base(db, engine, client, login_as, monkeypatch):
+    admin, _ = _seed(db, extra_users=7)
+    login_as(admin)
+    monkeypatch.setattr("app.api.admin.SessionLocal", sessionmaker(bind=engine))
+    monkeypatch.setattr("app.services.admin_user_service.EXPORT_CHUNK_SIZE", 4)
+
+    response = client.get("/api/admin/users/export")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 11
+    assert len({row["id"] for row in rows}) == 11
+    assert next(row for row in rows if row["email"] == "user0@example.com")["current_package"] == "Gold"
@@ -0,0 +1,195 @@
+"""
+Tests for the content-addressed blob store and the storage migration tool
+"""
+import asyncio
+import hashlib
+import io
+
+import pytest
+
+from app.models import GeneratedImage, ImageCategory, ImageTemplate, Invoice, User
+from app.services import blob_store, storage_migration
+from app.services.blob_store import IMAGES, INVOICES, CloudinaryBlobStore, LocalBlobStore, get_blob_store
+from app.services.image_generation_service import MockImageGenerationAdapter
+
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 20
+
+
+@pytest.fixture(autouse=True)
+def storage_root(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.STORAGE_LOCAL_ROOT", str(tmp_path / "storage"))
+    monkeypatch.setattr("app.core.config.settings.STORAGE_CHUNK_BYTES", 1000)
+    blob_store.reset_blob_stores()
+    yield tmp_path / "storage"
+    blob_store.reset_blob_stores()
+
+
+def _files(store):
+    return sorted(p.relative_to(store.root).as_posix() for p in store.root.rglob("*") if p.is_file())
+
+
+def test_identical_content_is_stored_once_in_a_sharded_path():
+    store = get_blob_store(IMAGES)
+    sha256 = hashlib.sha256(PNG).hexdigest()
+
+    first = store.save(PNG, "png")
+    second = store.save(io.BytesIO(PNG), ".PNG")
+
+    assert first.key == second.key == f"{sha256}.png"
+    assert (first.created, second.created) == (True, False)
+    assert _files(store) == [f"{sha256[:2]}/{sha256[2:4]}/{sha256}.png"]  # No temp files left
+    assert first.url.endswith(f"/blobs/images/{sha256[:2]}/{sha256[2:4]}/{sha256}.png")
+    assert store.key_from_url(first.url) == first.key
+
+    chunks = list(store.iter_chunks(first.key))
+    assert b"".join(chunks) == PNG and max(map(len, chunks)) == 1000
+
+
+def test_async_stream_writes_are_atomic():
+    store = get_blob_store(INVOICES)
+
+    async def stream(fail=False):
+        for i in range(0, len(PNG), 700):
+            yield PNG[i:i + 700]
+        if fail:
+            raise ConnectionError("upstream dropped")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(store.save_async(stream(fail=True), "pdf"))
+    assert _files(store) == []
+
+    blob = asyncio.run(store.save_async(stream(), "pdf"))
+    assert blob.url is None  # Private namespace
+    assert store.read(blob.key) == PNG
+
+
+def test_generated_images_are_deduplicated():
+    adapter = MockImageGenerationAdapter()
+
+    first = asyncio.run(adapter.generate("a lighthouse at dusk", user_id=1))
+    second = asyncio.run(adapter.generate("a lighthouse at dusk", user_id=2))
+
+    assert first["status"] == "succeeded"
+    assert first["image_url"] == second["image_url"]
+    store = get_blob_store(IMAGES)
+    assert list(store.keys()) == [store.key_from_url(first["image_url"])]
+
+
+def test_template_thumbnails_stream_into_the_store(db, client, login_as):
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+
+    response = client.post("/api/admin/studio/upload-thumbnail", files={"file": ("thumb.png", PNG, "image/png")})
+
+    assert response.status_code == 200
+    store = get_blob_store(IMAGES)
+    assert store.read(store.key_from_url(response.json()["url"])) == PNG
+
+
+def test_thumbnails_must_have_an_image_extension(db, client, login_as):
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+
+    for name in ("page.html", "logo.svg"):
+        response = client.post("/api/admin/studio/upload-thumbnail", files={"file": (name, PNG, "image/png")})
+        assert response.status_code == 400
+    assert list(get_blob_store(IMAGES).keys()) == []
+
+
+def test_cloudinary_saves_take_one_upload_call(monkeypatch):
+    import cloudinary.uploader
+
+    uploaded = set()
+
+    def upload_large(path, public_id, **kwargs):
+        assert kwargs["overwrite"] is False
+        existing = public_id in uploaded
+        uploaded.add(public_id)
+        return {"public_id": public_id, "existing": existing}
+
+    def exists(self, key):
+        raise AssertionError("save() must not look the asset up first")
+
+    monkeypatch.setattr(cloudinary.uploader, "upload_large", upload_large)
+    monkeypatch.setattr(CloudinaryBlobStore, "exists", exists)
+    store = CloudinaryBlobStore(IMAGES)
+
+    first, second = store.save(PNG, "png"), store.save(PNG, "png")
+
+    assert first.key == second.key
+    assert (first.created, second.created) == (True, False)
+
+
+def test_invoice_pdfs_are_served_from_the_store(db, client, login_as):
+    user = User(email="buyer@example.com", hashed_password="x", full_name="Buyer", referral_code="BUYER001")
+    db.add(user)
+    db.commit()
+    key = get_blob_store(INVOICES).save(b"%PDF-1.4 invoice", "pdf").key
+    invoice = Invoice(invoice_number="INV-2026-00001", user_id=user.id, payment_id=1, invoice_type="package",
+                      item_name="Silver Package", amount=2500, gst_amount=450, total_amount=2950, pdf_url=key)
+    db.add(invoice)
+    db.commit()
+    login_as(user)
+
+    response = client.get(f"/api/invoices/{invoice.id}/download")
+
+    assert response.status_code == 200
+    assert response.content == b"%PDF-1.4 invoice"
+
+
+def test_legacy_files_are_imported_once_and_rows_repointed(db, tmp_path, monkeypatch):
+    legacy_dir = tmp_path / "thumbnails"
+    legacy_dir.mkdir()
+    (legacy_dir / "old.png").write_bytes(PNG)
+    legacy_pdf = tmp_path / "INV-2025-00001.pdf"
+    legacy_pdf.write_bytes(b"%PDF-1.4 old")
+    monkeypatch.setattr(storage_migration, "LEGACY_THUMBNAIL_DIR", legacy_dir)
+
+    user = User(email="artist@example.com", hashed_password="x", full_name="Artist", referral_code="ARTIST01")
+    category = ImageCategory(name="Posters")
+    db.add_all([user, category])
+    db.commit()
+    db.add_all([
+        GeneratedImage(user_id=user.id, prompt_text="a", image_url="/static/thumbnails/old.png"),
+        GeneratedImage(user_id=user.id, prompt_text="b", image_url="https://res.cloudinary.com/demo/x.png"),
+        GeneratedImage(user_id=user.id, prompt_text="c", image_url="/static/thumbnails/gone.png"),
+        ImageTemplate(title="Poster", category_id=category.id, prompt_text="p", thumbnail_url="/static/thumbnails/old.png"),
+        Invoice(invoice_number="INV-2025-00001", user_id=user.id, payment_id=1, invoice_type="package",
+                item_name="Silver Package", amount=2500, gst_amount=450, total_amount=2950, pdf_url=str(legacy_pdf)),
+    ])
+    db.commit()
+    stores = {IMAGES: get_blob_store(IMAGES), INVOICES: get_blob_store(INVOICES)}
+
+    report = storage_migration.import_legacy(db, stores)
+
+    assert report.counts == {"imported": 3, "blobs_created": 2, "skipped": 1}
+    assert report.missing == ["/static/thumbnails/gone.png"]
+    url = stores[IMAGES].url(f"{hashlib.sha256(PNG).hexdigest()}.png")
+    assert db.query(ImageTemplate).one().thumbnail_url == url
+    assert stores[INVOICES].read(db.query(Invoice).one().pdf_url) == b"%PDF-1.4 old"
+
+    assert storage_migration.import_legacy(db, stores).counts == {"already_migrated": 3, "skipped": 1}
+
+
+def test_blobs_are_copied_between_backends_and_urls_rewritten(db, tmp_path):
+    source = LocalBlobStore(IMAGES, tmp_path / "old", "https://old.example.com/blobs/images")
+    target = LocalBlobStore(IMAGES, tmp_path / "new", "https://cdn.example.com/images")
+    kept = target.save(b"already there", "png")
+    moved = source.save(PNG, "png")
+    source.save(b"already there", "png")
+
+    user = User(email="artist@example.com", hashed_password="x", full_name="Artist", referral_code="ARTIST01")
+    db.add(user)
+    db.commit()
+    db.add(GeneratedImage(user_id=user.id, prompt_text="a", image_url=moved.url))
+    db.commit()
+
+    assert storage_migration.copy_blobs(source, target) == (1, 1)
+    assert storage_migration.rewrite_urls(db, source, target) == 1
+
+    assert sorted(target.keys()) == sorted([kept.key, moved.key])
+    assert db.query(GeneratedImage).one().image_url == target.url(moved.key)
@@ -0,0 +1,202 @@
+"""
+Tests for the table-driven commission engine (commission_rates / CommissionPlan)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import User, Package, Payment, UserPackage, Referral, Commission, CommissionRate, Wallet
+from app.models.wallet import WalletTransaction
+from app.services import commission_calculator, referral_graph
+from app.services.commission_calculator import (
+    COMMISSION_MATRIX, CommissionPlan, calculate_commission, get_commission_plan, recompute_commission_amounts,
+)
+from app.services.referral_service import process_referral_commissions
+
+
+@pytest.fixture(autouse=True)
+def _fresh_plan_cache(monkeypatch):
+    monkeypatch.setattr(commission_calculator, "_plan_cache", {})
+    monkeypatch.setattr("app.utils.email.send_commission_notification_email", lambda **kwargs: True)
+
+
+def _packages(db):
+    packages = [
+        Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950, display_order=1),
+        Package(name="Gold", slug="gold", base_price=4500, gst_amount=810, final_price=5310, display_order=2),
+        Package(name="Platinum", slug="platinum", base_price=7500, gst_amount=1350, final_price=8850, display_order=3),
+    ]
+    db.add_all(packages)
+    db.commit()
+    return packages
+
+
+def _chain(db, length, package):
+    """user0 <- user1 <- ... (user i referred by user i-1), each holding `package`"""
+    users, referrer = [], None
+    for i in range(length):
+        user = User(email=f"user{i}@example.com", hashed_password="x", full_name=f"User {i}",
+                    referral_code=f"REF{i:05d}", referred_by_id=referrer.id if referrer else None)
+        db.add(user)
+        db.flush()
+        referral_graph.add_user(db, user.id, user.referred_by_id)
+        db.add(UserPackage(user_id=user.id, package_id=package.id, status="active"))
+        users.append(referrer := user)
+    db.commit()
+    return users
+
+
+def test_matrix_plan_matches_calculate_commission(db):
+    packages = _packages(db)
+    ids = {package.name: package.id for package in packages}
+
+    plan = get_commission_plan(db)
+
+    assert plan.levels == 2
+    for referrer in ids:
+        for referee in ids:
+            for level in (1, 2):
+                assert plan.amount(ids[referrer], ids[referee], level) == calculate_commission(referrer, referee, level)
+    # Unknown packages, referrers without a package and levels beyond the plan earn nothing
+    assert plan.amount(999, ids["Gold"], 1) == 0.0
+    assert plan.amount(None, ids["Gold"], 1) == 0.0
+    assert plan.amount(ids["Gold"], ids["Gold"], 3) == 0.0
+    assert plan.fan_out(ids["Gold"], [ids["Silver"], None, ids["Gold"]]) == [2375.0, 0.0, 0.0]
+
+
+def test_bulk_amounts_match_per_row_lookups():
+    ids = {"Silver": 1, "Gold": 2, "Platinum": 3}
+    plan = CommissionPlan.from_matrix(COMMISSION_MATRIX, ids)
+    triples = [(a, b, level) for a in (1, 2, 3, None) for b in (1, 2, 3) for level in (1, 2, 3)]
+
+    amounts = plan.bulk_amounts(*zip(*triples))
+
+    assert list(amounts) == [plan.amount(a, b, level) for a, b, level in triples]
+
+
+def test_n_level_plan_from_table_pays_every_level(db):
+    silver, gold, platinum = _packages(db)
+    db.add_all([
+        CommissionRate(plan="default", referrer_package_id=gold.id, referee_package_id=silver.id, level=level, amount=amount)
+        for level, amount in {1: 1000.0, 2: 300.0, 3: 100.0}.items()
+    ])
+    db.commit()
+    users = _chain(db, 5, gold)
+    buyer = users[-1]
+    buyer_package = db.query(UserPackage).filter(UserPackage.user_id == buyer.id).one()
+    buyer_package.package_id = silver.id
+    db.commit()
+
+    process_referral_commissions(buyer.id, silver.id, db)
+
+    commissions = {c.user_id: (c.commission_type, c.amount) for c in db.query(Commission)}
+    assert commissions == {
+        users[3].id: ("level1", 1000.0),
+        users[2].id: ("level2", 300.0),
+        users[1].id: ("level3", 100.0),
+    }
+    assert sorted(r.level for r in db.query(Referral)) == [1, 2, 3]
+
+    # Retried jobs don't pay twice
+    process_referral_commissions(buyer.id, silver.id, db)
+    assert db.query(Commission).count() == 3
+
+
+def test_admin_plan_update_takes_effect_without_restart(db, client, login_as):
+    silver, gold, platinum = _packages(db)
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+
+    assert get_commission_plan(db).levels == 2  # Built-in matrix
+
+    response = client.put("/api/admin/commission-plan", json={"rates": [
+        {"referrer_package_id": gold.id, "referee_package_id": gold.id, "level": level, "amount": 50.0 * level}
+        for level in (1, 2, 3, 4)
+    ]})
+    assert response.status_code == 200, response.text
+    assert response.json()["levels"] == 4
+
+    plan = client.get("/api/admin/commission-plan").json()
+    assert [(rate["level"], rate["amount"]) for rate in plan["rates"]] == [(1, 50.0), (2, 100.0), (3, 150.0), (4, 200.0)]
+
+    response = client.put("/api/admin/commission-plan", json={"rates": [
+        {"referrer_package_id": gold.id, "referee_package_id": 999, "level": 1, "amount": 1.0}
+    ]})
+    assert response.status_code == 400
+
+
+def test_recompute_reprices_pending_commissions_only(db):
+    silver, gold, platinum = _packages(db)
+    referrer, referee = _chain(db, 2, gold)
+    upgraded_at = datetime.utcnow()
+    earlier = upgraded_at - timedelta(days=30)
+    db.query(UserPackage).filter(UserPackage.user_id == referrer.id).update({"purchase_date": earlier})
+    # Upgrading to Platinum later must not reprice commissions earned on Gold
+    db.add(UserPackage(user_id=referrer.id, package_id=platinum.id, status="active", purchase_date=upgraded_at + timedelta(days=1)))
+    referrals = [
+        Referral(referrer_id=referrer.id, referee_id=referee.id, level=1, package_id=silver.id, created_at=upgraded_at),
+        Referral(referrer_id=referrer.id, referee_id=referee.id, level=1, package_id=gold.id, created_at=upgraded_at),
+        Referral(referrer_id=referee.id, referee_id=referrer.id, level=1, package_id=gold.id, created_at=earlier - timedelta(days=1)),
+    ]
+    db.add_all(referrals)
+    db.flush()
+    db.add_all([
+        Commission(user_id=referrer.id, referral_id=referrals[0].id, amount=1.0, commission_type="level1", status="pending"),
+        Commission(user_id=referrer.id, referral_id=referrals[1].id, amount=1.0, commission_type="level1", status="paid"),
+        Commission(user_id=referee.id, referral_id=referrals[2].id, amount=1.0, commission_type="level1", status="pending"),
+    ])
+    db.commit()
+
+    dry_run = recompute_commission_amounts(db, batch_size=2)
+    assert {k: v for k, v in dry_run.items() if k != "seconds"} == {
+        "scanned": 3, "changed": 2, "updated": 0, "locked": 1, "unresolved": 1,
+    }
+    assert {c.amount for c in db.query(Commission)} == {1.0}
+
+    applied = recompute_commission_amounts(db, apply=True, batch_size=2)
+    assert applied["updated"] == 1
+    amounts = dict(db.query(Commission.referral_id, Commission.amount))
+    assert amounts == {
+        referrals[0].id: COMMISSION_MATRIX["Gold"]["Silver"][1],
+        referrals[1].id: 1.0,  # Paid
+        referrals[2].id: 1.0,  # Referrer had no package yet
+    }
+
+
+def test_every_payment_pays_once_and_credits_the_wallet_with_it(db, monkeypatch):
+    silver, gold, platinum = _packages(db)
+    referrer, buyer = _chain(db, 2, gold)
+    payments = [Payment(user_id=buyer.id, package_id=silver.id, razorpay_order_id=f"order_{i}", amount=2950, status="success")
+                for i in range(2)]
+    db.add_all(payments)
+    db.commit()
+    amount = COMMISSION_MATRIX["Gold"]["Silver"][1]
+
+    # The wallet credit fails: nothing is recorded, so the retried job pays it
+    from app.api import wallet as wallet_api
+    create_transaction = wallet_api.create_transaction
+
+    def _failing_credit(*args, **kwargs):
+        raise ConnectionError("database went away")
+
+    monkeypatch.setattr(wallet_api, "create_transaction", _failing_credit)
+    with pytest.raises(ConnectionError):
+        process_referral_commissions(buyer.id, silver.id, db, payment_id=payments[0].id)
+    db.rollback()
+    assert db.query(Referral).count() == db.query(Commission).count() == 0
+    monkeypatch.setattr(wallet_api, "create_transaction", create_transaction)
+
+    process_referral_commissions(buyer.id, silver.id, db, payment_id=payments[0].id)
+    process_referral_commissions(buyer.id, silver.id, db, payment_id=payments[0].id)  # Retried job
+    # A repeat purchase of the same package pays again
+    process_referral_commissions(buyer.id, silver.id, db, payment_id=payments[1].id)
+
+    assert sorted(r.payment_id for r in db.query(Referral)) == [payments[0].id, payments[1].id]
+    assert db.query(Commission).count() == 2
+    wallet = db.query(Wallet).filter(Wallet.user_id == referrer.id).one()
+    assert wallet.balance == 2 * amount
+    assert sorted(t.reference_id for t in db.query(WalletTransaction)) == [
+        f"commission-{payments[0].id}-1", f"commission-{payments[1].id}-1",
+    ]
@@ -0,0 +1,144 @@
+"""
+Tests for the commission replay / audit (app/services/commission_replay.py)
+"""
+import csv
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import User, Package, Payment, UserPackage, Referral, Commission
+from app.services import commission_calculator, referral_graph
+from app.services.commission_calculator import COMMISSION_MATRIX
+from app.services.commission_replay import replay, replay_parallel
+from app.services.referral_service import process_referral_commissions
+
+
+@pytest.fixture(autouse=True)
+def _quiet(monkeypatch):
+    monkeypatch.setattr(commission_calculator, "_plan_cache", {})
+    monkeypatch.setattr("app.utils.email.send_commission_notification_email", lambda **kwargs: True)
+
+
+def _seed(db):
+    """
+    top (Gold) <- mid (Silver) <- buyer; buyer bought Gold, then upgraded to Platinum.
+    Commissions are written by the live flow, so they start out correct.
+    """
+    base = datetime(2025, 1, 1)
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950, display_order=1)
+    gold = Package(name="Gold", slug="gold", base_price=4500, gst_amount=810, final_price=5310, display_order=2)
+    platinum = Package(name="Platinum", slug="platinum", base_price=7500, gst_amount=1350, final_price=8850, display_order=3)
+    db.add_all([silver, gold, platinum])
+    db.flush()
+
+    users, referrer = [], None
+    for name in ("top", "mid", "buyer"):
+        user = User(email=f"{name}@example.com", hashed_password="x", full_name=name.title(),
+                    referral_code=name.upper(), referred_by_id=referrer.id if referrer else None)
+        db.add(user)
+        db.flush()
+        referral_graph.add_user(db, user.id, user.referred_by_id)
+        users.append(referrer := user)
+    top, mid, buyer = users
+    db.add_all([
+        UserPackage(user_id=top.id, package_id=gold.id, status="active", purchase_date=base),
+        UserPackage(user_id=mid.id, package_id=silver.id, status="active", purchase_date=base + timedelta(hours=12)),
+    ])
+    db.commit()
+    process_referral_commissions(mid.id, silver.id, db)
+
+    for package, days in ((gold, 1), (platinum, 2)):
+        db.add(UserPackage(user_id=buyer.id, package_id=package.id, status="active", purchase_date=base + timedelta(days=days)))
+        db.commit()
+        process_referral_commissions(buyer.id, package.id, db)
+
+    # A failed payment never granted anything
+    payment = Payment(user_id=buyer.id, package_id=silver.id, razorpay_order_id="order_failed", amount=2950, status="failed")
+    db.add(payment)
+    db.flush()
+    db.add(UserPackage(user_id=buyer.id, package_id=silver.id, payment_id=payment.id, status="active",
+                       purchase_date=base + timedelta(days=3)))
+    db.commit()
+    return top, mid, buyer, silver, gold, platinum
+
+
+def _tamper(db, top, mid, buyer, silver, gold, platinum):
+    wrong = db.query(Commission).join(Referral).filter(Referral.referrer_id == mid.id, Referral.package_id == gold.id).one()
+    wrong.amount = 1.0
+    deleted = db.query(Commission).join(Referral).filter(Referral.referrer_id == top.id, Referral.package_id == platinum.id).one()
+    db.delete(deleted)
+    # Paid top as the buyer's direct referrer
+    extra = Referral(referrer_id=top.id, referee_id=buyer.id, level=1, package_id=gold.id)
+    db.add(extra)
+    db.flush()
+    db.add(Commission(user_id=top.id, referral_id=extra.id, amount=99.0, commission_type="level1"))
+    db.commit()
+    return wrong.id, extra
+
+
+def test_clean_history_matches(db):
+    _seed(db)
+
+    stats = replay(db, batch_size=2)
+
+    assert stats["purchases"] == 4  # The failed payment's package is skipped
+    assert stats["expected"] == stats["actual"] == stats["matched"] == 5
+    assert stats["missing"] == stats["extra"] == stats["wrong_amount"] == 0
+
+
+def test_repeat_purchases_are_expected_to_pay_again(db):
+    top, mid, buyer, silver, gold, platinum = _seed(db)
+    payment = Payment(user_id=buyer.id, package_id=gold.id, razorpay_order_id="order_again", amount=5310, status="success")
+    db.add(payment)
+    db.flush()
+    db.add(UserPackage(user_id=buyer.id, package_id=gold.id, payment_id=payment.id, status="active",
+                       purchase_date=datetime(2025, 1, 5)))
+    db.commit()
+
+    assert replay(db)["missing"] == 2
+    process_referral_commissions(buyer.id, gold.id, db, payment_id=payment.id)
+
+    stats = replay(db)
+    assert stats["expected"] == stats["actual"] == stats["matched"] == 7
+    assert stats["missing"] == stats["extra"] == stats["wrong_amount"] == 0
+
+
+def test_replay_reports_every_kind_of_difference(db):
+    top, mid, buyer, silver, gold, platinum = seeded = _seed(db)
+    wrong_id, extra = _tamper(db, *seeded)
+
+    diff = []
+    stats = replay(db, batch_size=1, emit=diff.append)
+
+    assert {k: stats[k] for k in ("matched", "missing", "extra", "wrong_amount")} == {
+        "matched": 3, "missing": 1, "extra": 1, "wrong_amount": 1,
+    }
+    by_kind = {row["kind"]: row for row in diff}
+    assert by_kind["wrong_amount"]["commission_id"] == wrong_id
+    assert by_kind["wrong_amount"]["expected_amount"] == COMMISSION_MATRIX["Silver"]["Gold"][1]
+    # Top held Gold when the buyer upgraded to Platinum, at level 2
+    assert (by_kind["missing"]["referrer_id"], by_kind["missing"]["level"]) == (top.id, 2)
+    assert by_kind["missing"]["expected_amount"] == COMMISSION_MATRIX["Gold"]["Platinum"][2]
+    assert (by_kind["extra"]["referrer_id"], by_kind["extra"]["level"], by_kind["extra"]["actual_amount"]) == (top.id, 1, 99.0)
+
+
+def test_parallel_replay_matches_sequential(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'replay.db'}"
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    _tamper(db, *_seed(db))
+    sequential = replay(db)
+    db.close()
+    engine.dispose()
+
+    diff_path = tmp_path / "diff.csv"
+    parallel = replay_parallel(3, batch_size=1, diff_path=str(diff_path), database_url=database_url)
+
+    assert {k: v for k, v in parallel.items() if k != "seconds"} == {k: v for k, v in sequential.items() if k != "seconds"}
+    with open(diff_path, newline="") as diff_file:
+        assert sorted(row["kind"] for row in csv.DictReader(diff_file)) == ["extra", "missing", "wrong_amount"]
+    assert [path.name for path in tmp_path.iterdir() if ".part" in path.name] == []
@@ -0,0 +1,77 @@
+"""
+Query-count regression tests for the community feed
+
+A feed page must be assembled with a fixed number of SQL statements,
+regardless of how many posts, authors, likes and comments it contains.
+"""
+from app.models import (
+    User, Profile, ImageCategory, GeneratedImage, CommunityPost, PostLike, Comment,
+)
+
+FEED_QUERY_BUDGET = 3  # page query + viewer likes + grouped comment counts
+
+
+def _seed_feed(db, posts: int):
+    category = ImageCategory(name="Art")
+    viewer = User(email="viewer@example.com", hashed_password="x", full_name="Viewer", referral_code="VIEWER01")
+    db.add_all([category, viewer])
+    db.flush()
+
+    for i in range(posts):
+        author = User(email=f"author{i}@example.com", hashed_password="x", full_name=f"Author {i}", referral_code=f"AUTH{i:04d}")
+        db.add(author)
+        db.flush()
+        db.add(Profile(user_id=author.id, avatar_url=f"https://cdn.example.com/{i}.png"))
+        image = GeneratedImage(user_id=author.id, prompt_text=f"prompt {i}", image_url=f"/static/{i}.png", status="succeeded")
+        db.add(image)
+        db.flush()
+        post = CommunityPost(image_id=image.id, user_id=author.id, title=f"Post {i}", category_id=category.id, likes_count=i % 3)
+        db.add(post)
+        db.flush()
+        if i % 2 == 0:
+            db.add(PostLike(post_id=post.id, user_id=viewer.id))
+        for n in range(i % 4):
+            db.add(Comment(post_id=post.id, user_id=author.id, text=f"comment {n}"))
+
+    db.commit()
+    db.refresh(viewer)  # the real auth dependency hands routes a loaded user
+    return viewer
+
+
+def test_feed_page_stays_within_query_budget(db, client, login_as, count_queries):
+    viewer = _seed_feed(db, posts=50)
+    login_as(viewer)
+
+    with count_queries() as statements:
+        response = client.get("/api/studio/community/feed", params={"limit": 50})
+
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 50
+    assert len(statements) <= FEED_QUERY_BUDGET, statements
+
+
+def test_feed_query_count_does_not_grow_with_page_size(db, client, login_as, count_queries):
+    viewer = _seed_feed(db, posts=40)
+    login_as(viewer)
+
+    with count_queries() as small_page:
+        client.get("/api/studio/community/feed", params={"limit": 5})
+    with count_queries() as large_page:
+        client.get("/api/studio/community/feed", params={"limit": 40})
+
+    assert len(small_page) == len(large_page)
+
+
+def test_feed_cards_are_enriched(db, client, login_as):
+    viewer = _seed_feed(db, posts=4)
+    login_as(viewer)
+
+    items = client.get("/api/studio/community/feed", params={"sort_by": "newest"}).json()["items"]
+    by_title = {item["title"]: item for item in items}
+
+    assert by_title["Post 0"]["user_liked"] is True
+    assert by_title["Post 1"]["user_liked"] is False
+    assert by_title["Post 3"]["comments_count"] == 3
+    assert by_title["Post 2"]["author_name"] == "Author 2"
+    assert by_title["Post 2"]["author_avatar_url"] == "https://cdn.example.com/2.png"
+    assert by_title["Post 2"]["category_name"] == "Art"
@@ -0,0 +1,161 @@
+"""
+Tests for the cached course catalogue behind the course listings
+"""
+import pytest
+
+from app.models import Course, Module, Package, Topic, User, UserCoursePurchase, UserPackage, Video
+from app.services import course_catalog
+
+
+@pytest.fixture(autouse=True)
+def fresh_catalog():
+    course_catalog.invalidate_catalog()
+    course_catalog.invalidate_user_access()
+    yield
+    course_catalog.invalidate_catalog()
+    course_catalog.invalidate_user_access()
+
+
+def _packages(db):
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    gold = Package(name="Gold", slug="gold", base_price=5000, gst_amount=900, final_price=5900)
+    db.add_all([silver, gold])
+    db.commit()
+    return silver, gold
+
+
+def _add_courses(db, package, count, start=0):
+    for i in range(start, start + count):
+        course = Course(title=f"Course {i}", slug=f"course-{i}", package_id=package.id, is_published=True, display_order=i)
+        db.add(course)
+        db.flush()
+        module = Module(course_id=course.id, title="Module", is_published=True)
+        db.add(module)
+        db.flush()
+        db.add_all([
+            Topic(module_id=module.id, title="Published", is_published=True),
+            Topic(module_id=module.id, title="Draft", is_published=False),
+        ])
+        db.add(Video(course_id=course.id, title="Video", cloudinary_public_id=f"v{i}",
+                     cloudinary_url="https://video.example.com", is_published=True))
+    db.commit()
+
+
+def _learner(db, package=None, email="learner@example.com"):
+    user = User(email=email, hashed_password="x", full_name="Learner", referral_code=email[:8].upper())
+    db.add(user)
+    db.commit()
+    if package is not None:
+        db.add(UserPackage(user_id=user.id, package_id=package.id, status="active"))
+        db.commit()
+    return user
+
+
+def test_listing_query_count_does_not_grow_with_courses(db, client, login_as, count_queries):
+    silver, _ = _packages(db)
+    login_as(_learner(db, silver))
+
+    _add_courses(db, silver, 2)
+    with count_queries() as few:
+        response = client.get("/api/courses/all-with-access")
+    assert len(response.json()) == 2
+
+    _add_courses(db, silver, 8, start=2)
+    course_catalog.invalidate_catalog()
+    course_catalog.invalidate_user_access()
+    with count_queries() as many:
+        response = client.get("/api/courses/all-with-access")
+
+    assert len(response.json()) == 10
+    assert response.json()[0]["video_count"] == 1  # published topics only
+    assert len(many) == len(few)
+
+
+def test_cached_catalogue_is_shared_and_access_is_per_user(db, client, login_as, count_queries):
+    silver, gold = _packages(db)
+    _add_courses(db, silver, 1)
+    _add_courses(db, gold, 1, start=1)
+    gold_course = db.query(Course).filter(Course.package_id == gold.id).one()
+    silver_learner = _learner(db, silver)
+    buyer = _learner(db, silver, email="buyer@example.com")
+    db.add(UserCoursePurchase(user_id=buyer.id, course_id=gold_course.id, amount_paid=100, is_active=True))
+    db.commit()
+
+    login_as(silver_learner)
+    client.get("/api/courses/my-courses")
+    with count_queries() as statements:
+        courses = client.get("/api/courses/all-with-access").json()
+    # The locked course is confirmed with the access lookups only, the catalogue stays cached
+    assert len(statements) == 2 and not any("FROM courses" in statement for statement in statements)
+    assert [(c["has_access"], c["access_type"]) for c in courses] == [(True, "package"), (False, None)]
+
+    login_as(buyer)
+    with count_queries() as statements:
+        courses = client.get("/api/courses/my-courses").json()
+    assert not any("FROM courses" in statement for statement in statements)
+    assert [(c["title"], c["access_type"]) for c in courses] == [("Course 0", "package"), ("Course 1", "individual")]
+    assert client.get(f"/api/courses/{gold_course.id}/with-modules").json()["total_topics"] == 2
+
+    # Individual purchases don't widen the package listing
+    assert [c["title"] for c in client.get("/api/courses/").json()] == ["Course 0"]
+
+
+def test_admin_mutations_invalidate_the_catalogue(db, client, login_as):
+    silver, _ = _packages(db)
+    _add_courses(db, silver, 1)
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+    course_id = db.query(Course.id).scalar()
+
+    assert client.get("/api/courses/").json()[0]["title"] == "Course 0"
+
+    assert client.put(f"/api/courses/{course_id}", json={"title": "Renamed"}).status_code == 200
+    assert client.get("/api/courses/").json()[0]["title"] == "Renamed"
+
+    module_id = client.get(f"/api/courses/{course_id}/with-modules").json()["modules"][0]["id"]
+    assert client.post(f"/api/modules/{module_id}/topics", json={"module_id": module_id, "title": "New", "is_published": True}).status_code == 200
+    assert client.get(f"/api/courses/{course_id}/with-modules").json()["total_topics"] == 3
+
+
+def test_unknown_course_ids_do_not_rebuild_the_catalogue(db, client, login_as, count_queries):
+    silver, _ = _packages(db)
+    _add_courses(db, silver, 1)
+    login_as(_learner(db, silver))
+    client.get("/api/courses/all-with-access")
+
+    with count_queries() as statements:
+        assert client.get("/api/courses/9999/with-modules").status_code == 404
+    assert not any("FROM modules" in statement for statement in statements)
+
+    # A course created by another worker is picked up
+    _add_courses(db, silver, 1, start=1)
+    course_id = db.query(Course.id).filter(Course.slug == "course-1").scalar()
+    assert client.get(f"/api/courses/{course_id}/with-modules").json()["title"] == "Course 1"
+
+
+
+def test_purchases_handled_by_another_worker_are_granted_without_waiting(db, client, login_as):
+    silver, gold = _packages(db)
+    _add_courses(db, gold, 1)
+    gold_course = db.query(Course).one()
+    learner = _learner(db, silver)
+    login_as(learner)
+
+    # This worker caches the learner's flags from before the purchase
+    assert client.get(f"/api/courses/{gold_course.id}/with-modules").status_code == 403
+    assert client.get("/api/courses/all-with-access").json()[0]["is_locked"] is True
+
+    # Another worker records the purchase; its invalidate_user_access() does not reach this one
+    db.add(UserCoursePurchase(user_id=learner.id, course_id=gold_course.id, amount_paid=5900, is_active=True))
+    db.commit()
+
+    assert client.get(f"/api/courses/{gold_course.id}/with-modules").status_code == 200
+    assert client.get("/api/courses/all-with-access").json()[0]["is_locked"] is False
+
+    # An upgrade to Gold shows up in the package listing the same way
+    assert client.get("/api/courses/").json() == []
+    db.add(UserPackage(user_id=learner.id, package_id=gold.id, status="active"))
+    db.commit()
+    assert [course["id"] for course in client.get("/api/courses/").json()] == [gold_course.id]
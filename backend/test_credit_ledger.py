@@ -0,0 +1,85 @@
+"""
+Tests for the materialized credit balances (CreditLedgerService)
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import CreditLedger, User, UserCreditBalance
+from app.services.credit_ledger_service import CreditLedgerService
+
+
+def _user(db, email="artist@example.com"):
+    user = User(email=email, hashed_password="x", full_name="Artist", referral_code=email[:8].upper())
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_reads_do_not_seed_and_the_first_mutation_seeds_from_the_ledger(db):
+    user = _user(db)
+    # Ledger rows from before the balance table
+    db.add_all([CreditLedger(user_id=user.id, delta=10, reason="purchase", idempotency_key="legacy-1"),
+                CreditLedger(user_id=user.id, delta=-3, reason="generation", idempotency_key="legacy-2")])
+    db.commit()
+
+    assert CreditLedgerService.get_balance(db, user.id) == 7
+    assert db.query(UserCreditBalance).count() == 0
+
+    result = CreditLedgerService.debit_credits(db, user.id, 2, reason="generation")
+
+    assert result["success"] and result["balance"] == 5
+    assert db.get(UserCreditBalance, user.id).balance == 5
+
+
+def test_credit_debit_and_idempotency(db):
+    user = _user(db)
+
+    CreditLedgerService.credit_credits(db, user.id, 10, reason="purchase", idempotency_key="buy-1")
+    again = CreditLedgerService.credit_credits(db, user.id, 10, reason="purchase", idempotency_key="buy-1")
+    assert again["idempotent"] and again["balance"] == 10
+
+    assert CreditLedgerService.debit_credits(db, user.id, 4, reason="generation")["balance"] == 6
+    refused = CreditLedgerService.debit_credits(db, user.id, 7, reason="generation")
+    assert not refused["success"] and refused["balance"] == 6
+    assert db.query(CreditLedger).count() == 2
+
+
+def test_reconcile_reports_and_repairs_drift(db):
+    user, other = _user(db), _user(db, "other@example.com")
+    CreditLedgerService.credit_credits(db, user.id, 10, reason="purchase")
+    db.add(CreditLedger(user_id=other.id, delta=5, reason="bonus", idempotency_key="bonus-1"))
+    db.get(UserCreditBalance, user.id).balance = 12
+    db.commit()
+
+    drift = CreditLedgerService.reconcile_balances(db, fix=True)
+
+    assert [(d["user_id"], d["snapshot"], d["ledger"]) for d in drift] == [(user.id, 12, 10), (other.id, None, 5)]
+    assert CreditLedgerService.reconcile_balances(db) == []
+    assert db.get(UserCreditBalance, other.id).balance == 5
+
+
+def test_concurrent_debits_never_overdraw(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'credits.db'}", connect_args={"check_same_thread": False, "timeout": 60})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user_id = _user(db).id
+        # Unseeded: the concurrent debits also race to create the snapshot
+        db.add(CreditLedger(user_id=user_id, delta=10, reason="purchase", idempotency_key="buy-1"))
+        db.commit()
+
+    def _debit(index):
+        with Session() as db:
+            return CreditLedgerService.debit_credits(db, user_id, 1, reason="generation", idempotency_key=f"gen-{index}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(_debit, range(25)))
+
+    assert sum(result["success"] for result in results) == 10
+    with Session() as db:
+        assert db.get(UserCreditBalance, user_id).balance == 0
+        assert CreditLedgerService.reconcile_balances(db) == []
+    engine.dispose()
@@ -0,0 +1,130 @@
+"""
+Tests for the email outbox and pooled SMTP dispatcher (against the local SMTP sink)
+"""
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models import EmailOutbox
+from app.services import email_outbox
+from app.services.email_outbox import EmailDispatcher, RateLimiter, queue_email
+from app.services.email_service import SMTPConnectionPool
+from scripts.smtp_sink import SMTPSink
+
+
+@pytest.fixture
+def session_factory(engine, monkeypatch):
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(email_outbox, "SessionLocal", factory)
+    return factory
+
+
+def _dispatch(session_factory, port, **kwargs):
+    async def _run():
+        pool = SMTPConnectionPool(hostname="127.0.0.1", port=port, username="", size=kwargs.pop("size", 2))
+        dispatcher = EmailDispatcher(session_factory=session_factory, pool=pool, rate_per_minute=0, **kwargs)
+        try:
+            await dispatcher.drain()
+        finally:
+            await pool.close()
+        return dispatcher
+
+    return asyncio.run(_run())
+
+
+def _with_sink(test):
+    """Run the sink on its own event loop thread for the duration of `test(sink)`"""
+    loop = asyncio.new_event_loop()
+    sink = SMTPSink()
+    loop.run_until_complete(sink.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        return test(sink)
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(sink.stop())
+        loop.close()
+
+
+def test_dispatcher_sends_batches_over_pooled_connections(db, session_factory):
+    for i in range(250):
+        queue_email(db, f"user{i}@example.com", f"Hello {i}", f"<p>Hi {i}</p>", text_content=f"Hi {i}")
+    db.commit()
+
+    def run(sink):
+        dispatcher = _dispatch(session_factory, sink.port, batch_size=100, size=2)
+        return dispatcher, sink
+
+    dispatcher, sink = _with_sink(run)
+
+    assert dispatcher.sent == 250
+    assert len(sink.messages) == 250
+    # Connections are reused across the whole run instead of one per message
+    assert sink.connections == dispatcher.pool.connections_opened <= 2
+    assert {row.status for row in db.query(EmailOutbox)} == {"sent"}
+    assert sink.messages[0]["Subject"] == "Hello 0"
+
+
+def test_failed_delivery_is_retried_then_marked_failed(db, session_factory, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.EMAIL_MAX_ATTEMPTS", 2)
+    queue_email(db, "user@example.com", "Hello", "<p>Hi</p>")
+    db.commit()
+
+    # Nothing listens on this port
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        closed_port = probe.getsockname()[1]
+
+    _dispatch(session_factory, closed_port)
+    email = db.query(EmailOutbox).one()
+    assert email.status == "pending"
+    assert email.attempts == 1
+    assert email.last_error
+
+    email.send_after = email.created_at
+    db.commit()
+    _dispatch(session_factory, closed_port)
+    db.refresh(email)
+    assert email.status == "failed"
+    assert email.attempts == 2
+
+
+def test_dedupe_key_queues_once(db):
+    first = queue_email(db, "user@example.com", "Welcome", "<p>Hi</p>", dedupe_key="welcome:1")
+    db.commit()
+    second = queue_email(db, "user@example.com", "Welcome", "<p>Hi</p>", dedupe_key="welcome:1")
+
+    assert second.id == first.id
+    assert db.query(EmailOutbox).count() == 1
+
+
+def test_rate_limiter_spaces_sends():
+    async def _acquire_many():
+        limiter = RateLimiter(per_minute=1200)  # one every 50ms
+        start = time.monotonic()
+        for _ in range(5):
+            await limiter.acquire()
+        return time.monotonic() - start
+
+    assert asyncio.run(_acquire_many()) >= 0.19
+
+
+def test_register_queues_emails_without_sending(db, client, session_factory):
+    response = client.post("/api/auth/register", json={
+        "email": "new@example.com",
+        "password": "Str0ngPassw0rd!",
+        "full_name": "New User",
+        "phone": "9876543210",
+    })
+
+    assert response.status_code in (200, 201), response.text
+    subjects = {row.subject for row in db.query(EmailOutbox).filter(EmailOutbox.to_email == "new@example.com")}
+    assert any("Verify" in subject for subject in subjects)
+    assert any("Welcome" in subject for subject in subjects)
+    assert {row.status for row in db.query(EmailOutbox)} == {"pending"}
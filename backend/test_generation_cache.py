@@ -0,0 +1,176 @@
+"""
+Tests for the content-addressed generation cache (cache="reuse" on /api/studio/generate)
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import GeneratedImage, GenerationCacheEntry, User
+from app.services import generation_cache, generation_jobs
+from app.services.credit_ledger_service import CreditLedgerService
+from app.services.generation_jobs import GenerationWorkerPool
+
+PROMPT = "a lighthouse on a cliff at dusk"
+
+
+class CountingAdapter:
+    name = "mock"
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt, tier="standard", user_id=0):
+        self.calls += 1
+        return {
+            "status": "succeeded",
+            "image_url": f"https://img.example.com/{self.calls}.png",
+            "provider": "mock",
+            "width": 1024,
+            "height": 1024,
+        }
+
+
+@pytest.fixture
+def adapter(monkeypatch):
+    counting = CountingAdapter()
+
+    class StubService:
+        def get_adapter(self, provider=None):
+            return counting
+
+    monkeypatch.setattr(generation_jobs, "get_image_generation_service", lambda: StubService())
+    return counting
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """File-backed SQLite: the worker pool settles jobs from a worker thread"""
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def artist(db, login_as):
+    user = User(email="artist@example.com", hashed_password="x", full_name="Artist", referral_code="ARTIST01")
+    db.add(user)
+    db.commit()
+    CreditLedgerService.credit_credits(db, user.id, 10, reason="purchase")
+    login_as(user)
+    return user
+
+
+def _generate(client, prompt=PROMPT, **extra):
+    return client.post("/api/studio/generate", json={"prompt": prompt, "provider": "mock", **extra})
+
+
+def _lookups(result):
+    return REGISTRY.get_sample_value("generation_cache_lookups_total", {"result": result}) or 0.0
+
+
+def test_reuse_returns_the_stored_image_without_calling_the_provider(db, client, engine, adapter, artist):
+    _generate(client)
+    asyncio.run(GenerationWorkerPool(session_factory=sessionmaker(bind=engine)).drain())
+    assert adapter.calls == 1
+    hits = _lookups("hit")
+
+    # Same request up to case and whitespace
+    response = _generate(client, prompt="  A Lighthouse ON a cliff   at dusk ", cache="reuse")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["cached"] is True and body["status"] == "succeeded"
+    assert body["image_url"] == "https://img.example.com/1.png"
+    assert adapter.calls == 1
+    assert _lookups("hit") == hits + 1
+
+    db.expire_all()
+    images = db.query(GeneratedImage).order_by(GeneratedImage.id).all()
+    assert [image.image_url for image in images] == ["https://img.example.com/1.png"] * 2
+    assert images[1].user_id == artist.id
+    assert CreditLedgerService.get_balance(db, artist.id) == 8
+    assert client.get(f"/api/studio/generate/{body['job_id']}").json()["image_id"] == images[1].id
+
+
+def test_fresh_seed_and_tier_changes_miss_the_cache(db, client, engine, adapter, artist):
+    _generate(client)
+    asyncio.run(GenerationWorkerPool(session_factory=sessionmaker(bind=engine)).drain())
+    misses = _lookups("miss")
+
+    assert _generate(client).status_code == 202  # fresh by default
+    assert _generate(client, cache="reuse", seed=7).json()["status"] == "queued"
+    assert _generate(client, cache="reuse", tier="premium2").json()["status"] == "queued"
+    assert _lookups("miss") == misses + 2
+
+    # A fresh run refreshes the entry
+    asyncio.run(GenerationWorkerPool(session_factory=sessionmaker(bind=engine)).drain())
+    assert _generate(client, cache="reuse").json()["image_url"] == "https://img.example.com/2.png"
+
+
+def test_expired_entries_are_dropped(db, monkeypatch):
+    key = generation_cache.cache_key(PROMPT, "standard", "mock")
+    generation_cache.store(db, key, {"image_url": "https://img.example.com/old.png"})
+    db.commit()
+
+    db.get(GenerationCacheEntry, key).created_at = datetime.utcnow() - timedelta(days=30)
+    db.commit()
+
+    assert generation_cache.lookup(db, key) is None
+    db.commit()
+    assert db.get(GenerationCacheEntry, key) is None
+
+
+def test_least_recently_used_entries_are_evicted_in_batches(db, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.GENERATION_CACHE_MAX_ENTRIES", 2)
+    monkeypatch.setattr(generation_cache, "EVICT_BATCH_SIZE", 1)
+    keys = [generation_cache.cache_key(f"prompt {i}", "standard", "mock") for i in range(5)]
+    for i, key in enumerate(keys[:4]):
+        generation_cache.store(db, key, {"image_url": f"https://img.example.com/{i}.png"})
+        db.commit()
+    # The size check is not due yet
+    assert db.query(GenerationCacheEntry).count() == 4
+
+    # Touch the oldest so the second one becomes least recently used
+    generation_cache.lookup(db, keys[0]).last_used_at = datetime.utcnow() + timedelta(seconds=1)
+    db.commit()
+
+    monkeypatch.setattr(generation_cache, "_next_evict_check", 0.0)
+    generation_cache.store(db, keys[4], {"image_url": "https://img.example.com/4.png"})
+    db.commit()
+
+    assert {key for (key,) in db.query(GenerationCacheEntry.cache_key)} == {keys[0], keys[4]}
+
+
+def test_storing_an_existing_key_updates_it_in_place(db):
+    key = generation_cache.cache_key(PROMPT, "standard", "mock")
+    generation_cache.store(db, key, {"image_url": "https://img.example.com/1.png"})
+    db.commit()
+    generation_cache.lookup(db, key)
+    db.commit()
+
+    # As when a concurrent job stored the key after this one's lookup
+    generation_cache.store(db, key, {"image_url": "https://img.example.com/2.png", "width": 512})
+    db.commit()
+
+    db.expire_all()
+    entry = db.get(GenerationCacheEntry, key)
+    assert (entry.image_url, entry.width, entry.hit_count) == ("https://img.example.com/2.png", 512, 1)
+
+
+def test_a_failed_cache_write_does_not_block_settlement(db, client, engine, adapter, artist, monkeypatch):
+    def _broken_store(*args, **kwargs):
+        raise RuntimeError("cache table is locked")
+
+    monkeypatch.setattr(generation_cache, "store", _broken_store)
+    job_id = _generate(client).json()["job_id"]
+
+    asyncio.run(GenerationWorkerPool(session_factory=sessionmaker(bind=engine)).drain())
+
+    assert client.get(f"/api/studio/generate/{job_id}").json()["status"] == "succeeded"
+    assert adapter.calls == 1
@@ -0,0 +1,188 @@
+"""
+Tests for the asynchronous image generation pipeline (/api/studio/generate + worker pool)
+"""
+import asyncio
+import contextlib
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import User, GeneratedImage, GenerationJob, CreditLedger
+from app.services import generation_jobs
+from app.services.credit_ledger_service import CreditLedgerService
+from app.services.generation_jobs import GenerationWorkerPool
+
+
+class StubAdapter:
+    """Provider stand-in that records how many calls overlap"""
+
+    def __init__(self, name, delay=0.05, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.hold_until = None  # Calls block until this many are in flight (at most 5s)
+        self.all_in = asyncio.Event()
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate(self, prompt, tier="standard", user_id=0):
+        self.calls += 1
+        call = self.calls
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.hold_until:
+                if self.in_flight >= self.hold_until:
+                    self.all_in.set()
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self.all_in.wait(), timeout=5)
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        if self.fail:
+            return {"job_id": None, "status": "failed", "error": "provider exploded", "provider": self.name}
+        return {
+            "job_id": f"{self.name}-{call}-{user_id}",
+            "status": "succeeded",
+            "image_url": f"https://img.example.com/{self.name}/{call}.png",
+            "provider": self.name,
+        }
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    adapters = {"mock": StubAdapter("mock"), "openai": StubAdapter("openai", delay=0.2)}
+
+    class StubService:
+        def get_adapter(self, provider=None):
+            return adapters["openai" if provider == "openai_dalle" else "mock"]
+
+    monkeypatch.setattr(generation_jobs, "get_image_generation_service", lambda: StubService())
+    return adapters
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """
+    File-backed SQLite: the worker pool settles jobs from several threads at once,
+    which the shared connection of the in-memory engine cannot take
+    """
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'generation.db'}",
+                                connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+@pytest.fixture
+def pool(engine):
+    return GenerationWorkerPool(session_factory=sessionmaker(autocommit=False, autoflush=False, bind=engine))
+
+
+def _user_with_credits(db, credits=10, email="artist@example.com"):
+    user = User(email=email, hashed_password="x", full_name="Artist", referral_code=email[:8].upper())
+    db.add(user)
+    db.commit()
+    CreditLedgerService.credit_credits(db, user.id, credits, reason="purchase")
+    return user
+
+
+def _generate(client, provider="mock", tier="standard"):
+    return client.post("/api/studio/generate", json={
+        "prompt": "a lighthouse on a cliff at dusk", "tier": tier, "provider": provider,
+    })
+
+
+def test_generate_returns_job_immediately_and_worker_settles_it(db, client, login_as, providers, pool):
+    user = _user_with_credits(db)
+    login_as(user)
+
+    response = _generate(client)
+    assert response.status_code == 202, response.text
+    body = response.json()
+    assert body["status"] == "queued"
+    assert body["credits_debited"] == 1
+    # Provider not called yet; credits reserved up front
+    assert providers["mock"].calls == 0
+    assert CreditLedgerService.get_balance(db, user.id) == 9
+
+    assert asyncio.run(pool.drain()) == 1
+
+    status = client.get(f"/api/studio/generate/{body['job_id']}").json()
+    assert status["status"] == "succeeded"
+    assert status["image_url"].startswith("https://img.example.com/mock/")
+    image = db.get(GeneratedImage, status["image_id"])
+    assert image.user_id == user.id
+    assert image.credits_spent == 1
+    assert CreditLedgerService.get_balance(db, user.id) == 9
+
+
+def test_failed_generation_refunds_reserved_credits(db, client, login_as, providers, pool):
+    providers["mock"].fail = True
+    user = _user_with_credits(db, credits=4)
+    login_as(user)
+
+    job_id = _generate(client, tier="premium2").json()["job_id"]
+    assert CreditLedgerService.get_balance(db, user.id) == 2
+
+    asyncio.run(pool.drain())
+
+    status = client.get(f"/api/studio/generate/{job_id}").json()
+    assert status["status"] == "failed"
+    assert "provider exploded" in status["error"]
+    assert status["credits_used"] == 0
+    db.expire_all()
+    assert CreditLedgerService.get_balance(db, user.id) == 4
+    assert db.query(GeneratedImage).count() == 0
+    assert db.query(CreditLedger).filter(CreditLedger.reason == "generation_refund").count() == 1
+
+
+def test_insufficient_credits_queues_nothing(db, client, login_as, providers):
+    login_as(_user_with_credits(db, credits=1))
+
+    response = _generate(client, tier="premium4")
+
+    assert response.status_code == 402
+    assert db.query(GenerationJob).count() == 0
+
+
+def test_worker_pool_respects_global_and_per_provider_caps(db, providers, pool, monkeypatch):
+    monkeypatch.setattr(generation_jobs, "PROVIDER_CONCURRENCY", {"openai": 2, "mock": 8, "default": 2})
+    pool.concurrency = 4
+    # The first openai calls wait for each other, so the cap is reached whatever the timing
+    providers["openai"].hold_until = 2
+    user = _user_with_credits(db, credits=100)
+    for _ in range(6):
+        assert generation_jobs.submit_job(db, user.id, "a slow openai prompt", "standard", provider="openai_dalle")["success"]
+    for _ in range(6):
+        assert generation_jobs.submit_job(db, user.id, "a fast mock prompt", "standard", provider="mock")["success"]
+
+    assert asyncio.run(pool.drain()) == 12
+
+    assert providers["openai"].peak == 2
+    # Mock jobs used the slots openai could not, but never beyond the pool size
+    assert providers["openai"].peak + providers["mock"].peak <= 4
+    assert pool.succeeded == 12
+    assert {job.status for job in db.query(GenerationJob)} == {"succeeded"}
+
+
+def test_stale_running_job_is_requeued_then_failed_with_refund(db, providers, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.GENERATION_MAX_ATTEMPTS", 2)
+    user = _user_with_credits(db, credits=3)
+    job = generation_jobs.submit_job(db, user.id, "an interrupted prompt", "standard")["job"]
+
+    for expected in ("queued", "failed"):
+        claimed = generation_jobs.claim_next(db, "dead-worker")
+        assert claimed["id"] == job.id
+        job = db.get(GenerationJob, job.id)
+        job.locked_at = job.locked_at.replace(year=2000)
+        db.commit()
+
+        assert generation_jobs.requeue_stale(db) == 1
+        db.refresh(job)
+        assert job.status == expected
+
+    assert CreditLedgerService.get_balance(db, user.id) == 3
@@ -0,0 +1,75 @@
+"""
+Tests for the shared provider HTTP client registry
+"""
+import asyncio
+import threading
+
+from app.core.http_clients import HTTPClientRegistry, PROVIDER_LIMITS
+
+
+def test_clients_are_shared_per_provider_within_a_loop():
+    registry = HTTPClientRegistry()
+
+    async def _run():
+        await registry.start()
+        first = registry.get("openai")
+        assert registry.get("openai") is first
+        assert registry.get("gemini") is not first
+        assert first._transport._pool._max_connections == PROVIDER_LIMITS["openai"]["max_connections"]
+        await registry.aclose()
+        assert first.is_closed
+        return first
+
+    closed = asyncio.run(_run())
+
+    async def _reopen():
+        # A new loop (e.g. a worker's asyncio.run) gets fresh clients
+        client = registry.get("openai")
+        assert client is not closed and not client.is_closed
+        await registry.aclose()
+
+    asyncio.run(_reopen())
+
+
+def test_each_loop_keeps_its_clients_until_shutdown():
+    registry = HTTPClientRegistry()
+    worker_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=worker_loop.run_forever, daemon=True)
+    thread.start()
+
+    async def _get():
+        return registry.get("openai")
+
+    try:
+        worker_client = asyncio.run_coroutine_threadsafe(_get(), worker_loop).result(timeout=5)
+
+        async def _run():
+            client = registry.get("openai")
+            # Another loop using the registry doesn't replace (or leak) this loop's clients
+            assert asyncio.run_coroutine_threadsafe(_get(), worker_loop).result(timeout=5) is worker_client
+            assert registry.get("openai") is client and client is not worker_client
+            await registry.aclose()
+            assert client.is_closed
+            return client
+
+        asyncio.run(_run())
+        # The worker loop's clients are closed on the worker loop
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), worker_loop).result(timeout=5)
+        assert worker_client.is_closed
+    finally:
+        worker_loop.call_soon_threadsafe(worker_loop.stop)
+        thread.join(timeout=5)
+        worker_loop.close()
+
+
+def test_provider_limits_can_be_overridden(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.HTTP_PROVIDER_LIMITS", '{"openai": {"max_connections": 3}}')
+    registry = HTTPClientRegistry()
+
+    async def _run():
+        client = registry.get("openai")
+        assert client._transport._pool._max_connections == 3
+        assert client.timeout.read == PROVIDER_LIMITS["openai"]["read_timeout"]
+        await registry.aclose()
+
+    asyncio.run(_run())
@@ -0,0 +1,202 @@
+"""
+Tests for the durable background job queue and post-payment jobs
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import User, Package, UserPackage, Payment, Commission, Referral, Invoice, BackgroundJob, EmailOutbox
+from app.services import job_queue, referral_graph
+from app.services.razorpay_service import razorpay_service
+
+
+@pytest.fixture
+def sent_emails(monkeypatch):
+    sent = []
+    monkeypatch.setattr("app.utils.email.send_purchase_confirmation_email", lambda **kwargs: sent.append(kwargs) or True)
+    monkeypatch.setattr("app.utils.email.send_commission_notification_email", lambda **kwargs: True)
+    monkeypatch.setattr("app.services.invoice_service.InvoiceService.generate_pdf", lambda self, *args: "invoices/test.pdf")
+    return sent
+
+
+@pytest.fixture
+def flaky_handler():
+    calls = []
+
+    @job_queue.job_handler("test_flaky")
+    def _flaky(db, payload):
+        calls.append(payload)
+        if len(calls) <= payload.get("failures", 0):
+            raise RuntimeError("temporary failure")
+
+    yield calls
+    job_queue.HANDLERS.pop("test_flaky", None)
+
+
+def _seed_purchase(db):
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    referrer = User(email="referrer@example.com", hashed_password="x", full_name="Referrer", referral_code="REFR0001")
+    db.add_all([silver, referrer])
+    db.flush()
+    buyer = User(email="buyer@example.com", hashed_password="x", full_name="Buyer", referral_code="BUYR0001",
+                 referred_by_id=referrer.id)
+    db.add(buyer)
+    db.flush()
+    referral_graph.add_user(db, buyer.id, referrer.id)
+    db.add_all([
+        UserPackage(user_id=referrer.id, package_id=silver.id, status="active"),
+        Payment(user_id=buyer.id, package_id=silver.id, razorpay_order_id="order_1", amount=2950, status="created"),
+    ])
+    db.commit()
+    db.refresh(buyer)
+    return buyer
+
+
+def test_verify_payment_returns_before_side_effects_run(db, client, login_as, monkeypatch, sent_emails):
+    login_as(_seed_purchase(db))
+    monkeypatch.setattr(razorpay_service, "verify_payment_signature", lambda **kwargs: True)
+
+    response = client.post("/api/payments/verify", json={
+        "razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1", "razorpay_signature": "sig",
+    })
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "success"
+    jobs = db.query(BackgroundJob).order_by(BackgroundJob.id).all()
+    assert [job.kind for job in jobs] == ["referral_commissions", "payment_invoice", "purchase_confirmation_email"]
+    assert all(job.status == "queued" for job in jobs)
+    assert db.query(Commission).count() == 0
+    assert sent_emails == []
+
+    assert job_queue.drain(db) == 3
+    assert db.query(Commission).count() == 1
+    assert db.query(Invoice).count() == 1
+    assert len(sent_emails) == 1
+    assert {job.status for job in db.query(BackgroundJob)} == {"succeeded"}
+
+
+def test_commission_job_is_idempotent(db, sent_emails):
+    buyer = _seed_purchase(db)
+    payload = {"user_id": buyer.id, "package_id": db.query(Package.id).scalar()}
+
+    job_queue.load_handlers()
+    for _ in range(2):
+        job_queue.HANDLERS["referral_commissions"](db, payload)
+
+    assert db.query(Referral).count() == 1
+    assert db.query(Commission).count() == 1
+
+
+def test_retried_post_payment_jobs_queue_each_email_once(db, monkeypatch):
+    monkeypatch.setattr("app.services.invoice_service.InvoiceService.generate_pdf", lambda self, *args: "invoices/test.pdf")
+    buyer = _seed_purchase(db)
+    payment = db.query(Payment).one()
+    payment.status = "success"
+    payment.razorpay_payment_id = "pay_1"
+    db.commit()
+
+    job_queue.load_handlers()
+    for _ in range(2):
+        job_queue.HANDLERS["referral_commissions"](db, {
+            "user_id": buyer.id, "package_id": payment.package_id, "payment_id": payment.id,
+        })
+        job_queue.HANDLERS["purchase_confirmation_email"](db, {"payment_id": payment.id})
+        db.commit()
+
+    emails = db.query(EmailOutbox).order_by(EmailOutbox.id).all()
+    assert [(email.to_email, email.dedupe_key) for email in emails] == [
+        ("referrer@example.com", f"commission:{payment.id}:1"),
+        ("buyer@example.com", f"payment:{payment.id}:confirmation"),
+    ]
+
+
+def test_commission_email_commits_with_the_commission(db, monkeypatch):
+    buyer = _seed_purchase(db)
+    payment = db.query(Payment).one()
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("worker died")
+
+    monkeypatch.setattr("app.services.referral_service.count_commission", crash)
+    job_queue.load_handlers()
+    with pytest.raises(RuntimeError):
+        job_queue.HANDLERS["referral_commissions"](db, {
+            "user_id": buyer.id, "package_id": payment.package_id, "payment_id": payment.id,
+        })
+
+    # The commission was committed before the crash, and its email with it
+    assert db.query(Commission).count() == 1
+    assert db.query(EmailOutbox.dedupe_key).scalar() == f"commission:{payment.id}:1"
+
+
+def test_enqueue_deduplicates_on_idempotency_key(db):
+    first = job_queue.enqueue(db, "test_flaky", {}, idempotency_key="k1")
+    db.commit()
+    second = job_queue.enqueue(db, "test_flaky", {}, idempotency_key="k1")
+
+    assert second.id == first.id
+    assert db.query(BackgroundJob).count() == 1
+
+
+def test_failed_job_is_retried_with_backoff(db, flaky_handler):
+    job_queue.enqueue(db, "test_flaky", {"failures": 1}, idempotency_key="flaky")
+    db.commit()
+
+    assert job_queue.drain(db) == 1
+    job = db.query(BackgroundJob).one()
+    assert job.status == "queued"
+    assert job.attempts == 1
+    assert job.run_at > datetime.utcnow()
+    assert "temporary failure" in job.last_error
+
+    # Not due yet
+    assert job_queue.drain(db) == 0
+
+    job.run_at = datetime.utcnow()
+    db.commit()
+    assert job_queue.drain(db) == 1
+    db.refresh(job)
+    assert job.status == "succeeded"
+    assert job.attempts == 2
+
+
+def test_job_is_dead_lettered_after_max_attempts(db, client, login_as, flaky_handler):
+    job = job_queue.enqueue(db, "test_flaky", {"failures": 10}, idempotency_key="dead", max_attempts=2)
+    db.commit()
+
+    for _ in range(2):
+        job.run_at = datetime.utcnow()
+        db.commit()
+        job_queue.drain(db)
+
+    db.refresh(job)
+    assert job.status == "dead"
+    assert job.attempts == 2
+
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMN0001", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+
+    metrics = client.get("/api/admin/jobs/metrics").json()
+    assert metrics["depth"]["dead"] == 1
+    assert [dead["id"] for dead in client.get("/api/admin/jobs/dead").json()] == [job.id]
+
+    assert client.post(f"/api/admin/jobs/{job.id}/retry").status_code == 200
+    db.refresh(job)
+    assert job.status == "queued"
+    assert job.attempts == 0
+
+
+def test_stale_running_job_is_requeued(db):
+    job = job_queue.enqueue(db, "test_flaky", {}, idempotency_key="stale")
+    db.commit()
+    claimed = job_queue.claim_next(db, "crashed-worker")
+    assert claimed.id == job.id
+    assert job_queue.claim_next(db, "other-worker") is None
+
+    claimed.locked_at = datetime.utcnow() - timedelta(hours=1)
+    db.commit()
+
+    assert job_queue.requeue_stale(db) == 1
+    assert job_queue.claim_next(db, "other-worker").id == job.id
@@ -0,0 +1,102 @@
+"""
+Keyset pagination tests for the community feed and list endpoints
+
+Walking every page must return each row exactly once, even when new rows
+are inserted between page requests.
+"""
+from datetime import datetime, timedelta
+
+from app.models import User, ImageCategory, GeneratedImage, CommunityPost, Comment
+
+
+def _seed_posts(db, count: int, start: datetime):
+    category = ImageCategory(name="Art")
+    author = User(email="author@example.com", username="author", hashed_password="x", full_name="Author", referral_code="AUTHOR01")
+    db.add_all([category, author])
+    db.flush()
+    for i in range(count):
+        _add_post(db, author, category, f"Post {i}", start + timedelta(minutes=i), likes=i % 5)
+    db.commit()
+    db.refresh(author)
+    return author, category
+
+
+def _add_post(db, author, category, title, created_at, likes=0):
+    image = GeneratedImage(user_id=author.id, prompt_text=title, image_url="/static/x.png", status="succeeded")
+    db.add(image)
+    db.flush()
+    db.add(CommunityPost(
+        image_id=image.id, user_id=author.id, title=title, category_id=category.id,
+        likes_count=likes, created_at=created_at,
+    ))
+
+
+def _walk_feed(client, sort_by: str, limit: int, between_pages=None):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": limit, "sort_by": sort_by}
+        if cursor:
+            params["cursor"] = cursor
+        body = client.get("/api/studio/community/feed", params=params).json()
+        seen.extend(item["id"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return seen
+        if between_pages:
+            between_pages()
+
+
+def test_feed_pages_cover_every_post_once(db, client, login_as):
+    author, _ = _seed_posts(db, count=23, start=datetime(2026, 1, 1))
+    login_as(author)
+
+    for sort_by in ("newest", "popular", "most_remixed"):
+        seen = _walk_feed(client, sort_by, limit=5)
+        assert len(seen) == 23
+        assert len(set(seen)) == 23
+
+
+def test_feed_is_stable_when_posts_arrive_while_scrolling(db, client, login_as):
+    author, category = _seed_posts(db, count=12, start=datetime(2026, 1, 1))
+    login_as(author)
+    original_ids = {post.id for post in db.query(CommunityPost).all()}
+    fresh = iter(range(100))
+
+    def publish_new_post():
+        _add_post(db, author, category, f"Fresh {next(fresh)}", datetime(2027, 1, 1))
+        db.commit()
+
+    seen = _walk_feed(client, "newest", limit=4, between_pages=publish_new_post)
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == original_ids
+
+
+def test_feed_rejects_cursor_from_another_sort_mode(db, client, login_as):
+    author, _ = _seed_posts(db, count=6, start=datetime(2026, 1, 1))
+    login_as(author)
+
+    cursor = client.get("/api/studio/community/feed", params={"limit": 2}).json()["next_cursor"]
+    response = client.get("/api/studio/community/feed", params={"limit": 2, "sort_by": "popular", "cursor": cursor})
+
+    assert response.status_code == 400
+
+
+def test_comments_cursor_pagination(db, client, login_as):
+    author, _ = _seed_posts(db, count=1, start=datetime(2026, 1, 1))
+    login_as(author)
+    post = db.query(CommunityPost).first()
+    for i in range(7):
+        db.add(Comment(post_id=post.id, user_id=author.id, text=f"c{i}", created_at=datetime(2026, 2, 1) + timedelta(minutes=i)))
+    db.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        body = client.get(f"/api/studio/posts/{post.id}/comments", params=params).json()
+        seen.extend(item["text"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [f"c{i}" for i in reversed(range(7))]
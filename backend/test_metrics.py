@@ -0,0 +1,130 @@
+"""
+Tests for the Prometheus metrics surface (/metrics)
+"""
+import asyncio
+import os
+import subprocess
+import sys
+
+from prometheus_client import REGISTRY, CollectorRegistry
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.core import metrics
+from app.models import EmailOutbox, GenerationJob, User
+from app.services import generation_jobs
+from app.services.credit_ledger_service import CreditLedgerService
+from app.services.image_generation_service import ImageGenerationService
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_request_latency_by_route_template_and_in_flight_gauge(client):
+    before = _sample("http_request_duration_seconds_count", method="GET", route="/health", status="200")
+
+    assert client.get("/health").status_code == 200
+    body = client.get("/metrics").text
+
+    assert _sample("http_request_duration_seconds_count", method="GET", route="/health", status="200") == before + 1
+    # The scrape itself is the only request in flight
+    assert 'http_requests_in_flight{method="GET"} 1.0' in body
+    assert "image_provider_request_duration_seconds" in body
+
+
+def test_scrapes_need_the_token_when_one_is_configured(client, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.METRICS_TOKEN", "scrape-secret")
+
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200 and "http_requests_in_flight" in response.text
+
+
+def test_health_is_registered_once():
+    from app.main import app
+
+    assert [route.path for route in app.routes].count("/health") == 1
+
+
+def test_queue_depth_is_read_at_scrape_time(db, engine):
+    user = User(email="queue@example.com", hashed_password="x", full_name="Queue", referral_code="QUEUE001")
+    db.add(user)
+    db.commit()
+    db.add_all([
+        EmailOutbox(from_email="noreply@example.com", to_email="a@example.com", subject="s", html_content="h", status="pending"),
+        EmailOutbox(from_email="noreply@example.com", to_email="b@example.com", subject="s", html_content="h", status="pending"),
+        EmailOutbox(from_email="noreply@example.com", to_email="c@example.com", subject="s", html_content="h", status="sent"),
+        GenerationJob(user_id=user.id, prompt_text="p", tier="standard", provider="mock", status="queued"),
+    ])
+    db.commit()
+
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(metrics.QueueDepthCollector(sessionmaker(bind=engine)))
+
+    assert registry.get_sample_value("email_outbox_depth", {"status": "pending"}) == 2
+    assert registry.get_sample_value("email_outbox_depth", {"status": "sent"}) is None
+    assert registry.get_sample_value("generation_queue_depth", {"provider": "mock", "status": "queued"}) == 1
+
+
+def test_generation_counters_and_provider_latency(db):
+    class StubAdapter:
+        name = "stub"
+
+        async def generate(self, prompt, tier="standard", user_id=0):
+            return {"status": "succeeded", "image_url": "https://img.example.com/1.png", "provider": "stub"}
+
+    service = ImageGenerationService.__new__(ImageGenerationService)
+    service.provider = "stub"
+    service.adapter = StubAdapter()
+    latency_before = _sample("image_provider_request_duration_seconds_count", provider="stub", outcome="success")
+    asyncio.run(service.generate_image("a prompt"))
+    assert _sample("image_provider_request_duration_seconds_count", provider="stub", outcome="success") == latency_before + 1
+
+    user = User(email="gen@example.com", hashed_password="x", full_name="Gen", referral_code="GEN00001")
+    db.add(user)
+    db.commit()
+    CreditLedgerService.credit_credits(db, user.id, 5, reason="purchase")
+    job = generation_jobs.submit_job(db, user.id, "a prompt", "standard", provider="mock")["job"]
+    generation_jobs.claim_next(db, "worker-1")
+
+    succeeded_before = _sample("image_generations_total", provider="mock", status="succeeded")
+    generation_jobs.complete_job(db, job.id, "worker-1", "a prompt", {"image_url": "https://img.example.com/2.png"})
+    assert _sample("image_generations_total", provider="mock", status="succeeded") == succeeded_before + 1
+
+
+def test_db_pool_checkout_wait_and_connections_in_use(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}")
+    metrics.instrument_engine(engine)
+    metrics.instrument_engine(engine)  # idempotent
+    waits = _sample("db_pool_checkout_wait_seconds_count")
+    in_use = _sample("db_pool_connections_in_use")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        assert _sample("db_pool_connections_in_use") == in_use + 1
+    assert _sample("db_pool_connections_in_use") == in_use
+    assert _sample("db_pool_checkout_wait_seconds_count") == waits + 1
+
+    # dispose() replaces the pool; checkouts stay timed
+    engine.dispose()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert _sample("db_pool_checkout_wait_seconds_count") == waits + 2
+    engine.dispose()
+
+
+def test_counters_aggregate_across_worker_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    backend = os.path.dirname(os.path.abspath(__file__))
+    worker = "from app.core import metrics; metrics.count_payment('package', 'success'); metrics.count_commission(1, 250.0)"
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], cwd=backend, env=env, check=True)
+
+    scrape = "from app.core import metrics; import sys; sys.stdout.write(metrics.render()[0].decode())"
+    body = subprocess.run([sys.executable, "-c", scrape], cwd=backend, env=env, check=True,
+                          capture_output=True, text=True).stdout
+
+    assert 'payments_total{kind="package",status="success"} 2.0' in body
+    assert 'commissions_amount_rupees_total{level="1"} 500.0' in body
@@ -0,0 +1,106 @@
+"""
+Tests for the set-based weekly payout batch (payout_service.create_payout_batch)
+"""
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import User, Package, Referral, Commission, Payout
+from app.services.payout_service import create_payout_batch
+
+
+def _seed(db, amounts_by_user):
+    """One user per entry, with pending commissions of the given amounts"""
+    package = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    buyer = User(email="buyer@example.com", hashed_password="x", full_name="Buyer", referral_code="BUYER")
+    db.add_all([package, buyer])
+    db.flush()
+    users = []
+    for index, amounts in enumerate(amounts_by_user):
+        user = User(email=f"earner{index}@example.com", hashed_password="x", full_name=f"Earner {index}",
+                    referral_code=f"EARN{index:04d}")
+        db.add(user)
+        db.flush()
+        for amount in amounts:
+            referral = Referral(referrer_id=user.id, referee_id=buyer.id, level=1, package_id=package.id)
+            db.add(referral)
+            db.flush()
+            db.add(Commission(user_id=user.id, referral_id=referral.id, amount=amount, commission_type="level1"))
+        users.append(user)
+    db.commit()
+    return users
+
+
+def test_batch_pays_eligible_users_in_chunks(db, count_queries):
+    minimum = settings.MINIMUM_PAYOUT_AMOUNT
+    users = _seed(db, [[minimum], [minimum / 2, minimum / 2, 100], [minimum - 1], [], [minimum * 3]] * 3)
+    paid = db.query(Commission).filter(Commission.user_id == users[4].id).first()
+    paid.status = "paid"
+    db.commit()
+
+    with count_queries() as statements:
+        result = create_payout_batch(db, chunk_size=2)
+
+    eligible = [u for index, u in enumerate(users) if index % 5 in (0, 1) or (index % 5 == 4 and u.id != users[4].id)]
+    assert result["payouts"] == len(eligible) == 8
+    assert result["chunks"] == 4
+    assert set(result["timings"]) == {"eligible", "claim", "insert", "link", "commit"}
+    # Fixed statements per chunk, whatever the number of commissions
+    assert len(statements) <= 3 + 4 * result["chunks"]
+
+    payouts = {p.user_id: p for p in db.query(Payout)}
+    assert set(payouts) == {u.id for u in eligible}
+    for payout in payouts.values():
+        linked = db.query(Commission).filter(Commission.payout_id == payout.id).all()
+        assert {c.status for c in linked} == {"processing"}
+        assert payout.amount == sum(c.amount for c in linked)
+        assert payout.status == "pending"
+    assert result["commissions"] == db.query(Commission).filter(Commission.payout_id.isnot(None)).count() == 3 + 3 * 3 + 2
+    assert result["amount"] == sum(p.amount for p in payouts.values())
+    # Below the minimum: untouched
+    below = db.query(Commission).filter(Commission.user_id == users[2].id).one()
+    assert (below.status, below.payout_id) == ("pending", None)
+
+    # Nothing left to pay
+    assert create_payout_batch(db)["payouts"] == 0
+
+
+def test_failed_chunk_rolls_back_and_rerun_resumes(db, monkeypatch):
+    _seed(db, [[1000.0]] * 4)
+    commit = Session.commit
+    calls = []
+
+    def _fail_second_chunk(session):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError("connection lost")
+        return commit(session)
+
+    monkeypatch.setattr(Session, "commit", _fail_second_chunk)
+    with pytest.raises(RuntimeError):
+        create_payout_batch(db, chunk_size=2)
+    monkeypatch.setattr(Session, "commit", commit)
+
+    assert db.query(Payout).count() == 2
+    assert db.query(Commission).filter(Commission.status == "pending", Commission.payout_id.is_(None)).count() == 2
+
+    result = create_payout_batch(db, chunk_size=2)
+
+    assert result["payouts"] == 2
+    assert db.query(Payout).count() == 4
+    assert db.query(Commission).filter(Commission.payout_id.is_(None)).count() == 0
+
+
+def test_batch_endpoint_reports_summary(db, client, login_as):
+    _seed(db, [[1000.0], [200.0]])
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN", is_admin=True)
+    db.add(admin)
+    db.commit()
+    login_as(admin)
+
+    body = client.post("/api/payouts/batch-create").json()
+
+    assert body["count"] == 1
+    assert body["commission_count"] == 1
+    assert body["total_amount"] == 1000.0
+    assert "link" in body["timings"]
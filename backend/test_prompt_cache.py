@@ -0,0 +1,129 @@
+"""
+Tests for the prompt enhancement cache (LRU backends, request coalescing, SDK timeout)
+"""
+import asyncio
+import threading
+import time
+
+from app.services import prompt_enhancement_service
+from app.services.prompt_cache import MemoryPromptCache, PromptEnhancementCache, SQLitePromptCache
+from app.services.prompt_enhancement_service import GeminiAdapter, PromptEnhancementService
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowEnhancer:
+    """Adapter stand-in; "fail" prompts come back unchanged like a provider fallback"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def enhance(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return prompt if "fail" in prompt else f"{prompt}, golden hour, 35mm"
+
+
+def _service(backend=None, delay=0.05):
+    service = PromptEnhancementService.__new__(PromptEnhancementService)
+    service.provider = "stub"
+    service.adapter = SlowEnhancer(delay)
+    service.cache = PromptEnhancementCache(backend or MemoryPromptCache(100, 900))
+    return service
+
+
+def test_memory_backend_evicts_least_recently_used_and_expires():
+    clock = FakeClock()
+    cache = MemoryPromptCache(max_entries=2, ttl_seconds=60, clock=clock)
+    cache.set("a", "A")
+    cache.set("b", "B")
+    assert cache.get("a") == "A"  # a is now the most recent
+    cache.set("c", "C")
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == ("A", None, "C")
+
+    clock.now += 60
+    assert cache.get("a") is None and len(cache) == 1
+
+
+def test_sqlite_backend_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "prompts.sqlite3")
+    clock = FakeClock()
+    worker_a = SQLitePromptCache(path, max_entries=2, ttl_seconds=60, clock=clock)
+    worker_b = SQLitePromptCache(path, max_entries=2, ttl_seconds=60, clock=clock)
+
+    worker_a.set("a", "A")
+    clock.now += 1
+    worker_a.set("b", "B")
+    clock.now += 1
+    assert worker_b.get("a") == "A"
+    clock.now += 1
+    worker_b.set("c", "C")
+
+    assert (worker_a.get("a"), worker_a.get("b"), worker_a.get("c")) == ("A", None, "C")
+
+    clock.now += 60
+    assert worker_b.get("c") is None and len(worker_a) == 1
+
+
+def test_concurrent_requests_for_a_prompt_make_one_upstream_call():
+    service = _service()
+
+    async def scenario():
+        results = await asyncio.gather(*(service.enhance_prompt("a red fox in snow") for _ in range(10)))
+        again = await service.enhance_prompt("  a red fox   in snow ")
+        return results, again
+
+    results, again = asyncio.run(scenario())
+
+    assert set(results) == {"a red fox in snow, golden hour, 35mm"}
+    assert again == results[0]
+    assert service.adapter.calls == 1
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_shared_call():
+    service = _service(delay=0.1)
+
+    async def scenario():
+        first = asyncio.ensure_future(service.enhance_prompt("a red fox in snow"))
+        second = asyncio.ensure_future(service.enhance_prompt("a red fox in snow"))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "a red fox in snow, golden hour, 35mm"
+    assert service.adapter.calls == 1
+
+
+def test_failed_enhancements_are_not_cached(tmp_path):
+    service = _service(SQLitePromptCache(str(tmp_path / "prompts.sqlite3"), 100, 900))
+
+    assert asyncio.run(service.enhance_prompt("this will fail")) == "this will fail"
+    assert asyncio.run(service.enhance_prompt("this will fail")) == "this will fail"
+    assert service.adapter.calls == 2
+
+
+def test_gemini_sdk_call_runs_in_its_pool_within_the_timeout(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROMPT_ENHANCER_TIMEOUT_SECONDS", 0.05)
+    threads = []
+
+    class HungModel:
+        def generate_content(self, contents, request_options=None):
+            threads.append(threading.current_thread().name)
+            time.sleep(0.5)
+
+    adapter = GeminiAdapter.__new__(GeminiAdapter)
+    adapter.model = HungModel()
+
+    started = time.perf_counter()
+    assert asyncio.run(adapter.enhance("a red fox in snow")) == "a red fox in snow"
+    assert time.perf_counter() - started < 0.3
+    assert threads[0].startswith("prompt-enhancer")
+    assert prompt_enhancement_service.get_sdk_executor() is prompt_enhancement_service.get_sdk_executor()
@@ -0,0 +1,210 @@
+"""
+Tests for latency-aware image provider routing (hedging, circuit breakers)
+"""
+import asyncio
+import time
+
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.models import CreditLedger, GeneratedImage, GenerationJob, User
+from app.services import generation_jobs
+from app.services.credit_ledger_service import CreditLedgerService
+from app.services.generation_jobs import GenerationWorkerPool
+from app.services.provider_router import CLOSED, HALF_OPEN, OPEN, ProviderRouter
+
+
+class ScriptedProvider:
+    """Provider stand-in answering with scripted delays ("fail" entries fail after the delay)"""
+
+    def __init__(self, name, script):
+        self.name = name
+        self.script = list(script)
+        self.calls = 0
+        self.cancelled = 0
+
+    async def generate(self, prompt, tier="standard", user_id=0):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        delay, fail = (step[0], True) if isinstance(step, tuple) else (step, False)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if fail:
+            return {"status": "failed", "error": f"{self.name} exploded"}
+        return {"status": "succeeded", "image_url": f"https://img.example.com/{self.name}/{self.calls}.png"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(autouse=True)
+def router_settings(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_ROUTER_MIN_SAMPLES", 3)
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_BREAKER_FAILURES", 2)
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_BREAKER_RESET_SECONDS", 30.0)
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_AFTER_SECONDS", 0.0)
+
+
+def _run(router, times=1):
+    return [asyncio.run(router.generate("a prompt")) for _ in range(times)]
+
+
+def test_ranks_providers_by_measured_latency(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_ENABLED", False)
+    slow = ScriptedProvider("slow", [0.06])
+    fast = ScriptedProvider("fast", [0.01])
+    router = ProviderRouter([slow, fast])
+
+    # Unmeasured providers go first, in configured order
+    assert [r["provider"] for r in _run(router, 4)] == ["slow", "slow", "slow", "fast"]
+    _run(router, 2)
+    assert [r["provider"] for r in _run(router, 3)] == ["fast"] * 3
+
+    snapshot = router.snapshot()
+    assert snapshot["fast"]["p50"] < snapshot["slow"]["p50"] <= snapshot["slow"]["p95"]
+    assert snapshot["slow"]["samples"] == 3 and snapshot["fast"]["error_rate"] == 0.0
+
+
+def test_circuit_opens_on_repeated_failures_and_recovers_after_a_trial_call(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_ENABLED", False)
+    clock = FakeClock()
+    flaky = ScriptedProvider("flaky", [(0, "fail"), (0, "fail"), 0])
+    backup = ScriptedProvider("backup", [0])
+    router = ProviderRouter([flaky, backup], clock=clock)
+
+    # Each failure fails over to the backup within the same generation
+    assert [r["provider"] for r in _run(router, 2)] == ["backup", "backup"]
+    assert router.stats["flaky"].state == OPEN
+
+    _run(router, 3)
+    assert flaky.calls == 2  # skipped while open
+
+    clock.now += 30
+    assert router.stats["flaky"].available() and router.stats["flaky"].state == HALF_OPEN
+    assert _run(router)[0]["provider"] == "flaky"
+    assert router.stats["flaky"].state == CLOSED
+
+
+def test_all_circuits_open_fails_without_calling_anyone():
+    broken = ScriptedProvider("broken", [(0, "fail")])
+    router = ProviderRouter([broken], clock=FakeClock())
+    _run(router, 2)
+
+    result = _run(router)[0]
+    assert result["status"] == "failed" and "unavailable" in result["error"]
+    assert broken.calls == 2
+
+
+def test_slow_call_is_hedged_and_the_first_result_wins(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_AFTER_SECONDS", 0.05)
+    primary = ScriptedProvider("primary", [1.0])
+    secondary = ScriptedProvider("secondary", [0.02])
+    router = ProviderRouter([primary, secondary])
+    hedges = REGISTRY.get_sample_value("image_provider_hedges_total", {"winner": "hedge"}) or 0.0
+
+    started = time.perf_counter()
+    result = _run(router)[0]
+
+    assert time.perf_counter() - started < 0.5
+    assert result["provider"] == "secondary"
+    assert (primary.calls, secondary.calls, primary.cancelled) == (1, 1, 1)
+    # The cancelled loser is neither a failure nor a latency sample
+    assert len(router.stats["primary"].samples) == 0 and router.stats["primary"].state == CLOSED
+    assert REGISTRY.get_sample_value("image_provider_hedges_total", {"winner": "hedge"}) == hedges + 1
+
+
+def test_fast_primary_is_not_hedged(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_AFTER_SECONDS", 0.2)
+    primary = ScriptedProvider("primary", [0.01])
+    secondary = ScriptedProvider("secondary", [0.01])
+
+    assert _run(ProviderRouter([primary, secondary]), 3)[-1]["provider"] == "primary"
+    assert secondary.calls == 0
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """File-backed SQLite: the worker pool settles jobs from a worker thread"""
+    test_engine = create_engine(f"sqlite:///{tmp_path / 'router.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=test_engine)
+    yield test_engine
+    test_engine.dispose()
+
+
+def test_hedged_generation_debits_credits_once(db, engine, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.PROVIDER_HEDGE_AFTER_SECONDS", 0.05)
+    router = ProviderRouter([ScriptedProvider("primary", [0.5]), ScriptedProvider("secondary", [0.02])])
+
+    class StubService:
+        def get_adapter(self, provider=None):
+            return router
+
+    monkeypatch.setattr(generation_jobs, "get_image_generation_service", lambda: StubService())
+
+    user = User(email="hedge@example.com", hashed_password="x", full_name="Hedge", referral_code="HEDGE001")
+    db.add(user)
+    db.commit()
+    CreditLedgerService.credit_credits(db, user.id, 5, reason="purchase")
+    job = generation_jobs.submit_job(db, user.id, "a prompt", "standard", provider="auto")["job"]
+    assert job.provider == "auto"
+
+    pool = GenerationWorkerPool(session_factory=sessionmaker(bind=engine))
+    assert asyncio.run(pool.drain()) == 1
+
+    db.expire_all()
+    assert db.get(GenerationJob, job.id).status == "succeeded"
+    assert [image.provider for image in db.query(GeneratedImage).all()] == ["secondary"]
+    assert [(row.reason, row.delta) for row in db.query(CreditLedger).order_by(CreditLedger.id)] == [
+        ("purchase", 5), ("generation", -1),
+    ]
+    assert CreditLedgerService.get_balance(db, user.id) == 4
+
+
+def test_router_calls_take_the_per_provider_slots_of_the_pool(db, engine, monkeypatch):
+    monkeypatch.setattr(generation_jobs, "PROVIDER_CONCURRENCY", {"primary": 1, "secondary": 1, "auto": 8, "default": 2})
+    in_flight, peak = {"primary": 0, "secondary": 0}, {"primary": 0, "secondary": 0}
+
+    class CountingProvider(ScriptedProvider):
+        async def generate(self, prompt, tier="standard", user_id=0):
+            in_flight[self.name] += 1
+            peak[self.name] = max(peak[self.name], in_flight[self.name])
+            try:
+                return await super().generate(prompt, tier, user_id)
+            finally:
+                in_flight[self.name] -= 1
+
+    primary, secondary = CountingProvider("primary", [0.1]), CountingProvider("secondary", [0.1])
+    router = ProviderRouter([primary, secondary])
+
+    class StubService:
+        def get_adapter(self, provider=None):
+            return router
+
+    monkeypatch.setattr(generation_jobs, "get_image_generation_service", lambda: StubService())
+    user = User(email="auto@example.com", hashed_password="x", full_name="Auto", referral_code="AUTO0001")
+    db.add(user)
+    db.commit()
+    CreditLedgerService.credit_credits(db, user.id, 5, reason="purchase")
+    for _ in range(3):
+        generation_jobs.submit_job(db, user.id, "a prompt", "standard", provider="auto")
+
+    pool = GenerationWorkerPool(session_factory=sessionmaker(bind=engine))
+    assert asyncio.run(pool.drain()) == 3
+
+    # The second job skipped the saturated primary, the third waited for a slot
+    assert peak == {"primary": 1, "secondary": 1}
+    assert primary.calls + secondary.calls == 3 and secondary.calls >= 1
+    assert pool.active == {"auto": 0, "primary": 0, "secondary": 0}
+    db.expire_all()
+    assert {job.status for job in db.query(GenerationJob)} == {"succeeded"}
@@ -0,0 +1,93 @@
+"""
+EXPLAIN QUERY PLAN checks for the hot per-request queries
+
+Each query mirrors a filter/sort used by app/api. The test fails when SQLite
+would answer one with a full table (or full index) scan, or sort its rows in
+a temporary B-tree, i.e. when the index that serves it is missing.
+"""
+import pytest
+from sqlalchemy import func
+
+from app.models import (
+    Comment, Commission, CommunityPost, CreditLedger, GeneratedImage, Notification,
+    Payment, PostLike, UserCoursePurchase, UserPackage, VideoProgress,
+)
+from app.models.wallet import WalletTransaction
+from app.services import referral_graph
+
+HOT_QUERIES = {
+    "community feed (newest)": lambda db: db.query(CommunityPost).filter(
+        CommunityPost.visibility == "public", CommunityPost.is_hidden == False
+    ).order_by(CommunityPost.created_at.desc(), CommunityPost.id.desc()).limit(20),
+    "user's public post count": lambda db: db.query(func.count(CommunityPost.id)).filter(
+        CommunityPost.user_id == 1, CommunityPost.visibility == "public", CommunityPost.is_hidden == False
+    ),
+    "post like lookup": lambda db: db.query(PostLike).filter(PostLike.post_id == 1, PostLike.user_id == 2),
+    "viewer likes on a feed page": lambda db: db.query(PostLike.post_id).filter(
+        PostLike.user_id == 2, PostLike.post_id.in_([1, 2, 3])
+    ),
+    "comment thread": lambda db: db.query(Comment).filter(
+        Comment.post_id == 1, Comment.is_deleted == False
+    ).order_by(Comment.created_at, Comment.id).limit(20),
+    "credit ledger history": lambda db: db.query(CreditLedger).filter(
+        CreditLedger.user_id == 1
+    ).order_by(CreditLedger.created_at.desc()).limit(50),
+    "my creations": lambda db: db.query(GeneratedImage).filter(
+        GeneratedImage.user_id == 1
+    ).order_by(GeneratedImage.created_at.desc()).limit(20),
+    "topic progress": lambda db: db.query(VideoProgress).filter(
+        VideoProgress.user_id == 1, VideoProgress.topic_id == 2
+    ),
+    "current package": lambda db: db.query(UserPackage).filter(
+        UserPackage.user_id == 1, UserPackage.status == "active"
+    ).order_by(UserPackage.purchase_date.desc()).limit(1),
+    "notifications": lambda db: db.query(Notification).filter(
+        Notification.user_id == 1
+    ).order_by(Notification.created_at.desc()).limit(50),
+    "unread notification count": lambda db: db.query(func.count(Notification.id)).filter(
+        Notification.user_id == 1, Notification.is_read == False
+    ),
+    "commission history": lambda db: db.query(Commission).filter(
+        Commission.user_id == 1
+    ).order_by(Commission.created_at.desc()),
+    "payment history": lambda db: db.query(Payment).filter(
+        Payment.user_id == 1
+    ).order_by(Payment.created_at.desc()),
+    "individual course access": lambda db: db.query(UserCoursePurchase).filter(
+        UserCoursePurchase.user_id == 1, UserCoursePurchase.is_active == True, UserCoursePurchase.course_id == 2
+    ),
+    "wallet transactions": lambda db: db.query(WalletTransaction).filter(
+        WalletTransaction.wallet_id == 1
+    ).order_by(WalletTransaction.created_at.desc()).limit(50),
+}
+
+
+def query_plan(db, query):
+    compiled = query.statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    return [row[-1] for row in db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}")]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(db, name):
+    plan = query_plan(db, HOT_QUERIES[name](db))
+
+    assert not [step for step in plan if step.startswith("SCAN")], f"{name}: {plan}"
+    assert not [step for step in plan if "TEMP B-TREE" in step], f"{name}: {plan}"
+    assert any(step.startswith("SEARCH") for step in plan), f"{name}: {plan}"
+
+
+def test_missing_index_is_detected(db):
+    db.connection().exec_driver_sql("DROP INDEX ix_notifications_user_created")
+
+    plan = query_plan(db, HOT_QUERIES["notifications"](db))
+
+    assert any("TEMP B-TREE" in step for step in plan)
+
+
+def test_referral_stats_package_breakdown_reads_only_the_downline(db):
+    plan = query_plan(db, referral_graph.package_counts(db, 1, max_depth=2))
+
+    # Each member's latest package is an index lookup, never a window over all purchases
+    assert not [step for step in plan if step.startswith("SCAN")], plan
+    assert any(step.startswith("SEARCH referral_paths") for step in plan), plan
+    assert any(step.startswith("SEARCH user_packages USING INDEX ix_user_packages_user_status_purchase") for step in plan), plan
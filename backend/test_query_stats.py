@@ -0,0 +1,94 @@
+"""
+Tests for per-request SQL instrumentation (query counts, slow-query log, /metrics)
+"""
+import logging
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core import query_stats
+from app.models import User, Notification
+
+
+def _user_with_notifications(db, count=3):
+    user = User(email="reader@example.com", hashed_password="x", full_name="Reader", referral_code="READER01")
+    db.add(user)
+    db.commit()
+    db.add_all(Notification(user_id=user.id, title=f"n{i}", message="m", type="system") for i in range(count))
+    db.commit()
+    return user
+
+
+def test_response_headers_report_request_queries(db, client, login_as, count_queries):
+    login_as(_user_with_notifications(db))
+
+    with count_queries() as statements:
+        response = client.get("/api/notifications/")
+
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) == len(statements) > 0
+    assert float(response.headers["X-DB-Time-Ms"]) >= float(response.headers["X-DB-Slowest-Ms"]) >= 0
+
+
+def test_slow_queries_are_logged_with_route_template(db, client, login_as, monkeypatch, caplog):
+    monkeypatch.setattr("app.core.config.settings.SLOW_QUERY_THRESHOLD_MS", 0.0)
+    login_as(_user_with_notifications(db))
+    notification_id = db.query(Notification.id).first()[0]
+
+    with caplog.at_level(logging.WARNING, logger="app.core.query_stats"):
+        client.get(f"/api/notifications/{notification_id}")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert messages and all("GET /api/notifications/{notification_id}" in message for message in messages)
+    assert any("SELECT notifications.id" in message for message in messages)
+
+    monkeypatch.setattr("app.core.config.settings.SLOW_QUERY_LOG_SAMPLE_RATE", 0.0)
+    caplog.clear()
+    client.get(f"/api/notifications/{notification_id}")
+    assert not caplog.records
+
+
+def test_metrics_endpoint_exposes_per_route_query_histograms(db, client, login_as):
+    login_as(_user_with_notifications(db))
+    client.get("/api/notifications/stats")
+
+    body = client.get("/metrics").text
+
+    assert 'http_request_db_queries_count{method="GET",route="/api/notifications/stats"}' in body
+    assert 'http_request_db_seconds_bucket{le="0.001",method="GET",route="/api/notifications/stats"}' in body
+
+
+def test_nothing_is_recorded_without_hooks(engine):
+    stats = query_stats.RequestQueryStats()
+    token = query_stats._current.set(stats)
+    try:
+        query_stats.uninstall_query_hooks()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert stats.count == 0
+
+        query_stats.install_query_hooks()
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert stats.count == 1
+    finally:
+        query_stats._current.reset(token)
+        query_stats.install_query_hooks()
+
+
+def test_failed_statements_leave_no_start_time_behind(engine):
+    stats = query_stats.RequestQueryStats()
+    token = query_stats._current.set(stats)
+    query_stats.install_query_hooks()
+    try:
+        with engine.connect() as conn:
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+            conn.execute(text("SELECT 1"))
+
+            assert "query_start_time" not in conn.info
+        assert stats.count == 1
+    finally:
+        query_stats._current.reset(token)
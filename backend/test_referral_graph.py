@@ -0,0 +1,93 @@
+"""
+Tests for the referral graph closure table (referral_paths)
+"""
+from app.models import User, Package, UserPackage, ReferralPath
+from app.services import referral_graph
+from app.services.referral_service import get_referral_tree
+
+
+def _user(db, name, referrer=None):
+    user = User(email=f"{name}@example.com", hashed_password="x", full_name=name.title(),
+                referral_code=name.upper()[:12], referred_by_id=referrer.id if referrer else None)
+    db.add(user)
+    db.flush()
+    referral_graph.add_user(db, user.id, user.referred_by_id)
+    db.commit()
+    return user
+
+
+def _chain_and_fanout(db):
+    """root -> a, b;  a -> a1, a2;  a1 -> a1x"""
+    root = _user(db, "root")
+    a, b = _user(db, "alpha", root), _user(db, "bravo", root)
+    a1, a2 = _user(db, "alpha1", a), _user(db, "alpha2", a)
+    a1x = _user(db, "alpha1x", a1)
+    return root, a, b, a1, a2, a1x
+
+
+def _paths(db):
+    return set(db.query(ReferralPath.ancestor_id, ReferralPath.descendant_id, ReferralPath.depth))
+
+
+def test_add_user_indexes_every_ancestor(db):
+    root, a, b, a1, a2, a1x = _chain_and_fanout(db)
+
+    assert [(u.id, depth) for u, depth in referral_graph.upline(db, a1x.id)] == [(a1.id, 1), (a.id, 2), (root.id, 3)]
+    assert referral_graph.level_counts(db, root.id) == {1: 2, 2: 2, 3: 1}
+    assert referral_graph.subtree_count(db, root.id) == 5
+    assert referral_graph.subtree_count(db, root.id, max_depth=2) == 4
+    assert referral_graph.subtree_count(db, b.id) == 0
+
+
+def test_rebuild_matches_incremental_index(db):
+    _chain_and_fanout(db)
+    incremental = _paths(db)
+
+    result = referral_graph.rebuild(db)
+
+    assert _paths(db) == incremental
+    assert result == {"rows": len(incremental), "depth": 3, "seconds": result["seconds"]}
+
+
+def test_stats_and_tree_use_one_query_each(db, client, login_as, count_queries):
+    root, a, b, a1, a2, a1x = _chain_and_fanout(db)
+    gold = Package(name="Gold", slug="gold", base_price=5000, gst_amount=900, final_price=5900)
+    db.add(gold)
+    db.flush()
+    db.add_all([UserPackage(user_id=a.id, package_id=gold.id, status="active"),
+                UserPackage(user_id=a1.id, package_id=gold.id, status="active")])
+    db.commit()
+    login_as(root)
+
+    with count_queries() as statements:
+        stats = client.get("/api/referrals/stats").json()
+    assert stats == {
+        "total_referrals": 4,
+        "level1_referrals": 2,
+        "level2_referrals": 2,
+        "package_breakdown": {"Gold": {"level1": 1, "level2": 1}},
+    }
+    # Level counts + package breakdown (the rest is the session reloading current_user)
+    assert len([sql for sql in statements if "referral_paths" in sql]) == 2
+
+    with count_queries() as statements:
+        tree = get_referral_tree(root.id, db)
+    assert [d["user_id"] for d in tree["direct_referrals"]] == [a.id, b.id]
+    assert [i["user_id"] for i in tree["direct_referrals"][0]["indirect_referrals"]] == [a1.id, a2.id]
+    assert len(statements) <= 2
+
+
+def test_register_indexes_new_user(db, client):
+    root, a, *_ = _chain_and_fanout(db)
+
+    response = client.post("/api/auth/register", json={
+        "email": "newbie@example.com",
+        "password": "Str0ngPassw0rd!",
+        "full_name": "New Bie",
+        "phone": "9876543210",
+        "referred_by_code": a.referral_code,
+    })
+
+    assert response.status_code in (200, 201), response.text
+    newbie = db.query(User).filter(User.email == "newbie@example.com").one()
+    assert [(u.id, depth) for u, depth in referral_graph.upline(db, newbie.id)] == [(a.id, 1), (root.id, 2)]
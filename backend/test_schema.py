@@ -0,0 +1,70 @@
+"""
+Tests for startup schema verification and DDL-free request handling
+"""
+import re
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+from app.core.database import Base
+from app.core.schema_check import SchemaError, missing_schema, verify_schema
+from app.models import User, Course, Package
+from app.services.reward_service import award_credits
+
+DDL = re.compile(r"^\s*(CREATE|ALTER|DROP|PRAGMA)\b", re.IGNORECASE)
+
+
+def _user(db, email="learner@example.com", is_admin=False):
+    user = User(email=email, hashed_password="x", full_name="Learner",
+                referral_code=email[:8].upper(), is_admin=is_admin)
+    db.add(user)
+    db.commit()
+    return user
+
+
+def test_verify_schema_accepts_complete_database(engine):
+    assert missing_schema(engine, Base.metadata) == {}
+    verify_schema(engine)
+
+
+def test_verify_schema_reports_missing_tables_and_columns():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE notifications"))
+        conn.execute(text("ALTER TABLE wallets DROP COLUMN version"))
+
+    assert missing_schema(engine, Base.metadata) == {"notifications": [], "wallets": ["version"]}
+    with pytest.raises(SchemaError, match="notifications \\(table\\).*wallets \\(columns: version\\)"):
+        verify_schema(engine)
+    engine.dispose()
+
+
+def test_request_handling_issues_no_ddl(db, client, login_as, count_queries):
+    admin = _user(db, "admin@example.com", is_admin=True)
+    learner = _user(db)
+    silver = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    db.add(silver)
+    db.flush()
+    course = Course(title="Course", slug="course", description="d", package_id=silver.id, is_published=True)
+    db.add(course)
+    db.commit()
+
+    with count_queries() as statements:
+        login_as(admin)
+        assert client.post("/api/wallet/credit", params={"amount": 50, "description": "bonus"}).status_code == 200
+        assert client.get(f"/api/courses/{course.id}/with-modules").status_code == 200
+        login_as(learner)
+        for path in (
+            "/api/wallet/", "/api/wallet/stats", "/api/wallet/transactions",
+            "/api/notifications/", "/api/notifications/stats",
+            "/api/profile/me", "/api/certificates/my-certificates",
+            "/api/course-purchases/my-purchases", f"/api/course-purchases/check-access/{course.id}",
+            "/api/courses/all-with-access",
+        ):
+            assert client.get(path).status_code == 200, path
+        assert award_credits(db, learner.id, 5, "Welcome bonus") is not None
+
+    assert statements
+    assert [statement for statement in statements if DDL.match(statement)] == []
@@ -0,0 +1,129 @@
+"""
+Tests for the time-decayed trending score
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.models import User, ImageCategory, GeneratedImage, CommunityPost, PostLike
+from app.services import trending_service
+
+
+def _make_post(db, author, category, title, created_at):
+    image = GeneratedImage(user_id=author.id, prompt_text=title, image_url="/static/x.png", status="succeeded")
+    db.add(image)
+    db.flush()
+    post = CommunityPost(image_id=image.id, user_id=author.id, title=title, category_id=category.id, created_at=created_at)
+    trending_service.record_event(post, "publish", at=created_at)
+    db.add(post)
+    db.flush()
+    return post
+
+
+@pytest.fixture
+def authors(db):
+    category = ImageCategory(name="Art")
+    users = [
+        User(email=f"u{i}@example.com", hashed_password="x", full_name=f"U{i}", referral_code=f"TREND{i:03d}")
+        for i in range(30)
+    ]
+    db.add(category)
+    db.add_all(users)
+    db.commit()
+    return users, category
+
+
+def _like(db, post, user, at):
+    db.add(PostLike(post_id=post.id, user_id=user.id, created_at=at))
+    post.likes_count = (post.likes_count or 0) + 1
+    trending_service.record_event(post, "like", at=at)
+
+
+def test_recent_engagement_outranks_older_engagement(db, authors):
+    users, category = authors
+    now = datetime(2026, 6, 1)
+    old = _make_post(db, users[0], category, "old", now - timedelta(days=7))
+    fresh = _make_post(db, users[0], category, "fresh", now - timedelta(hours=2))
+
+    for user in users[:20]:
+        _like(db, old, user, now - timedelta(days=6))
+    for user in users[:5]:
+        _like(db, fresh, user, now - timedelta(hours=1))
+
+    assert old.likes_count > fresh.likes_count
+    assert fresh.trending_score > old.trending_score
+
+
+def test_incremental_score_matches_recompute(db, authors):
+    users, category = authors
+    start = datetime(2026, 3, 1)
+    post = _make_post(db, users[0], category, "p", start)
+    for i, user in enumerate(users[:10]):
+        _like(db, post, user, start + timedelta(hours=i))
+    db.commit()
+    incremental = post.trending_score
+
+    trending_service.recompute_scores(db)
+    db.refresh(post)
+
+    assert post.trending_score == pytest.approx(incremental, rel=1e-9)
+
+
+def test_unlike_removes_contribution(db, authors):
+    users, category = authors
+    at = datetime(2026, 3, 1)
+    post = _make_post(db, users[0], category, "p", at)
+    before = post.trending_score
+
+    trending_service.record_event(post, "like", at=at + timedelta(hours=1))
+    trending_service.record_event(post, "like", at=at + timedelta(hours=1), removed=True)
+
+    assert post.trending_score == pytest.approx(before, rel=1e-9)
+
+
+def test_concurrent_events_on_a_stale_post_are_not_lost(db, engine, authors):
+    users, category = authors
+    at = datetime(2026, 3, 1)
+    post = _make_post(db, users[0], category, "p", at)
+    db.commit()
+    expected = post.trending_score
+    for hour in (1, 2):
+        expected = trending_service._log_add(expected, trending_service._event_term("like", at + timedelta(hours=hour)))
+
+    # Two requests load the post before either records its like
+    first, second = sessionmaker(bind=engine)(), sessionmaker(bind=engine)()
+    first_post, second_post = first.get(CommunityPost, post.id), second.get(CommunityPost, post.id)
+    trending_service.record_event(first_post, "like", at=at + timedelta(hours=1))
+    first.commit()
+    trending_service.record_event(second_post, "like", at=at + timedelta(hours=2))
+    second.commit()
+
+    db.expire_all()
+    assert db.get(CommunityPost, post.id).trending_score == pytest.approx(expected, rel=1e-9)
+    first.close()
+    second.close()
+
+
+def test_trending_feed_paginates_by_score(db, client, login_as, authors):
+    users, category = authors
+    now = datetime(2026, 6, 1)
+    for i in range(9):
+        post = _make_post(db, users[0], category, f"p{i}", now - timedelta(days=i))
+        for user in users[:i]:
+            _like(db, post, user, now - timedelta(days=i))
+    db.commit()
+    login_as(users[0])
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 4, "sort_by": "trending", **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/studio/community/feed", params=params).json()
+        seen.extend(item["title"] for item in body["items"])
+        cursor = body["next_cursor"]
+        if not cursor:
+            break
+
+    posts = db.query(CommunityPost).all()
+    expected = sorted(posts, key=lambda p: (p.trending_score, p.id), reverse=True)
+    assert seen == [p.title for p in expected]
@@ -0,0 +1,184 @@
+"""
+Tests for streaming video uploads and resumable upload sessions
+"""
+import asyncio
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.models import Course, Module, Package, Topic, User, Video
+from app.services import video_ingest
+from app.services.cloudinary_service import cloudinary_service
+
+VIDEO = os.urandom(10_000)
+
+
+@pytest.fixture(autouse=True)
+def upload_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.VIDEO_UPLOAD_DIR", str(tmp_path / "uploads"))
+    monkeypatch.setattr("app.core.config.settings.VIDEO_UPLOAD_CHUNK_BYTES", 1024)
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    """Records what Cloudinary would receive"""
+    uploads = []
+
+    def upload_video_large(file_path, folder="courses", public_id=None):
+        with open(file_path, "rb") as f:
+            uploads.append({"folder": folder, "data": f.read(), "thread": threading.current_thread().name})
+        return {"public_id": f"{folder}/v{len(uploads)}", "url": "https://video.example.com/v.mp4", "duration": 12}
+
+    monkeypatch.setattr(cloudinary_service, "upload_video_large", upload_video_large)
+    return uploads
+
+
+@pytest.fixture
+def module(db, login_as):
+    admin = User(email="admin@example.com", hashed_password="x", full_name="Admin", referral_code="ADMIN001", is_admin=True)
+    package = Package(name="Silver", slug="silver", base_price=2500, gst_amount=450, final_price=2950)
+    db.add_all([admin, package])
+    db.commit()
+    course = Course(title="Course", slug="course", package_id=package.id)
+    db.add(course)
+    db.commit()
+    module = Module(course_id=course.id, title="Module")
+    db.add(module)
+    db.commit()
+    login_as(admin)
+    return module
+
+
+class RecordingUpload(UploadFile):
+    def __init__(self, data):
+        super().__init__(io.BytesIO(data), filename="lesson.mp4")
+        self.read_sizes = []
+
+    async def read(self, size=-1):
+        self.read_sizes.append(size)
+        return await super().read(size)
+
+
+def test_spooling_reads_fixed_chunks_and_hashes_as_it_goes():
+    upload = RecordingUpload(VIDEO)
+
+    video = asyncio.run(video_ingest.spool_upload(upload))
+
+    assert set(upload.read_sizes) == {1024}
+    assert (video.size, video.sha256) == (len(VIDEO), hashlib.sha256(VIDEO).hexdigest())
+    with open(video.path, "rb") as f:
+        assert f.read() == VIDEO
+    video.cleanup()
+    assert not os.path.exists(video.path)
+
+
+def test_spooling_rejects_videos_over_the_limit(monkeypatch):
+    monkeypatch.setattr("app.core.config.settings.VIDEO_UPLOAD_MAX_BYTES", 4096)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(video_ingest.spool_upload(RecordingUpload(VIDEO)))
+
+    assert error.value.status_code == 413
+    assert os.listdir(video_ingest.upload_dir()) == []
+
+
+def test_multipart_course_video_is_uploaded_from_the_pool(db, client, module, storage):
+    response = client.post(
+        f"/api/courses/{module.course_id}/videos",
+        data={"title": "Intro"},
+        files={"video_file": ("intro.mp4", VIDEO, "video/mp4")},
+    )
+
+    assert response.status_code == 201, response.text
+    assert storage[0]["data"] == VIDEO and storage[0]["thread"].startswith("video-upload")
+    assert db.query(Video).one().cloudinary_public_id == f"courses/{module.course_id}/v1"
+    assert os.listdir(video_ingest.upload_dir()) == []
+
+
+def test_resumable_session_continues_after_a_dropped_chunk(db, client, module, storage):
+    created = client.post("/api/uploads/videos", json={
+        "filename": "lesson.mp4", "size": len(VIDEO), "sha256": hashlib.sha256(VIDEO).hexdigest(),
+    })
+    assert created.status_code == 201
+    upload_id = created.json()["upload_id"]
+    url = f"/api/uploads/videos/{upload_id}"
+
+    # First chunk arrives, only 1500 bytes of the second get through
+    assert client.put(url, content=VIDEO[:4000], headers={"Upload-Offset": "0"}).json()["offset"] == 4000
+    client.put(url, content=VIDEO[4000:5500], headers={"Upload-Offset": "4000"})
+
+    # Resending from the client's own position is refused with the committed offset
+    conflict = client.put(url, content=VIDEO[4000:], headers={"Upload-Offset": "4000"})
+    assert conflict.status_code == 409 and conflict.json()["detail"]["offset"] == 5500
+
+    offset = client.get(url).json()["offset"]
+    done = client.put(url, content=VIDEO[offset:], headers={"Upload-Offset": str(offset)}).json()
+    assert done["complete"] is True
+
+    response = client.post(
+        f"/api/modules/{module.id}/topics/upload-video",
+        data={"title": "Lesson 1", "upload_id": upload_id},
+    )
+
+    assert response.status_code == 200, response.text
+    assert storage[0]["data"] == VIDEO
+    assert db.query(Topic).one().cloudinary_url == "https://video.example.com/v.mp4"
+    assert client.get(url).status_code == 404  # Session removed once stored
+
+
+def test_incomplete_or_corrupt_sessions_are_not_stored(client, module, storage):
+    session = client.post("/api/uploads/videos", json={
+        "filename": "lesson.mp4", "size": len(VIDEO), "sha256": hashlib.sha256(b"other").hexdigest(),
+    }).json()
+    url = f"/api/uploads/videos/{session['upload_id']}"
+    topic_url = f"/api/modules/{module.id}/topics/upload-video"
+
+    client.put(url, content=VIDEO[:100], headers={"Upload-Offset": "0"})
+    assert client.post(topic_url, data={"title": "Lesson", "upload_id": session["upload_id"]}).status_code == 409
+
+    assert client.put(url, content=VIDEO[100:] + b"x", headers={"Upload-Offset": "100"}).status_code == 400
+    client.put(url, content=VIDEO[100:], headers={"Upload-Offset": str(client.get(url).json()["offset"])})
+    assert client.post(topic_url, data={"title": "Lesson", "upload_id": session["upload_id"]}).status_code == 400
+    assert storage == []
+
+
+def test_a_failed_store_keeps_the_session_for_a_retry(db, client, module, storage, monkeypatch):
+    upload_id = client.post("/api/uploads/videos", json={"filename": "lesson.mp4", "size": len(VIDEO)}).json()["upload_id"]
+    client.put(f"/api/uploads/videos/{upload_id}", content=VIDEO, headers={"Upload-Offset": "0"})
+    topic_url = f"/api/modules/{module.id}/topics/upload-video"
+
+    def cloudinary_down(file_path, folder="courses", public_id=None):
+        raise ConnectionError("Cloudinary unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(cloudinary_service, "upload_video_large", cloudinary_down)
+        assert client.post(topic_url, data={"title": "Lesson", "upload_id": upload_id}).status_code == 500
+    assert client.get(f"/api/uploads/videos/{upload_id}").json()["complete"] is True
+
+    assert client.post(topic_url, data={"title": "Lesson", "upload_id": upload_id}).status_code == 200
+    assert storage[0]["data"] == VIDEO
+    assert client.get(f"/api/uploads/videos/{upload_id}").status_code == 404
+
+
+def test_the_append_lock_is_refreshed_while_a_chunk_is_written(monkeypatch):
+    monkeypatch.setattr(video_ingest, "LOCK_REFRESH_SECONDS", 0)
+    upload_id = video_ingest.create_session("lesson.mp4", len(VIDEO))["upload_id"]
+    lock = video_ingest.upload_dir() / upload_id / video_ingest.LOCK_FILE
+    ages = []
+
+    async def body():
+        for i in range(0, len(VIDEO), 2500):
+            # Age the lock as a long chunk would
+            os.utime(lock, (0, 0))
+            yield VIDEO[i:i + 2500]
+            ages.append(os.path.getmtime(lock))
+
+    status = asyncio.run(video_ingest.append_chunk(upload_id, 0, body()))
+
+    assert status["complete"] is True
+    assert min(ages) > 0
+    assert not lock.exists()
@@ -0,0 +1,102 @@
+"""
+Tests for atomic, idempotent wallet mutations (app.api.wallet.create_transaction)
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.wallet import create_transaction, credit_wallet_internal, get_or_create_wallet
+from app.core.database import Base
+from app.models import User
+from app.models.wallet import TransactionSource, TransactionType, Wallet, WalletTransaction
+
+
+def _users(db, count):
+    users = [User(email=f"user{i}@example.com", hashed_password="x", full_name=f"User {i}", referral_code=f"W{i:05d}")
+             for i in range(count)]
+    db.add_all(users)
+    db.commit()
+    return users
+
+
+def test_reference_id_is_an_idempotency_key(db):
+    user, = _users(db, 1)
+
+    first = credit_wallet_internal(db, user.id, 100.0, TransactionSource.COMMISSION, "Commission", "commission_1")
+    again = credit_wallet_internal(db, user.id, 100.0, TransactionSource.COMMISSION, "Commission", "commission_1")
+
+    assert again.id == first.id
+    wallet = get_or_create_wallet(db, user.id)
+    assert (wallet.balance, wallet.total_earned, wallet.version) == (100.0, 100.0, 2)
+    assert (first.balance_before, first.balance_after) == (0.0, 100.0)
+
+
+def test_debit_never_overdraws(db):
+    user, = _users(db, 1)
+    wallet = get_or_create_wallet(db, user.id)
+    create_transaction(db, wallet, TransactionType.CREDIT, TransactionSource.ADMIN, 50.0, "Top up", "top-up")
+
+    try:
+        create_transaction(db, wallet, TransactionType.DEBIT, TransactionSource.PURCHASE, 80.0, "Too much", "purchase-1")
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("debit above the balance was accepted")
+
+    assert db.query(WalletTransaction).count() == 1
+    assert get_or_create_wallet(db, user.id).balance == 50.0
+
+
+def test_parallel_credits_and_debits_keep_exact_balances(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'wallets.db'}", connect_args={"check_same_thread": False, "timeout": 60})
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        user_ids = [user.id for user in _users(db, 4)]
+        for user_id in user_ids:
+            get_or_create_wallet(db, user_id)
+
+    rng = random.Random(7)
+    operations = []
+    for index in range(2000):
+        kind = TransactionType.CREDIT if rng.random() < 0.55 else TransactionType.DEBIT
+        operations.append((rng.choice(user_ids), kind, float(rng.choice([10, 25, 40])), f"op-{index}"))
+    # Retried requests: every 10th operation is submitted twice
+    operations += operations[::10]
+    rng.shuffle(operations)
+
+    def _apply(operation):
+        user_id, kind, amount, reference_id = operation
+        with Session() as db:
+            wallet = db.query(Wallet).filter(Wallet.user_id == user_id).one()
+            source = TransactionSource.ADMIN if kind == TransactionType.CREDIT else TransactionSource.PURCHASE
+            try:
+                create_transaction(db, wallet, kind, source, amount, "Stress", reference_id)
+                return True
+            except HTTPException:
+                return False
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(_apply, operations))
+    assert any(results) and not all(results)  # Some debits hit an empty wallet
+
+    with Session() as db:
+        assert db.query(WalletTransaction).count() == len({op[3] for op, ok in zip(operations, results) if ok})
+        for user_id in user_ids:
+            wallet = db.query(Wallet).filter(Wallet.user_id == user_id).one()
+            history = db.query(WalletTransaction).filter(WalletTransaction.wallet_id == wallet.id).order_by(WalletTransaction.id).all()
+
+            ledger = sum(t.amount if t.type == TransactionType.CREDIT else -t.amount for t in history)
+            assert wallet.balance == ledger
+            assert wallet.version == 1 + len(history)
+            # Every transaction starts from the balance the previous one left
+            balance = 0.0
+            for transaction in history:
+                assert transaction.balance_before == balance
+                assert transaction.balance_after >= 0
+                balance = transaction.balance_after
+            assert balance == wallet.balance
+    engine.dispose()
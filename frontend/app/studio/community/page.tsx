@@ -64,7 +64,7 @@ export default function CommunityGalleryPage() {
 
       // Build query parameters
       const params: any = {
-        cursor: 0,
+        cursor: null,
         limit: 20,
       };
 
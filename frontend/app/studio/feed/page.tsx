@@ -40,7 +40,7 @@ export default function MobileFeedPage() {
   const [direction, setDirection] = useState(0);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
-  const [cursor, setCursor] = useState(0);
+  const [cursor, setCursor] = useState<string | null>(null);
   const [hasMore, setHasMore] = useState(true);
   const [isRemixModalOpen, setIsRemixModalOpen] = useState(false);
   const [selectedPostForRemix, setSelectedPostForRemix] = useState<FeedPost | null>(null);
@@ -84,7 +84,7 @@ export default function MobileFeedPage() {
       setError(null);
 
       const response = await studioAPI.getCommunityFeed(
-        loadMore ? cursor : 0,
+        loadMore ? cursor : null,
         20,
         undefined,
         undefined,
@@ -103,7 +103,7 @@ export default function MobileFeedPage() {
 
       // Update cursor for next page
       if (response.data.next_cursor) {
-        setCursor(parseInt(response.data.next_cursor));
+        setCursor(response.data.next_cursor);
         setHasMore(true);
       } else {
         setHasMore(false);
@@ -238,7 +238,10 @@ export const adminAPI = {
   getRecentActivity: () => api.get('/api/admin/recent-activity'),
 
   // Users
-  getUsers: (skip = 0, limit = 100) => api.get(`/api/admin/users?skip=${skip}&limit=${limit}`),
+  getUsers: (skip = 0, limit = 100, filters?: { package?: string; search?: string; is_active?: boolean; sort_by?: string; cursor?: string }) =>
+    api.get('/api/admin/users', { params: { skip, limit, ...filters } }),
+  exportUsers: (filters?: { package?: string; search?: string; is_active?: boolean; sort_by?: string }) =>
+    api.get('/api/admin/users/export', { params: filters, responseType: 'blob' }),
   toggleUserActive: (userId: number) => api.put(`/api/admin/users/${userId}/toggle-active`),
   toggleUserAdmin: (userId: number) => api.put(`/api/admin/users/${userId}/toggle-admin`),
 
@@ -360,7 +363,7 @@ export const studioAPI = {
     }),
 
   getCommunityFeed: (
-    cursor: number = 0,
+    cursor: string | null = null,
     limit: number = 20,
     categoryId?: number,
     search?: string,
@@ -368,7 +371,8 @@ export const studioAPI = {
     provider?: string,
     sortBy?: string
   ) => {
-    const params: any = { cursor, limit };
+    const params: any = { limit };
+    if (cursor) params.cursor = cursor;
     if (categoryId) params.category_id = categoryId;
     if (search) params.search = search;
     if (tier) params.tier = tier;